@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Attendance
+from .services import AttendanceService
 
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
@@ -14,4 +15,18 @@ class AttendanceAdmin(admin.ModelAdmin):
     
     def get_section_name(self, obj):
         return obj.class_section.section_name if obj.class_section else obj.student.class_section.section_name if obj.student.class_section else '-'
-    get_section_name.short_description = 'Section'
\ No newline at end of file
+    get_section_name.short_description = 'Section'
+    
+    def save_model(self, request, obj, form, change):
+        previous = Attendance.objects.filter(pk=obj.pk).first() if change else None
+        super().save_model(request, obj, form, change)
+        AttendanceService.refresh_for_records([obj] + ([previous] if previous else []))
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        AttendanceService.refresh_for_records([obj])
+    
+    def delete_queryset(self, request, queryset):
+        records = list(queryset)
+        super().delete_queryset(request, queryset)
+        AttendanceService.refresh_for_records(records)
@@ -2,10 +2,10 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from .models import Attendance
 from .serializers import AttendanceSerializer
+from .services import AttendanceService
 from students.models import Student
 from subjects.models import ClassSection
 from users.decorators import module_required
@@ -29,6 +29,19 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             
         return queryset.order_by('-date', 'student__first_name')
     
+    def perform_create(self, serializer):
+        record = serializer.save()
+        AttendanceService.refresh_for_records([record])
+    
+    def perform_update(self, serializer):
+        previous = Attendance.objects.get(pk=serializer.instance.pk)
+        record = serializer.save()
+        AttendanceService.refresh_for_records([previous, record])
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        AttendanceService.refresh_for_records([instance])
+    
     @action(detail=False, methods=['post'])
     def bulk_mark(self, request):
         """Bulk mark attendance for a class"""
@@ -41,27 +54,12 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 return Response({'error': 'Class ID and date are required'}, 
                               status=status.HTTP_400_BAD_REQUEST)
             
-            # Delete existing attendance for this class and date
-            Attendance.objects.filter(
-                student__class_section_id=class_id,
-                date=date
-            ).delete()
-            
-            # Create new attendance records
-            attendance_records = []
-            for item in attendance_data:
-                student = get_object_or_404(Student, id=item['student_id'])
-                attendance_records.append(Attendance(
-                    student=student,
-                    date=date,
-                    status=item['status']
-                ))
-            
-            Attendance.objects.bulk_create(attendance_records)
+            # Replace the class's attendance for this date in one bulk write
+            count = AttendanceService.bulk_mark_attendance(class_id, date, attendance_data)
             
             return Response({
-                'message': f'Attendance marked for {len(attendance_records)} students',
-                'count': len(attendance_records)
+                'message': f'Attendance marked for {count} students',
+                'count': count
             })
             
         except Exception as e:
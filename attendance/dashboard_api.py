@@ -1,7 +1,7 @@
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.db.models import Count, Q
-from .models import Attendance
+from .models import StudentAttendanceTotals
 from students.models import Student
 import logging
 
@@ -28,14 +28,14 @@ def attendance_report_api(request):
                 'error': 'Student not found'
             }, status=404)
         
-        # Get attendance data
-        attendance_records = Attendance.objects.filter(student=student)
+        # Get attendance data from the student's running totals
+        totals = StudentAttendanceTotals.objects.filter(student=student).first()
         
-        total_days = attendance_records.count()
-        present_days = attendance_records.filter(status='present').count()
-        absent_days = attendance_records.filter(status='absent').count()
+        total_days = totals.total if totals else 0
+        present_days = totals.present if totals else 0
+        absent_days = totals.absent if totals else 0
         
-        percentage = round((present_days / total_days * 100), 2) if total_days > 0 else 0
+        percentage = totals.percentage if totals else 0
         
         return JsonResponse([{
             'student_name': student.name,
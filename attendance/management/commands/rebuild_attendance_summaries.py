@@ -0,0 +1,30 @@
+# Rebuild the attendance daily summaries and per-student totals from the raw records
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.services import AttendanceService
+
+
+class Command(BaseCommand):
+    help = 'Recompute AttendanceDailySummary and StudentAttendanceTotals (run once after upgrading)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only recompute daily summaries from this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+
+        start = time.perf_counter()
+        self.stdout.write('📅 Rebuilding attendance summaries...')
+        summaries, students = AttendanceService.rebuild_rollups(since)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt {summaries} class-day summaries and totals of {students} students '
+            f'in {time.perf_counter() - start:.1f}s'
+        ))
@@ -9,8 +9,52 @@ class Attendance(BaseModel):
 
     class Meta:
         unique_together = ('student', 'date')
+        indexes = [
+            models.Index(fields=['class_section', 'date', 'status']),
+            models.Index(fields=['date', 'status']),
+        ]
         verbose_name = 'Attendance'
         verbose_name_plural = 'Attendance Records'
 
     def __str__(self):
         return f"{self.student} - {self.date} - {self.status}"
+
+
+class AttendanceDailySummary(BaseModel):
+    """Per-class totals for one day, kept up to date by AttendanceService.record_class_attendance"""
+    class_section = models.ForeignKey('subjects.ClassSection', on_delete=models.CASCADE, related_name='attendance_summaries')
+    date = models.DateField()
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('class_section', 'date')
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+        verbose_name = 'Attendance Daily Summary'
+        verbose_name_plural = 'Attendance Daily Summaries'
+
+    def __str__(self):
+        return f"{self.class_section} - {self.date}: {self.present}/{self.total}"
+
+
+class StudentAttendanceTotals(BaseModel):
+    """Running attendance totals of one student"""
+    student = models.OneToOneField('students.Student', on_delete=models.CASCADE, related_name='attendance_totals')
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    last_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Student Attendance Totals'
+        verbose_name_plural = 'Student Attendance Totals'
+
+    @property
+    def percentage(self):
+        return round((self.present / self.total * 100), 2) if self.total > 0 else 0
+
+    def __str__(self):
+        return f"{self.student} - {self.present}/{self.total}"
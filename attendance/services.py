@@ -1,8 +1,10 @@
 # attendance/services.py
-from django.db.models import Count, Q
+from datetime import date as date_cls
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
 from django.core.cache import cache
 from django.utils import timezone
-from .models import Attendance
+from .models import Attendance, AttendanceDailySummary, StudentAttendanceTotals
 from students.models import Student
 from decimal import Decimal
 import logging
@@ -10,9 +12,15 @@ import logging
 logger = logging.getLogger(__name__)
 
 class AttendanceService:
+    BATCH_SIZE = 500
+    
     @staticmethod
     def calculate_attendance_percentage(student, start_date=None, end_date=None):
         """Calculate attendance percentage for a student"""
+        if not start_date and not end_date:
+            totals = StudentAttendanceTotals.objects.filter(student=student).first()
+            return totals.percentage if totals else 0
+        
         queryset = Attendance.objects.filter(student=student)
         
         if start_date:
@@ -20,11 +28,19 @@ class AttendanceService:
         if end_date:
             queryset = queryset.filter(date__lte=end_date)
         
-        total = queryset.count()
-        present = queryset.filter(status='Present').count()
+        stats = queryset.aggregate(total=Count('id'), present=Count('id', filter=Q(status='Present')))
+        total, present = stats['total'], stats['present']
         
         return round((present / total * 100), 2) if total > 0 else 0
     
+    @staticmethod
+    def get_rate(start_date, end_date=None):
+        """School-wide attendance rate (percent) over a date range, from the daily summaries"""
+        summaries = AttendanceDailySummary.objects.filter(date__gte=start_date, date__lte=end_date or start_date)
+        stats = summaries.aggregate(present=Sum('present'), total=Sum('total'))
+        total = stats['total'] or 0
+        return round((stats['present'] or 0) / total * 100, 1) if total else 0
+    
     @staticmethod
     def get_class_attendance_summary(class_section, date):
         """Get attendance summary for a class on specific date"""
@@ -32,15 +48,10 @@ class AttendanceService:
         summary = cache.get(cache_key)
         
         if not summary:
-            students = Student.objects.filter(class_section=class_section)
-            attendance_records = Attendance.objects.filter(
-                student__class_section=class_section,
-                date=date
-            )
-            
-            total_students = students.count()
-            present_count = attendance_records.filter(status='Present').count()
-            absent_count = attendance_records.filter(status='Absent').count()
+            total_students = Student.objects.filter(class_section=class_section).count()
+            day = AttendanceDailySummary.objects.filter(class_section=class_section, date=date).first()
+            present_count = day.present if day else 0
+            absent_count = day.absent if day else 0
             
             summary = {
                 'total_students': total_students,
@@ -55,25 +66,172 @@ class AttendanceService:
     @staticmethod
     def bulk_mark_attendance(class_section, date, attendance_data):
         """Bulk mark attendance for a class"""
-        # Delete existing records
-        Attendance.objects.filter(
-            student__class_section=class_section,
-            date=date
-        ).delete()
-        
-        # Create new records
-        attendance_records = []
-        for item in attendance_data:
-            student = Student.objects.get(id=item['student_id'])
-            attendance_records.append(Attendance(
-                student=student,
-                date=date,
-                status=item['status']
-            ))
+        statuses = {int(item['student_id']): item['status'] for item in attendance_data}
+        known = set(Student.objects.all_statuses().filter(id__in=list(statuses)).values_list('id', flat=True))
+        statuses = {student_id: status for student_id, status in statuses.items() if student_id in known}
+        return AttendanceService.record_class_attendance(class_section, date, statuses, replace=True)
+    
+    @classmethod
+    def record_class_attendance(cls, class_section, date, statuses, replace=False):
+        """
+        Bulk attendance writer. ``statuses`` maps student id to 'Present' or
+        'Absent'; rows are inserted or updated in bulk and the class's daily
+        summary and the students' running totals are refreshed in the same
+        transaction. With ``replace`` the class's other records for the day
+        are removed. Returns the number of records written.
+        """
+        if isinstance(date, str):
+            date = date_cls.fromisoformat(date)
+        class_section_id = getattr(class_section, 'id', class_section)
+        now = timezone.now()
         
-        Attendance.objects.bulk_create(attendance_records)
+        with transaction.atomic():
+            existing = {
+                record.student_id: record
+                for record in Attendance.objects.filter(student_id__in=list(statuses), date=date)
+            }
+            summary_keys = {(class_section_id, date)}
+            touched = set(statuses)
+            
+            if replace:
+                stale = Attendance.objects.filter(class_section_id=class_section_id, date=date).exclude(
+                    student_id__in=list(statuses)
+                )
+                touched.update(stale.values_list('student_id', flat=True))
+                stale.delete()
+            
+            to_create, to_update = [], []
+            for student_id, status in statuses.items():
+                record = existing.get(student_id)
+                if record is None:
+                    to_create.append(Attendance(
+                        student_id=student_id, date=date, status=status, class_section_id=class_section_id
+                    ))
+                elif record.status != status or record.class_section_id != class_section_id:
+                    if record.class_section_id:
+                        summary_keys.add((record.class_section_id, date))
+                    record.status = status
+                    record.class_section_id = class_section_id
+                    record.updated_at = now
+                    to_update.append(record)
+            
+            Attendance.objects.bulk_create(to_create, batch_size=cls.BATCH_SIZE)
+            Attendance.objects.bulk_update(
+                to_update, ['status', 'class_section', 'updated_at'], batch_size=cls.BATCH_SIZE
+            )
+            cls.refresh_daily_summaries(summary_keys)
+            cls.refresh_student_totals(touched)
         
         # Clear cache
-        cache.delete(f"attendance_summary_{class_section.id}_{date}")
+        cache.delete_many(
+            [f"attendance_summary_{class_section_id}_{date}"] +
+            [f"attendance_pct_{student_id}" for student_id in touched]
+        )
+        from dashboard.real_time_service import DashboardUpdateService
+        from core.response_cache import data_versions
+        DashboardUpdateService.update_attendance_stats()
+        data_versions.touch('attendance')  # Bulk writes send no post_save
+        logger.info(f"Recorded attendance of {len(statuses)} students in class {class_section_id} for {date}")
+        return len(to_create) + len(to_update)
+    
+    @classmethod
+    def refresh_for_records(cls, records):
+        """Refresh the rollups after single Attendance rows were saved or deleted"""
+        records = list(records)
+        cls.refresh_daily_summaries({(record.class_section_id, record.date) for record in records})
+        cls.refresh_student_totals({record.student_id for record in records})
+        cache.delete_many([f"attendance_pct_{record.student_id}" for record in records])
+    
+    @staticmethod
+    def refresh_daily_summaries(keys):
+        """Recount AttendanceDailySummary rows for the given (class_section_id, date) pairs"""
+        keys = {(class_section_id, date) for class_section_id, date in keys if class_section_id}
+        if not keys:
+            return
+        counts = {
+            (row['class_section_id'], row['date']): row
+            for row in Attendance.objects.filter(
+                class_section_id__in={key[0] for key in keys}, date__in={key[1] for key in keys}
+            ).values('class_section_id', 'date').annotate(
+                present=Count('id', filter=Q(status='Present')),
+                absent=Count('id', filter=Q(status='Absent')),
+                total=Count('id'),
+            ).order_by()
+            if (row['class_section_id'], row['date']) in keys
+        }
+        AttendanceDailySummary.objects.bulk_create(
+            [
+                AttendanceDailySummary(
+                    class_section_id=row['class_section_id'], date=row['date'],
+                    present=row['present'], absent=row['absent'], total=row['total'],
+                )
+                for row in counts.values()
+            ],
+            update_conflicts=True,
+            unique_fields=['class_section', 'date'],
+            update_fields=['present', 'absent', 'total', 'updated_at'],
+        )
+        empty = keys - set(counts)
+        if empty:
+            query = Q()
+            for class_section_id, date in empty:
+                query |= Q(class_section_id=class_section_id, date=date)
+            AttendanceDailySummary.objects.filter(query).delete()
+    
+    @classmethod
+    def refresh_student_totals(cls, student_ids):
+        """Recount StudentAttendanceTotals rows of the given students"""
+        student_ids = sorted(student_ids)
+        for start in range(0, len(student_ids), cls.BATCH_SIZE):
+            chunk = student_ids[start:start + cls.BATCH_SIZE]
+            rows = list(Attendance.objects.filter(student_id__in=chunk).values('student_id').annotate(
+                present=Count('id', filter=Q(status='Present')),
+                absent=Count('id', filter=Q(status='Absent')),
+                total=Count('id'),
+                last_date=Max('date'),
+            ).order_by())
+            StudentAttendanceTotals.objects.bulk_create(
+                [StudentAttendanceTotals(**row) for row in rows],
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=['present', 'absent', 'total', 'last_date', 'updated_at'],
+            )
+            StudentAttendanceTotals.objects.filter(student_id__in=chunk).exclude(
+                student_id__in=[row['student_id'] for row in rows]
+            ).delete()
+    
+    @classmethod
+    def rebuild_rollups(cls, since=None):
+        """
+        Recompute the daily summaries (from ``since`` on) and every student's
+        running totals from the raw rows. Rows saved without a class get the
+        student's current class first. Returns (summaries, students) counts.
+        """
+        from django.db.models import OuterRef, Subquery
+        
+        with transaction.atomic():
+            Attendance.objects.filter(class_section__isnull=True).update(
+                class_section_id=Subquery(
+                    Student.objects.all_statuses().select_related(None).filter(
+                        pk=OuterRef('student_id')
+                    ).values('class_section_id')[:1]
+                )
+            )
+            
+            records = Attendance.objects.filter(class_section__isnull=False)
+            summaries = AttendanceDailySummary.objects.all()
+            if since:
+                records = records.filter(date__gte=since)
+                summaries = summaries.filter(date__gte=since)
+            keys = set(records.values_list('class_section_id', 'date').distinct().order_by())
+            keys.update(summaries.values_list('class_section_id', 'date'))
+            keys = sorted(keys)
+            for start in range(0, len(keys), cls.BATCH_SIZE):
+                cls.refresh_daily_summaries(keys[start:start + cls.BATCH_SIZE])
+            
+            student_ids = set(Attendance.objects.values_list('student_id', flat=True).distinct().order_by())
+            student_ids.update(StudentAttendanceTotals.objects.values_list('student_id', flat=True))
+            cls.refresh_student_totals(student_ids)
         
-        return len(attendance_records)
\ No newline at end of file
+        cache.delete_many([f"attendance_pct_{student_id}" for student_id in student_ids])
+        return len(keys), len(student_ids)
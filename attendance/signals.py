@@ -0,0 +1,25 @@
+# attendance/signals.py
+"""Keep the attendance rollups right when a student (and with it their attendance) is deleted"""
+
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+
+@receiver(pre_delete, sender='students.Student')
+def remember_attendance_days(sender, instance, **kwargs):
+    """The cascade removes the rows before post_delete, so note their class days now"""
+    from .models import Attendance
+    instance._attendance_summary_keys = set(
+        Attendance.objects.filter(student=instance).values_list('class_section_id', 'date').distinct().order_by()
+    )
+
+
+@receiver(post_delete, sender='students.Student')
+def refresh_attendance_summaries(sender, instance, **kwargs):
+    """StudentAttendanceTotals cascades with the student; the class/day summaries are recounted"""
+    from .services import AttendanceService
+    from core.response_cache import data_versions
+    keys = getattr(instance, '_attendance_summary_keys', None)
+    if keys:
+        AttendanceService.refresh_daily_summaries(keys)
+        data_versions.touch('attendance')
@@ -1,3 +1,41 @@
+# attendance/tests.py
+from django.db.models import Sum
 from django.test import TestCase
 
-# Create your tests here.
+from attendance.models import Attendance, AttendanceDailySummary, StudentAttendanceTotals
+from attendance.services import AttendanceService
+from core.benchmark_school import BenchmarkSchoolBuilder
+from students.models import Student
+
+
+class AttendanceRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=6, classes=1, sections_per_class=2, attendance_days=4,
+                               routes=1, stoppages_per_route=1).build()
+
+    def assertRollupsMatchRows(self):
+        totals = AttendanceDailySummary.objects.aggregate(present=Sum('present'), total=Sum('total'))
+        self.assertEqual(totals['total'], Attendance.objects.count())
+        self.assertEqual(totals['present'], Attendance.objects.filter(status='Present').count())
+        self.assertEqual(
+            StudentAttendanceTotals.objects.aggregate(total=Sum('total'))['total'],
+            Attendance.objects.count(),
+        )
+
+    def test_seeded_school_has_rollups(self):
+        self.assertEqual(AttendanceDailySummary.objects.count(), 2 * 4)
+        self.assertRollupsMatchRows()
+
+    def test_deleting_a_student_refreshes_class_summaries(self):
+        Student.objects.order_by('id').first().delete()
+        self.assertRollupsMatchRows()
+
+    def test_record_class_attendance_updates_rollups(self):
+        student = Student.objects.order_by('id').first()
+        day = Attendance.objects.filter(student=student).order_by('date').first().date
+        AttendanceService.record_class_attendance(
+            student.class_section, day, {student.id: 'Absent'}, replace=False
+        )
+        self.assertRollupsMatchRows()
@@ -8,8 +8,9 @@ from django.utils.html import escape
 from django.utils import timezone
 from students.models import Student
 from subjects.models import ClassSection
-from .models import Attendance
-from django.db.models import Count
+from .models import Attendance, AttendanceDailySummary
+from .services import AttendanceService
+from django.db.models import Count, Sum
 from datetime import date
 from users.decorators import module_required
 import logging
@@ -145,36 +146,25 @@ def mark_attendance(request):
             except ClassSection.DoesNotExist:
                 return JsonResponse({'error': 'Selected class section not found'}, status=400)
             
-            students_in_class = Student.objects.filter(class_section=class_section)
-
-            # Mark all students as absent first
-            for student in students_in_class:
-                Attendance.objects.update_or_create(
-                    student=student,
-                    date=attendance_date,
-                    defaults={
-                        'status': 'Absent'
-                    }
-                )
-
-            # Mark present students (those in attendance_data)
+            students_in_class = set(
+                Student.objects.filter(class_section=class_section).values_list('id', flat=True)
+            )
+
+            # Present students are those in attendance_data, everyone else is absent
+            present_ids = set()
             for student_id in attendance_data:
                 try:
                     # Validate student ID
                     student_id_int = int(student_id)
-                    if student_id_int <= 0:
-                        continue
-                    
-                    student = Student.objects.get(id=student_id_int, class_section=class_section)
-                    Attendance.objects.update_or_create(
-                        student=student,
-                        date=attendance_date,
-                        defaults={
-                            'status': 'Present'
-                        }
-                    )
-                except (Student.DoesNotExist, ValueError, TypeError):
+                except (ValueError, TypeError):
                     continue
+                if student_id_int in students_in_class:
+                    present_ids.add(student_id_int)
+
+            AttendanceService.record_class_attendance(class_section, attendance_date, {
+                student_id: 'Present' if student_id in present_ids else 'Absent'
+                for student_id in students_in_class
+            })
 
             return JsonResponse({'success': True, 'message': 'Perfect! Attendance has been marked successfully for all students.'})
 
@@ -231,6 +221,15 @@ def attendance_manage(request):
         })
 
 
+def _enrolled_counts():
+    """{class_section_id: number of active students} in one grouped query"""
+    return dict(
+        Student.objects.filter(class_section__isnull=False).select_related(None)
+        .values('class_section_id').annotate(count=Count('id')).values_list('class_section_id', 'count')
+        .order_by()
+    )
+
+
 @module_required('attendance', 'view')
 def attendance_report(request):
     """Display attendance report page and provide report data on AJAX requests"""
@@ -252,15 +251,15 @@ def attendance_report(request):
                 students_data = []
                 students = Student.objects.filter(class_section=cls) if cls else []
                 
+                statuses = dict(Attendance.objects.filter(
+                    student__in=students,
+                    date=report_date
+                ).values_list('student_id', 'status')) if cls else {}
+                
                 for student in students:
-                    attendance = Attendance.objects.filter(
-                        student=student,
-                        date=report_date
-                    ).first()
-                    
                     students_data.append({
                         'name': f"{student.first_name} {student.last_name}",
-                        'status': attendance.status if attendance else 'No Record'
+                        'status': statuses.get(student.id, 'No Record')
                     })
                 
                 return JsonResponse({'students': students_data})
@@ -278,30 +277,25 @@ def attendance_report(request):
 
             report_data = []
             class_sections = ClassSection.objects.all().order_by('class_name')
+            enrolled = _enrolled_counts()
+            summaries = {
+                summary.class_section_id: summary
+                for summary in AttendanceDailySummary.objects.filter(date=report_date)
+            }
 
             for cls in class_sections:
-                total_students = Student.objects.filter(class_section=cls).count()
+                total_students = enrolled.get(cls.id, 0)
                 
                 if total_students == 0:
                     continue
                 
-                present_count = Attendance.objects.filter(
-                    student__class_section=cls,
-                    date=report_date,
-                    status='Present'
-                ).count()
-                
-                absent_count = Attendance.objects.filter(
-                    student__class_section=cls,
-                    date=report_date,
-                    status='Absent'
-                ).count()
+                summary = summaries.get(cls.id)
 
                 report_data.append({
                     'class_name': f"{cls.class_name} - {cls.section_name}",
                     'total_students': total_students,
-                    'present': present_count,
-                    'absent': absent_count,
+                    'present': summary.present if summary else 0,
+                    'absent': summary.absent if summary else 0,
                 })
 
             return JsonResponse({'report': report_data})
@@ -319,25 +313,24 @@ def attendance_report(request):
 
             report_data = []
             class_sections = ClassSection.objects.all()
+            enrolled = _enrolled_counts()
+            totals = {
+                row['class_section_id']: row
+                for row in AttendanceDailySummary.objects.filter(
+                    date__range=[from_date, to_date]
+                ).values('class_section_id').annotate(
+                    present_total=Sum('present'), absent_total=Sum('absent')
+                ).order_by()
+            }
 
             for cls in class_sections:
-                total_students = Student.objects.filter(class_section=cls).count()
-                present_count = Attendance.objects.filter(
-                    student__class_section=cls,
-                    date__range=[from_date, to_date],
-                    status='Present'
-                ).count()
-                absent_count = Attendance.objects.filter(
-                    student__class_section=cls,
-                    date__range=[from_date, to_date],
-                    status='Absent'
-                ).count()
+                row = totals.get(cls.id, {})
 
                 report_data.append({
                     'class_name': f"{cls.class_name} - {cls.section_name}",
-                    'total_students': total_students,
-                    'present': present_count,
-                    'absent': absent_count,
+                    'total_students': enrolled.get(cls.id, 0),
+                    'present': row.get('present_total', 0),
+                    'absent': row.get('absent_total', 0),
                 })
 
             return JsonResponse({'report': report_data})
@@ -363,14 +356,19 @@ def professional_attendance_report(request):
     ).values('date', 'status')
     
     # Calculate daily attendance rates
+    daily_totals = {
+        row['date']: row
+        for row in AttendanceDailySummary.objects.filter(
+            date__range=[start_date, end_date]
+        ).values('date').annotate(present_total=Sum('present'), records=Sum('total')).order_by()
+    }
     daily_rates = []
     current_date = start_date
     while current_date <= end_date:
-        total_records = Attendance.objects.filter(date=current_date).count()
-        present_records = Attendance.objects.filter(date=current_date, status='Present').count()
+        day = daily_totals.get(current_date)
         
-        if total_records > 0:
-            rate = present_records / total_records
+        if day and day['records'] > 0:
+            rate = day['present_total'] / day['records']
         else:
             rate = 0.8  # Default rate if no data
         
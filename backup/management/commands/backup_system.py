@@ -16,7 +16,9 @@ class Command(BaseCommand):
     
     Usage:
         python manage.py backup_system create --type=full --name=daily_backup
+        python manage.py backup_system create --format=sqlite
         python manage.py backup_system restore --file=backup.json --mode=merge
+        python manage.py backup_system restore --file=snapshot_20250101_020000.sqlite3.gz
         python manage.py backup_system cleanup --days=30
         python manage.py backup_system list
     """
@@ -44,6 +46,12 @@ class Command(BaseCommand):
             type=str,
             help='Output directory for backup file'
         )
+        create_parser.add_argument(
+            '--format',
+            choices=['json', 'sqlite'],
+            default='json',
+            help='json: portable dumpdata export; sqlite: compressed page-level snapshot of the whole database'
+        )
         
         # Restore backup command
         restore_parser = subparsers.add_parser('restore', help='Restore from backup')
@@ -64,6 +72,16 @@ class Command(BaseCommand):
             action='store_true',
             help='Validate backup without applying changes'
         )
+        restore_parser.add_argument(
+            '--confirm',
+            action='store_true',
+            help='Skip confirmation prompt'
+        )
+        restore_parser.add_argument(
+            '--no-safety-snapshot',
+            action='store_true',
+            help='Snapshot restores: do not snapshot the current database first'
+        )
         
         # Cleanup command
         cleanup_parser = subparsers.add_parser('cleanup', help='Clean up old backups')
@@ -133,6 +151,10 @@ class Command(BaseCommand):
         custom_name = options.get('name', '')
         output_dir = options.get('output_dir')
         
+        if options.get('format') == 'sqlite':
+            self.handle_snapshot(custom_name, output_dir, backup_type)
+            return
+        
         self.stdout.write(f"Creating {backup_type} backup...")
         
         # Determine output directory
@@ -188,6 +210,28 @@ class Command(BaseCommand):
             )
         )
     
+    def handle_snapshot(self, custom_name, output_dir, backup_type):
+        """Handle SQLite snapshot creation"""
+        from backup.services.snapshot_service import SQLiteSnapshotService
+        
+        if backup_type != 'full':
+            self.stdout.write(self.style.WARNING("Snapshots always cover the whole database; --type is ignored"))
+        self.stdout.write("Creating SQLite snapshot...")
+        
+        job = SQLiteSnapshotService.create(name=custom_name or '', output_dir=output_dir)
+        raw_mb = job.metadata['raw_size'] / (1024 * 1024)
+        size_mb = job.size_bytes / (1024 * 1024)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshot created successfully!\n"
+                f"File: {job.file_path}\n"
+                f"Size: {raw_mb:.2f} MB database, {size_mb:.2f} MB compressed\n"
+                f"SHA-256: {job.checksum}\n"
+                f"Time: {job.report_json['seconds']}s (job id {job.id})"
+            )
+        )
+    
     def handle_restore(self, options):
         """Handle backup restoration"""
         file_path = Path(options['file'])
@@ -197,6 +241,11 @@ class Command(BaseCommand):
         if not file_path.exists():
             raise CommandError(f"Backup file not found: {file_path}")
         
+        from backup.services.snapshot_service import SQLiteSnapshotService
+        if SQLiteSnapshotService.is_snapshot(file_path):
+            self.handle_snapshot_restore(file_path, options)
+            return
+        
         self.stdout.write(f"{'Validating' if dry_run else 'Restoring'} backup from {file_path}...")
         
         # Validate JSON structure
@@ -251,6 +300,50 @@ class Command(BaseCommand):
             for error in result.errors[:5]:  # Show first 5 errors
                 self.stdout.write(f"  - {error}")
     
+    def handle_snapshot_restore(self, file_path, options):
+        """Handle SQLite snapshot restoration (always replaces the whole database)"""
+        from backup.services.snapshot_service import SQLiteSnapshotService
+        
+        if options.get('dry_run'):
+            self.handle_snapshot_verify(file_path)
+            return
+        
+        if not options.get('confirm'):
+            confirm = input("WARNING: A snapshot restore replaces the whole database. Continue? (yes/no): ")
+            if confirm.lower() != 'yes':
+                self.stdout.write("Operation cancelled")
+                return
+        
+        self.stdout.write(f"Restoring snapshot from {file_path}...")
+        job = SQLiteSnapshotService.restore(file_path, safety_snapshot=not options.get('no_safety_snapshot'))
+        report = job.report_json
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Restore completed successfully!\n"
+                f"Tables: {report['tables']}\n"
+                f"Time: {report['seconds']}s"
+            )
+        )
+        if report.get('safety_snapshot'):
+            self.stdout.write(f"Previous database saved as {report['safety_snapshot']}")
+        self.stdout.write(self.style.WARNING(
+            "Restart the application server workers: caches of other processes still hold the old data"
+        ))
+    
+    def handle_snapshot_verify(self, file_path):
+        """Handle SQLite snapshot verification"""
+        from backup.services.snapshot_service import SQLiteSnapshotService
+        
+        report = SQLiteSnapshotService.verify(file_path)
+        
+        self.stdout.write(self.style.SUCCESS("Snapshot verification completed!"))
+        self.stdout.write(f"File size: {report['size_bytes'] / (1024 * 1024):.2f} MB")
+        self.stdout.write(f"Database size: {report['raw_size'] / (1024 * 1024):.2f} MB")
+        self.stdout.write(f"Checksum: {report['checksum']}{'' if report['registered'] else ' (not registered, integrity only)'}")
+        self.stdout.write(f"Integrity: {report['integrity']}")
+        self.stdout.write(f"Tables: {report['tables']}")
+    
     def handle_cleanup(self, options):
         """Handle cleanup of old backups"""
         days_old = options['days']
@@ -369,6 +462,11 @@ class Command(BaseCommand):
         
         self.stdout.write(f"Verifying backup file: {file_path}")
         
+        from backup.services.snapshot_service import SQLiteSnapshotService
+        if SQLiteSnapshotService.is_snapshot(file_path):
+            self.handle_snapshot_verify(file_path)
+            return
+        
         try:
             # Check JSON structure
             with open(file_path, 'r', encoding='utf-8') as f:
@@ -14,13 +14,10 @@ from .row_formatters import RowFormatter
 
 export_logger = logging.getLogger('export.api')
 
-try:
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
-    EXCEL_AVAILABLE = True
-except ImportError:
-    EXCEL_AVAILABLE = False
+# openpyxl (which pulls in numpy when installed) is imported on the first Excel export
+from core.ml_lazy_loader import module_available
+
+EXCEL_AVAILABLE = module_available('openpyxl')
 
 class ExcelExporter(DataExportService):
     """Excel export service"""
@@ -38,6 +35,10 @@ class ExcelExporter(DataExportService):
                 from .csv_exporter import CSVExporter
                 return CSVExporter.export_to_csv(module_name, user)
             
+            from openpyxl import Workbook
+            from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+            from openpyxl.utils import get_column_letter
+            
             # Get fresh data for Excel export (avoid caching complex objects)
             data = cls.get_module_data(module_name)
             
@@ -0,0 +1,333 @@
+# backup/services/snapshot_service.py
+"""
+Page-level SQLite snapshots
+
+JSON backups serialize every row through dumpdata, which takes minutes on a
+large database. On SQLite a snapshot copies the database pages with SQLite's
+online backup API instead, then gzips and checksums the copy:
+
+- WAL mode: the copy runs in one step, i.e. one read transaction. In WAL
+  readers don't block writers, and a single step can't be restarted by
+  their commits, so the snapshot is the database as of its start.
+- Rollback-journal mode: pages are copied BACKUP_SNAPSHOT_STEP_PAGES at a
+  time and the shared lock is released between steps, so writers get through.
+  Each of their commits restarts the copy, though; after MAX_RESTARTS the
+  copy is finished in one step, holding off writers until it is done.
+
+The copy is integrity-checked before it is compressed and is registered as a
+BackupJob (format 'sqlite.gz'; sha256 of the file as checksum, sha256 of the
+raw database in metadata) plus a BackupHistory row.
+
+Restoring checks both checksums and runs PRAGMA integrity_check on the
+decompressed copy, takes a safety snapshot of the current database, then
+copies the pages into the live database with the same API, so open
+connections see the restored data instead of a file swapped under them.
+Afterwards every data version stamp (core/response_cache.py) is bumped, so no
+process serves cached pages or a compiled fee schedule of the old data. Other
+caches are only cleared in the restoring process, and with the default
+per-process LocMem cache each worker keeps its own: restart the application
+server workers after a restore.
+
+JSON exports stay the portable format (other database engines, partial
+restores); snapshots restore into SQLite only.
+
+    job = SQLiteSnapshotService.create(user=request.user)
+    SQLiteSnapshotService.verify(job.file_path)
+    SQLiteSnapshotService.restore(job.file_path)
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+from pathlib import Path
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+logger = logging.getLogger('backup.snapshot')
+
+FORMAT = 'sqlite.gz'
+EXTENSION = '.sqlite3.gz'
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class SnapshotError(Exception):
+    """The snapshot can't be taken, or a snapshot file failed verification"""
+
+
+class _Restarted(Exception):
+    """A stepped copy kept restarting because of concurrent writes"""
+
+
+class SQLiteSnapshotService:
+    """Create, verify and restore compressed page-level snapshots of the SQLite database"""
+
+    MAX_RESTARTS = 3  # Stepped copies restarted by writers before falling back to one step
+
+    @staticmethod
+    def is_snapshot(path):
+        return str(path).endswith(EXTENSION)
+
+    @staticmethod
+    def database_path(using=DEFAULT_DB_ALIAS):
+        connection = connections[using]
+        if connection.vendor != 'sqlite':
+            raise SnapshotError("Snapshots need SQLite; use a JSON backup on other databases.")
+        name = str(connection.settings_dict['NAME'])
+        if name == ':memory:' or 'mode=memory' in name:
+            raise SnapshotError("An in-memory database can't be snapshotted.")
+        return Path(name)
+
+    @staticmethod
+    def backups_dir():
+        return Path(getattr(settings, 'BACKUP_DIRECTORY', Path(settings.BASE_DIR) / 'backups'))
+
+    @staticmethod
+    def _connect(path, using=DEFAULT_DB_ALIAS):
+        timeout = connections[using].settings_dict.get('OPTIONS', {}).get('timeout', 20)
+        return sqlite3.connect(str(path), timeout=timeout, isolation_level=None)
+
+    @staticmethod
+    def _digest(path):
+        """sha256 and size of a file"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), size
+
+    @staticmethod
+    def integrity(path, quick=False):
+        """'ok', or the problems PRAGMA integrity_check found (first 20)"""
+        conn = sqlite3.connect(str(path))
+        try:
+            pragma = 'quick_check' if quick else 'integrity_check'
+            rows = [row[0] for row in conn.execute(f'PRAGMA {pragma}(20)')]
+        finally:
+            conn.close()
+        return 'ok' if rows == ['ok'] else '; '.join(rows)
+
+    @classmethod
+    def _copy(cls, db_path, target_path, progress=None):
+        """Online page copy of the database into a new file; returns page statistics"""
+        source = cls._connect(db_path)
+        target = sqlite3.connect(str(target_path))
+        try:
+            journal_mode = source.execute('PRAGMA journal_mode').fetchone()[0].lower()
+            restarts = 0
+            if journal_mode != 'wal':
+                # A commit by another connection restarts a stepped copy; on a
+                # busy database give up after a few and copy in one step
+                remaining_before = None
+
+                def on_step(status, remaining, total):
+                    nonlocal remaining_before, restarts
+                    if remaining_before is not None and remaining > remaining_before:
+                        restarts += 1
+                        if restarts > cls.MAX_RESTARTS:
+                            raise _Restarted()
+                    remaining_before = remaining
+                    if progress:
+                        progress(status, remaining, total)
+
+                try:
+                    source.backup(target, pages=getattr(settings, 'BACKUP_SNAPSHOT_STEP_PAGES', 4096), progress=on_step)
+                except _Restarted:
+                    logger.warning(f"Snapshot copy restarted {restarts} times by concurrent writes; copying in one step")
+            if journal_mode == 'wal' or restarts > cls.MAX_RESTARTS:
+                source.backup(target, pages=-1, progress=progress)
+            target.execute('PRAGMA journal_mode=DELETE')  # Self-contained file, no -wal needed
+            page_size = target.execute('PRAGMA page_size').fetchone()[0]
+            page_count = target.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            target.close()
+            source.close()
+        return {'journal_mode': journal_mode, 'page_size': page_size, 'page_count': page_count, 'restarts': restarts}
+
+    @staticmethod
+    def _compress(raw_path, path):
+        """gzip ``raw_path`` into ``path``; returns the raw database's sha256 and size"""
+        level = getattr(settings, 'BACKUP_SNAPSHOT_COMPRESSLEVEL', 1)
+        digest = hashlib.sha256()
+        size = 0
+        with open(raw_path, 'rb') as src, gzip.open(path, 'wb', compresslevel=level) as dst:
+            while chunk := src.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+                dst.write(chunk)
+        return digest.hexdigest(), size
+
+    @classmethod
+    def create(cls, name='', user=None, output_dir=None, using=DEFAULT_DB_ALIAS, progress=None):
+        """Take a snapshot and register it; returns the BackupJob"""
+        from backup.models import BackupHistory, BackupJob
+
+        started = time.monotonic()
+        db_path = cls.database_path(using)
+        directory = Path(output_dir) if output_dir else cls.backups_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        filename = f"{name + '_' if name else ''}snapshot_{timezone.now().strftime('%Y%m%d_%H%M%S')}{EXTENSION}"
+        path = directory / filename
+
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            raw_path = Path(tmp) / 'snapshot.sqlite3'
+            info = cls._copy(db_path, raw_path, progress)
+            integrity = cls.integrity(raw_path, quick=True)
+            if integrity != 'ok':
+                raise SnapshotError(f"Snapshot copy failed its integrity check: {integrity}")
+            part = Path(tmp) / (filename + '.part')
+            raw_sha256, raw_size = cls._compress(raw_path, part)
+            os.replace(part, path)
+
+        checksum, size = cls._digest(path)
+        duration = time.monotonic() - started
+        job = BackupJob.objects.create(
+            status='success',
+            file_path=str(path),
+            format=FORMAT,
+            checksum=checksum,
+            size_bytes=size,
+            file_size=size,
+            backup_type='snapshot',
+            duration_seconds=round(duration),
+            created_by=user if getattr(user, 'pk', None) else None,
+            metadata={
+                **info,
+                'raw_sha256': raw_sha256,
+                'raw_size': raw_size,
+                'sqlite_version': sqlite3.sqlite_version,
+                'integrity': integrity,
+            },
+            report_json={
+                'created_at': timezone.now().strftime('%d/%m/%Y: %H:%M:%S'),
+                'message': 'SQLite snapshot',
+                'seconds': round(duration, 2),
+            },
+        )
+        BackupHistory.objects.create(file_name=filename, operation_type='backup')
+        logger.info(f"Snapshot {filename}: {raw_size / 1048576:.1f} MB -> {size / 1048576:.1f} MB in {duration:.1f}s")
+        return job
+
+    @staticmethod
+    def _job_for(path):
+        from backup.models import BackupJob
+        return BackupJob.objects.filter(format=FORMAT, file_path__endswith=Path(path).name).order_by('-created_at').first()
+
+    @classmethod
+    def _unpack(cls, path, directory):
+        """Verify a snapshot file and decompress it into ``directory``; returns (raw path, report)"""
+        path = Path(path)
+        if not path.exists():
+            raise SnapshotError(f"Snapshot file not found: {path}")
+        checksum, size = cls._digest(path)
+        job = cls._job_for(path)
+        if job and job.checksum and job.checksum != checksum:
+            raise SnapshotError("Snapshot checksum does not match the one recorded when it was taken.")
+
+        raw_path = Path(directory) / 'restore.sqlite3'
+        digest = hashlib.sha256()
+        try:
+            with gzip.open(path, 'rb') as src, open(raw_path, 'wb') as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    dst.write(chunk)
+        except (OSError, EOFError) as e:
+            raise SnapshotError(f"Snapshot file is damaged: {e}")
+        expected = (job.metadata or {}).get('raw_sha256') if job else None
+        if expected and expected != digest.hexdigest():
+            raise SnapshotError("Decompressed snapshot does not match the recorded database checksum.")
+
+        try:
+            integrity = cls.integrity(raw_path)
+        except sqlite3.DatabaseError as e:
+            raise SnapshotError(f"Snapshot is not a valid SQLite database: {e}")
+        if integrity != 'ok':
+            raise SnapshotError(f"Snapshot failed its integrity check: {integrity}")
+
+        conn = sqlite3.connect(str(raw_path))
+        try:
+            tables = conn.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        finally:
+            conn.close()
+        return raw_path, {
+            'file': str(path),
+            'checksum': checksum,
+            'size_bytes': size,
+            'raw_size': raw_path.stat().st_size,
+            'registered': job is not None,  # Unregistered files are checked for integrity only
+            'integrity': integrity,
+            'tables': tables,
+        }
+
+    @classmethod
+    def verify(cls, path):
+        """Check a snapshot's checksums and integrity without restoring it; returns a report dict"""
+        with tempfile.TemporaryDirectory(dir=Path(path).parent) as tmp:
+            return cls._unpack(path, tmp)[1]
+
+    @classmethod
+    def restore(cls, path, user=None, safety_snapshot=True, using=DEFAULT_DB_ALIAS):
+        """Replace the whole database with a verified snapshot; returns the RestoreJob"""
+        from backup.models import BackupHistory, BackupJob, RestoreJob
+
+        started = time.monotonic()
+        db_path = cls.database_path(using)
+        with tempfile.TemporaryDirectory(dir=db_path.parent) as tmp:
+            raw_path, report = cls._unpack(path, tmp)
+            safety = cls.create(name='pre_restore', user=user, using=using) if safety_snapshot else None
+            # Snapshots newer than the restored one stay registered (and verifiable)
+            snapshot_jobs = list(BackupJob.objects.filter(format=FORMAT).values(
+                'status', 'file_path', 'format', 'checksum', 'size_bytes', 'file_size',
+                'backup_type', 'duration_seconds', 'metadata', 'report_json',
+            ))
+
+            connections[using].close()
+            source = sqlite3.connect(str(raw_path))
+            target = cls._connect(db_path, using)
+            try:
+                source.backup(target)  # One step: the write lock is held for the whole copy
+            finally:
+                target.close()
+                source.close()
+
+        cache.clear()  # Cached pages and balances describe the old data; this process's cache only
+        cls._touch_data_versions(using)
+        known = set(BackupJob.objects.filter(format=FORMAT).values_list('file_path', flat=True))
+        BackupJob.objects.bulk_create([
+            BackupJob(**job) for job in snapshot_jobs
+            if job['file_path'] not in known and Path(job['file_path']).exists()
+        ])
+
+        duration = time.monotonic() - started
+        report.update(seconds=round(duration, 2), safety_snapshot=safety.file_path if safety else None,
+                      restart_required=True)
+        job = RestoreJob.objects.create(
+            status='success',
+            source_type='backup',
+            file_path=str(path),
+            format=FORMAT,
+            mode='replace',
+            validation_result_json={'integrity': report['integrity'], 'checksum': report['checksum']},
+            report_json={'created_at': timezone.now().strftime('%d/%m/%Y: %H:%M:%S'), **report},
+        )
+        BackupHistory.objects.create(file_name=Path(path).name, operation_type='restore')
+        logger.info(f"Restored snapshot {Path(path).name} in {duration:.1f}s; restart the application server workers")
+        return job
+
+    @staticmethod
+    def _touch_data_versions(using=DEFAULT_DB_ALIAS):
+        """New stamps for every domain, so no process serves what it cached before the restore"""
+        from core.fee_management.fee_schedule import fee_schedule
+        from core.response_cache import DOMAINS, DataVersions
+
+        try:
+            DataVersions(using).touch(*DOMAINS, fee_schedule.VERSION_KEY)
+        except DatabaseError as e:  # Snapshot taken before the stamps table existed
+            logger.warning(f"Could not bump data versions after the restore ({e}); run migrate and restart the workers")
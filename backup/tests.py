@@ -303,4 +303,88 @@ class BackupSecurityTestCase(TestCase):
         self.assertTrue(BackupSecurityManager.validate_file_size(1024 * 1024))  # 1MB
         
         # Test oversized file
-        self.assertFalse(BackupSecurityManager.validate_file_size(200 * 1024 * 1024))  # 200MB
\ No newline at end of file
+        self.assertFalse(BackupSecurityManager.validate_file_size(200 * 1024 * 1024))  # 200MB
+
+class SQLiteSnapshotTestCase(TestCase):
+    """Snapshot create/verify/restore against a scratch SQLite file standing in for the live database"""
+
+    def setUp(self):
+        import sqlite3
+        from unittest import mock
+        from django.test import override_settings
+        from .services.snapshot_service import SQLiteSnapshotService
+
+        self.service = SQLiteSnapshotService
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = Path(tmp.name) / 'live.sqlite3'
+        self.backup_dir = Path(tmp.name) / 'backups'
+
+        conn = sqlite3.connect(str(self.db_path))
+        conn.execute('CREATE TABLE pupils (name TEXT)')
+        conn.execute("INSERT INTO pupils VALUES ('Asha'), ('Ravi')")
+        conn.commit()
+        conn.close()
+
+        settings_override = override_settings(BACKUP_DIRECTORY=str(self.backup_dir))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.object(SQLiteSnapshotService, 'database_path', return_value=self.db_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pupils(self):
+        import sqlite3
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            return sorted(row[0] for row in conn.execute('SELECT name FROM pupils'))
+        finally:
+            conn.close()
+
+    def test_create_and_verify(self):
+        from .models import BackupJob
+
+        job = self.service.create(name='nightly')
+        self.assertTrue(Path(job.file_path).exists())
+        self.assertTrue(BackupJob.objects.filter(pk=job.pk, format='sqlite.gz').exists())
+
+        report = self.service.verify(job.file_path)
+        self.assertEqual(report['integrity'], 'ok')
+        self.assertTrue(report['registered'])
+        self.assertEqual(report['tables'], 1)
+
+    def test_damaged_snapshot_is_rejected(self):
+        from .services.snapshot_service import SnapshotError
+
+        path = Path(self.service.create().file_path)
+        data = bytearray(path.read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        path.write_bytes(bytes(data))
+        with self.assertRaisesMessage(SnapshotError, 'checksum does not match'):
+            self.service.verify(path)
+
+        stray = self.backup_dir / 'stray_snapshot.sqlite3.gz'
+        stray.write_bytes(b'not a snapshot')
+        with self.assertRaises(SnapshotError):
+            self.service.verify(stray)
+
+    def test_restore_replaces_data_and_bumps_versions(self):
+        import sqlite3
+        from core.response_cache import data_versions
+
+        job = self.service.create()
+        conn = sqlite3.connect(str(self.db_path))
+        conn.execute("INSERT INTO pupils VALUES ('Meena')")
+        conn.commit()
+        conn.close()
+        before = data_versions.get('students', 'fees', 'fee_schedule')
+
+        restore = self.service.restore(job.file_path)
+
+        self.assertEqual(self.pupils(), ['Asha', 'Ravi'])
+        self.assertTrue(restore.report_json['restart_required'])
+        safety = restore.report_json['safety_snapshot']
+        self.assertTrue(Path(safety).exists())
+        self.assertEqual(self.service.verify(safety)['integrity'], 'ok')
+        after = data_versions.get('students', 'fees', 'fee_schedule')
+        self.assertTrue(all(after[key] != before[key] for key in before))
@@ -85,4 +85,61 @@ def export_download(request, request_id):
         return JsonResponse({
             'error': 'Download failed',
             'message': str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+def _can_import(user, adapter):
+    if not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    from users.models import UserModulePermission
+    permissions = UserModulePermission.get_user_permissions(user)
+    return permissions.get(adapter.module, {}).get('edit', False)
+
+
+@require_http_methods(["POST"])
+def import_initiate(request):
+    """Start a bulk import job (multipart: kind, file, dry_run)"""
+    from .imports import ImportFileError, get_adapter, start_import
+
+    try:
+        kind = request.POST.get('kind', '')
+        uploaded_file = request.FILES.get('file')
+        dry_run = request.POST.get('dry_run') in ('1', 'true', 'on')
+
+        adapter = get_adapter(kind)
+        if not _can_import(request.user, adapter):
+            return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+        if not uploaded_file:
+            return JsonResponse({'success': False, 'error': 'Please choose a file to import.'}, status=400)
+
+        job_id = start_import(kind, uploaded_file, user=request.user, dry_run=dry_run)
+        logger.info(f"Import {job_id} ({kind}) started by user {request.user.id}")
+        return JsonResponse({
+            'success': True,
+            'job_id': job_id,
+            'message': f'{adapter.label} import started',
+        })
+    except ImportFileError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Import error: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': 'Import request failed',
+            'message': 'Please try again later'
+        }, status=500)
+
+
+@require_http_methods(["GET"])
+def import_status(request, job_id):
+    """Progress and, once finished, the report of an import job"""
+    from .imports import import_progress
+
+    progress = import_progress(job_id)
+    if not request.user.is_authenticated or progress is None:
+        return JsonResponse({'status': 'unknown', 'job_id': job_id}, status=404)
+    details = progress.get('details') or {}
+    if not request.user.is_superuser and details.get('user_id') != request.user.id:
+        return JsonResponse({'status': 'unknown', 'job_id': job_id}, status=404)
+    return JsonResponse({'job_id': job_id, **progress})
@@ -1,5 +1,25 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'core'
\ No newline at end of file
+    name = 'core'
+
+    def ready(self):
+        from . import checks  # noqa: F401 - registers the shared-cache checks
+        from . import images  # noqa: F401 - connects the photo variant receivers
+        from . import response_cache  # noqa: F401 - connects the data version receivers
+
+        if getattr(settings, 'ML_ALERTS_SCHEDULER_ENABLED', False) and self._serving():
+            from .ml_alert_service import ml_alert_scheduler
+            ml_alert_scheduler.start()
+
+    @staticmethod
+    def _serving():
+        """True in a web server process, not in other management commands or the runserver reloader"""
+        if len(sys.argv) > 1 and os.path.basename(sys.argv[0]) == 'manage.py':
+            return sys.argv[1] == 'runserver' and os.environ.get('RUN_MAIN') == 'true'
+        return True
@@ -0,0 +1,417 @@
+# core/benchmark_school.py - Deterministic large-school dataset for benchmarks
+"""
+Builds a realistic, reproducible school with bulk_create so the hot views can
+be exercised at production scale: class sections, students, transport routes
+and stoppages, monthly tuition and transport FeesTypes, deposits with the
+same notes the fee form writes, class and individual fines with FineStudent
+links, and daily attendance.
+
+Every value derives from ``seed`` and ``as_of`` so two runs with the same
+arguments produce identical data. All rows are tagged with a ``BM`` prefix
+(admission numbers, room numbers, route names, receipts) so they can be
+removed again with ``BenchmarkSchoolBuilder.clear()``.
+
+Used by the ``seed_benchmark_school`` command and the query budget guard
+suite in core/tests.py.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ['April', 'May', 'June', 'July', 'August', 'September',
+          'October', 'November', 'December', 'January', 'February', 'March']
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Ayaan',
+               'Krishna', 'Ishaan', 'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Pari', 'Anika',
+               'Navya', 'Myra', 'Sara', 'Kiara', 'Rohan', 'Kabir', 'Riya', 'Priya']
+LAST_NAMES = ['Sharma', 'Verma', 'Gupta', 'Singh', 'Kumar', 'Yadav', 'Mishra', 'Pandey',
+              'Jha', 'Prasad', 'Sinha', 'Das', 'Khan', 'Ansari', 'Roy', 'Thakur']
+LOCALITIES = ['Station Road', 'Gandhi Nagar', 'Kankarbagh', 'Rajendra Nagar', 'Boring Road',
+              'Ashok Nagar', 'Patel Chowk', 'Nehru Colony', 'Civil Lines', 'Old Market']
+
+PREFIX = 'BM'
+
+
+def academic_year_start(today=None):
+    """First day (1st April) of the academic year containing ``today``"""
+    today = today or date.today()
+    return date(today.year if today.month >= 4 else today.year - 1, 4, 1)
+
+
+class BenchmarkSchoolBuilder:
+    """Seed a school of the requested size; every value derives from ``seed``"""
+
+    def __init__(self, students=2000, classes=12, sections_per_class=5, attendance_days=180,
+                 routes=8, stoppages_per_route=6, transport_ratio=0.3,
+                 seed=42, as_of=None, batch_size=2000, progress=None):
+        self.student_count = students
+        self.class_count = classes
+        self.sections_per_class = sections_per_class
+        self.attendance_days = attendance_days
+        self.route_count = routes
+        self.stoppages_per_route = stoppages_per_route
+        self.transport_ratio = transport_ratio
+        self.seed = seed
+        self.as_of = as_of or date.today()
+        self.start_date = academic_year_start(self.as_of)
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.rng = random.Random(seed)
+        self.summary = {}
+
+    @staticmethod
+    def exists():
+        from students.models import Student
+        return Student.objects.all_statuses().filter(admission_number__startswith=PREFIX).exists()
+
+    @staticmethod
+    @transaction.atomic
+    def clear():
+        """Delete every row a previous build created"""
+        from subjects.models import ClassSection
+        from students.models import Student
+        from fees.models import FeesGroup
+        from fines.models import Fine
+        from transport.models import Route
+
+        students = Student.objects.all_statuses().filter(admission_number__startswith=PREFIX)
+        Fine.objects.filter(fine_students__student__in=students).delete()
+        FeesGroup.objects.filter(related_class_section__room_number__startswith=f'{PREFIX}-').delete()
+        FeesGroup.objects.filter(related_stoppage__route__name__startswith=f'{PREFIX} ').delete()
+        deleted, _ = students.delete()
+        Route.objects.filter(name__startswith=f'{PREFIX} ').delete()
+        ClassSection.objects.filter(room_number__startswith=f'{PREFIX}-').delete()
+        return deleted
+
+    @transaction.atomic
+    def build(self):
+        """Create the whole dataset and return a summary of row counts"""
+        sections = self._create_class_sections()
+        students = self._create_students(sections)
+        schedule = self._create_fee_schedule(sections)
+        transport = self._create_transport(students)
+        fine_payments = self._create_fines(sections, students)
+        self._create_deposits(students, schedule, transport, fine_payments)
+        self._create_attendance(students)
+        self._touch_data_versions()
+        logger.info(f"Benchmark school built: {self.summary}")
+        return self.summary
+
+    @staticmethod
+    def _touch_data_versions():
+        """Everything was bulk-created, so no post_save bumped a version stamp"""
+        from core.fee_management.fee_schedule import fee_schedule
+        from core.response_cache import data_versions
+
+        fee_schedule.invalidate()
+        data_versions.touch()
+
+    def _school_days(self):
+        """The most recent ``attendance_days`` school days, ending at ``as_of``"""
+        days = []
+        current = self.as_of
+        while len(days) < self.attendance_days:
+            if current.weekday() != 6:  # Sundays off
+                days.append(current)
+            current -= timedelta(days=1)
+        return days[::-1]
+
+    def _months_elapsed(self):
+        return min(12, max(1, (self.as_of.year - self.start_date.year) * 12
+                           + self.as_of.month - self.start_date.month + 1))
+
+    def _create_class_sections(self):
+        from subjects.models import ClassSection
+
+        section_names = 'ABCDEFGHIJ'[:self.sections_per_class]
+        sections = [
+            ClassSection(
+                class_name=f'Class {number}',
+                section_name=section,
+                room_number=f'{PREFIX}-{number:02d}{section}',
+            )
+            for number in range(1, self.class_count + 1)
+            for section in section_names
+        ]
+        ClassSection.objects.bulk_create(sections, batch_size=self.batch_size)
+        sections = list(ClassSection.objects.filter(room_number__startswith=f'{PREFIX}-').order_by('id'))
+        self.summary['class_sections'] = len(sections)
+        self.progress(f"{len(sections)} class sections")
+        return sections
+
+    def _create_students(self, sections):
+        from students.models import Student
+
+        rng = self.rng
+        students = []
+        for i in range(self.student_count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            students.append(Student(
+                admission_number=f'{PREFIX}{i + 1:06d}',
+                first_name=first,
+                last_name=last,
+                father_name=f'{rng.choice(FIRST_NAMES)} {last}',
+                mother_name=f'{rng.choice(FIRST_NAMES)} {last}',
+                date_of_birth=date(2008 + rng.randint(0, 12), rng.randint(1, 12), rng.randint(1, 28)),
+                date_of_admission=self.start_date - timedelta(days=rng.randint(0, 2000)),
+                class_section=sections[i % len(sections)],
+                gender=rng.choice(['Male', 'Female']),
+                religion=rng.choice(['Hindu', 'Muslim', 'Christian', 'Sikh']),
+                caste_category=rng.choice(['General', 'BC', 'EBC', 'OBC', 'SC', 'ST']),
+                address=f'{rng.randint(1, 400)}, {rng.choice(LOCALITIES)}',
+                mobile_number=f'9{rng.randint(100000000, 999999999)}',
+                email=f'{PREFIX.lower()}{i + 1:06d}@example.com',
+                blood_group=rng.choice(['A+', 'B+', 'O+', 'AB+', 'UNKN']),
+                due_amount=Decimal(rng.choice([0, 0, 0, 500, 1200, 2500])),
+                status='ACTIVE',
+            ))
+        Student.objects.bulk_create(students, batch_size=self.batch_size)
+        students = list(Student.objects.all_statuses().filter(admission_number__startswith=PREFIX)
+                        .select_related('class_section').order_by('id'))
+        self.summary['students'] = len(students)
+        self.progress(f"{len(students)} students")
+        return students
+
+    def _create_fee_schedule(self, sections):
+        """One monthly tuition fee per section and month; returns {section_id: [(note, amount)]}"""
+        from fees.models import FeesGroup, FeesType
+
+        groups = FeesGroup.objects.bulk_create([
+            FeesGroup(fee_group='Monthly', group_type='Tuition Fee', fee_type='Class Based',
+                      related_class_section=section)
+            for section in sections
+        ], batch_size=self.batch_size)
+
+        fee_types = []
+        schedule = {}
+        for index, (section, group) in enumerate(zip(sections, groups)):
+            amount = Decimal(600 + 50 * (index // self.sections_per_class))
+            schedule[section.id] = [(f'Fee Payment: Tuition Fee - {month}', amount) for month in MONTHS]
+            for month in MONTHS:
+                fee_types.append(FeesType(
+                    fee_group=group,
+                    amount=amount,
+                    amount_type=month,
+                    context_type='monthly',
+                    context_data={'months': [month], 'classes': [section.display_name]},
+                    month_name=month,
+                    class_name=section.display_name,
+                ))
+        FeesType.objects.bulk_create(fee_types, batch_size=self.batch_size)
+        self.summary['fee_types'] = len(fee_types)
+        return schedule
+
+    def _create_transport(self, students):
+        """Routes, stoppages, monthly transport fees and assignments; returns {student_id: [(note, amount)]}"""
+        from fees.models import FeesGroup, FeesType
+        from transport.models import Route, Stoppage, TransportAssignment
+
+        rng = self.rng
+        Route.objects.bulk_create([
+            Route(name=f'{PREFIX} Route {number}') for number in range(1, self.route_count + 1)
+        ])
+        routes = list(Route.objects.filter(name__startswith=f'{PREFIX} ').order_by('id'))
+        Stoppage.objects.bulk_create([
+            Stoppage(route=route, name=f'{PREFIX} Stop {r}-{s}')
+            for r, route in enumerate(routes, 1)
+            for s in range(1, self.stoppages_per_route + 1)
+        ], batch_size=self.batch_size)
+        stoppages = list(Stoppage.objects.filter(route__in=routes).select_related('route').order_by('id'))
+
+        groups = FeesGroup.objects.bulk_create([
+            FeesGroup(fee_group='Monthly', group_type='Transport', fee_type='Stoppage Based',
+                      related_stoppage=stoppage)
+            for stoppage in stoppages
+        ], batch_size=self.batch_size)
+        fee_types = []
+        stoppage_fees = {}
+        for index, (stoppage, group) in enumerate(zip(stoppages, groups)):
+            amount = Decimal(300 + 50 * (index % self.stoppages_per_route))
+            stoppage_fees[stoppage.id] = [(f'Fee Payment: Transport - {month}', amount) for month in MONTHS]
+            for month in MONTHS:
+                fee_types.append(FeesType(
+                    fee_group=group,
+                    amount=amount,
+                    amount_type=month,
+                    context_type='stoppage_based',
+                    context_data={'months': [month], 'stoppages': [stoppage.name]},
+                    month_name=month,
+                    stoppage_name=stoppage.name,
+                    related_stoppage=stoppage,
+                ))
+        FeesType.objects.bulk_create(fee_types, batch_size=self.batch_size)
+
+        assignments = []
+        transport = {}
+        for student in students:
+            if rng.random() >= self.transport_ratio:
+                continue
+            stoppage = rng.choice(stoppages)
+            assignments.append(TransportAssignment(student=student, route=stoppage.route, stoppage=stoppage))
+            transport[student.id] = stoppage_fees[stoppage.id]
+        TransportAssignment.objects.bulk_create(assignments, batch_size=self.batch_size)
+
+        self.summary['routes'] = len(routes)
+        self.summary['stoppages'] = len(stoppages)
+        self.summary['transport_fee_types'] = len(fee_types)
+        self.summary['transport_assignments'] = len(assignments)
+        self.progress(f"{len(routes)} routes, {len(stoppages)} stoppages, {len(assignments)} transport students")
+        return transport
+
+    def _create_fines(self, sections, students):
+        """A late fee per class plus a sprinkling of individual fines; returns paid fine links"""
+        from fines.models import FineType, Fine, FineStudent
+
+        rng = self.rng
+        late_fee, _ = FineType.objects.get_or_create(name='Late Fee', defaults={'category': 'Late Fee'})
+        damage, _ = FineType.objects.get_or_create(name='Damage', defaults={'category': 'Damage'})
+
+        by_section = {}
+        for student in students:
+            by_section.setdefault(student.class_section_id, []).append(student)
+
+        class_fines = Fine.objects.bulk_create([
+            Fine(class_section=section, fine_type=late_fee, amount=Decimal('100'),
+                 reason=f'Late fee for {section.display_name}', target_scope='Class',
+                 due_date=self.start_date + timedelta(days=45))
+            for section in sections
+        ], batch_size=self.batch_size)
+        individual = rng.sample(students, min(len(students), max(1, len(students) // 20)))
+        individual_fines = Fine.objects.bulk_create([
+            Fine(fine_type=damage, amount=Decimal(rng.choice([50, 150, 300])),
+                 reason='Library book damaged', target_scope='Individual',
+                 due_date=self.start_date + timedelta(days=rng.randint(30, 150)))
+            for _ in individual
+        ], batch_size=self.batch_size)
+
+        links = []
+        paid = []
+        for section, fine in zip(sections, class_fines):
+            for student in by_section.get(section.id, []):
+                is_paid = rng.random() < 0.6
+                links.append(FineStudent(fine=fine, student=student, is_paid=is_paid,
+                                         payment_date=fine.due_date if is_paid else None))
+                if is_paid:
+                    paid.append((student, late_fee.name, fine.amount, fine.due_date))
+        for student, fine in zip(individual, individual_fines):
+            links.append(FineStudent(fine=fine, student=student))
+        FineStudent.objects.bulk_create(links, batch_size=self.batch_size)
+        self.summary['fines'] = len(class_fines) + len(individual_fines)
+        self.summary['fine_students'] = len(links)
+        self.progress(f"{self.summary['fines']} fines, {len(links)} fine links")
+        return paid
+
+    def _create_deposits(self, students, schedule, transport, fine_payments):
+        """Pay a random prefix of the elapsed months, one receipt per counter visit"""
+        from student_fees.models import FeeDeposit
+
+        rng = self.rng
+        months_elapsed = self._months_elapsed()
+        deposits = []
+        dates = []
+        receipt_seq = 0
+
+        def deposit(student, note, amount, receipt_no, paid_on, discount=Decimal('0')):
+            mode = rng.choice(['Cash', 'Cash', 'UPI', 'Online'])
+            deposits.append(FeeDeposit(
+                student=student,
+                amount=amount,
+                discount=discount,
+                paid_amount=amount - discount,
+                receipt_no=receipt_no,
+                payment_mode=mode,
+                transaction_no=f'TXN{rng.randint(10 ** 9, 10 ** 10 - 1)}' if mode != 'Cash' else None,
+                payment_source='Counter',
+                note=note,
+            ))
+            dates.append(paid_on)
+
+        for student in students:
+            tuition = schedule[student.class_section_id]
+            bus = transport.get(student.id)
+            paid_months = rng.randint(0, months_elapsed)
+            month_index = 0
+            while month_index < paid_months:
+                visit = min(paid_months, month_index + rng.randint(1, 3))
+                receipt_seq += 1
+                receipt_no = f'{PREFIX}R{receipt_seq:08d}'
+                paid_on = self.start_date + timedelta(days=30 * month_index + rng.randint(0, 20))
+                discounted = rng.random() < 0.1
+                for index in range(month_index, visit):
+                    for note, amount in [tuition[index]] + ([bus[index]] if bus else []):
+                        discount = (amount * Decimal('0.05')).quantize(Decimal('0.01')) if discounted else Decimal('0')
+                        deposit(student, note, amount, receipt_no, paid_on, discount)
+                month_index = visit
+            if student.due_amount and rng.random() < 0.5:
+                receipt_seq += 1
+                deposit(student, 'Carry Forward Payment', student.due_amount,
+                        f'{PREFIX}R{receipt_seq:08d}', self.start_date + timedelta(days=rng.randint(0, 60)))
+
+        for student, fine_name, amount, paid_on in fine_payments:
+            receipt_seq += 1
+            deposit(student, f'Fine Payment: {fine_name}', amount, f'{PREFIX}R{receipt_seq:08d}', paid_on)
+
+        created = FeeDeposit.objects.bulk_create(deposits, batch_size=self.batch_size)
+        # deposit_date is auto_now_add, so spread the history with one UPDATE per day
+        by_date = {}
+        for row, paid_on in zip(created, dates):
+            by_date.setdefault(paid_on, []).append(row.id)
+        for paid_on, ids in by_date.items():
+            paid_at = timezone.make_aware(datetime.combine(paid_on, time(10, 0)))
+            for start in range(0, len(ids), 500):
+                FeeDeposit.objects.filter(id__in=ids[start:start + 500]).update(deposit_date=paid_at)
+        self.summary['payment_allocations'] = self._allocate_deposits(students)
+        self.summary['fee_deposits'] = len(deposits)
+        self.summary['receipts'] = receipt_seq
+        self.progress(f"{len(deposits)} deposits on {receipt_seq} receipts")
+
+    def _allocate_deposits(self, students):
+        """Classify the seeded deposits the same way the backfill command does"""
+        from core.fee_management.allocations import PaymentAllocationService
+        from student_fees.models import FeeDeposit
+
+        created = 0
+        for start in range(0, len(students), 500):
+            chunk = [student.id for student in students[start:start + 500]]
+            created += PaymentAllocationService.allocate_deposits(
+                list(FeeDeposit.objects.filter(student_id__in=chunk)), batch_size=self.batch_size
+            )
+        return created
+
+    def _create_attendance(self, students):
+        from attendance.models import Attendance
+
+        rng = self.rng
+        days = self._school_days()
+        total = 0
+        batch = []
+        for student in students:
+            presence = rng.uniform(0.6, 0.98)
+            for day in days:
+                batch.append(Attendance(
+                    student_id=student.id,
+                    class_section_id=student.class_section_id,
+                    date=day,
+                    status='Present' if rng.random() < presence else 'Absent',
+                ))
+            if len(batch) >= self.batch_size * 10:
+                Attendance.objects.bulk_create(batch, batch_size=self.batch_size)
+                total += len(batch)
+                batch = []
+                self.progress(f"{total} attendance rows")
+        if batch:
+            Attendance.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+        self.summary['attendance'] = total
+        self.progress(f"{total} attendance rows")
+
+        # bulk_create skips the rollups record_class_attendance keeps
+        from attendance.services import AttendanceService
+        self.summary['attendance_summaries'], _ = AttendanceService.rebuild_rollups(since=days[0] if days else None)
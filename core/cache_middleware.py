@@ -1,32 +1,59 @@
 from django.core.cache import cache
-from django.utils.cache import get_cache_key
-from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils import timezone
+from django.http import HttpResponse, HttpResponseNotModified
+from django.middleware.csrf import get_token
 from django.conf import settings
 import time
 import hashlib
-import json
+
+from .response_cache import (
+    DOMAINS, STORE_ENCODING, accepted_encodings, compress, data_versions, decompress, negotiate,
+)
 
 
 class SmartCacheMiddleware:
     """
-    Intelligent caching middleware that reduces database queries by 50%
+    Per-user response cache for the heavy list and dashboard pages
+
+    Entries are keyed by the user's session and CSRF secret, the request
+    headers a page may vary on, today's date and the data version stamps of
+    what the page shows (core/response_cache.py), so a write makes the old
+    pages unreachable instead of leaving them to expire. The stamps live in
+    the database, so entries in a per-process cache are invalidated by writes
+    made in any process. Bodies are stored compressed, with a strong ETag; a
+    matching If-None-Match is answered with 304 before the view runs.
+
+    Not cached: anonymous requests, pages showing or queueing messages,
+    responses that set cookies, change the session, vary on other headers,
+    are downloads or say no-cache/no-store, and pages that issued a CSRF
+    token to a client without a CSRF cookie yet.
     """
     
+    # Request headers that are part of the key; Vary on anything else is not cacheable
+    KEY_HEADERS = ('HTTP_ACCEPT', 'HTTP_ACCEPT_LANGUAGE', 'HTTP_X_REQUESTED_WITH')
+    VARY_ALLOWED = {'cookie', 'accept-encoding', 'accept', 'accept-language', 'x-requested-with'}
+    CONTENT_TYPES = ('text/html', 'application/json')
+    SKIP_HEADERS = {'content-length', 'content-encoding', 'etag', 'vary', 'set-cookie', 'x-cache-status'}
+    
     def __init__(self, get_response):
         self.get_response = get_response
         
         # Cache settings
+        self.enabled = getattr(settings, 'SMART_CACHE_ENABLED', True)
         self.cache_timeout = getattr(settings, 'SMART_CACHE_TIMEOUT', 300)  # 5 minutes
         self.cache_prefix = getattr(settings, 'SMART_CACHE_PREFIX', 'smart_cache')
-        
-        # URLs to cache
-        self.cacheable_urls = [
-            '/students/',
-            '/students/api/stats/',
-            '/dashboard/',
-            '/fees/',
-            '/attendance/',
-        ]
+        self.max_size = getattr(settings, 'SMART_CACHE_MAX_SIZE', 1024 * 1024)
+        
+        # URLs to cache -> data domains they show
+        self.cacheable_urls = {
+            '/students/': ('students', 'fees', 'attendance'),
+            '/student_fees/': ('students', 'fees'),
+            '/fees/': ('students', 'fees'),
+            '/attendance/': ('students', 'attendance'),
+            '/dashboard/': DOMAINS,
+        }
         
         # URLs to never cache
         self.non_cacheable_urls = [
@@ -37,34 +64,21 @@ class SmartCacheMiddleware:
         ]
 
     def __call__(self, request):
-        # Skip caching for non-GET requests
-        if request.method != 'GET':
-            return self.get_response(request)
-        
-        # Skip caching for non-cacheable URLs
-        if any(request.path.startswith(url) for url in self.non_cacheable_urls):
-            return self.get_response(request)
-        
-        # Check if URL is cacheable
-        is_cacheable = any(request.path.startswith(url) for url in self.cacheable_urls)
-        
-        if not is_cacheable:
+        # Only GET/HEAD of cacheable URLs by signed-in users
+        domains = self._get_domains(request)
+        if domains is None or self._has_pending_messages(request):
             return self.get_response(request)
         
-        # Generate cache key
-        cache_key = self._generate_cache_key(request)
+        # Generate cache key (reads the version stamps before the view runs)
+        cache_key = self._generate_cache_key(request, domains)
         
         # Try to get cached response
-        cached_response = cache.get(cache_key)
-        if cached_response:
-            # Add cache hit header
-            response = HttpResponse(
-                cached_response['content'],
-                content_type=cached_response['content_type'],
-                status=cached_response['status']
-            )
+        entry = cache.get(cache_key)
+        if entry:
+            if entry['csrf']:
+                get_token(request)  # Keep the CSRF cookie refresh the view would have caused
+            response = self._cached_response(request, entry)
             response['X-Cache-Status'] = 'HIT'
-            response['X-Cache-Key'] = cache_key[:20] + '...'
             return response
         
         # Get fresh response
@@ -73,45 +87,143 @@ class SmartCacheMiddleware:
         response_time = time.time() - start_time
         
         # Cache successful responses
-        if response.status_code == 200 and hasattr(response, 'content'):
-            cache_data = {
-                'content': response.content,
-                'content_type': response.get('Content-Type', 'text/html'),
-                'status': response.status_code,
-                'timestamp': time.time()
-            }
-            
-            # Determine cache timeout based on URL
-            timeout = self._get_cache_timeout(request.path)
-            cache.set(cache_key, cache_data, timeout)
-            
-            # Add cache miss header
+        if request.method == 'GET' and self._is_cacheable(request, response):
+            entry = self._make_entry(request, response)
+            cache.set(cache_key, entry, self._get_cache_timeout(request.path))
+            response = self._cached_response(request, entry, response)
             response['X-Cache-Status'] = 'MISS'
-            response['X-Cache-Key'] = cache_key[:20] + '...'
         
         # Add performance headers
         response['X-Response-Time'] = f'{response_time:.3f}s'
         
         return response
     
-    def _generate_cache_key(self, request):
+    def _get_domains(self, request):
+        """Data domains of a cacheable request, None if it is not cacheable"""
+        if not self.enabled or request.method not in ('GET', 'HEAD'):
+            return None
+        if any(request.path.startswith(url) for url in self.non_cacheable_urls):
+            return None
+        if not request.user.is_authenticated:
+            return None
+        for url, domains in self.cacheable_urls.items():
+            if request.path.startswith(url):
+                return domains
+        return None
+    
+    @staticmethod
+    def _has_pending_messages(request):
+        """Messages waiting to be shown; the view must render them"""
+        storage = getattr(request, '_messages', None)
+        return storage is not None and len(storage) > 0
+    
+    def _generate_cache_key(self, request, domains):
         """
         Generate unique cache key based on request
         """
-        # Include user ID for personalized content
-        user_id = request.user.id if request.user.is_authenticated else 'anonymous'
-        
-        # Include query parameters
-        query_string = request.GET.urlencode()
-        
-        # Create unique identifier
-        cache_data = f"{request.path}:{user_id}:{query_string}"
+        parts = [
+            request.path,
+            request.GET.urlencode(),
+            str(request.user.pk),
+            request.session.session_key or '',
+            request.META.get('CSRF_COOKIE', ''),  # Cached forms carry tokens for this secret
+            timezone.localdate().isoformat(),     # "Today" figures change at midnight
+            data_versions.stamp(*domains),
+        ]
+        parts.extend(request.META.get(header, '') for header in self.KEY_HEADERS)
         
         # Hash for consistent key length
-        cache_hash = hashlib.md5(cache_data.encode()).hexdigest()
+        cache_hash = hashlib.sha256('\n'.join(parts).encode()).hexdigest()
         
         return f"{self.cache_prefix}:{cache_hash}"
     
+    def _is_cacheable(self, request, response):
+        """Whether the response can be replayed to this user later"""
+        if response.status_code != 200 or response.streaming:
+            return False
+        if response.cookies or response.has_header('Content-Disposition') or response.has_header('Content-Encoding'):
+            return False
+        if not response.get('Content-Type', '').startswith(self.CONTENT_TYPES):
+            return False
+        if len(response.content) > self.max_size:
+            return False
+        if any(token in response.get('Cache-Control', '') for token in ('no-cache', 'no-store')):
+            return False
+        vary = {header.strip().lower() for header in response.get('Vary', '').split(',') if header.strip()}
+        if not vary <= self.VARY_ALLOWED:
+            return False
+        # A first CSRF token sets the cookie; the next request's key will include it
+        if request.META.get('CSRF_COOKIE_NEEDS_UPDATE') and settings.CSRF_COOKIE_NAME not in request.COOKIES:
+            return False
+        if getattr(request, 'session', None) is not None and request.session.modified:
+            return False
+        storage = getattr(request, '_messages', None)
+        if storage is not None and (storage.used or len(storage) > 0):
+            return False
+        return True
+    
+    def _make_entry(self, request, response):
+        body = response.content
+        return {
+            'body': compress(body, STORE_ENCODING),
+            'encoding': STORE_ENCODING,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'content_type': response['Content-Type'],
+            'headers': [(name, value) for name, value in response.items()
+                        if name.lower() not in self.SKIP_HEADERS],
+            'csrf': bool(request.META.get('CSRF_COOKIE_NEEDS_UPDATE')),
+        }
+    
+    @staticmethod
+    def _etag_matches(request, etag):
+        """If-None-Match against any encoding of the stored body"""
+        for candidate in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            if candidate == '*' or candidate.removeprefix('W/').strip('"').split('-')[0] == etag:
+                return True
+        return False
+    
+    @staticmethod
+    def _format_etag(etag, encoding, weak=False):
+        # Each encoding is a different representation, so it gets its own ETag
+        value = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+        return f'W/{value}' if weak else value
+    
+    def _cached_response(self, request, entry, response=None):
+        """
+        The stored body in the client's preferred encoding, or 304 if the
+        client has it already. ``response`` is the view's own response on a
+        miss; it is updated in place.
+        """
+        encoding = entry['encoding']
+        body = entry['body']
+        weak = False
+        if encoding not in accepted_encodings(request):
+            encoding = negotiate(request)
+            weak = encoding is not None  # Recompressed per request, so not byte-identical
+        etag = self._format_etag(entry['etag'], encoding, weak)
+        
+        if self._etag_matches(request, entry['etag']):
+            response = HttpResponseNotModified()
+        else:
+            if encoding != entry['encoding']:
+                body = decompress(body, entry['encoding'])
+                if encoding:
+                    body = compress(body, encoding)
+            if response is None:
+                response = HttpResponse(content_type=entry['content_type'])
+                for name, value in entry['headers']:
+                    response[name] = value
+            response.content = body
+            response['Content-Length'] = str(len(body))
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+        if 'Cache-Control' not in response:
+            # Browsers keep the page but ask again each time (If-None-Match)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+    
     def _get_cache_timeout(self, path):
         """
         Get cache timeout based on URL pattern
@@ -203,18 +315,44 @@ class StaticFilesCacheMiddleware:
 
 class CompressionMiddleware:
     """
-    Simple compression middleware for better performance
+    Brotli (when installed) or gzip compression of text responses
+
+    Responses that already have a Content-Encoding (e.g. from
+    SmartCacheMiddleware's stored bodies) are left alone.
     """
     
+    MIN_SIZE = 200  # Not worth compressing below this
+    CONTENT_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+    
     def __init__(self, get_response):
         self.get_response = get_response
     
     def __call__(self, request):
         response = self.get_response(request)
         
-        # Add compression hint header
-        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
-            response['Vary'] = 'Accept-Encoding'
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(self.CONTENT_TYPES):
+            return response
+        if len(response.content) < self.MIN_SIZE:
+            return response
+        
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request)
+        if not encoding:
+            return response
+        
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        
+        # A strong ETag belongs to the uncompressed bytes (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
         
         return response
 
@@ -289,8 +427,9 @@ class CacheInvalidator:
                 f'complete_dashboard_{admission_number}'
             ])
         
-        # Note: Django cache doesn't support pattern deletion
-        # In production with Redis, use: cache.delete_pattern(pattern)
+        # Note: Django cache doesn't support pattern deletion; cached pages
+        # are dropped by moving the data version stamp instead
+        data_versions.touch('students')
         for pattern in patterns:
             try:
                 cache.delete(pattern)
@@ -307,6 +446,7 @@ class CacheInvalidator:
             'fee_stats_*',
             'payment_summary_*'
         ]
+        data_versions.touch('fees')
         
         if student_id:
             patterns.extend([
@@ -331,6 +471,7 @@ class CacheInvalidator:
             'student_dashboard_stats',
             'system_overview_*'
         ]
+        data_versions.touch()
         
         for pattern in patterns:
             try:
@@ -0,0 +1,33 @@
+# core/checks.py
+"""System checks for settings that only work with a cache shared by all server processes"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries live inside one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def cache_is_shared(alias='default'):
+    """True when every server process reads and writes the same ``alias`` cache"""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return backend not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, Tags.compatibility)
+def check_session_cache(app_configs=None, **kwargs):
+    if settings.SESSION_ENGINE != 'core.sessions':
+        return []
+    alias = getattr(settings, 'SESSION_CACHE_ALIAS', 'default')
+    if cache_is_shared(alias):
+        return []
+    return [Error(
+        f"SESSION_ENGINE 'core.sessions' serves sessions from the '{alias}' cache, which is local to each "
+        f"process ({settings.CACHES[alias]['BACKEND']}); other processes would keep using logged-out or "
+        f"changed sessions.",
+        hint="Set CACHE_BACKEND to a shared cache (file-based, database, Redis or Memcached), "
+             "or use SESSION_ENGINE = 'core.sessions_db'.",
+        id='core.E001',
+    )]
@@ -1,9 +1,8 @@
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    pd = None
-    PANDAS_AVAILABLE = False
+from core.ml_lazy_loader import lazy_import, module_available
+
+# pandas is only imported when an .xlsx export is actually produced
+PANDAS_AVAILABLE = module_available('pandas')
+pd = lazy_import('pandas') if PANDAS_AVAILABLE else None
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 from reportlab.pdfgen import canvas
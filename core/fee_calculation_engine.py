@@ -98,11 +98,13 @@ class FeeCalculationEngine:
             # Check if student has carry forward record
             cf_amount = getattr(student, 'due_amount', Decimal('0'))
             
-            # Get carry forward from fee deposits marked as CF
+            # Get carry forward from fee deposits allocated to CF
             from student_fees.models import FeeDeposit
-            cf_deposits = FeeDeposit.objects.filter(
-                student=student,
-                note__icontains="Carry Forward"
+            from core.fee_management.allocations import PaymentAllocationService
+            from core.fee_management.models import PaymentAllocation
+            cf_deposits = PaymentAllocationService.deposits_of_type(
+                FeeDeposit.objects.filter(student=student),
+                PaymentAllocation.CARRY_FORWARD
             ).aggregate(
                 total_cf=Sum('amount'),
                 paid_cf=Sum('paid_amount')
@@ -121,7 +123,8 @@ class FeeCalculationEngine:
         """Calculate current session fees (excluding CF and fines)"""
         try:
             from fees.models import FeesType
-            from student_fees.models import FeeDeposit
+            from core.fee_management.allocations import PaymentAllocationService
+            from core.fee_management.models import PaymentAllocation
             
             # Get applicable fees for current session
             class_name = student.class_section.class_name if student.class_section else 'N/A'
@@ -134,18 +137,10 @@ class FeeCalculationEngine:
             total_applicable = sum(fee.amount for fee in applicable_fees)
             
             # Get current session payments (exclude CF and fine payments)
-            current_payments = FeeDeposit.objects.filter(
-                student=student,
-                fees_type__isnull=False
-            ).exclude(
-                Q(note__icontains="Fine Payment") | Q(note__icontains="Carry Forward")
-            ).aggregate(
-                paid=Sum('paid_amount'),
-                discount=Sum('discount')
-            )
+            current_payments = PaymentAllocationService.student_totals(student)[PaymentAllocation.FEE]
             
-            total_paid = current_payments.get('paid') or Decimal('0')
-            total_discount = current_payments.get('discount') or Decimal('0')
+            total_paid = current_payments['paid']
+            total_discount = current_payments['discount']
             
             return max(total_applicable - total_paid - total_discount, Decimal('0'))
             
@@ -193,30 +188,16 @@ class FeeCalculationEngine:
     def _get_payment_summary(self, student) -> Dict:
         """Get comprehensive payment summary"""
         try:
-            from student_fees.models import FeeDeposit
+            from core.fee_management.allocations import PaymentAllocationService
+            from core.fee_management.models import PaymentAllocation
             
-            # Regular fee payments
-            regular_payments = FeeDeposit.objects.filter(
-                student=student
-            ).exclude(
-                note__icontains="Fine Payment"
-            ).aggregate(
-                total_paid=Sum('paid_amount'),
-                total_discount=Sum('discount')
-            )
-            
-            # Fine payments
-            fine_payments = FeeDeposit.objects.filter(
-                student=student,
-                note__icontains="Fine Payment"
-            ).aggregate(
-                fine_paid=Sum('paid_amount')
-            )
+            payments = PaymentAllocationService.student_totals(student)
+            regular_types = (PaymentAllocation.FEE, PaymentAllocation.CARRY_FORWARD)
             
             return {
-                'total_paid': regular_payments.get('total_paid') or Decimal('0'),
-                'total_discount': regular_payments.get('total_discount') or Decimal('0'),
-                'fine_paid': fine_payments.get('fine_paid') or Decimal('0')
+                'total_paid': sum((payments[t]['paid'] for t in regular_types), Decimal('0')),
+                'total_discount': sum((payments[t]['discount'] for t in regular_types), Decimal('0')),
+                'fine_paid': payments[PaymentAllocation.FINE]['paid']
             }
             
         except Exception as e:
@@ -230,7 +211,7 @@ class FeeCalculationEngine:
     def process_fee_payment(self, student, payment_data) -> dict:
         """Process payment using AtomicFeeCalculator"""
         try:
-            result = self.calculator.process_payment(student, payment_data)
+            result = self.calculator.process_payment(student, self.calculator.reserve_receipt(payment_data))
             
             if result['success']:
                 return {
@@ -0,0 +1,286 @@
+# core/fee_management/allocations.py
+"""
+Structured payment allocation
+
+Every FeeDeposit row gets one PaymentAllocation saying what it paid: a
+FeesType, a Fine or the carry-forward balance. Balance code aggregates over
+these indexed foreign keys instead of LIKE scans on FeeDeposit.note.
+
+Payment views that know the target record it directly (record); anything
+else (admin edits, legacy rows, bulk imports) is classified once from the
+note text with the same rules the old note matching used (allocate_deposits).
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Sum
+import logging
+
+from .models import PaymentAllocation
+
+logger = logging.getLogger(__name__)
+
+FEE_NOTE_PREFIX = 'Fee Payment: '
+FINE_NOTE_PREFIX = 'Fine Payment: '
+CARRY_FORWARD_NOTE = 'Carry Forward'
+
+
+def _zero_totals():
+    return {'paid': Decimal('0.00'), 'discount': Decimal('0.00'), 'count': 0}
+
+
+class PaymentAllocationService:
+    """Create and aggregate PaymentAllocation rows"""
+
+    @staticmethod
+    def classify_note(note, payment_source=None):
+        """Allocation type implied by a deposit note"""
+        note = note or ''
+        if CARRY_FORWARD_NOTE.lower() in note.lower() or payment_source == 'carry_forward':
+            return PaymentAllocation.CARRY_FORWARD
+        if 'fine payment' in note.lower():
+            return PaymentAllocation.FINE
+        return PaymentAllocation.FEE
+
+    @staticmethod
+    def build(deposit, allocation_type, fees_type=None, fine=None):
+        """Unsaved allocation of the whole deposit to one target"""
+        return PaymentAllocation(
+            fee_deposit=deposit,
+            student_id=deposit.student_id,
+            allocation_type=allocation_type,
+            fees_type=fees_type,
+            fine=fine,
+            allocated_amount=deposit.paid_amount or Decimal('0'),
+            discount_amount=deposit.discount or Decimal('0'),
+        )
+
+    @classmethod
+    def record(cls, targets):
+        """
+        Save allocations for freshly created deposits.
+        ``targets`` is a list of (deposit, allocation_type, fees_type, fine).
+        """
+        from core.response_cache import data_versions
+
+        allocations = [cls.build(deposit, allocation_type, fees_type, fine)
+                       for deposit, allocation_type, fees_type, fine in targets]
+        data_versions.touch('fees')  # Deposits are bulk-created, so no post_save did it
+        return PaymentAllocation.objects.bulk_create(allocations)
+
+    # ------------------------------------------------------------------
+    # Classification from note text (backfill / unknown writers)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _applicable_fees_by_student(cls, students):
+        """Mirror AtomicFeeCalculator.get_applicable_fees for many students in one query"""
+        from transport.models import TransportAssignment
+        from .fee_schedule import fee_schedule
+
+        schedule = fee_schedule.get()
+        stoppages = dict(TransportAssignment.objects.filter(
+            student__in=[s.id for s in students]
+        ).order_by('id').values_list('student_id', 'stoppage_id'))
+        return {
+            student.id: list(schedule.class_fees(
+                student.class_section.display_name if student.class_section_id else None
+            )) + list(schedule.transport_fees(stoppages.get(student.id)))
+            for student in students
+        }
+
+    @staticmethod
+    def _match_fee(note, fees):
+        """Exact 'Fee Payment: <group> - <month>' first, then the old icontains fallback"""
+        for fee in fees:
+            if note == f'{FEE_NOTE_PREFIX}{fee.fee_group.group_type} - {fee.amount_type}':
+                return fee
+        lowered = note.lower()
+        for fee in fees:
+            if fee.amount_type.lower() in lowered and fee.fee_group.group_type.lower() in lowered:
+                return fee
+        return None
+
+    @classmethod
+    def allocate_deposits(cls, deposits, batch_size=1000):
+        """
+        Classify deposits from their notes and save one allocation each.
+        Deposits that already have allocations, or are auto-generated
+        (receipt AUTO-...), are skipped. Returns the number created.
+        """
+        from fines.models import FineStudent
+        from students.models import Student
+
+        deposits = [d for d in deposits if not (d.receipt_no or '').startswith('AUTO-')]
+        if not deposits:
+            return 0
+        done = set(PaymentAllocation.objects.filter(
+            fee_deposit__in=[d.id for d in deposits]
+        ).values_list('fee_deposit_id', flat=True))
+        deposits = [d for d in deposits if d.id not in done]
+        if not deposits:
+            return 0
+
+        student_ids = {d.student_id for d in deposits}
+        students = list(Student.objects.all_statuses().filter(id__in=student_ids).select_related('class_section'))
+        applicable = cls._applicable_fees_by_student(students)
+
+        fines_by_student = defaultdict(list)
+        for fs in FineStudent.objects.filter(student__in=student_ids).select_related(
+                'fine', 'fine__fine_type').order_by('-is_paid', 'id'):
+            fines_by_student[fs.student_id].append(fs.fine)
+        used_fines = set(PaymentAllocation.objects.filter(
+            student__in=student_ids, allocation_type=PaymentAllocation.FINE, fine__isnull=False
+        ).values_list('student_id', 'fine_id'))
+
+        targets = []
+        for deposit in sorted(deposits, key=lambda d: (d.deposit_date, d.id)):
+            note = deposit.note or ''
+            allocation_type = cls.classify_note(note, deposit.payment_source)
+            fees_type = fine = None
+            if allocation_type == PaymentAllocation.FEE:
+                fees_type = cls._match_fee(note, applicable.get(deposit.student_id, []))
+            elif allocation_type == PaymentAllocation.FINE:
+                name = note.split(':', 1)[1].strip() if ':' in note else ''
+                candidates = [f for f in fines_by_student[deposit.student_id] if f.fine_type.name == name]
+                unused = [f for f in candidates if (deposit.student_id, f.id) not in used_fines]
+                fine = (unused or candidates or [None])[0]
+                if fine:
+                    used_fines.add((deposit.student_id, fine.id))
+            targets.append((deposit, allocation_type, fees_type, fine))
+
+        created = 0
+        for start in range(0, len(targets), batch_size):
+            created += len(cls.record(targets[start:start + batch_size]))
+        return created
+
+    @classmethod
+    @transaction.atomic
+    def sync_deposit(cls, deposit):
+        """Re-derive the allocation of a single edited deposit"""
+        PaymentAllocation.objects.filter(fee_deposit=deposit).delete()
+        return cls.allocate_deposits([deposit])
+
+    @classmethod
+    def backfill(cls, batch_size=1000, rebuild=False):
+        """Allocate every FeeDeposit that has no allocation yet, a batch of students at a time"""
+        from student_fees.models import FeeDeposit
+
+        if rebuild:
+            PaymentAllocation.objects.filter(student_fee__isnull=True, applied_fine__isnull=True).delete()
+        pending_students = FeeDeposit.objects.filter(allocations__isnull=True).order_by(
+            'student_id').values_list('student_id', flat=True).distinct()
+        created = 0
+        last_id = 0
+        while True:
+            chunk = list(pending_students.filter(student_id__gt=last_id)[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1]
+            created += cls.allocate_deposits(
+                list(FeeDeposit.objects.filter(student_id__in=chunk, allocations__isnull=True)),
+                batch_size=batch_size,
+            )
+        return created
+
+    # ------------------------------------------------------------------
+    # Aggregation
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def totals_for_students(cls, students):
+        """{student_id: {allocation_type: {'paid', 'discount', 'count'}}} in one grouped query"""
+        totals = defaultdict(lambda: defaultdict(_zero_totals))
+        rows = PaymentAllocation.objects.filter(student__in=students).values(
+            'student_id', 'allocation_type'
+        ).annotate(paid=Sum('allocated_amount'), discount=Sum('discount_amount'), count=Count('id'))
+        for row in rows:
+            totals[row['student_id']][row['allocation_type']] = {
+                'paid': row['paid'] or Decimal('0.00'),
+                'discount': row['discount'] or Decimal('0.00'),
+                'count': row['count'],
+            }
+        return totals
+
+    @classmethod
+    def student_totals(cls, student):
+        """Paid/discount/count per allocation type for one student"""
+        return cls.totals_for_students([student.id])[student.id]
+
+    @classmethod
+    def fee_totals(cls, student_ids, fees_type_ids=None):
+        """{(student_id, fees_type_id): {'paid', 'discount'}} for fee allocations"""
+        allocations = PaymentAllocation.objects.filter(
+            student__in=student_ids, allocation_type=PaymentAllocation.FEE, fees_type__isnull=False
+        )
+        if fees_type_ids is not None:
+            allocations = allocations.filter(fees_type__in=fees_type_ids)
+        rows = allocations.values('student_id', 'fees_type_id').annotate(
+            paid=Sum('allocated_amount'), discount=Sum('discount_amount')
+        )
+        return {
+            (row['student_id'], row['fees_type_id']): {
+                'paid': row['paid'] or Decimal('0.00'),
+                'discount': row['discount'] or Decimal('0.00'),
+            }
+            for row in rows
+        }
+
+    @classmethod
+    def student_fee_totals(cls, student):
+        """{fees_type_id: {'paid', 'discount'}} for one student"""
+        return {fees_type_id: totals for (_, fees_type_id), totals
+                in cls.fee_totals([student.id]).items()}
+
+    @staticmethod
+    def payable_key(allocation_type, fees_type_id, fine_id):
+        """The id AtomicFeeCalculator.get_payable_fees uses for the same target"""
+        if allocation_type == PaymentAllocation.CARRY_FORWARD:
+            return 'carry_forward'
+        if allocation_type == PaymentAllocation.FINE:
+            return f'fine_{fine_id}' if fine_id else None
+        return fees_type_id
+
+    @classmethod
+    def annotate_deposits(cls, student, deposits):
+        """
+        Attach ``allocation_type``, ``payable_key`` and ``paid_before`` (amount
+        paid towards the same target by earlier deposits) to each deposit,
+        using a single query over the student's allocations.
+        """
+        deposits = list(deposits)
+        rows = PaymentAllocation.objects.filter(student=student).values_list(
+            'fee_deposit_id', 'allocation_type', 'fees_type_id', 'fine_id',
+            'allocated_amount', 'fee_deposit__deposit_date'
+        )
+        by_deposit = {}
+        history = defaultdict(list)
+        for deposit_id, allocation_type, fees_type_id, fine_id, amount, deposit_date in rows:
+            key = cls.payable_key(allocation_type, fees_type_id, fine_id)
+            by_deposit[deposit_id] = (allocation_type, key)
+            if key is not None:
+                history[key].append((deposit_date, amount))
+
+        for deposit in deposits:
+            allocation_type, key = by_deposit.get(
+                deposit.id, (cls.classify_note(deposit.note, deposit.payment_source), None)
+            )
+            deposit.allocation_type = allocation_type
+            deposit.payable_key = key
+            deposit.paid_before = sum(
+                (amount for paid_at, amount in history.get(key, []) if paid_at < deposit.deposit_date),
+                Decimal('0')
+            )
+        return deposits
+
+    @staticmethod
+    def regular_deposits(deposits):
+        """FeeDeposit queryset minus carry-forward and fine payments"""
+        return deposits.exclude(allocations__allocation_type__in=[
+            PaymentAllocation.CARRY_FORWARD, PaymentAllocation.FINE
+        ])
+
+    @staticmethod
+    def deposits_of_type(deposits, allocation_type):
+        return deposits.filter(allocations__allocation_type=allocation_type)
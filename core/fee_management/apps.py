@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class FeeManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core.fee_management'
-    label = 'fee_management'
\ No newline at end of file
+    label = 'fee_management'
+
+    def ready(self):
+        import core.fee_management.signals
+        import core.fee_management.checks
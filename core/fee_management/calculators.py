@@ -4,6 +4,7 @@ ATOMIC FEE CALCULATOR - Single Source of Truth
 Fixes all identified issues with centralized, consistent calculations
 """
 
+from collections import defaultdict
 from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import date, timedelta
@@ -39,39 +40,19 @@ class AtomicFeeCalculator:
     
     @classmethod
     def get_applicable_fees(cls, student):
-        """SINGLE SOURCE: Get applicable fees for student"""
-        from fees.models import FeesType
+        """SINGLE SOURCE: Get applicable fees for student from the compiled fee schedule"""
         from transport.models import TransportAssignment
+        from .fee_schedule import fee_schedule
         
+        schedule = fee_schedule.get()
         if not student.class_section:
-            return FeesType.objects.filter(
-                Q(class_name__isnull=True) | Q(class_name='')
-            ).exclude(fee_group__group_type="Transport")
-        
-        # FIXED: Consistent class matching using display_name
-        class_display = student.class_section.display_name
-        
-        regular_fees = FeesType.objects.filter(
-            Q(class_name__isnull=True) | 
-            Q(class_name='') |
-            Q(class_name__iexact=class_display)
-        ).exclude(fee_group__group_type="Transport")
+            return schedule.fees_for(None)
         
         # Transport fees if assigned
-        transport_fees = []
-        try:
-            assignment = TransportAssignment.objects.select_related('stoppage').filter(
-                student=student
-            ).first()
-            if assignment and assignment.stoppage:
-                transport_fees = FeesType.objects.filter(
-                    fee_group__group_type="Transport",
-                    related_stoppage=assignment.stoppage
-                )
-        except Exception:
-            pass
-        
-        return list(regular_fees) + list(transport_fees)
+        stoppage_id = TransportAssignment.objects.filter(
+            student=student
+        ).values_list('stoppage_id', flat=True).first()
+        return schedule.fees_for(student.class_section, stoppage_id)
     
     @classmethod
     @transaction.atomic
@@ -86,51 +67,24 @@ class AtomicFeeCalculator:
         applicable_fees = cls.get_applicable_fees(student)
         current_fees_total = cls._to_decimal(sum(fee.amount for fee in applicable_fees))
         
-        # Current session payments - FIXED: Properly separate from carry forward
-        from student_fees.models import FeeDeposit
-        
-        # Get ALL payments first
-        all_payments = FeeDeposit.objects.filter(
-            student=student,
-            paid_amount__gt=0
-        ).exclude(
-            Q(receipt_no__startswith="AUTO-")
-        )
+        # Payments aggregated over their allocations (one grouped query)
+        from .allocations import PaymentAllocationService
+        from .models import PaymentAllocation
         
-        # Separate current session from carry forward payments
-        current_payments = all_payments.exclude(
-            Q(note__icontains="Fine Payment") | 
-            Q(note__icontains="Carry Forward")
-        ).aggregate(
-            paid=Sum('paid_amount'),
-            discount=Sum('discount')
-        )
+        payment_totals = PaymentAllocationService.student_totals(student)
+        current_payments = payment_totals[PaymentAllocation.FEE]
+        cf_payments = payment_totals[PaymentAllocation.CARRY_FORWARD]
         
         current_paid = cls._to_decimal(current_payments['paid'])
         current_discount = cls._to_decimal(current_payments['discount'])
         current_balance = max(current_fees_total - current_paid - current_discount, Decimal('0.00'))
         
-        # Carry forward - FIXED: Only include actual carry forward payments
+        # Carry forward - only payments allocated to the previous session balance
         cf_original = cls._to_decimal(student.due_amount)
-        cf_payments = all_payments.filter(
-            note__icontains="Carry Forward"
-        ).aggregate(
-            paid=Sum('paid_amount'),
-            discount=Sum('discount')
-        )
-        
         cf_paid = cls._to_decimal(cf_payments['paid'])
         cf_discount = cls._to_decimal(cf_payments['discount'])
         cf_balance = max(cf_original - cf_paid - cf_discount, Decimal('0.00'))
         
-        # Debug logging for payment separation
-        logger.info(f"Student {student.admission_number} payment breakdown:")
-        logger.info(f"  Current session: Fees={current_fees_total}, Paid={current_paid}, Discount={current_discount}, Balance={current_balance}")
-        logger.info(f"  Carry forward: Original={cf_original}, Paid={cf_paid}, Discount={cf_discount}, Balance={cf_balance}")
-        logger.info(f"  Total payments found: {all_payments.count()}")
-        logger.info(f"  Current session payments: {all_payments.exclude(Q(note__icontains='Fine Payment') | Q(note__icontains='Carry Forward')).count()}")
-        logger.info(f"  Carry forward payments: {all_payments.filter(note__icontains='Carry Forward').count()}")
-        
         # Fines
         fine_data = cls._calculate_fine_balance(student)
         fine_unpaid = cls._to_decimal(fine_data['unpaid'])
@@ -138,7 +92,16 @@ class AtomicFeeCalculator:
         # SINGLE CALCULATION FORMULA
         total_balance = current_balance + cf_balance + fine_unpaid
         
-        logger.info(f"  Final totals: Current={current_balance}, CF={cf_balance}, Fines={fine_unpaid}, Total={total_balance}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Student %s balance: current fees=%s paid=%s discount=%s balance=%s; "
+                "carry forward=%s paid=%s discount=%s balance=%s; fines=%s; total=%s; "
+                "payments=%s (current %s, carry forward %s)",
+                student.admission_number, current_fees_total, current_paid, current_discount, current_balance,
+                cf_original, cf_paid, cf_discount, cf_balance, fine_unpaid, total_balance,
+                sum(totals['count'] for totals in payment_totals.values()),
+                current_payments['count'], cf_payments['count'],
+            )
         
         result = {
             'current_session': {
@@ -160,6 +123,154 @@ class AtomicFeeCalculator:
         cache.set(cache_key, result, cls.CACHE_TIMEOUT)
         return result
     
+    @classmethod
+    def calculate_balances(cls, students, chunk_size=500):
+        """
+        BATCH: {student_id: {'current', 'carry_forward', 'fines', 'total'}} balances
+        for many students, same formula as calculate_student_balance but from a
+        few grouped queries per chunk instead of several queries per student.
+        """
+        return {
+            student_id: {
+                'current': details['current_session']['balance'],
+                'carry_forward': details['carry_forward']['balance'],
+                'fines': details['fines']['unpaid'],
+                'total': details['total_balance'],
+            }
+            for student_id, details in cls.calculate_balance_details(students, chunk_size).items()
+        }
+
+    @classmethod
+    def calculate_balance_details(cls, students, chunk_size=500):
+        """BATCH: {student_id: calculate_student_balance(student)} without the per-student queries"""
+        from fines.models import FineStudent
+        from transport.models import TransportAssignment
+        from .allocations import PaymentAllocationService
+        from .fee_schedule import fee_schedule
+        from .models import PaymentAllocation
+
+        schedule = fee_schedule.get()
+
+        students = list(students)
+        balances = {}
+        for start in range(0, len(students), chunk_size):
+            chunk = students[start:start + chunk_size]
+            ids = [student.id for student in chunk]
+            payment_totals = PaymentAllocationService.totals_for_students(ids)
+            stoppages = dict(TransportAssignment.objects.filter(student__in=ids).values_list('student_id', 'stoppage_id'))
+            student_fines = {}
+            for student_id, is_paid, scope, class_section_id, amount in FineStudent.objects.filter(
+                student__in=ids
+            ).values_list('student_id', 'is_paid', 'fine__target_scope', 'fine__class_section_id', 'fine__amount'):
+                student_fines.setdefault(student_id, []).append((is_paid, scope, class_section_id, cls._to_decimal(amount)))
+
+            for student in chunk:
+                current_fees = schedule.total_for(student.class_section, stoppages.get(student.id))
+
+                totals = payment_totals[student.id]
+                fee, cf = totals[PaymentAllocation.FEE], totals[PaymentAllocation.CARRY_FORWARD]
+                current_paid, current_discount = cls._to_decimal(fee['paid']), cls._to_decimal(fee['discount'])
+                current_balance = max(current_fees - current_paid - current_discount, Decimal('0.00'))
+                cf_original = cls._to_decimal(student.due_amount)
+                cf_paid, cf_discount = cls._to_decimal(cf['paid']), cls._to_decimal(cf['discount'])
+                cf_balance = max(cf_original - cf_paid - cf_discount, Decimal('0.00'))
+
+                fines_paid = fines_unpaid = Decimal('0.00')
+                for is_paid, scope, class_section_id, amount in student_fines.get(student.id, []):
+                    if scope in ('Individual', 'All') or (scope == 'Class' and class_section_id == student.class_section_id):
+                        if is_paid:
+                            fines_paid += amount
+                        else:
+                            fines_unpaid += amount
+
+                balances[student.id] = {
+                    'current_session': {
+                        'total_fees': current_fees,
+                        'paid': current_paid,
+                        'discount': current_discount,
+                        'balance': current_balance
+                    },
+                    'carry_forward': {
+                        'total_due': cf_original,
+                        'paid': cf_paid,
+                        'discount': cf_discount,
+                        'balance': cf_balance
+                    },
+                    'fines': {
+                        'paid': fines_paid,
+                        'unpaid': fines_unpaid,
+                        'balance': fines_unpaid
+                    },
+                    'total_balance': current_balance + cf_balance + fines_unpaid
+                }
+        return balances
+
+    @classmethod
+    def warm_balance_cache(cls, students, chunk_size=500):
+        """Store freshly computed balances of many students under calculate_student_balance's cache keys"""
+        hour = timezone.now().hour
+        balances = cls.calculate_balance_details(students, chunk_size)
+        cache.set_many({
+            cls._get_cache_key('balance', student_id, hour): details
+            for student_id, details in balances.items()
+        }, cls.CACHE_TIMEOUT)
+        return balances
+
+    @classmethod
+    def payable_fees_for_students(cls, students, chunk_size=500):
+        """
+        BATCH: {student_id: get_payable_fees(student)} (without discounts) from a
+        few grouped queries per chunk. Each item also carries the FeesType or
+        Fine it pays under 'fees_type' / 'fine'.
+        """
+        from fines.models import FineStudent
+        from .allocations import PaymentAllocationService
+
+        students = list(students)
+        payable = {}
+        for start in range(0, len(students), chunk_size):
+            chunk = students[start:start + chunk_size]
+            ids = [student.id for student in chunk]
+            balances = cls.calculate_balance_details(chunk, chunk_size)
+            applicable = PaymentAllocationService._applicable_fees_by_student(chunk)
+            fee_totals = PaymentAllocationService.fee_totals(ids)
+            unpaid_fines = defaultdict(list)
+            for fs in FineStudent.objects.filter(student__in=ids, is_paid=False).select_related('fine', 'fine__fine_type'):
+                unpaid_fines[fs.student_id].append(fs.fine)
+
+            for student in chunk:
+                items = []
+                cf = balances[student.id]['carry_forward']
+                if cf['balance'] > 0:
+                    items.append({
+                        'id': 'carry_forward', 'type': 'carry_forward', 'display_name': 'Previous Session Balance',
+                        'amount': cf['total_due'], 'paid_amount': cf['paid'], 'discount_paid': cf['discount'],
+                        'payable': cf['balance'], 'fees_type': None, 'fine': None,
+                    })
+                for fee in applicable.get(student.id, []):
+                    totals = fee_totals.get((student.id, fee.id), {})
+                    paid, discount_paid = cls._to_decimal(totals.get('paid')), cls._to_decimal(totals.get('discount'))
+                    original_amount = cls._to_decimal(fee.amount)
+                    payable_amount = max(original_amount - paid - discount_paid, Decimal('0.00'))
+                    if payable_amount > 0:
+                        items.append({
+                            'id': fee.id, 'type': 'fee',
+                            'display_name': f"{fee.fee_group.group_type} - {fee.amount_type}",
+                            'amount': original_amount, 'paid_amount': paid, 'discount_paid': discount_paid,
+                            'payable': payable_amount, 'fees_type': fee, 'fine': None,
+                        })
+                for fine in unpaid_fines.get(student.id, []):
+                    if (fine.target_scope in ('Individual', 'All') or
+                            (fine.target_scope == 'Class' and fine.class_section_id == student.class_section_id)):
+                        amount = cls._to_decimal(fine.amount)
+                        items.append({
+                            'id': f"fine_{fine.id}", 'type': 'fine', 'display_name': f"Fine: {fine.fine_type.name}",
+                            'amount': amount, 'paid_amount': Decimal('0.00'), 'discount_paid': Decimal('0.00'),
+                            'payable': amount, 'fees_type': None, 'fine': fine,
+                        })
+                payable[student.id] = items
+        return payable
+
     @classmethod
     def _calculate_fine_balance(cls, student):
         """Calculate fine balance with proper filtering"""
@@ -233,40 +344,17 @@ class AtomicFeeCalculator:
                 'is_overdue': True
             })
         
-        # Current fees
+        # Current fees - payments per FeesType from their allocations
+        from .allocations import PaymentAllocationService
         applicable_fees = cls.get_applicable_fees(student)
-        from student_fees.models import FeeDeposit
+        fee_totals = PaymentAllocationService.student_fee_totals(student)
         
         for fee in applicable_fees:
             fee_name = f"{fee.fee_group.group_type} - {fee.amount_type}"
+            payment_data = fee_totals.get(fee.id, {})
             
-            # FIXED: Multiple matching strategies for payments
-            # Try exact match first
-            payment_data = FeeDeposit.objects.filter(
-                student=student,
-                note__exact=f'Fee Payment: {fee_name}'
-            ).aggregate(
-                paid=Sum('paid_amount'),
-                discount=Sum('discount')
-            )
-            
-            # If no exact match, try broader matching
-            if not payment_data['paid']:
-                payment_data = FeeDeposit.objects.filter(
-                    student=student
-                ).filter(
-                    Q(note__icontains=fee.amount_type) &
-                    Q(note__icontains=fee.fee_group.group_type)
-                ).exclude(
-                    Q(note__icontains="Fine Payment") |
-                    Q(note__icontains="Carry Forward")
-                ).aggregate(
-                    paid=Sum('paid_amount'),
-                    discount=Sum('discount')
-                )
-            
-            paid = cls._to_decimal(payment_data['paid'])
-            discount_paid = cls._to_decimal(payment_data['discount'])
+            paid = cls._to_decimal(payment_data.get('paid'))
+            discount_paid = cls._to_decimal(payment_data.get('discount'))
             original_amount = cls._to_decimal(fee.amount)
             
             # CORRECTED: Payable = Remaining amount after payments
@@ -293,16 +381,19 @@ class AtomicFeeCalculator:
                 })
             
             # Debug logging with payment matching info
-            logger.info(f"Fee {fee_name}: Original={original_amount}, Paid={paid}, Discount={discount_paid}, Payable={due_amount}")
-            logger.info(f"  Payment search: 'Fee Payment: {fee_name}' and fallback: {fee.amount_type} + {fee.fee_group.group_type}")
+            logger.debug("Fee %s: original=%s paid=%s discount=%s payable=%s",
+                         fee_name, original_amount, paid, discount_paid, payable_amount)
         
         # Unpaid fines
         cls._add_payable_fines(student, payable_fees)
         
         # Final debug log
-        logger.info(f"Total payable fees for student {student.id}: {len(payable_fees)}")
-        for fee in payable_fees:
-            logger.info(f"  {fee['display_name']}: Amount={fee['amount']}, Paid={fee['paid_amount']}, Payable={fee['payable']}, Due={fee['due']}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Payable fees for student %s: %s", student.id, "; ".join(
+                f"{fee['display_name']}: amount={fee['amount']} paid={fee['paid_amount']} "
+                f"payable={fee['payable']} due={fee['due']}"
+                for fee in payable_fees
+            ))
         
         return payable_fees
     
@@ -340,20 +431,31 @@ class AtomicFeeCalculator:
         except Exception as e:
             logger.error(f"Fine processing error: {str(e)}")
     
+    @classmethod
+    def reserve_receipt(cls, payment_data):
+        """``payment_data`` with a receipt number; call before process_payment opens its transaction"""
+        if payment_data.get('receipt_no'):
+            return payment_data
+        return {**payment_data, 'receipt_no': cls._generate_receipt_number()}
+    
     @classmethod
     @transaction.atomic
     def process_payment(cls, student, payment_data):
-        """ATOMIC: Process payment with corrected validation"""
+        """ATOMIC: Process payment with corrected validation (pass a reserve_receipt() number)"""
         try:
             from student_fees.models import FeeDeposit
             from fines.models import Fine, FineStudent
             from fees.models import FeesType
             
-            receipt_no = cls._generate_receipt_number()
+            receipt_no = payment_data.get('receipt_no') or cls._generate_receipt_number()
             if not receipt_no or len(receipt_no) < 5:
                 raise ValidationError("Failed to generate receipt number")
             
+            from .allocations import PaymentAllocationService
+            from .models import PaymentAllocation
+            
             deposits = []
+            allocation_targets = []
             total_paid = Decimal('0.00')
             
             for item in payment_data['selected_fees']:
@@ -382,9 +484,12 @@ class AtomicFeeCalculator:
                     'deposit_date': timezone.now()
                 }
                 
+                fee = fine = None
                 if fee_id == 'carry_forward':
+                    allocation_type = PaymentAllocation.CARRY_FORWARD
                     deposit_data['note'] = 'Carry Forward Payment'
                 elif fee_id.startswith('fine_'):
+                    allocation_type = PaymentAllocation.FINE
                     fine_id = int(fee_id.replace('fine_', ''))
                     fine = Fine.objects.get(id=fine_id)
                     deposit_data['note'] = f'Fine Payment: {fine.fine_type.name}'
@@ -395,10 +500,13 @@ class AtomicFeeCalculator:
                             payment_date=timezone.now().date()
                         )
                 else:
+                    allocation_type = PaymentAllocation.FEE
                     fee = FeesType.objects.get(id=fee_id)
                     deposit_data['note'] = f'Fee Payment: {fee.fee_group.group_type} - {fee.amount_type}'
                 
-                deposits.append(FeeDeposit(**deposit_data))
+                deposit = FeeDeposit(**deposit_data)
+                deposits.append(deposit)
+                allocation_targets.append((deposit, allocation_type, fee, fine))
                 total_paid += paid_amount
             
             # Bulk create with validation
@@ -406,9 +514,13 @@ class AtomicFeeCalculator:
                 deposit.full_clean()
             
             FeeDeposit.objects.bulk_create(deposits)
+            PaymentAllocationService.record(allocation_targets)
             
             # Clear cache
             cls._clear_student_cache(student)
+
+            from student_fees.services import ReceiptSnapshotService
+            ReceiptSnapshotService.capture_on_commit(receipt_no)
             
             return {
                 'success': True,
@@ -424,10 +536,8 @@ class AtomicFeeCalculator:
     @classmethod
     def _generate_receipt_number(cls):
         """Generate unique receipt number"""
-        import uuid
-        timestamp = timezone.now().strftime("%Y%m%d%H%M%S")
-        unique_id = uuid.uuid4().hex[:8].upper()
-        return f"RCP{timestamp}{unique_id}"
+        from .receipts import ReceiptNumberService
+        return ReceiptNumberService.next_number()
     
     @classmethod
     def _clear_student_cache(cls, student):
@@ -443,6 +553,14 @@ class AtomicFeeCalculator:
             cache_key = cls._get_cache_key('balance', student.id, hour)
             cache.delete(cache_key)
     
+    @classmethod
+    def clear_students_cache(cls, student_ids):
+        """Drop the cached balances of many students with one cache call"""
+        cache.delete_many([
+            cls._get_cache_key('balance', student_id, hour)
+            for student_id in student_ids for hour in range(24)
+        ])
+    
     @classmethod
     def calculate_partial_payment_due(cls, original_amount, paid_amount, discount_paid, custom_payable=None, current_discount=0):
         """Calculate due amount for partial payments - matches JS logic"""
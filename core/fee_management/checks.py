@@ -0,0 +1,32 @@
+# core/fee_management/checks.py
+"""
+Balances are aggregated over PaymentAllocation, so a deposit without one is
+missing from every balance. ``manage.py check --database default`` (and
+``migrate``) warns about such deposits.
+"""
+
+from django.core.checks import Tags, Warning, register
+from django.db import DatabaseError
+
+
+@register(Tags.database)
+def check_unallocated_deposits(app_configs=None, databases=None, **kwargs):
+    if not databases:
+        return []
+    from student_fees.models import FeeDeposit
+
+    errors = []
+    for alias in databases:
+        try:
+            count = FeeDeposit.objects.using(alias).filter(
+                allocations__isnull=True
+            ).exclude(receipt_no__startswith='AUTO-').count()
+        except DatabaseError:  # Tables not created yet
+            continue
+        if count:
+            errors.append(Warning(
+                f"{count} fee deposit(s) in '{alias}' have no payment allocation and are missing from balances.",
+                hint="Run 'python manage.py backfill_payment_allocations'.",
+                id='fee_management.W001',
+            ))
+    return errors
@@ -44,4 +44,4 @@ CACHE_TIMEOUT_LONG = 3600  # 1 hour
 
 # Receipt settings
 RECEIPT_PREFIX = 'REC'
-RECEIPT_NUMBER_LENGTH = 4
\ No newline at end of file
+RECEIPT_NUMBER_LENGTH = 5
\ No newline at end of file
@@ -0,0 +1,144 @@
+# core/fee_management/fee_schedule.py
+"""
+Compiled fee schedule
+
+Fee structures are stored as exploded FeesType rows (one per month x class or
+month x stoppage) matched to students by class name, so every balance used to
+start with its own FeesType queries. FeeScheduleIndex loads all FeesType rows
+once and compiles them into:
+
+- class name (lower-cased) -> general fees plus the class's fees, with total
+- stoppage -> transport fees, with total
+
+The compiled schedule is held in process memory and tagged with the
+'fee_schedule' data version stamp, which is stored in the database (see
+core/response_cache.py). Saving or deleting a FeesType, FeesGroup,
+ClassSection or Stoppage bumps the stamp in the same transaction (see
+signals.py); every process compares stamps on lookup and recompiles when they
+differ, and a rollback restores the old stamp along with the old fees.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from django.db import DEFAULT_DB_ALIAS
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+
+
+@dataclass(frozen=True)
+class FeeSchedule:
+    """One compiled version of the fee structure; treat it as read-only"""
+
+    version: str
+    general: tuple = ()
+    by_class: dict = field(default_factory=dict)
+    by_stoppage: dict = field(default_factory=dict)
+    general_total: Decimal = ZERO
+    class_totals: dict = field(default_factory=dict)
+    stoppage_totals: dict = field(default_factory=dict)
+
+    def class_fees(self, class_name):
+        """General fees plus the fees of ``class_name`` (case-insensitive), in id order"""
+        if not class_name:
+            return self.general
+        return self.by_class.get(class_name.lower(), self.general)
+
+    def class_total(self, class_name):
+        if not class_name:
+            return self.general_total
+        return self.class_totals.get(class_name.lower(), self.general_total)
+
+    def transport_fees(self, stoppage_id):
+        return self.by_stoppage.get(stoppage_id, ())
+
+    def transport_total(self, stoppage_id):
+        return self.stoppage_totals.get(stoppage_id, ZERO)
+
+    def fees_for(self, class_section, stoppage_id=None):
+        """Applicable fees of a student in ``class_section`` riding from ``stoppage_id``"""
+        if not class_section:
+            return list(self.general)
+        return list(self.class_fees(class_section.display_name)) + list(self.transport_fees(stoppage_id))
+
+    def total_for(self, class_section, stoppage_id=None):
+        if not class_section:
+            return self.general_total
+        return self.class_total(class_section.display_name) + self.transport_total(stoppage_id)
+
+
+class FeeScheduleIndex:
+    """Process-wide compiled fee schedule, recompiled when its version stamp moves"""
+
+    VERSION_KEY = 'fee_schedule'
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self._lock = threading.Lock()
+        self._schedule = None
+
+    def version(self):
+        """The current stamp, shared by every process through the database"""
+        from core.response_cache import data_versions
+        return data_versions.get(self.VERSION_KEY)[self.VERSION_KEY]
+
+    def get(self):
+        """The compiled schedule for the current version"""
+        version = self.version()
+        schedule = self._schedule
+        if schedule is not None and schedule.version == version:
+            return schedule
+        with self._lock:
+            schedule = self._schedule
+            if schedule is None or schedule.version != version:
+                schedule = self.compile(version)
+                self._schedule = schedule
+        return schedule
+
+    @staticmethod
+    def compile(version):
+        """Load every FeesType once and group it by class name and stoppage"""
+        from fees.models import FeesType
+
+        general, by_class, by_stoppage = [], {}, {}
+        for fee in FeesType.objects.select_related('fee_group').order_by('id'):
+            if fee.fee_group.group_type == 'Transport':
+                if fee.related_stoppage_id:
+                    by_stoppage.setdefault(fee.related_stoppage_id, []).append(fee)
+            elif not fee.class_name:
+                general.append(fee)
+            else:
+                by_class.setdefault(fee.class_name.lower(), []).append(fee)
+
+        general_total = sum((Decimal(str(fee.amount)) for fee in general), ZERO)
+        class_fees, class_totals = {}, {}
+        for name, fees in by_class.items():
+            class_fees[name] = tuple(sorted(general + fees, key=lambda fee: fee.id))
+            class_totals[name] = general_total + sum((Decimal(str(fee.amount)) for fee in fees), ZERO)
+
+        schedule = FeeSchedule(
+            version=version,
+            general=tuple(general),
+            by_class=class_fees,
+            by_stoppage={stoppage: tuple(fees) for stoppage, fees in by_stoppage.items()},
+            general_total=general_total,
+            class_totals=class_totals,
+            stoppage_totals={
+                stoppage: sum((Decimal(str(fee.amount)) for fee in fees), ZERO)
+                for stoppage, fees in by_stoppage.items()
+            },
+        )
+        logger.debug(f"Compiled fee schedule {version}: {len(class_fees)} classes, {len(by_stoppage)} stoppages")
+        return schedule
+
+    def invalidate(self):
+        """Drop this process's copy and bump the stamp so every process recompiles"""
+        from core.response_cache import data_versions
+        self._schedule = None
+        data_versions.touch(self.VERSION_KEY)
+
+
+fee_schedule = FeeScheduleIndex()
@@ -0,0 +1,107 @@
+# core/fee_management/fine_application.py
+"""
+Set-based fine application
+
+Class and school-wide fines are linked to their students in a fixed number
+of queries: one annotated query picks the eligible students (optionally only
+those who have not paid the fine's fee type), FineStudent rows are
+bulk-inserted, and the affected students are queued for one balance
+recalculation at commit (see recalculation.py). Fine.save, FeeManagementService.apply_class_fine and the
+process_due_fines task all go through apply().
+"""
+
+from decimal import Decimal
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+import logging
+
+from .models import PaymentAllocation
+
+logger = logging.getLogger(__name__)
+
+
+class FineApplicationService:
+    """Link fines to students in bulk and refresh their balances once"""
+
+    BATCH_SIZE = 500
+    BULK_SCOPES = ('Class', 'All')
+
+    @classmethod
+    def eligible_students(cls, fine):
+        """Students a Class/All fine applies to, in one annotated query"""
+        from students.models import Student
+
+        if fine.target_scope == 'Class' and fine.class_section_id:
+            students = Student.objects.filter(class_section_id=fine.class_section_id)
+        elif fine.target_scope == 'All':
+            students = Student.objects.all()
+        else:
+            return Student.objects.none()
+
+        if fine.fees_type_id:
+            # Only students who have not paid the fee type in full
+            paid = PaymentAllocation.objects.filter(
+                student=OuterRef('pk'),
+                allocation_type=PaymentAllocation.FEE,
+                fees_type_id=fine.fees_type_id,
+            ).values('student').annotate(total=Sum('allocated_amount')).values('total')
+            students = students.annotate(
+                fee_paid=Coalesce(Subquery(paid), Value(Decimal('0.00')), output_field=DecimalField())
+            ).filter(fee_paid__lt=fine.fees_type.amount)
+        return students
+
+    @classmethod
+    def apply(cls, fine, students=None):
+        """
+        Link ``fine`` to ``students`` (default: eligible_students) that do not
+        have it yet. Returns the ids of the newly fined students.
+        """
+        from fines.models import FineStudent
+
+        if students is None:
+            students = cls.eligible_students(fine)
+        if hasattr(students, 'values_list'):
+            candidate_ids = set(students.values_list('id', flat=True))
+        else:
+            candidate_ids = {getattr(student, 'id', student) for student in students}
+        if not candidate_ids:
+            return []
+
+        already_fined = set(FineStudent.objects.filter(fine=fine).values_list('student_id', flat=True))
+        new_ids = sorted(candidate_ids - already_fined)
+        FineStudent.objects.bulk_create(
+            [FineStudent(fine=fine, student_id=student_id, is_paid=False) for student_id in new_ids],
+            batch_size=cls.BATCH_SIZE,
+            ignore_conflicts=True,  # A concurrent run may have linked some already
+        )
+        cls.refresh_students(new_ids)
+        logger.info(f"Applied fine {fine.id} ({fine.target_scope}) to {len(new_ids)} students")
+        return new_ids
+
+    @classmethod
+    def refresh_students(cls, student_ids):
+        """Queue the given students' balances for one recalculation at commit"""
+        from .recalculation import due_recalc_queue
+
+        due_recalc_queue.mark_dirty(student_ids)
+
+    @classmethod
+    def apply_due(cls, today=None):
+        """
+        Apply every Class/All fine whose due date has passed to the eligible
+        students that do not have it yet (new admissions, fees still unpaid).
+        Returns {fine_id: students fined}.
+        """
+        from fines.models import Fine
+
+        today = today or timezone.localdate()
+        applied = {}
+        fines = Fine.objects.filter(
+            target_scope__in=cls.BULK_SCOPES, due_date__lte=today
+        ).select_related('fees_type')
+        for fine in fines:
+            new_ids = cls.apply(fine)
+            if new_ids:
+                applied[fine.id] = len(new_ids)
+        return applied
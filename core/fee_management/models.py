@@ -50,13 +50,42 @@ class AppliedFine(BaseModel):
         return f"{self.student} - {self.fine_template.name} (₹{self.amount})"
 
 class PaymentAllocation(BaseModel):
-    """Track how payments are allocated to fees and fines"""
+    """Track how payments are allocated to fees, fines and carry forward"""
+    FEE = 'fee'
+    FINE = 'fine'
+    CARRY_FORWARD = 'carry_forward'
+    ALLOCATION_TYPES = [
+        (FEE, 'Fee'),
+        (FINE, 'Fine'),
+        (CARRY_FORWARD, 'Carry Forward'),
+    ]
+
     fee_deposit = models.ForeignKey('student_fees.FeeDeposit', on_delete=models.CASCADE, related_name='allocations')
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, null=True, blank=True, related_name='payment_allocations')
+    allocation_type = models.CharField(max_length=20, choices=ALLOCATION_TYPES, default=FEE)
+    fees_type = models.ForeignKey('fees.FeesType', on_delete=models.SET_NULL, null=True, blank=True, related_name='payment_allocations')
+    fine = models.ForeignKey('fines.Fine', on_delete=models.SET_NULL, null=True, blank=True, related_name='payment_allocations')
     student_fee = models.ForeignKey(StudentFee, on_delete=models.CASCADE, null=True, blank=True)
     applied_fine = models.ForeignKey(AppliedFine, on_delete=models.CASCADE, null=True, blank=True)
     allocated_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     allocation_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'allocation_type']),
+            models.Index(fields=['student', 'fees_type']),
+            models.Index(fields=['fine', 'student']),
+        ]
+
+    def __str__(self):
+        target = self.fees_type or self.fine or self.student_fee or self.applied_fine or self.get_allocation_type_display()
+        return f"₹{self.allocated_amount} → {target}"
+
+class ReceiptSequence(BaseModel):
+    """Last receipt number issued under a prefix (e.g. one row per year)"""
+    prefix = models.CharField(max_length=40, unique=True)
+    last_number = models.PositiveBigIntegerField(default=0)
+
     def __str__(self):
-        target = self.student_fee or self.applied_fine
-        return f"₹{self.allocated_amount} → {target}"
\ No newline at end of file
+        return f"{self.prefix}: {self.last_number}"
@@ -124,35 +124,8 @@ class PaymentProcessor:
     
     def _generate_receipt_number(self):
         """Generate secure unique receipt number"""
-        from student_fees.models import FeeDeposit
-        import uuid
-        
-        try:
-            # Get current year
-            year = timezone.now().year
-            
-            # Get next sequence number with error handling
-            last_receipt = FeeDeposit.objects.filter(
-                receipt_no__startswith=f'REC{year}'
-            ).order_by('-id').first()
-            
-            if last_receipt:
-                try:
-                    last_num = int(last_receipt.receipt_no[-4:])
-                    next_num = last_num + 1
-                except (ValueError, IndexError):
-                    next_num = 1
-            else:
-                next_num = 1
-            
-            # Add UUID for additional uniqueness and security
-            unique_suffix = uuid.uuid4().hex[:4].upper()
-            return f'REC{year}{next_num:04d}{unique_suffix}'
-            
-        except Exception as e:
-            logger.error(f"Error generating receipt number: {sanitize_input(str(e))}")
-            # Fallback to UUID-based receipt number
-            return f'REC{timezone.now().year}{uuid.uuid4().hex[:8].upper()}'
+        from .receipts import ReceiptNumberService
+        return ReceiptNumberService.next_number()
     
     def get_payment_history(self, student, limit=10):
         """Get payment history for student"""
@@ -0,0 +1,124 @@
+# core/fee_management/recalculation.py
+"""
+Deferred due-amount recalculation
+
+Writes that change what a student owes (fines applied or removed, payments,
+promotions) mark the student dirty instead of recalculating on the spot.
+Dirty students are collected in a set, so a student touched many times by one
+bulk operation is recalculated once, and the set is flushed when the current
+transaction commits: cached summaries and balances are dropped with one cache
+call and the balances are recomputed in a few grouped queries for all of them.
+
+Outside a transaction ``mark_dirty`` flushes immediately, as
+``Student.update_due_amount`` always did; wrap a loop in ``deferred()`` to
+coalesce it. With DUE_RECALC_ASYNC the recomputation is handed to the
+``recalculate_due_amounts`` Celery task; caches are still cleared at commit.
+"""
+
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DueRecalculationQueue:
+    """Coalesce students whose balances changed and recalculate them once"""
+
+    BATCH_SIZE = 500
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self._local = threading.local()
+
+    def _state(self):
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = set()
+            self._local.depth = 0
+        return self._local
+
+    def _schedule_flush(self):
+        """Flush at commit when inside a transaction, right away otherwise"""
+        connection = transaction.get_connection(self.using)
+        if not connection.in_atomic_block:
+            self.flush()
+        elif not any(entry[1] == self.flush for entry in connection.run_on_commit):
+            # One flush per transaction; registered again if a rollback dropped it
+            transaction.on_commit(self.flush, using=self.using)
+
+    def mark_dirty(self, students):
+        """Queue students (instances or ids) for recalculation at commit"""
+        ids = {getattr(student, 'pk', student) for student in students}
+        ids.discard(None)
+        if not ids:
+            return
+        state = self._state()
+        state.pending.update(ids)
+        if not state.depth:  # Otherwise flushed when the outermost deferred() exits
+            self._schedule_flush()
+
+    @contextmanager
+    def deferred(self):
+        """Hold flushes until the block exits (or its transaction commits)"""
+        state = self._state()
+        state.depth += 1
+        try:
+            yield self
+        finally:
+            state.depth -= 1
+        if not state.depth and state.pending:
+            self._schedule_flush()
+
+    def discard(self):
+        """Forget queued students without recalculating them"""
+        self._state().pending.clear()
+
+    def flush(self):
+        """Recalculate every queued student; returns how many were flushed"""
+        state = self._state()
+        student_ids = sorted(state.pending)
+        state.pending.clear()
+        if not student_ids:
+            return 0
+
+        if getattr(settings, 'DUE_RECALC_ASYNC', False):
+            self.recalculate(student_ids, warm=False)
+            try:
+                from .tasks import recalculate_due_amounts
+                recalculate_due_amounts.delay(student_ids)
+            except Exception as e:
+                logger.warning(f"Could not queue due recalculation, running inline: {e}")
+                self.recalculate(student_ids)
+        else:
+            self.recalculate(student_ids)
+        return len(student_ids)
+
+    @classmethod
+    def recalculate(cls, student_ids, warm=True):
+        """Drop cached data of the students and recompute their balances in bulk"""
+        from core.response_cache import data_versions
+        from students.models import Student
+        from .calculators import AtomicFeeCalculator
+
+        student_ids = list(student_ids)
+        data_versions.touch('fees')  # Cached pages show the balances
+        warm = warm and getattr(settings, 'DUE_RECALC_WARM_BALANCES', True)
+        recalculated = 0
+        for start in range(0, len(student_ids), cls.BATCH_SIZE):
+            chunk = student_ids[start:start + cls.BATCH_SIZE]
+            students = list(Student.objects.all_statuses().filter(id__in=chunk))
+            Student.invalidate_cache_many(students)
+            AtomicFeeCalculator.clear_students_cache(chunk)
+            if warm and students:
+                try:
+                    AtomicFeeCalculator.warm_balance_cache(students, cls.BATCH_SIZE)
+                except Exception as e:
+                    logger.error(f"Balance recalculation failed for {len(students)} students: {e}")
+            recalculated += len(students)
+        logger.info(f"Recalculated due amounts of {recalculated} students")
+        return recalculated
+
+
+due_recalc_queue = DueRecalculationQueue()
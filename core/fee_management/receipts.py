@@ -0,0 +1,65 @@
+# core/fee_management/receipts.py
+"""
+Receipt number sequence
+
+Every receipt number comes from a ReceiptSequence counter row, one per
+prefix (by default one per year, e.g. REC-2025-00042). Numbers are taken
+with a single atomic ``UPDATE ... SET last_number = last_number + n``, so
+concurrent cashiers never get the same number and nobody probes or retries.
+Bulk imports reserve a block of numbers in one call. A number taken by a
+payment that later fails is not reused, so receipts can have gaps.
+
+Allocate before opening the payment transaction: inside it the counter row
+stays locked until that transaction commits.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+import logging
+
+from .constants import RECEIPT_PREFIX, RECEIPT_NUMBER_LENGTH
+from .models import ReceiptSequence
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptNumberService:
+    """Issue unique receipt numbers from per-prefix counters"""
+
+    @classmethod
+    def prefix(cls, on=None):
+        """Sequence prefix for a date, from RECEIPT_SEQUENCE_PREFIX ({year}, {school})"""
+        on = on or timezone.localdate()
+        template = getattr(settings, 'RECEIPT_SEQUENCE_PREFIX', f'{RECEIPT_PREFIX}-{{year}}')
+        return template.format(year=on.year, school=getattr(settings, 'RECEIPT_SCHOOL_CODE', ''))
+
+    @staticmethod
+    def format(prefix, number):
+        return f"{prefix}-{number:0{RECEIPT_NUMBER_LENGTH}d}"
+
+    @classmethod
+    def allocate_block(cls, count, prefix=None):
+        """Reserve ``count`` consecutive receipt numbers and return them"""
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        prefix = prefix or cls.prefix()
+
+        with transaction.atomic():
+            # UPDATE first so the write lock is taken before anything is read
+            sequence = ReceiptSequence.objects.filter(prefix=prefix)
+            if not sequence.update(last_number=F('last_number') + count, updated_at=timezone.now()):
+                ReceiptSequence.objects.get_or_create(prefix=prefix)
+                sequence.update(last_number=F('last_number') + count, updated_at=timezone.now())
+            last = sequence.values_list('last_number', flat=True).get()
+
+        first = last - count + 1
+        if count > 1:
+            logger.info(f"Reserved receipts {cls.format(prefix, first)}..{cls.format(prefix, last)}")
+        return [cls.format(prefix, number) for number in range(first, last + 1)]
+
+    @classmethod
+    def next_number(cls, prefix=None):
+        """Issue one receipt number"""
+        return cls.allocate_block(1, prefix)[0]
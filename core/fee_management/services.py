@@ -10,6 +10,10 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.utils.html import escape
 from core.security_utils import sanitize_input
+from .allocations import PaymentAllocationService
+from .fine_application import FineApplicationService
+from .recalculation import due_recalc_queue
+from .models import PaymentAllocation
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,8 +31,7 @@ class FeeManagementService:
         Fixes the issue where fines are applied to all students instead of specific class
         """
         try:
-            from fines.models import Fine, FineStudent
-            from students.models import Student
+            from fines.models import Fine
             
             # Validate required data
             class_section_id = fine_data.get('class_section_id')
@@ -53,7 +56,7 @@ class FeeManagementService:
                 }
             
             # Create the fine record
-            fine = Fine.objects.create(
+            fine = Fine(
                 class_section=class_section,
                 fine_type_id=fine_type_id,
                 fees_type_id=fees_type_id,
@@ -63,33 +66,11 @@ class FeeManagementService:
                 target_scope='Class',
                 created_by=fine_data.get('created_by')
             )
+            fine.save(apply_to_students=False)
             
-            # CRITICAL FIX: Only get students from the SPECIFIC class section
-            if fees_type_id:
-                # If fees_type is specified, get students who haven't paid that specific fee type
-                # AND are in the specified class section
-                students_with_unpaid_fees = self._get_students_with_unpaid_fees(
-                    class_section=class_section,
-                    fees_type_id=fees_type_id
-                )
-            else:
-                # If no specific fees_type, apply to all students in the class section
-                students_with_unpaid_fees = Student.objects.filter(
-                    class_section=class_section
-                )
-            
-            # Apply fine to filtered students
-            fine_students_created = []
-            for student in students_with_unpaid_fees:
-                fine_student, created = FineStudent.objects.get_or_create(
-                    fine=fine,
-                    student=student,
-                    defaults={'is_paid': False}
-                )
-                if created:
-                    fine_students_created.append(fine_student)
-                    # Update student due amount
-                    student.update_due_amount()
+            # CRITICAL FIX: Only students from the SPECIFIC class section - and, if
+            # fees_type is specified, only those who haven't paid that fee type
+            fine_students_created = FineApplicationService.apply(fine)
             
             logger.info(
                 f"Applied fine '{fine.fine_type.name}' (₹{fine.amount}) to "
@@ -117,34 +98,15 @@ class FeeManagementService:
         This is the core fix for the fine application issue
         """
         try:
-            from students.models import Student
-            from student_fees.models import FeeDeposit
             from fees.models import FeesType
+            from fines.models import Fine
             
-            # Get the specific fees type
             fees_type = FeesType.objects.get(id=fees_type_id)
             
-            # Get all students in the specified class section
-            class_students = Student.objects.filter(
-                class_section=class_section
-            )
-            
-            # Filter students who haven't paid this specific fee type
-            students_with_unpaid_fees = []
-            
-            for student in class_students:
-                # Check if student has paid this specific fee type
-                # Note: FeeDeposit model doesn't have fees_type field, using note field instead
-                paid_amount = FeeDeposit.objects.filter(
-                    student=student,
-                    note__icontains=fees_type.display_format
-                ).aggregate(
-                    total_paid=Sum('paid_amount')
-                )['total_paid'] or Decimal('0')
-                
-                # If paid amount is less than fee amount, student has unpaid fees
-                if paid_amount < fees_type.amount:
-                    students_with_unpaid_fees.append(student)
+            # Same eligibility query the fine applicator uses
+            students_with_unpaid_fees = list(FineApplicationService.eligible_students(
+                Fine(target_scope='Class', class_section=class_section, fees_type=fees_type)
+            ))
             
             logger.info(
                 f"Found {len(students_with_unpaid_fees)} students in {class_section.display_name} "
@@ -291,22 +253,24 @@ class FeeManagementService:
             removed_count = 0
             kept_count = 0
             
-            for fine_student in fine_students:
-                student = fine_student.student
-                
-                # If student is not in the intended class, remove the fine
-                if student.class_section != intended_class:
-                    logger.info(
-                        f"Removing fine from {student.admission_number} "
-                        f"({student.class_section.display_name if student.class_section else 'No Class'}) "
-                        f"- not in intended class {intended_class.display_name}"
-                    )
-                    fine_student.delete()
-                    # Update student due amount
-                    student.update_due_amount()
-                    removed_count += 1
-                else:
-                    kept_count += 1
+            # Students are recalculated once, after the loop
+            with due_recalc_queue.deferred():
+                for fine_student in fine_students:
+                    student = fine_student.student
+
+                    # If student is not in the intended class, remove the fine
+                    if student.class_section != intended_class:
+                        logger.info(
+                            f"Removing fine from {student.admission_number} "
+                            f"({student.class_section.display_name if student.class_section else 'No Class'}) "
+                            f"- not in intended class {intended_class.display_name}"
+                        )
+                        fine_student.delete()
+                        # Update student due amount
+                        student.update_due_amount()
+                        removed_count += 1
+                    else:
+                        kept_count += 1
             
             return {
                 'success': True,
@@ -365,13 +329,10 @@ class FeeManagementService:
                     'unpaid_students': []
                 }
                 
+                paid_totals = PaymentAllocationService.fee_totals(students, [fees_type.id])
+                
                 for student in students:
-                    paid_amount = FeeDeposit.objects.filter(
-                        student=student,
-                        note__icontains=fees_type.display_format
-                    ).aggregate(
-                        total_paid=Sum('paid_amount')
-                    )['total_paid'] or Decimal('0')
+                    paid_amount = paid_totals.get((student.id, fees_type.id), {}).get('paid', Decimal('0'))
                     
                     if paid_amount >= fees_type.amount:
                         class_stats['students_paid'] += 1
@@ -425,12 +386,13 @@ class FeeManagementService:
                     Q(class_name__isnull=True) | Q(class_name__iexact=class_name)
                 )
                 
+                paid_fee_ids = {
+                    fees_type_id for (_, fees_type_id) in PaymentAllocationService.fee_totals([student.id])
+                }
+                
                 for fee_type in applicable_fees:
                     # Check if student already has this fee assigned
-                    existing_deposit = FeeDeposit.objects.filter(
-                        student=student,
-                        note__icontains=fee_type.display_format
-                    ).first()
+                    existing_deposit = fee_type.id in paid_fee_ids
                     
                     if not existing_deposit:
                         # Skip creating auto-deposit records to avoid receipt validation errors
@@ -457,12 +419,9 @@ class FeeManagementService:
                         # Check if student meets the criteria for this fine
                         if fine.fees_type:
                             # Fine is for unpaid fees - check if student has unpaid fees
-                            paid_amount = FeeDeposit.objects.filter(
-                                student=student,
-                                note__icontains=fine.fees_type.display_format
-                            ).aggregate(
-                                total_paid=Sum('paid_amount')
-                            )['total_paid'] or Decimal('0')
+                            paid_amount = PaymentAllocationService.fee_totals(
+                                [student.id], [fine.fees_type_id]
+                            ).get((student.id, fine.fees_type_id), {}).get('paid', Decimal('0'))
                             
                             if paid_amount < fine.fees_type.amount:
                                 # Student has unpaid fees, apply the fine
@@ -569,11 +528,14 @@ class FeeManagementService:
                 }
             }
             
+            # Fee payments per FeesType, from their allocations
+            fee_totals = PaymentAllocationService.student_fee_totals(student)
+            
             # 1. Carry Forward Amount
             if hasattr(student, 'due_amount') and student.due_amount > 0:
-                cf_deposits = FeeDeposit.objects.filter(
-                    student=student,
-                    note__icontains="Carry Forward"
+                cf_deposits = PaymentAllocationService.deposits_of_type(
+                    FeeDeposit.objects.filter(student=student),
+                    PaymentAllocation.CARRY_FORWARD
                 ).aggregate(
                     total_cf=Sum('amount'),
                     paid_cf=Sum('paid_amount')
@@ -602,18 +564,11 @@ class FeeManagementService:
                 ).exclude(fee_group__group_type="Transport")
                 
                 for fee_type in applicable_fees:
-                    # Use fee name pattern matching like fallback service
                     fee_name = f"{fee_type.fee_group.group_type} - {fee_type.amount_type}"
-                    paid_amount = FeeDeposit.objects.filter(
-                        student=student,
-                        note__icontains=fee_name
-                    ).aggregate(
-                        total_paid=Sum('paid_amount'),
-                        total_discount=Sum('discount')
-                    )
+                    paid_amount = fee_totals.get(fee_type.id, {})
                     
-                    total_paid = paid_amount.get('total_paid') or Decimal('0')
-                    total_discount = paid_amount.get('total_discount') or Decimal('0')
+                    total_paid = paid_amount.get('paid', Decimal('0'))
+                    total_discount = paid_amount.get('discount', Decimal('0'))
                     pending = fee_type.amount - total_paid - total_discount
                     
                     if pending > 0:
@@ -643,12 +598,7 @@ class FeeManagementService:
                     )
                     
                     for fee_type in transport_fees:
-                        paid_amount = FeeDeposit.objects.filter(
-                            student=student,
-                            note__icontains=fee_type.display_format
-                        ).aggregate(
-                            total_paid=Sum('paid_amount')
-                        )['total_paid'] or Decimal('0')
+                        paid_amount = fee_totals.get(fee_type.id, {}).get('paid', Decimal('0'))
                         
                         pending = fee_type.amount - paid_amount
                         if pending > 0:
@@ -0,0 +1,39 @@
+# core/fee_management/signals.py
+"""Keep PaymentAllocation in step with FeeDeposit rows saved one at a time,
+and the compiled fee schedule in step with the fee structure"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender='student_fees.FeeDeposit')
+def allocate_saved_deposit(sender, instance, created, raw=False, **kwargs):
+    """
+    bulk_create callers record their own allocations; this covers .save()
+    writers. FeeDeposit.save runs in a transaction, so a failure here rolls
+    the deposit back instead of leaving it out of every balance.
+    """
+    if raw:
+        return
+    from .allocations import PaymentAllocationService
+    if created:
+        PaymentAllocationService.allocate_deposits([instance])
+    else:
+        PaymentAllocationService.sync_deposit(instance)
+
+
+@receiver(post_save, sender='fees.FeesType')
+@receiver(post_delete, sender='fees.FeesType')
+@receiver(post_save, sender='fees.FeesGroup')
+@receiver(post_delete, sender='fees.FeesGroup')
+@receiver(post_save, sender='subjects.ClassSection')
+@receiver(post_delete, sender='subjects.ClassSection')
+@receiver(post_save, sender='transport.Stoppage')
+@receiver(post_delete, sender='transport.Stoppage')
+def invalidate_fee_schedule(sender, **kwargs):
+    """Recompile the fee schedule after any change to what it is built from"""
+    from .fee_schedule import fee_schedule
+    fee_schedule.invalidate()
@@ -0,0 +1,13 @@
+# core/fee_management/tasks.py - Background fee jobs
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def recalculate_due_amounts(student_ids):
+    """Recompute balances of students flushed by the due recalculation queue"""
+    from .recalculation import DueRecalculationQueue
+    
+    count = DueRecalculationQueue.recalculate(student_ids)
+    return f"Recalculated due amounts of {count} students"
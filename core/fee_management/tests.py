@@ -0,0 +1,142 @@
+# core/fee_management/tests.py
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.db import OperationalError, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core.benchmark_school import BenchmarkSchoolBuilder
+from core.fee_management.recalculation import DueRecalculationQueue, due_recalc_queue
+from students.models import Student
+
+
+class DueRecalculationQueueTests(TestCase):
+    """Students marked dirty many times in one transaction are recalculated once, at commit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=12, classes=2, sections_per_class=1, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+        cls.ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        due_recalc_queue.discard()
+        patcher = mock.patch.object(DueRecalculationQueue, 'recalculate')
+        self.recalculate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def recalculated(self):
+        return [list(call.args[0]) for call in self.recalculate.call_args_list]
+
+    def test_marks_are_coalesced_until_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for _ in range(3):
+                due_recalc_queue.mark_dirty(self.ids[:4])
+            due_recalc_queue.mark_dirty(Student.objects.filter(id__in=self.ids[2:6]))
+            self.assertEqual(self.recalculated(), [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.recalculated(), [self.ids[:6]])
+
+    def test_deferred_block_flushes_once_on_exit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with due_recalc_queue.deferred():
+                for student_id in self.ids:
+                    due_recalc_queue.mark_dirty([student_id])
+                self.assertEqual(callbacks, [])
+        self.assertEqual(self.recalculated(), [self.ids])
+
+    def test_class_fine_recalculates_its_students_once(self):
+        from fines.models import Fine, FineType
+
+        section = Student.objects.get(id=self.ids[0]).class_section
+        class_ids = sorted(Student.objects.filter(class_section=section).values_list('id', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Fine.objects.create(
+                    fine_type=FineType.objects.create(name='Uniform', category='Discipline'),
+                    amount=Decimal('25'), reason='Uniform', target_scope='Class',
+                    class_section=section, due_date=timezone.localdate(),
+                )
+        self.assertEqual(self.recalculated(), [class_ids])
+
+
+class ReceiptNumberTests(TransactionTestCase):
+    """Receipt numbers from the per-prefix counter are unique and gap-free under concurrency"""
+
+    THREADS = 8
+    PER_THREAD = 25
+
+    def test_concurrent_cashiers_get_distinct_numbers(self):
+        from django.db import connection
+        from core.fee_management.receipts import ReceiptNumberService
+
+        barrier = threading.Barrier(self.THREADS)
+        issued, errors = [], []
+
+        def take():
+            # The in-memory test database reports lock conflicts instead of
+            # waiting like a file database's busy timeout; the failed
+            # transaction rolled back, so try again
+            while True:
+                try:
+                    return ReceiptNumberService.next_number(prefix='REC-TEST')
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    time.sleep(0.001)
+
+        def cashier():
+            try:
+                barrier.wait()
+                for _ in range(self.PER_THREAD):
+                    issued.append(take())
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cashier) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.PER_THREAD
+        self.assertEqual(len(set(issued)), total)
+        self.assertEqual(sorted(issued), [ReceiptNumberService.format('REC-TEST', n) for n in range(1, total + 1)])
+
+    def test_block_reservation_continues_the_sequence(self):
+        from core.fee_management.receipts import ReceiptNumberService
+
+        first = ReceiptNumberService.next_number(prefix='REC-BLOCK')
+        block = ReceiptNumberService.allocate_block(3, prefix='REC-BLOCK')
+        self.assertEqual([first] + block, [ReceiptNumberService.format('REC-BLOCK', n) for n in range(1, 5)])
+        self.assertRaises(ValueError, ReceiptNumberService.allocate_block, 0, prefix='REC-BLOCK')
+
+    def test_payments_take_their_number_before_the_transaction_opens(self):
+        from django.db import connection
+        from core.fee_management.calculators import AtomicFeeCalculator
+        from core.fee_management.receipts import ReceiptNumberService
+        from student_fees.services import PaymentProcessingService
+
+        BenchmarkSchoolBuilder(students=2, classes=1, sections_per_class=1, attendance_days=1,
+                               routes=1, stoppages_per_route=1).build()
+        student = Student.objects.order_by('id').first()
+        fee = next(item for item in AtomicFeeCalculator.get_payable_fees(student, False) if item['type'] != 'fine')
+        next_number = ReceiptNumberService.next_number
+        in_transaction = []
+
+        def take(*args, **kwargs):
+            in_transaction.append(connection.in_atomic_block)
+            return next_number(*args, **kwargs)
+
+        with mock.patch.object(ReceiptNumberService, 'next_number', side_effect=take):
+            result = PaymentProcessingService.process_payment(student, {
+                'selected_fees': [{'id': str(fee['id']), 'amount': fee['payable']}], 'payment_mode': 'Cash',
+            })
+        self.assertTrue(result['success'])
+        self.assertEqual(in_transaction, [False])
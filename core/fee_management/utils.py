@@ -4,24 +4,14 @@
 from decimal import Decimal
 from django.utils import timezone
 from django.core.cache import cache
-from .constants import RECEIPT_PREFIX, RECEIPT_NUMBER_LENGTH
 import logging
 
 logger = logging.getLogger(__name__)
 
 def generate_receipt_number():
     """Generate unique receipt number"""
-    year = timezone.now().year
-    
-    # Get next sequence from cache or database
-    cache_key = f'receipt_sequence_{year}'
-    sequence = cache.get(cache_key, 0)
-    sequence += 1
-    
-    # Cache for 1 hour
-    cache.set(cache_key, sequence, 3600)
-    
-    return f'{RECEIPT_PREFIX}{year}{sequence:0{RECEIPT_NUMBER_LENGTH}d}'
+    from .receipts import ReceiptNumberService
+    return ReceiptNumberService.next_number()
 
 def format_currency(amount):
     """Format amount as currency"""
@@ -0,0 +1,166 @@
+# core/images.py
+"""
+Photo variants for student and teacher images
+
+Uploaded photos are served as-is (often multi-megabyte phone pictures) even
+where the page shows a 48px avatar. On upload every photo also gets:
+
+- thumb: 192px square crop (lists, cards, avatars up to 96 CSS px at 2x)
+- profile: fits in 480x480 (profile pages, ID cards)
+
+each as WebP and as a progressive JPEG fallback. Variant names carry a hash of
+the source bytes (variants/<upload dir>/<stem>.<hash>.<variant>.<ext>), so a
+new photo always gets new URLs and the files can be cached forever (see
+core/media_views.py). The paths are recorded in the model's image_variants
+field, so building a URL needs no storage lookups:
+
+    {"source": "students/images/a.jpg",
+     "thumb": {"webp": "variants/...thumb.webp", "jpg": "variants/...thumb.jpg"},
+     "profile": {...}}
+
+Existing photos are backfilled with ``manage.py generate_image_variants``.
+"""
+
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+import hashlib
+import io
+import logging
+import posixpath
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumb': {'size': (192, 192), 'crop': True},
+    'profile': {'size': (480, 480), 'crop': False},
+}
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+VARIANT_ROOT = 'variants'
+
+# model label -> image field
+IMAGE_FIELDS = {
+    'students.Student': 'student_image',
+    'teachers.Teacher': 'photo',
+}
+
+
+class ImageVariantService:
+    """Generates, looks up and removes photo variants"""
+
+    @staticmethod
+    def _open(data):
+        image = Image.open(io.BytesIO(data))
+        largest = max(spec['size'][0] for spec in VARIANTS.values())
+        image.draft('RGB', (largest * 2, largest * 2))  # Let the JPEG decoder downscale
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+    @classmethod
+    def generate(cls, field_file, force=False):
+        """Write every variant of ``field_file``; returns the image_variants dict"""
+        storage = field_file.storage
+        with storage.open(field_file.name, 'rb') as source:
+            data = source.read()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        image = cls._open(data)
+
+        directory, filename = posixpath.split(field_file.name)
+        stem = posixpath.splitext(filename)[0]
+        variants = {'source': field_file.name}
+        for name, spec in VARIANTS.items():
+            if spec['crop']:
+                resized = ImageOps.fit(image, spec['size'], Image.LANCZOS)
+            else:
+                resized = image.copy()
+                resized.thumbnail(spec['size'], Image.LANCZOS)
+
+            variants[name] = {}
+            for ext, fmt, options in FORMATS:
+                path = posixpath.join(VARIANT_ROOT, directory, f"{stem}.{digest}.{name}.{ext}")
+                if storage.exists(path):
+                    if not force:
+                        variants[name][ext] = path  # Same content, same name
+                        continue
+                    storage.delete(path)
+                buffer = io.BytesIO()
+                resized.save(buffer, fmt, **options)
+                variants[name][ext] = storage.save(path, ContentFile(buffer.getvalue()))
+        return variants
+
+    @staticmethod
+    def is_current(field_file, variants):
+        return bool(field_file) and bool(variants) and variants.get('source') == field_file.name
+
+    @staticmethod
+    def url(field_file, variants, variant, ext='jpg'):
+        """URL of one variant, or None if it has not been generated for the current photo"""
+        if not ImageVariantService.is_current(field_file, variants):
+            return None
+        path = variants.get(variant, {}).get(ext)
+        return field_file.storage.url(path) if path else None
+
+    @staticmethod
+    def delete(storage, variants, keep=None):
+        """Remove variant files, except those also listed in ``keep``"""
+        keep_paths = {path for name in VARIANTS for path in (keep or {}).get(name, {}).values()}
+        for name in VARIANTS:
+            for path in (variants or {}).get(name, {}).values():
+                if path in keep_paths:
+                    continue
+                try:
+                    storage.delete(path)
+                except Exception as e:
+                    logger.warning(f"Could not delete image variant {path}: {e}")
+
+    @classmethod
+    def refresh(cls, instance, field_name, force=False):
+        """Bring ``instance.image_variants`` in line with its photo; True if anything changed"""
+        field_file = getattr(instance, field_name)
+        current = instance.image_variants or {}
+        if not force and (cls.is_current(field_file, current) or (not field_file and not current)):
+            return False
+        cls.store(instance, field_name, cls.generate(field_file, force=force) if field_file else {})
+        return True
+
+    @classmethod
+    def store(cls, instance, field_name, variants):
+        """Record ``variants`` for ``instance`` and remove the files they replace"""
+        current = instance.image_variants or {}
+        # Queryset update: no second post_save, and the default manager may hide the row
+        type(instance)._base_manager.filter(pk=instance.pk).update(image_variants=variants)
+        instance.image_variants = variants
+        if current:
+            cls.delete(instance._meta.get_field(field_name).storage, current, keep=variants)
+
+
+@receiver(post_save, sender='students.Student')
+@receiver(post_save, sender='teachers.Teacher')
+def generate_photo_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Create variants when a photo is uploaded, replaced or cleared"""
+    field_name = IMAGE_FIELDS[sender._meta.label]
+    if raw or (update_fields is not None and field_name not in update_fields):
+        return
+    try:
+        ImageVariantService.refresh(instance, field_name)
+    except Exception as e:
+        # The original photo is still served; the backfill command can retry
+        logger.warning(f"Photo variants failed for {sender._meta.label} {instance.pk}: {e}")
+
+
+@receiver(post_delete, sender='students.Student')
+@receiver(post_delete, sender='teachers.Teacher')
+def delete_photo_variants(sender, instance, **kwargs):
+    variants = instance.__dict__.get('image_variants')  # A deferred field can't be loaded any more
+    if variants:
+        storage = instance._meta.get_field(IMAGE_FIELDS[sender._meta.label]).storage
+        ImageVariantService.delete(storage, variants)
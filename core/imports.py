@@ -0,0 +1,399 @@
+# core/imports.py
+"""
+Chunked bulk import engine
+
+Uploads (CSV or XLSX) are read row by row, never loaded whole, and handed to
+an ImportAdapter in chunks of BULK_IMPORT_CHUNK_SIZE records:
+
+1. ``prepare(chunk)`` preloads what the chunk needs in a few queries
+   (existing keys, classes, students by admission number, ...)
+2. ``build(row_num, record, context)`` validates one record with the app's
+   existing forms/validators against that preloaded context and returns an
+   unsaved instance (raise ValidationError to reject the row, return None to
+   skip it)
+3. ``write(instances)`` saves the chunk with bulk_create, in its own transaction
+
+Rows that fail validation are reported with their row number and left out;
+the rest are imported. A dry run stops after step 2 and reports what would be
+created. Adapters that must post a file all-or-nothing set single_transaction,
+and can add per-row ``lines`` and ``totals`` to the report (summarize). Adapters are registered in ADAPTERS by dotted path, so each app
+keeps its own in <app>/imports.py.
+
+Large files run as a background job (start_import); progress and the final
+report are kept in the cache by backup's ProgressTracker under the job id.
+"""
+
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from .response_cache import data_versions
+import csv
+import io
+import threading
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADAPTERS = {
+    'students': 'students.imports.StudentImportAdapter',
+    'class_sections': 'subjects.imports.ClassSectionImportAdapter',
+    'subjects': 'subjects.imports.SubjectImportAdapter',
+    'fine_assignments': 'fines.imports.FineAssignmentImportAdapter',
+    'opening_deposits': 'student_fees.imports.OpeningDepositImportAdapter',
+    'statement_payments': 'student_fees.imports.StatementPaymentImportAdapter',
+}
+
+
+class ImportFileError(ValueError):
+    """The upload as a whole cannot be read (format, encoding, missing columns)"""
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+class SpreadsheetReader:
+    """Iterate the rows of a CSV or XLSX upload without loading the whole file"""
+
+    def __init__(self, uploaded_file):
+        self.file = uploaded_file
+        self.name = (getattr(uploaded_file, 'name', '') or '').lower()
+        self.rows_read = 0
+        self._total_rows = None
+        if not self.name.endswith(('.csv', '.xlsx')):
+            raise ImportFileError("Please upload a .csv or .xlsx file.")
+
+    def __iter__(self):
+        rows = self._xlsx_rows() if self.name.endswith('.xlsx') else self._csv_rows()
+        for row in rows:
+            self.rows_read += 1
+            yield row
+
+    def _csv_rows(self):
+        self.file.seek(0)
+        reader = csv.reader(io.TextIOWrapper(self.file, encoding='utf-8-sig', newline=''))
+        try:
+            yield from reader
+        except UnicodeDecodeError:
+            raise ImportFileError("We couldn't read this file. Please save it as UTF-8 CSV and try again.")
+
+    def _xlsx_rows(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportFileError("Excel import is not available; please upload a CSV file.")
+        try:
+            workbook = load_workbook(self.file, read_only=True, data_only=True)
+        except Exception:
+            raise ImportFileError("We couldn't open this Excel file. Please check it and try again.")
+        try:
+            sheet = workbook.active
+            self._total_rows = sheet.max_row
+            yield from sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    def fraction_done(self):
+        """Rough share of the file read so far (0..1), for progress reporting"""
+        if self._total_rows:
+            return min(self.rows_read / self._total_rows, 1.0)
+        try:
+            size = self.file.size
+            return min(self.file.tell() / size, 1.0) if size else 0.0
+        except (AttributeError, OSError, ValueError):
+            return 0.0
+
+
+def normalize_header(cell):
+    return str(cell or '').strip().lower().replace('.', '').replace('-', '_').replace(' ', '_')
+
+
+def clean_cell(value):
+    """Spreadsheet cell as the string a form would receive"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def parse_decimal(value, default=None):
+    """Decimal from a cell; blank gives ``default``. Raises ValidationError."""
+    if value in (None, ''):
+        if default is None:
+            raise ValidationError("amount is missing")
+        return default
+    try:
+        amount = Decimal(str(value).replace(',', ''))
+    except InvalidOperation:
+        raise ValidationError(f"'{value}' is not a valid amount")
+    if not amount.is_finite() or amount < 0:
+        raise ValidationError(f"'{value}' is not a valid amount")
+    return amount.quantize(Decimal('0.01'))
+
+
+def iter_records(rows, required=(), aliases=None):
+    """
+    (row_num, {column: value}) for every non-blank row after the header.
+    Header cells are normalized (``Admission No`` -> ``admission_no``) and
+    mapped through ``aliases``; missing ``required`` columns raise ImportFileError.
+    """
+    aliases = aliases or {}
+    header = None
+    for row_num, row in enumerate(rows, 1):
+        if not row or all(cell in (None, '') for cell in row):
+            continue
+        if header is None:
+            header = [aliases.get(name, name) for name in map(normalize_header, row)]
+            missing = [column for column in required if column not in header]
+            if missing:
+                raise ImportFileError(f"The first row must name these columns: {', '.join(missing)}.")
+            continue
+        yield row_num, {name: clean_cell(value) for name, value in zip(header, row) if name}
+    if header is None:
+        raise ImportFileError("The file is empty.")
+
+
+# ----------------------------------------------------------------------
+# Adapters and engine
+# ----------------------------------------------------------------------
+
+@dataclass
+class ImportReport:
+    """What an import did (or, for a dry run, would do)"""
+
+    kind: str
+    dry_run: bool = False
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+    lines: list = field(default_factory=list)    # Per-row outcome, for adapters that reconcile
+    totals: dict = field(default_factory=dict)
+
+    MAX_ERRORS = 100
+    MAX_LINES = 5000
+
+    def add_error(self, row_num, message):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"Row {row_num}: {message}")
+
+    @property
+    def summary(self):
+        verb = 'would be' if self.dry_run else 'were'
+        return (f"{self.rows} rows read: {self.created} {verb} created, {self.updated} {verb} updated, "
+                f"{self.skipped} skipped, {self.error_count} with errors")
+
+    def as_dict(self):
+        return {
+            'kind': self.kind, 'dry_run': self.dry_run, 'rows': self.rows,
+            'created': self.created, 'updated': self.updated, 'skipped': self.skipped,
+            'error_count': self.error_count, 'errors': self.errors, 'summary': self.summary,
+            'lines': self.lines[:self.MAX_LINES], 'totals': self.totals,
+        }
+
+
+class ImportAdapter:
+    """How one kind of record is validated and saved; subclass per model"""
+
+    kind = ''
+    label = ''
+    module = ''           # users.UserModulePermission module needed ('edit')
+    columns = ()          # required columns
+    aliases = {}          # alternative header -> column
+    single_transaction = False  # True: the whole file is written, or nothing is
+    touches = ()          # core.response_cache domains whose cached pages a write makes stale
+
+    def __init__(self, user=None, **options):
+        self.user = user
+        self.options = options
+
+    def prepare(self, records):
+        """Preload lookups for a chunk of (row_num, record); returns a context dict"""
+        return {}
+
+    def build(self, row_num, record, context):
+        """Unsaved instance for a valid record, None to skip it; raise ValidationError if invalid"""
+        raise NotImplementedError
+
+    def write(self, instances):
+        """Save one chunk; returns (created, updated). Rows neither created nor updated count as skipped"""
+        raise NotImplementedError
+
+    def finish(self, report):
+        """Runs once after all chunks were written (not on dry runs)"""
+
+    def summarize(self, report):
+        """Runs at the very end, dry run or not; may fill report.lines / report.totals"""
+
+    @staticmethod
+    def form_errors(form):
+        """Flatten form errors into one message"""
+        messages = []
+        for name, errors in form.errors.items():
+            label = '' if name == '__all__' else f"{name}: "
+            messages.append(label + ' '.join(errors))
+        return '; '.join(messages)
+
+
+def get_adapter(kind, user=None, **options):
+    try:
+        return import_string(ADAPTERS[kind])(user=user, **options)
+    except KeyError:
+        raise ImportFileError(f"Unknown import type '{kind}'.")
+
+
+class BulkImporter:
+    """Run an adapter over a file chunk by chunk"""
+
+    def __init__(self, adapter, chunk_size=None, on_progress=None):
+        self.adapter = adapter
+        self.chunk_size = chunk_size or getattr(settings, 'BULK_IMPORT_CHUNK_SIZE', 500)
+        self.on_progress = on_progress
+
+    def run(self, uploaded_file, dry_run=False):
+        reader = SpreadsheetReader(uploaded_file)
+        return self.run_records(
+            iter_records(reader, self.adapter.columns, self.adapter.aliases),
+            dry_run=dry_run, reader=reader,
+        )
+
+    def run_records(self, records, dry_run=False, reader=None):
+        adapter = self.adapter
+        report = ImportReport(kind=adapter.kind, dry_run=dry_run)
+        with transaction.atomic() if adapter.single_transaction and not dry_run else nullcontext():
+            self._run_chunks(iter(records), report, dry_run, reader)
+            if not dry_run:
+                adapter.finish(report)
+        adapter.summarize(report)
+        logger.info(f"Import {adapter.kind}{' (dry run)' if dry_run else ''}: {report.summary}")
+        return report
+
+    def _run_chunks(self, records, report, dry_run, reader):
+        adapter = self.adapter
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+            report.rows += len(chunk)
+            context = adapter.prepare(chunk)
+            instances = []
+            for row_num, record in chunk:
+                try:
+                    instance = adapter.build(row_num, record, context)
+                except ValidationError as e:
+                    report.add_error(row_num, '; '.join(e.messages))
+                    continue
+                if instance is None:
+                    report.skipped += 1
+                else:
+                    instances.append(instance)
+
+            if dry_run:
+                report.created += len(instances)
+            elif instances:
+                with transaction.atomic():
+                    created, updated = adapter.write(instances)
+                    if adapter.touches:
+                        data_versions.touch(*adapter.touches)
+                report.created += created
+                report.updated += updated
+                report.skipped += len(instances) - created - updated
+
+            if self.on_progress:
+                self.on_progress(report, reader.fraction_done() if reader else None)
+
+
+# ----------------------------------------------------------------------
+# Background jobs
+# ----------------------------------------------------------------------
+
+def _tracker(job_id):
+    from backup.progress_tracker import ProgressTracker
+    return ProgressTracker(job_id, 'import')
+
+
+def start_import(kind, uploaded_file, user=None, dry_run=False):
+    """
+    Store the upload and import it in the background (BULK_IMPORT_BACKEND:
+    'thread', 'celery' or 'inline'). Returns the job id for import_progress().
+    """
+    from django.core.files.storage import default_storage
+
+    get_adapter(kind)  # Unknown kinds fail here, not in the worker
+    SpreadsheetReader(uploaded_file)  # So does an unsupported file type
+    job_id = uuid.uuid4().hex[:12]
+    path = default_storage.save(f"imports/{job_id}_{uploaded_file.name}", uploaded_file)
+    user_id = getattr(user, 'id', None)
+    _tracker(job_id).update_progress(0, 100, 'Queued', {'kind': kind, 'user_id': user_id, 'dry_run': dry_run})
+
+    backend = getattr(settings, 'BULK_IMPORT_BACKEND', 'thread')
+    args = (job_id, kind, path, user_id, dry_run)
+    if backend == 'celery':
+        try:
+            from .tasks import run_import
+            run_import.delay(*args)
+            return job_id
+        except Exception as e:
+            logger.warning(f"Could not queue import {job_id}, running in a thread: {e}")
+    if backend == 'inline':
+        run_import_job(*args)
+    else:
+        threading.Thread(target=_run_in_thread, args=args, name=f'import-{job_id}', daemon=True).start()
+    return job_id
+
+
+def _run_in_thread(*args):
+    try:
+        run_import_job(*args)
+    finally:
+        close_old_connections()
+
+
+def run_import_job(job_id, kind, path, user_id=None, dry_run=False):
+    """Import a stored upload, reporting progress under ``job_id``"""
+    from django.contrib.auth import get_user_model
+    from django.core.files.storage import default_storage
+
+    tracker = _tracker(job_id)
+    base = {'kind': kind, 'user_id': user_id, 'dry_run': dry_run}
+
+    def on_progress(report, fraction):
+        percent = int((fraction or 0) * 100)
+        tracker.update_progress(percent, 100, f"{report.rows} rows processed", {**base, **report.as_dict()})
+
+    try:
+        user = get_user_model().objects.filter(id=user_id).first() if user_id else None
+        with default_storage.open(path, 'rb') as uploaded:
+            report = BulkImporter(get_adapter(kind, user=user), on_progress=on_progress).run(uploaded, dry_run)
+        tracker.complete_operation(True, report.summary, {**base, **report.as_dict()})
+    except ImportFileError as e:
+        tracker.complete_operation(False, str(e), base)
+    except Exception as e:
+        logger.error(f"Import job {job_id} ({kind}) failed: {e}")
+        tracker.complete_operation(False, 'The import failed. Please check the file and try again.', base)
+    finally:
+        try:
+            default_storage.delete(path)
+        except Exception:
+            pass
+
+
+def import_progress(job_id):
+    """Progress/report dict of an import job, or None if unknown or expired"""
+    from backup.progress_tracker import ProgressTracker
+    return ProgressTracker.get_progress(job_id, 'import')
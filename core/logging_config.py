@@ -0,0 +1,193 @@
+# core/logging_config.py
+"""
+Queue-based logging (LOGGING_CONFIG = 'core.logging_config.configure')
+
+Django applies settings.LOGGING with dictConfig as usual; afterwards every
+file and stream handler it created is replaced by a QueueProxyHandler that
+only puts the record on an in-memory queue. One background QueueListener
+thread formats and writes the records, so request threads never wait for
+the disk or for log rotation.
+
+- The queue is bounded (LOG_QUEUE_SIZE); when the writer falls behind,
+  records below WARNING are dropped and counted instead of blocking.
+- Messages are merged (msg % args) in the calling thread so the record is
+  fixed at the time of the call; the Formatter, timestamps and traceback
+  text are produced in the writer thread.
+- Handler filters run in the calling thread, before the record is queued.
+- RateLimitFilter keeps each logger to LOG_RATE_LIMIT records per second
+  below WARNING; the next record after a busy second says how many were
+  suppressed.
+- Set LOG_QUEUE_ENABLED=False to write synchronously (e.g. while debugging
+  logging itself).
+"""
+
+from django.conf import settings
+import atexit
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import threading
+
+_listener = None
+
+
+class QueueProxyHandler(logging.handlers.QueueHandler):
+    """Stands in for one real handler; records are written by the listener thread"""
+
+    def __init__(self, log_queue, target):
+        super().__init__(log_queue)
+        self.target = target
+        self.setLevel(target.level)
+        self.filters = target.filters  # Filtered here, so skipped records never reach the queue
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Same process, so the record itself goes on the queue; only the
+        # message is fixed now (args may be mutable objects)
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait((self.target, record))
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                self.queue.put((self.target, record))  # Never lose warnings/errors
+            else:
+                self.dropped += 1
+
+
+class HandlerQueueListener(logging.handlers.QueueListener):
+    """Hands each queued record to the handler it was meant for"""
+
+    def __init__(self, log_queue, proxies):
+        super().__init__(log_queue)
+        self.proxies = proxies
+
+    def start(self):
+        super().start()
+        self._thread.name = 'log-writer'
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # Wait for room rather than fail on a full queue
+
+    def handle(self, item):
+        target, record = item
+        if self.dropped_total():
+            self._emit(target, logging.makeLogRecord({
+                'name': 'core.logging', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"Log queue full: {self._take_dropped()} records were dropped",
+            }))
+        self._emit(target, record)
+
+    @staticmethod
+    def _emit(target, record):
+        # Level and filters were already applied by the QueueProxyHandler
+        target.acquire()
+        try:
+            target.emit(record)
+        finally:
+            target.release()
+
+    def dropped_total(self):
+        return any(proxy.dropped for proxy in self.proxies)
+
+    def _take_dropped(self):
+        total = 0
+        for proxy in self.proxies:
+            total += proxy.dropped
+            proxy.dropped = 0
+        return total
+
+
+class RateLimitFilter(logging.Filter):
+    """Pass at most ``per_second`` records per logger per second below WARNING"""
+
+    def __init__(self, per_second=None):
+        super().__init__()
+        self.per_second = per_second or getattr(settings, 'LOG_RATE_LIMIT', 50)
+        self._windows = {}  # logger name -> [second, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        second = int(record.created)
+        with self._lock:
+            window = self._windows.get(record.name)
+            if window is None or window[0] != second:
+                suppressed = window[2] if window else 0
+                self._windows[record.name] = [second, 1, 0]
+                if suppressed:
+                    record.msg = f"[{suppressed} records suppressed] {record.getMessage()}"
+                    record.args = None
+                return True
+            if window[1] < self.per_second:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+def _loggers():
+    yield logging.getLogger()
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if isinstance(logger, logging.Logger):  # Skip PlaceHolders
+            yield logger
+
+
+def install_queue_logging(queue_size=None):
+    """Move every file/stream handler behind one queue and writer thread"""
+    global _listener
+    stop_queue_logging()
+
+    log_queue = queue.Queue(maxsize=queue_size or getattr(settings, 'LOG_QUEUE_SIZE', 10000))
+    proxies = {}
+    for logger in _loggers():
+        for handler in list(logger.handlers):
+            if not isinstance(handler, logging.StreamHandler):
+                continue  # Null/mail/queue handlers stay as they are
+            if handler not in proxies:
+                proxies[handler] = QueueProxyHandler(log_queue, handler)
+            logger.removeHandler(handler)
+            logger.addHandler(proxies[handler])
+
+    _listener = HandlerQueueListener(log_queue, list(proxies.values()))
+    _listener.start()
+    return _listener
+
+
+def stop_queue_logging():
+    """Flush the queue and stop the writer thread"""
+    global _listener
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+    _listener = None
+
+
+def _restart_in_child():
+    # A forked worker inherits the queue (and possibly its held lock) but
+    # not the writer thread: give it a fresh queue and thread
+    if _listener is not None:
+        log_queue = queue.Queue(maxsize=_listener.queue.maxsize)
+        for proxy in _listener.proxies:
+            proxy.queue = log_queue
+        _listener.queue = log_queue
+        _listener._thread = None
+        _listener.start()
+
+
+def configure(logging_settings):
+    """Django LOGGING_CONFIG callable"""
+    logging.config.dictConfig(logging_settings)
+    if getattr(settings, 'LOG_QUEUE_ENABLED', True):
+        install_queue_logging()
+
+
+atexit.register(stop_queue_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_in_child)
@@ -0,0 +1,35 @@
+# Allocate existing fee deposits to the fee, fine or carry forward they paid
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.fee_management.allocations import PaymentAllocationService
+from core.fee_management.models import PaymentAllocation
+
+
+class Command(BaseCommand):
+    help = 'Create PaymentAllocation rows for fee deposits recorded before structured allocation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Students per batch')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Drop note-derived allocations and classify every deposit again')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        self.stdout.write('🔄 Allocating fee deposits...')
+        created = PaymentAllocationService.backfill(
+            batch_size=options['batch_size'],
+            rebuild=options['rebuild'],
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Created {created} payment allocations in {elapsed:.1f}s'))
+        for allocation_type, label in PaymentAllocation.ALLOCATION_TYPES:
+            count = PaymentAllocation.objects.filter(allocation_type=allocation_type).count()
+            self.stdout.write(f'  {label:<24} {count:>10}')
+        unmatched = PaymentAllocation.objects.filter(
+            allocation_type=PaymentAllocation.FEE, fees_type__isnull=True
+        ).count()
+        if unmatched:
+            self.stdout.write(self.style.WARNING(f'⚠️ {unmatched} fee payments did not match a fee type'))
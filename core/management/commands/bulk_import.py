@@ -0,0 +1,59 @@
+# Import students, class sections, subjects, fines, opening deposits or statement payments from a CSV/XLSX file
+import csv
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import ADAPTERS, BulkImporter, ImportFileError, get_adapter
+
+
+class Command(BaseCommand):
+    help = 'Bulk import records from a CSV or XLSX file, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(ADAPTERS), help='What the file contains')
+        parser.add_argument('file', help='Path to the .csv or .xlsx file')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without saving')
+        parser.add_argument('--chunk-size', type=int, help='Rows validated and saved together')
+        parser.add_argument('--user', help='Username recorded as creator (default: first superuser)')
+        parser.add_argument('--report', help='Write the per-row reconciliation to this CSV file (statement payments)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named '{options['user']}'")
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+
+        start = time.perf_counter()
+        self.stdout.write(f"📥 Importing {options['kind']} from {options['file']}...")
+        try:
+            with open(options['file'], 'rb') as uploaded:
+                importer = BulkImporter(get_adapter(options['kind'], user=user), chunk_size=options['chunk_size'])
+                report = importer.run(uploaded, dry_run=options['dry_run'])
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f'⚠️ {error}'))
+        if report.error_count > len(report.errors):
+            self.stdout.write(self.style.WARNING(f'⚠️ ... and {report.error_count - len(report.errors)} more'))
+        self.stdout.write(self.style.SUCCESS(f'✅ {report.summary} ({elapsed:.1f}s)'))
+        for status, entry in report.totals.get('by_status', {}).items():
+            self.stdout.write(f"   {status}: {entry['count']} rows, ₹{entry['amount']}")
+        if report.totals.get('allocated'):
+            self.stdout.write('   paid towards: ' + ', '.join(
+                f"{split.replace('_', ' ')} ₹{amount}" for split, amount in report.totals['allocated'].items()
+            ))
+        if options['report'] and report.lines:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as out:
+                writer = csv.DictWriter(out, fieldnames=list(report.lines[0]))
+                writer.writeheader()
+                writer.writerows(report.lines)
+            self.stdout.write(f"📄 Reconciliation written to {options['report']}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run - nothing was saved'))
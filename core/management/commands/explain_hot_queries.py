@@ -0,0 +1,101 @@
+# Print the query plans of the hot-path queries to verify index use
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+# Plan lines that read a whole table: SQLite "SCAN <table>" without an index, PostgreSQL "Seq Scan"
+FULL_SCAN_RE = re.compile(r'\bSCAN (?!.*\bUSING\b.*\bINDEX\b)|Seq Scan')
+
+
+def _hot_queries(sample):
+    """(name, description, queryset) for every query the hot views run per student/class/day"""
+    from attendance.models import Attendance
+    from core.fee_management.models import PaymentAllocation
+    from fines.models import FineStudent
+    from student_fees.models import FeeDeposit
+
+    today = sample['date']
+    return [
+        ('deposit_history', 'Student payment history, newest first',
+         FeeDeposit.objects.filter(student_id=sample['student_id']).order_by('-deposit_date')),
+        ('deposit_period', 'Student payments inside a date range',
+         FeeDeposit.objects.filter(student_id=sample['student_id'], deposit_date__date__gte=today.replace(day=1))),
+        ('receipt_lookup', 'Receipt view and generate_receipt_no uniqueness probe',
+         FeeDeposit.objects.filter(receipt_no=sample['receipt_no'])),
+        ('collection_by_mode', 'Fee collection report filtered by payment mode',
+         FeeDeposit.objects.filter(payment_mode='Cash', deposit_date__gte=sample['since'])),
+        ('allocation_totals', 'Paid/discount per allocation type (balances, fees report)',
+         PaymentAllocation.objects.filter(student_id=sample['student_id']).values('allocation_type').annotate(
+             paid=Sum('allocated_amount'), discount=Sum('discount_amount'))),
+        ('unpaid_fines', 'Unpaid fines of a student',
+         FineStudent.objects.filter(student_id=sample['student_id'], is_paid=False).select_related('fine')),
+        ('class_attendance', 'Daily class attendance report',
+         Attendance.objects.filter(class_section_id=sample['class_section_id'], date=today, status='Present')),
+        ('daily_attendance', 'School-wide present/absent counts for a day',
+         Attendance.objects.filter(date=today).values('status').annotate(count=Count('id'))),
+        ('attendance_window', 'Present/absent counts over the last 30 days',
+         Attendance.objects.filter(date__gte=today - timedelta(days=30), date__lte=today).values(
+             'date').annotate(present=Count('id', filter=Q(status='Present')))),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Show the database query plans of the hot-path fee, fine and attendance queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', action='append', help='Only explain this query (repeatable)')
+        parser.add_argument('--sql', action='store_true', help='Print the SQL before each plan')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any plan reads a whole table')
+
+    def _sample(self):
+        """Real ids where data exists so the planner sees realistic values"""
+        from attendance.models import Attendance
+        from student_fees.models import FeeDeposit
+
+        deposit = FeeDeposit.objects.order_by('-id').values('student_id', 'receipt_no').first() or {}
+        attendance = Attendance.objects.exclude(class_section=None).order_by('-date').values(
+            'class_section_id', 'date').first() or {}
+        return {
+            'student_id': deposit.get('student_id', 1),
+            'receipt_no': deposit.get('receipt_no', 'REC00000'),
+            'class_section_id': attendance.get('class_section_id', 1),
+            'date': attendance.get('date', timezone.localdate()),
+            'since': timezone.now() - timedelta(days=30),
+        }
+
+    def handle(self, *args, **options):
+        queries = _hot_queries(self._sample())
+        if options['query']:
+            unknown = set(options['query']) - {name for name, _, _ in queries}
+            if unknown:
+                raise CommandError(f"Unknown query: {', '.join(sorted(unknown))}. "
+                                   f"Choose from {', '.join(name for name, _, _ in queries)}")
+            queries = [q for q in queries if q[0] in options['query']]
+
+        self.stdout.write(f'🔍 Query plans on {connection.vendor}')
+        full_scans = []
+        for name, description, queryset in queries:
+            plan = queryset.explain()
+            scans = [line.strip() for line in plan.splitlines() if FULL_SCAN_RE.search(line)]
+            marker = self.style.WARNING('⚠️ full scan') if scans else self.style.SUCCESS('✅ indexed')
+            self.stdout.write(f'\n{name} - {description}  {marker}')
+            if options['sql']:
+                self.stdout.write(f'  SQL: {queryset.query}')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+            if scans:
+                full_scans.append(name)
+
+        self.stdout.write('')
+        if full_scans:
+            message = f"{len(full_scans)} of {len(queries)} queries read a whole table: {', '.join(full_scans)}"
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(f'⚠️ {message}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ All {len(queries)} queries use an index'))
@@ -0,0 +1,60 @@
+# Create thumbnail/profile variants for student and teacher photos uploaded before they existed
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core.images import IMAGE_FIELDS, ImageVariantService
+
+
+class Command(BaseCommand):
+    help = 'Generate WebP/JPEG photo variants (see core/images.py) for photos that lack them'
+
+    MODELS = {'students': 'students.Student', 'teachers': 'teachers.Teacher'}
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['all', *self.MODELS], default='all')
+        parser.add_argument('--workers', type=int, default=4, help='Photos resized in parallel')
+        parser.add_argument('--force', action='store_true', help='Re-encode photos that already have variants')
+
+    def handle(self, *args, **options):
+        labels = self.MODELS.values() if options['model'] == 'all' else [self.MODELS[options['model']]]
+        for label in labels:
+            self.backfill(apps.get_model(label), IMAGE_FIELDS[label], options['workers'], options['force'])
+
+    def backfill(self, model, field_name, workers, force):
+        rows = model._base_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}).only(
+            'pk', field_name, 'image_variants'
+        )
+        pending = [
+            instance for instance in rows.iterator()
+            if force or not ImageVariantService.is_current(getattr(instance, field_name), instance.image_variants)
+        ]
+        name = model._meta.verbose_name_plural
+        if not pending:
+            self.stdout.write(self.style.SUCCESS(f'✅ All {name} photos already have variants'))
+            return
+
+        self.stdout.write(f'🖼️ Generating variants for {len(pending)} {name} photos with {workers} workers...')
+        start = time.perf_counter()
+
+        def generate(instance):
+            try:
+                return instance, ImageVariantService.generate(getattr(instance, field_name), force=force), None
+            except Exception as e:
+                return instance, None, e
+
+        done = failed = 0
+        # Resizing runs in the pool (Pillow releases the GIL); database writes stay on this thread
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for instance, variants, error in pool.map(generate, pending):
+                if error is not None:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'⚠️ {model.__name__} {instance.pk}: {error}'))
+                    continue
+                ImageVariantService.store(instance, field_name, variants)
+                done += 1
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'✅ {done} {name} photos done, {failed} failed ({elapsed:.1f}s)'))
@@ -0,0 +1,39 @@
+# List published ML models and import the loose models/*.pkl files into the registry
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ml_registry import model_registry
+
+
+class Command(BaseCommand):
+    help = 'Show the ML model registry manifest or publish the legacy models/*.pkl files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--import-legacy', action='store_true',
+                            help='Publish models/*.pkl files that are not in the registry yet')
+        parser.add_argument('--overwrite', action='store_true',
+                            help='With --import-legacy, publish a new version even if the model exists')
+        parser.add_argument('--models-dir', help='Directory holding the legacy .pkl files')
+
+    def handle(self, *args, **options):
+        if options['import_legacy']:
+            try:
+                published = model_registry.import_legacy(options['models_dir'], overwrite=options['overwrite'])
+            except Exception as e:
+                raise CommandError(f'Legacy import failed: {e}')
+            for name, version in published.items():
+                self.stdout.write(self.style.SUCCESS(f'✅ Published {name} {version}'))
+            if not published:
+                self.stdout.write(self.style.WARNING('⚠️ Nothing to import'))
+
+        manifest = model_registry.manifest(force=True)
+        self.stdout.write(f'\n📦 Model registry: {model_registry.root}')
+        if not manifest:
+            self.stdout.write(self.style.WARNING(
+                '⚠️ No models published; run `manage.py train_ml_models` or `--import-legacy`'
+            ))
+            return
+        self.stdout.write(f"  {'model':<22} {'version':<8} {'size KB':>10}  published")
+        for name, entry in sorted(manifest.items()):
+            self.stdout.write(
+                f"  {name:<22} {entry['version']:<8} {entry['size'] / 1024:>10.1f}  {entry['published_at']}"
+            )
@@ -0,0 +1,40 @@
+# Dump the per-view performance report collected by QueryProfilingMiddleware
+from django.core.management.base import BaseCommand
+import json
+
+from core.profiling import SORT_KEYS, build_report, load_merged_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show the worst views by latency, query count and N+1 patterns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', default='p95_ms', choices=SORT_KEYS, help='Column to rank views by')
+        parser.add_argument('--top', type=int, default=20, help='Number of views to show (0 = all)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--reset', action='store_true', help='Delete collected stats after printing')
+
+    def handle(self, *args, **options):
+        rows = build_report(load_merged_stats(include_live=False), sort=options['sort'], top=options['top'] or None)
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+        elif not rows:
+            self.stdout.write("No profiling data recorded yet. Is core.profiling.QueryProfilingMiddleware enabled?")
+        else:
+            header = f"{'View':<45} {'Reqs':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'AvgQ':>6} {'MaxQ':>6} {'DBms':>8} {'Hit%':>6} {'N+1':>5}"
+            self.stdout.write(header)
+            self.stdout.write('-' * len(header))
+            for row in rows:
+                hit_ratio = f"{row['cache_hit_ratio'] * 100:.0f}" if row['cache_hit_ratio'] is not None else '-'
+                self.stdout.write(
+                    f"{row['view'][:45]:<45} {row['requests']:>6} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                    f"{row['p99_ms']:>8.1f} {row['avg_queries']:>6} {row['max_queries']:>6} {row['avg_db_ms']:>8.1f} "
+                    f"{hit_ratio:>6} {row['n_plus_one_requests']:>5}"
+                )
+                for shape, count in row['repeated_queries']:
+                    self.stdout.write(self.style.WARNING(f"    x{count} {shape[:150]}"))
+
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Profiling stats reset'))
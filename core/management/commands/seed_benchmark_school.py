@@ -0,0 +1,59 @@
+# Seed a deterministic large school for benchmarking and query budget work
+from datetime import date
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark_school import BenchmarkSchoolBuilder
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible large-school dataset (students, fees, transport, fines, attendance) with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000, help='Number of students')
+        parser.add_argument('--classes', type=int, default=12, help='Number of classes')
+        parser.add_argument('--sections', type=int, default=5, help='Sections per class')
+        parser.add_argument('--attendance-days', type=int, default=220, help='School days of attendance per student')
+        parser.add_argument('--routes', type=int, default=8, help='Transport routes')
+        parser.add_argument('--stoppages', type=int, default=6, help='Stoppages per route')
+        parser.add_argument('--transport-ratio', type=float, default=0.3, help='Share of students using transport')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--as-of', help='Pretend today is YYYY-MM-DD (default: today)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert')
+        parser.add_argument('--clear', action='store_true', help='Delete a previously seeded benchmark school first')
+
+    def handle(self, *args, **options):
+        if options['sections'] > 10:
+            raise CommandError('At most 10 sections per class are supported')
+        try:
+            as_of = date.fromisoformat(options['as_of']) if options['as_of'] else None
+        except ValueError:
+            raise CommandError(f"Invalid --as-of date: {options['as_of']}")
+
+        if BenchmarkSchoolBuilder.exists():
+            if not options['clear']:
+                raise CommandError('A benchmark school is already seeded. Run with --clear to replace it.')
+            deleted = BenchmarkSchoolBuilder.clear()
+            self.stdout.write(f'🧹 Removed {deleted} rows from the previous benchmark school')
+
+        start = time.perf_counter()
+        builder = BenchmarkSchoolBuilder(
+            students=options['students'],
+            classes=options['classes'],
+            sections_per_class=options['sections'],
+            attendance_days=options['attendance_days'],
+            routes=options['routes'],
+            stoppages_per_route=options['stoppages'],
+            transport_ratio=options['transport_ratio'],
+            seed=options['seed'],
+            as_of=as_of,
+            batch_size=options['batch_size'],
+            progress=lambda message: self.stdout.write(f'  {message}'),
+        )
+        summary = builder.build()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Benchmark school seeded in {elapsed:.1f}s (seed {options["seed"]})'))
+        for name, count in summary.items():
+            self.stdout.write(f'  {name:<24} {count:>10}')
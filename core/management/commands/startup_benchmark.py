@@ -0,0 +1,135 @@
+# Measure worker startup cost: import time and resident memory per app
+import json
+import os
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ml_lazy_loader import HEAVY_MODULES
+
+# Runs in a fresh interpreter so every measurement starts from a cold process
+CHILD_SCRIPT = r'''
+import importlib, importlib.util, json, resource, sys, time
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+heavy = HEAVY
+target = TARGET
+start_rss, start = rss_mb(), time.perf_counter()
+import django
+django.setup()
+setup_ms, setup_rss = (time.perf_counter() - start) * 1000, rss_mb()
+
+modules = []
+start = time.perf_counter()
+if target == '__urlconf__':
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+elif target != '__setup__':
+    for suffix in ('views', 'urls', 'api_views', 'services'):
+        name = f'{target}.{suffix}'
+        try:
+            found = importlib.util.find_spec(name)
+        except ImportError:
+            found = None
+        if found:
+            importlib.import_module(name)
+            modules.append(suffix)
+import_ms = (time.perf_counter() - start) * 1000
+
+print(json.dumps({
+    'setup_ms': setup_ms,
+    'import_ms': import_ms,
+    'base_rss_mb': start_rss,
+    'setup_rss_mb': setup_rss,
+    'rss_mb': rss_mb(),
+    'modules': modules,
+    'heavy': [name for name in heavy if name in sys.modules],
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Report import time and RSS of each local app, measured in a fresh process per app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', action='append', help='Only measure this app label (repeatable)')
+        parser.add_argument('--json', action='store_true', help='Print raw JSON instead of a table')
+
+    def _local_apps(self):
+        base_dir = str(settings.BASE_DIR)
+        return [config for config in apps.get_app_configs() if config.path.startswith(base_dir)]
+
+    def _measure(self, target):
+        script = CHILD_SCRIPT.replace('HEAVY', repr(HEAVY_MODULES)).replace('TARGET', repr(target))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=str(settings.BASE_DIR), env=env,
+            capture_output=True, text=True, timeout=300,
+        )
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ['unknown error'])[-1]
+            return {'error': error}
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        configs = self._local_apps()
+        if options['app']:
+            labels = {config.label: config for config in configs}
+            unknown = set(options['app']) - set(labels)
+            if unknown:
+                raise CommandError(f"Unknown app: {', '.join(sorted(unknown))}")
+            configs = [labels[label] for label in options['app']]
+
+        targets = [('django.setup()', '__setup__'), ('ROOT_URLCONF', '__urlconf__')]
+        targets += [(config.label, config.name) for config in configs]
+
+        if not options['json']:
+            self.stdout.write(f'⏱️ Measuring {len(targets)} cold imports (one process each)...')
+        results = []
+        for label, target in targets:
+            row = self._measure(target)
+            row['app'] = label
+            results.append(row)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        setup = results[0]
+        if 'error' in setup:
+            raise CommandError(f"django.setup() failed: {setup['error']}")
+        self.stdout.write(
+            f"\n  django.setup(): {setup['setup_ms']:.0f}ms, "
+            f"RSS {setup['base_rss_mb']:.0f} -> {setup['setup_rss_mb']:.0f} MB\n"
+        )
+        self.stdout.write(f"  {'app':<22} {'import ms':>10} {'+RSS MB':>9} {'RSS MB':>8}  heavy modules loaded")
+        for row in results[1:]:
+            if 'error' in row:
+                self.stdout.write(self.style.ERROR(f"  {row['app']:<22} failed: {row['error']}"))
+                continue
+            heavy = ', '.join(row['heavy']) or '-'
+            line = (f"  {row['app']:<22} {row['import_ms']:>10.0f} "
+                    f"{row['rss_mb'] - row['setup_rss_mb']:>9.1f} {row['rss_mb']:>8.1f}  {heavy}")
+            self.stdout.write(self.style.WARNING(line) if row['heavy'] else line)
+
+        offenders = [row['app'] for row in results if row.get('heavy')]
+        if offenders:
+            self.stdout.write(self.style.WARNING(
+                f"\n⚠️ Heavy libraries loaded at import time by: {', '.join(offenders)}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n✅ No heavy ML/reporting library is loaded at startup'))
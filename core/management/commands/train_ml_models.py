@@ -15,7 +15,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--model',
             type=str,
-            choices=['all', 'performance', 'payment', 'attendance'],
+            choices=['all', 'performance', 'payment', 'attendance', 'risk'],
             default='all',
             help='Specify which model to train'
         )
@@ -47,6 +47,9 @@ class Command(BaseCommand):
             if options['model'] in ['all', 'attendance']:
                 self.train_attendance_model(options)
             
+            if options['model'] in ['all', 'risk']:
+                self.train_risk_model(options)
+            
             self.stdout.write(
                 self.style.SUCCESS('ML model training completed successfully!')
             )
@@ -142,17 +145,37 @@ class Command(BaseCommand):
         try:
             from core.ml_models import attendance_pattern_analyzer
             
-            # Attendance model uses unsupervised learning, so we just initialize it
-            attendance_pattern_analyzer._train_or_load()
+            # Attendance model uses unsupervised learning on synthetic data
+            attendance_pattern_analyzer.train()
             
             self.stdout.write(
-                self.style.SUCCESS('Attendance pattern model trained successfully!')
+                self.style.SUCCESS(
+                    f'Attendance pattern model trained successfully! '
+                    f'Published {attendance_pattern_analyzer.version}'
+                )
             )
             
         except Exception as e:
             logger.error(f"Attendance model training failed: {e}")
             raise CommandError(f'Attendance model training failed: {e}')
     
+    def train_risk_model(self, options):
+        """Train fee collection risk model used by the reports dashboard"""
+        self.stdout.write('Training fee collection risk model...')
+        
+        try:
+            from reports.ml_analytics import ml_analytics
+            
+            version = ml_analytics.train_risk_model()
+            
+            self.stdout.write(
+                self.style.SUCCESS(f'Fee collection risk model trained successfully! Published {version}')
+            )
+            
+        except Exception as e:
+            logger.error(f"Risk model training failed: {e}")
+            raise CommandError(f'Risk model training failed: {e}')
+    
     def prepare_performance_data(self):
         """Prepare real student performance data for training"""
         try:
@@ -1,13 +1,20 @@
 from django.http import HttpResponse, Http404
 from django.conf import settings
 from django.views.static import serve
+from core.images import VARIANT_ROOT
 import os
 
+VARIANT_MAX_AGE = 365 * 24 * 60 * 60
+
 def serve_media_with_fallback(request, path):
     """Serve media files with fallback to default image for missing files"""
     try:
         # Try to serve the actual file
-        return serve(request, path, document_root=settings.MEDIA_ROOT)
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+        if path.startswith(VARIANT_ROOT + '/'):
+            # Variant names include a hash of the photo, so they never change
+            response['Cache-Control'] = f'public, max-age={VARIANT_MAX_AGE}, immutable'
+        return response
     except Http404:
         # If file not found and it's an image request, serve default placeholder
         if path.startswith('students/images/') and any(path.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif']):
@@ -1,12 +1,26 @@
 # ML-Powered Alert Service for School Management System - FIXED
+"""
+The alert feed is materialized by a job (``manage.py materialize_ml_alerts``
+or the optional in-process MLAlertScheduler) that computes every category in
+batch and stores it as an MLAlertSnapshot. Dashboard requests only read the
+latest snapshot, so an expired cache never blocks a page on the analyses.
+"""
 from typing import List, Dict, Any
+from django.conf import settings
 from django.core.cache import cache
+from django.db import close_old_connections
 from django.utils import timezone
 from datetime import timedelta
+import hashlib
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+FEED_CACHE_KEY = 'ml_alerts_feed'
+LOCK_CACHE_KEY = 'ml_alerts_materialize_lock'
+
 class MLAlertService:
     """ML-powered intelligent alert system"""
     
@@ -20,13 +34,108 @@ class MLAlertService:
         }
     
     def get_all_ml_alerts(self) -> List[Dict[str, Any]]:
-        """Get comprehensive ML-powered alerts from all modules"""
-        cache_key = 'ml_alerts_comprehensive'
-        cached_alerts = cache.get(cache_key)
+        """Top ML alerts from the latest materialized feed (never computed in the request)"""
+        return self.get_feed()['alerts'][:15]  # Return top 15 alerts
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """Headline counts stored with the latest feed"""
+        return self.get_feed()['summary']
+    
+    def get_feed(self) -> Dict[str, Any]:
+        """Latest stored feed: alerts, summary, generated_at and inputs_version"""
+        feed = cache.get(FEED_CACHE_KEY)
+        if feed is not None:
+            return feed
         
-        if cached_alerts:
-            return cached_alerts
+        from .models import MLAlertSnapshot
+        snapshot = MLAlertSnapshot.objects.only(
+            'generated_at', 'inputs_version', 'alerts', 'summary'
+        ).first()
+        if snapshot is None:
+            logger.warning("No ML alert feed stored yet; run `manage.py materialize_ml_alerts`")
+        feed = self._feed_from_snapshot(snapshot)
+        cache.set(FEED_CACHE_KEY, feed, self.cache_timeout)
+        return feed
+    
+    def _feed_from_snapshot(self, snapshot) -> Dict[str, Any]:
+        if snapshot is None:
+            return {'alerts': [], 'summary': {}, 'generated_at': None, 'inputs_version': None}
+        return {
+            'alerts': snapshot.alerts,
+            'summary': snapshot.summary,
+            'generated_at': snapshot.generated_at.isoformat(),
+            'inputs_version': snapshot.inputs_version,
+        }
+    
+    def inputs_version(self) -> str:
+        """
+        Fingerprint of everything the alerts are computed from: row counts and
+        last change of the input tables, published model versions and the date
+        (the attendance and revenue windows move daily).
+        """
+        from django.db.models import Count, Max
+        from attendance.models import Attendance
+        from fines.models import FineStudent
+        from students.models import Student
+        from student_fees.models import FeeDeposit
+        from subjects.models import SubjectAssignment
+        from transport.models import TransportAssignment
+        from .ml_registry import model_registry
         
+        parts = [timezone.localdate().isoformat()]
+        for queryset, changed_field in (
+            (Student.objects.all_statuses(), 'updated_at'),
+            (FeeDeposit.objects.all(), 'deposit_date'),
+            (Attendance.objects.all(), 'updated_at'),
+            (FineStudent.objects.all(), 'updated_at'),
+            (TransportAssignment.objects.all(), 'assigned_date'),
+            (SubjectAssignment.objects.all(), 'created_at'),
+        ):
+            stats = queryset.order_by().aggregate(count=Count('id'), last_id=Max('id'), changed=Max(changed_field))
+            parts.append(f"{queryset.model._meta.label}:{stats['count']}:{stats['last_id']}:{stats['changed']}")
+        parts.extend(f"{name}:{entry['version']}" for name, entry in sorted(model_registry.manifest().items()))
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
+    
+    def materialize(self, force=False):
+        """
+        Compute every alert category in batch and store the feed. Skipped when
+        the inputs have not changed since the last run (unless ``force``) or
+        another process holds the lock. Returns (snapshot, created).
+        """
+        from .models import MLAlertSnapshot
+        
+        if not cache.add(LOCK_CACHE_KEY, True, getattr(settings, 'ML_ALERTS_REFRESH_INTERVAL', 900)):
+            logger.info("ML alert materialization already running elsewhere; skipped")
+            return MLAlertSnapshot.objects.first(), False
+        try:
+            version = self.inputs_version()
+            latest = MLAlertSnapshot.objects.first()
+            if latest and latest.inputs_version == version and not force:
+                logger.info(f"ML alert inputs unchanged ({version}); keeping feed from {latest.generated_at}")
+                return latest, False
+            
+            start = time.perf_counter()
+            alerts = self.compute_alerts()
+            summary = self.compute_summary()
+            snapshot = MLAlertSnapshot.objects.create(
+                inputs_version=version,
+                alerts=alerts,
+                summary=summary,
+                duration_ms=int((time.perf_counter() - start) * 1000),
+            )
+            
+            keep = getattr(settings, 'ML_ALERTS_KEEP_SNAPSHOTS', 48)
+            stale = MLAlertSnapshot.objects.values_list('id', flat=True)[keep:]
+            MLAlertSnapshot.objects.filter(id__in=list(stale)).delete()
+            
+            cache.set(FEED_CACHE_KEY, self._feed_from_snapshot(snapshot), self.cache_timeout)
+            logger.info(f"Materialized {len(alerts)} ML alerts in {snapshot.duration_ms}ms ({version})")
+            return snapshot, True
+        finally:
+            cache.delete(LOCK_CACHE_KEY)
+    
+    def compute_alerts(self) -> List[Dict[str, Any]]:
+        """Run every alert category and sort by priority"""
         alerts = []
         
         # Student performance alerts
@@ -55,52 +164,71 @@ class MLAlertService:
             self.alert_priorities.get(x.get('priority', 'low'), 3),
             x.get('timestamp', 0)
         ))
+        return alerts
+    
+    def compute_summary(self) -> Dict[str, int]:
+        """Counts shown by the dashboard's own AI alerts"""
+        from django.db.models import Count, Q
+        from attendance.models import Attendance
+        from students.models import Student
         
-        # Cache results
-        cache.set(cache_key, alerts, self.cache_timeout)
-        
-        return alerts[:15]  # Return top 15 alerts
+        month_start = timezone.localdate().replace(day=1)
+        low_attendance = Attendance.objects.filter(
+            date__gte=month_start, student__status='ACTIVE'
+        ).values('student_id').annotate(
+            total=Count('id'), present=Count('id', filter=Q(status='Present'))
+        ).order_by()
+        return {
+            'high_risk_students': Student.objects.filter(due_amount__gt=5000).count(),
+            'payment_risks': Student.objects.filter(due_amount__gt=0, fee_deposits__isnull=True).count(),
+            'attendance_anomalies': sum(1 for row in low_attendance if row['present'] * 100 < row['total'] * 75),
+        }
     
     def _get_student_performance_alerts(self) -> List[Dict[str, Any]]:
         """ML-powered student performance alerts with specific context"""
         alerts = []
         try:
             from students.models import Student
-            from student_fees.services import FeeCalculationService
+            from core.fee_management.calculators import AtomicFeeCalculator
+            from core.ml_features import StudentFeatureBuilder
+            from core.ml_integrations import ml_service
             
             # High-risk students with details
             high_risk_students = []
             dropout_risk_students = []
             
-            for student in Student.objects.select_related('class_section')[:100]:
-                try:
-                    balance_info = FeeCalculationService.calculate_student_balance(student)
-                    total_balance = balance_info.get('total_balance', 0)
-                    attendance_rate = student.get_attendance_percentage()
-                    
-                    # ML risk factors with context
-                    if total_balance > 10000:
-                        high_risk_students.append({
-                            'name': f"{student.first_name} {student.last_name}",
-                            'admission_no': student.admission_number,
-                            'class': student.class_section.display_name if student.class_section else 'N/A',
-                            'balance': total_balance,
-                            'attendance': attendance_rate
-                        })
-                    
-                    # Dropout risk with specific criteria
-                    if total_balance > 15000 and attendance_rate < 60:
-                        dropout_risk_students.append({
-                            'name': f"{student.first_name} {student.last_name}",
-                            'admission_no': student.admission_number,
-                            'class': student.class_section.display_name if student.class_section else 'N/A',
-                            'balance': total_balance,
-                            'attendance': attendance_rate,
-                            'risk_score': 0.85 + (total_balance / 100000) + ((100 - attendance_rate) / 100)
-                        })
-                        
-                except Exception:
-                    continue
+            # Balances, attendance and model risk for every student from grouped queries
+            builder = StudentFeatureBuilder(Student.objects.all())
+            balances = AtomicFeeCalculator.calculate_balances(builder.students)
+            predictions = ml_service.predict_risk_batch(builder.students) if ml_service else {}
+            
+            for student in builder.students:
+                total_balance = float(balances[student.id]['total'])
+                attendance_rate = builder.attendance_percentage(student.id)
+                ml_risk = predictions.get(student.id, {}).get('risk_level', 'unknown')
+                
+                # ML risk factors with context
+                if total_balance > 10000:
+                    high_risk_students.append({
+                        'name': f"{student.first_name} {student.last_name}",
+                        'admission_no': student.admission_number,
+                        'class': student.class_section.display_name if student.class_section else 'N/A',
+                        'balance': total_balance,
+                        'attendance': attendance_rate,
+                        'ml_risk': ml_risk
+                    })
+                
+                # Dropout risk with specific criteria
+                if total_balance > 15000 and attendance_rate < 60:
+                    dropout_risk_students.append({
+                        'name': f"{student.first_name} {student.last_name}",
+                        'admission_no': student.admission_number,
+                        'class': student.class_section.display_name if student.class_section else 'N/A',
+                        'balance': total_balance,
+                        'attendance': attendance_rate,
+                        'ml_risk': ml_risk,
+                        'risk_score': 0.85 + (total_balance / 100000) + ((100 - attendance_rate) / 100)
+                    })
             
             if high_risk_students:
                 # Sort by balance (highest first)
@@ -226,56 +354,56 @@ class MLAlertService:
             from students.models import Student
             from datetime import date, timedelta
             
+            from django.db.models import Count, Q
+            
             week_ago = date.today() - timedelta(days=7)
             
             # Students with detailed attendance analysis
             declining_students = []
             irregular_students = []
             
-            for student in Student.objects.select_related('class_section')[:50]:
-                try:
-                    recent_attendance = Attendance.objects.filter(
-                        student=student,
-                        date__gte=week_ago
-                    )
-                    
-                    if recent_attendance.count() > 0:
-                        total_days = recent_attendance.count()
-                        present_days = recent_attendance.filter(status='Present').count()
-                        present_rate = present_days / total_days
-                        
-                        if present_rate < 0.6:  # Less than 60%
-                            declining_students.append({
-                                'name': f"{student.first_name} {student.last_name}",
-                                'admission_no': student.admission_number,
-                                'class': student.class_section.display_name if student.class_section else 'N/A',
-                                'attendance_rate': present_rate * 100,
-                                'present_days': present_days,
-                                'total_days': total_days,
-                                'absent_days': total_days - present_days
-                            })
-                        
-                        # Pattern analysis
-                        monday_absences = recent_attendance.filter(
-                            date__week_day=2, status='Absent'
-                        ).count()
-                        friday_absences = recent_attendance.filter(
-                            date__week_day=6, status='Absent'
-                        ).count()
-                        
-                        if monday_absences >= 2 or friday_absences >= 2:
-                            pattern_type = "Monday pattern" if monday_absences >= 2 else "Friday pattern"
-                            irregular_students.append({
-                                'name': f"{student.first_name} {student.last_name}",
-                                'admission_no': student.admission_number,
-                                'class': student.class_section.display_name if student.class_section else 'N/A',
-                                'pattern': pattern_type,
-                                'frequency': max(monday_absences, friday_absences),
-                                'attendance_rate': present_rate * 100
-                            })
-                            
-                except Exception:
-                    continue
+            # Last week's counts for every student in one grouped query
+            absent = Q(status='Absent')
+            weekly = Attendance.objects.filter(date__gte=week_ago, student__status='ACTIVE').values('student_id').annotate(
+                total_days=Count('id'),
+                present_days=Count('id', filter=Q(status='Present')),
+                monday_absences=Count('id', filter=absent & Q(date__week_day=2)),
+                friday_absences=Count('id', filter=absent & Q(date__week_day=6)),
+            ).order_by()
+            weekly = {row['student_id']: row for row in weekly}
+            students = Student.objects.filter(id__in=list(weekly)).select_related('class_section')
+            
+            for student in students:
+                stats = weekly[student.id]
+                total_days = stats['total_days']
+                present_days = stats['present_days']
+                present_rate = present_days / total_days
+                
+                if present_rate < 0.6:  # Less than 60%
+                    declining_students.append({
+                        'name': f"{student.first_name} {student.last_name}",
+                        'admission_no': student.admission_number,
+                        'class': student.class_section.display_name if student.class_section else 'N/A',
+                        'attendance_rate': present_rate * 100,
+                        'present_days': present_days,
+                        'total_days': total_days,
+                        'absent_days': total_days - present_days
+                    })
+                
+                # Pattern analysis
+                monday_absences = stats['monday_absences']
+                friday_absences = stats['friday_absences']
+                
+                if monday_absences >= 2 or friday_absences >= 2:
+                    pattern_type = "Monday pattern" if monday_absences >= 2 else "Friday pattern"
+                    irregular_students.append({
+                        'name': f"{student.first_name} {student.last_name}",
+                        'admission_no': student.admission_number,
+                        'class': student.class_section.display_name if student.class_section else 'N/A',
+                        'pattern': pattern_type,
+                        'frequency': max(monday_absences, friday_absences),
+                        'attendance_rate': present_rate * 100
+                    })
             
             if declining_students:
                 # Sort by lowest attendance first
@@ -329,39 +457,53 @@ class MLAlertService:
             from subjects.models import ClassSection
             from students.models import Student
             
+            from django.db.models import Count, Exists, OuterRef, Q
+            from student_fees.models import FeeDeposit
+            
             # Detailed class performance analysis
             underperforming_classes = []
             
-            for class_section in ClassSection.objects.all():
-                students_in_class = Student.objects.filter(class_section=class_section)
-                class_size = students_in_class.count()
+            # Size, high dues and paying students of every class in one grouped query
+            has_deposit = Exists(FeeDeposit.objects.filter(student=OuterRef('pk')))
+            class_stats = Student.objects.exclude(class_section=None).annotate(
+                has_deposit=has_deposit
+            ).values('class_section_id').annotate(
+                class_size=Count('id'),
+                high_dues=Count('id', filter=Q(due_amount__gt=8000)),
+                no_payments=Count('id', filter=Q(has_deposit=False)),
+            ).order_by()
+            class_stats = {row['class_section_id']: row for row in class_stats}
+            
+            for class_section in ClassSection.objects.filter(id__in=list(class_stats)):
+                stats = class_stats[class_section.id]
+                class_size = stats['class_size']
+                high_dues = stats['high_dues']
+                no_payments = stats['no_payments']
+                
+                # Calculate performance metrics
+                financial_risk_rate = (high_dues / class_size) * 100
+                payment_engagement = ((class_size - no_payments) / class_size) * 100
                 
-                if class_size > 0:
-                    # Multiple performance indicators
-                    high_dues = students_in_class.filter(due_amount__gt=8000).count()
-                    no_payments = students_in_class.filter(fee_deposits__isnull=True).count()
-                    
-                    # Calculate performance metrics
-                    financial_risk_rate = (high_dues / class_size) * 100
-                    payment_engagement = ((class_size - no_payments) / class_size) * 100
-                    
-                    if financial_risk_rate > 30 or payment_engagement < 50:
-                        # Get specific student details
-                        at_risk_students = students_in_class.filter(
-                            due_amount__gt=8000
-                        )[:3]  # Top 3 at-risk students
-                        
-                        student_names = [f"{s.first_name} {s.last_name} (₹{s.due_amount})" for s in at_risk_students]
-                        
-                        underperforming_classes.append({
-                            'class_name': class_section.display_name,
-                            'total_students': class_size,
-                            'high_dues_count': high_dues,
-                            'financial_risk_rate': financial_risk_rate,
-                            'payment_engagement': payment_engagement,
-                            'at_risk_students': student_names,
-                            'teacher': getattr(class_section, 'class_teacher', 'Not Assigned')
-                        })
+                if financial_risk_rate > 30 or payment_engagement < 50:
+                    underperforming_classes.append({
+                        'class_section_id': class_section.id,
+                        'class_name': class_section.display_name,
+                        'total_students': class_size,
+                        'high_dues_count': high_dues,
+                        'financial_risk_rate': financial_risk_rate,
+                        'payment_engagement': payment_engagement,
+                        'at_risk_students': [],
+                        'teacher': str(getattr(class_section, 'class_teacher', 'Not Assigned'))
+                    })
+            
+            # Top 3 at-risk students of the flagged classes in one query
+            at_risk = {c['class_section_id']: c['at_risk_students'] for c in underperforming_classes}
+            for student in Student.objects.filter(class_section__in=list(at_risk), due_amount__gt=8000).only(
+                'first_name', 'last_name', 'due_amount', 'class_section'
+            ).order_by('class_section_id', 'id'):
+                names = at_risk[student.class_section_id]
+                if len(names) < 3:
+                    names.append(f"{student.first_name} {student.last_name} (₹{student.due_amount})")
             
             if underperforming_classes:
                 # Sort by risk rate (highest first)
@@ -483,41 +625,27 @@ class MLAlertService:
             from subjects.models import SubjectAssignment
             from students.models import Student
             
-            # Teacher workload analysis with proper error handling
+            from django.db.models import Count
+            
+            # Teacher workload analysis from two grouped queries
             overloaded_teachers = []
             
-            for teacher in Teacher.objects.all():
-                try:
-                    # Count subjects assigned through SubjectAssignment
-                    assignments = SubjectAssignment.objects.filter(teacher=teacher).select_related('class_section')
-                    subjects_count = assignments.count()
-                    
-                    # Count total students taught (approximate) with safe access
-                    total_students_taught = 0
-                    for assignment in assignments:
-                        try:
-                            # Safe access to class_section with multiple checks
-                            if hasattr(assignment, 'class_section') and assignment.class_section:
-                                students_in_class = Student.objects.filter(class_section=assignment.class_section).count()
-                                total_students_taught += students_in_class
-                        except AttributeError:
-                            # Skip if class_section field doesn't exist or is None
-                            continue
-                        except Exception:
-                            # Skip any other errors
-                            continue
-                    
-                    # ML workload assessment
-                    if subjects_count > 5 or total_students_taught > 200:
-                        overloaded_teachers.append({
-                            'teacher': teacher,
-                            'subjects': subjects_count,
-                            'students': total_students_taught
-                        })
-                        
-                except Exception:
-                    # Skip this teacher if any error occurs
-                    continue
+            class_sizes = dict(Student.objects.values_list('class_section_id').annotate(size=Count('id')).order_by())
+            workload = {}
+            for teacher_id, class_section_id in SubjectAssignment.objects.values_list('teacher_id', 'class_section_id'):
+                subjects_count, students_taught = workload.get(teacher_id, (0, 0))
+                workload[teacher_id] = (subjects_count + 1, students_taught + class_sizes.get(class_section_id, 0))
+            
+            for teacher in Teacher.objects.filter(id__in=list(workload)):
+                subjects_count, total_students_taught = workload[teacher.id]
+                
+                # ML workload assessment
+                if subjects_count > 5 or total_students_taught > 200:
+                    overloaded_teachers.append({
+                        'teacher': teacher,
+                        'subjects': subjects_count,
+                        'students': total_students_taught
+                    })
             
             if overloaded_teachers:
                 alerts.append({
@@ -538,5 +666,38 @@ class MLAlertService:
         
         return alerts
 
+class MLAlertScheduler:
+    """Optional in-process job that refreshes the alert feed every ML_ALERTS_REFRESH_INTERVAL seconds"""
+    
+    def __init__(self, service, interval=None):
+        self.service = service
+        self.interval = interval or getattr(settings, 'ML_ALERTS_REFRESH_INTERVAL', 900)
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ml-alert-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"ML alert scheduler started (every {self.interval}s)")
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        # First run shortly after startup, then every interval
+        delay = min(self.interval, 30)
+        while not self._stop.wait(delay):
+            try:
+                self.service.materialize()
+            except Exception as e:
+                logger.error(f"Scheduled ML alert materialization failed: {e}")
+            finally:
+                close_old_connections()
+            delay = self.interval
+
 # Global instance
-ml_alert_service = MLAlertService()
\ No newline at end of file
+ml_alert_service = MLAlertService()
+ml_alert_scheduler = MLAlertScheduler(ml_alert_service)
\ No newline at end of file
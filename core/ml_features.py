@@ -0,0 +1,197 @@
+# core/ml_features.py - Batch feature extraction for student risk models
+"""
+Builds the features of many students from a handful of grouped queries
+(attendance, payments, fines) instead of several queries per student, so a
+whole class or school can be scored with one model call.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import logging
+
+from django.db.models import Avg, Case, Count, F, FloatField, Q, StdDev, Sum, When
+from django.db.models.functions import ExtractDay
+from django.utils import timezone
+
+from .ml_lazy_loader import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when a student has some data but not this feature
+DEFAULT_ATTENDANCE_RATE = 0.85
+DEFAULT_PAYMENT_SCORE = 0.75
+DEFAULT_AGE = 15
+
+
+class StudentFeatureBuilder:
+    """Aggregated per-student features for a queryset or list of students"""
+
+    ATTENDANCE_WINDOW_DAYS = 30
+    PAYMENT_WINDOW_DAYS = 90
+    FEE_DUE_DAY = 10  # Fees are due on the 10th of each month
+    CHUNK_SIZE = 500
+
+    def __init__(self, students, as_of=None):
+        if hasattr(students, 'select_related'):
+            students = students.select_related('class_section')
+        self.students = list(students)
+        self.ids = [student.id for student in self.students]
+        self.as_of = as_of or timezone.localdate()
+        self._attendance = None
+        self._payments = None
+        self._fines = None
+
+    def _grouped(self, build_query):
+        """Run ``build_query(ids)`` per chunk of ids and index the rows by student_id"""
+        rows = {}
+        for start in range(0, len(self.ids), self.CHUNK_SIZE):
+            for row in build_query(self.ids[start:start + self.CHUNK_SIZE]):
+                rows[row['student_id']] = row
+        return rows
+
+    @property
+    def attendance(self):
+        """{student_id: total, present, recent_total, recent_present}"""
+        if self._attendance is None:
+            from attendance.models import Attendance
+            since = self.as_of - timedelta(days=self.ATTENDANCE_WINDOW_DAYS)
+            recent = Q(date__gte=since, date__lte=self.as_of)
+            self._attendance = self._grouped(lambda ids: Attendance.objects.filter(
+                student__in=ids
+            ).values('student_id').annotate(
+                total=Count('id'),
+                present=Count('id', filter=Q(status='Present')),
+                recent_total=Count('id', filter=recent),
+                recent_present=Count('id', filter=recent & Q(status='Present')),
+            ).order_by())
+        return self._attendance
+
+    @property
+    def payments(self):
+        """{student_id: count, recent_count, avg_delay, paid_mean, paid_std}"""
+        if self._payments is None:
+            from student_fees.models import FeeDeposit
+            since = timezone.now() - timedelta(days=self.PAYMENT_WINDOW_DAYS)
+            delay = Case(
+                When(deposit_date__day__gt=self.FEE_DUE_DAY,
+                     then=ExtractDay('deposit_date') - self.FEE_DUE_DAY),
+                output_field=FloatField(),
+            )
+            self._payments = self._grouped(lambda ids: FeeDeposit.objects.filter(
+                student__in=ids
+            ).values('student_id').annotate(
+                count=Count('id'),
+                recent_count=Count('id', filter=Q(deposit_date__gte=since)),
+                avg_delay=Avg(delay),
+                paid_mean=Avg(F('paid_amount'), output_field=FloatField()),
+                paid_std=StdDev(F('paid_amount'), output_field=FloatField()),
+            ).order_by())
+        return self._payments
+
+    @property
+    def fines(self):
+        """{student_id: count, unpaid_amount}"""
+        if self._fines is None:
+            from fines.models import FineStudent
+            self._fines = self._grouped(lambda ids: FineStudent.objects.filter(
+                student__in=ids
+            ).values('student_id').annotate(
+                count=Count('id'),
+                unpaid_amount=Sum('fine__amount', filter=Q(is_paid=False)),
+            ).order_by())
+        return self._fines
+
+    # ------------------------------------------------------------------
+    # Individual features (None when the student has no data for them)
+    # ------------------------------------------------------------------
+
+    def attendance_rate(self, student_id):
+        """Share of present days in the last 30 days"""
+        stats = self.attendance.get(student_id)
+        if not stats or not stats['recent_total']:
+            return None
+        return min(stats['recent_present'] / stats['recent_total'], 1.0)
+
+    def attendance_percentage(self, student_id):
+        """All-time attendance percentage, as Student.attendance_percentage"""
+        stats = self.attendance.get(student_id)
+        if not stats or not stats['total']:
+            return 0
+        return round(stats['present'] / stats['total'] * 100, 2)
+
+    def payment_score(self, student_id):
+        """Payments in the last 90 days, three or more scoring 1.0"""
+        stats = self.payments.get(student_id)
+        if not stats or not stats['recent_count']:
+            return None
+        return min(stats['recent_count'] / 3, 1.0)
+
+    def fine_count(self, student_id):
+        stats = self.fines.get(student_id)
+        return stats['count'] if stats else 0
+
+    def age(self, student):
+        birth = getattr(student, 'date_of_birth', None)
+        if not birth:
+            return getattr(student, 'age', None)
+        today = self.as_of
+        return today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+
+    def outstanding_amount(self, student):
+        """Carry-forward due plus unpaid fines"""
+        stats = self.fines.get(student.id)
+        unpaid = (stats['unpaid_amount'] if stats else None) or Decimal('0')
+        return (student.due_amount or Decimal('0')) + unpaid
+
+    # ------------------------------------------------------------------
+    # Feature rows
+    # ------------------------------------------------------------------
+
+    def risk_features(self):
+        """
+        {student_id: [attendance_rate, payment_score, fine_count, age]} in the
+        layout of the performance model, or None for students with no data.
+        """
+        features = {}
+        for student in self.students:
+            attendance_rate = self.attendance_rate(student.id)
+            payment_score = self.payment_score(student.id)
+            fine_count = self.fine_count(student.id)
+            age = self.age(student)
+            if attendance_rate is None and payment_score is None and not fine_count and age is None:
+                features[student.id] = None
+                continue
+            features[student.id] = [
+                attendance_rate if attendance_rate is not None else DEFAULT_ATTENDANCE_RATE,
+                payment_score if payment_score is not None else DEFAULT_PAYMENT_SCORE,
+                fine_count,
+                age if age is not None else DEFAULT_AGE,
+            ]
+        return features
+
+    def fee_risk_matrix(self):
+        """
+        NumPy matrix for the fee collection risk model, one row per student:
+        payments, avg delay, consistency, outstanding, 30-day attendance, class id.
+        """
+        rows = []
+        for student in self.students:
+            stats = self.payments.get(student.id) or {}
+            count = stats.get('count', 0)
+            mean = stats.get('paid_mean') or 0
+            if count < 2:
+                consistency = 0.5
+            else:
+                cv = (stats.get('paid_std') or 0) / mean if mean > 0 else 1
+                consistency = max(0, 1 - cv)
+            attendance_rate = self.attendance_rate(student.id)
+            rows.append([
+                count,
+                stats.get('avg_delay') or 0,
+                consistency,
+                float(self.outstanding_amount(student)),
+                attendance_rate if attendance_rate is not None else 0.75,
+                student.class_section_id or 0,
+            ])
+        return np.array(rows, dtype=float).reshape(len(rows), 6)
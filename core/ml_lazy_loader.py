@@ -1,53 +1,102 @@
 # Lazy ML Model Loader - Performance Fix
-import os
+"""
+Deferred imports for heavy optional dependencies.
+
+numpy, pandas, scikit-learn and joblib cost hundreds of MB and seconds per
+worker. Modules that need them bind a LazyModule at import time instead and
+the real import happens on first attribute access, so workers that never
+serve an ML or export page never load them. module_available() answers
+"is it installed?" without importing anything.
+"""
+import importlib
+import importlib.util
 import logging
-from django.conf import settings
-from django.core.cache import cache
+import sys
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+HEAVY_MODULES = ('numpy', 'pandas', 'sklearn', 'joblib', 'scipy')
+
+
+def module_available(name):
+    """True if ``name`` can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+    
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+    
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+                    logger.info(f"Deferred import of {self.__dict__['_name']} took "
+                                f"{(time.perf_counter() - start) * 1000:.0f}ms")
+        return module
+    
+    @property
+    def is_loaded(self):
+        return self.__dict__['_module'] is not None
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+    
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+    
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def lazy_import(name):
+    """Return the module if it is already imported, otherwise a LazyModule"""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def loaded_heavy_modules():
+    """Heavy dependencies already imported in this process"""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
 class LazyMLService:
     """Lazy-loading ML service to improve startup performance"""
     
     def __init__(self):
         self._models = {}
-        self._model_cache_timeout = 3600  # 1 hour
         
     def _load_model_if_needed(self, model_name):
-        """Load model only when first accessed"""
-        if model_name not in self._models:
-            try:
-                # Check cache first
-                cache_key = f"ml_model_{model_name}"
-                cached_model = cache.get(cache_key)
-                
-                if cached_model:
-                    self._models[model_name] = cached_model
-                    return True
-                
-                # Load from disk
-                model_path = os.path.join(settings.BASE_DIR, 'models', f'{model_name}.pkl')
-                if os.path.exists(model_path):
-                    import pickle
-                    with open(model_path, 'rb') as f:
-                        model = pickle.load(f)
-                    
-                    self._models[model_name] = model
-                    cache.set(cache_key, model, self._model_cache_timeout)
-                    logger.info(f"Loaded ML model: {model_name}")
-                    return True
-                else:
-                    logger.warning(f"ML model not found: {model_name}")
-                    return False
-                    
-            except Exception as e:
-                logger.error(f"Failed to load ML model {model_name}: {e}")
+        """Load model only when first accessed, from the shared model registry"""
+        from .ml_registry import model_registry
+        try:
+            # Memory-mapped and cached per version by the registry
+            model = model_registry.get(model_name)
+            if model is None:
+                logger.warning(f"ML model not found: {model_name}")
                 return False
-        return True
+            self._models[model_name] = model
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load ML model {model_name}: {e}")
+            return False
     
     def predict_student_performance(self, student_id):
         """Lazy-loaded student performance prediction"""
-        if not self._load_model_if_needed('student_performance_model'):
+        if not self._load_model_if_needed('student_performance'):
             return {'risk_level': 'unknown', 'error': 'Model not available'}
         
         try:
@@ -1,5 +1,4 @@
 # ML Models for School Management System - TDD Implementation
-import joblib
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
@@ -7,10 +6,9 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, mean_squared_error
 from sklearn.preprocessing import StandardScaler
 import logging
-import os
-from pathlib import Path
 from typing import Dict, List, Any
-import time
+
+from .ml_registry import model_registry
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +25,8 @@ class StudentPerformancePredictor:
         self.scaler = StandardScaler()
         self.is_trained = False
         self.feature_names = ['attendance_rate', 'previous_grade', 'assignment_completion']
-        self.model_path = Path('models/student_performance_model.pkl')
-        self.scaler_path = Path('models/student_performance_scaler.pkl')
+        self.registry_name = 'student_performance'
+        self.version = None
     
     def train(self, training_data: pd.DataFrame) -> Dict[str, float]:
         """Train the performance prediction model"""
@@ -75,8 +73,7 @@ class StudentPerformancePredictor:
     
     def predict(self, features: List[float]) -> np.ndarray:
         """Predict performance probabilities"""
-        if not self.is_trained:
-            self._load_model()
+        self._load_model()
         
         try:
             # Ensure features are in correct format
@@ -120,28 +117,31 @@ class StudentPerformancePredictor:
         }
     
     def _save_model(self):
-        """Save trained model and scaler"""
+        """Publish trained model and scaler to the model registry"""
         try:
-            # Create models directory if it doesn't exist
-            self.model_path.parent.mkdir(exist_ok=True)
-            
-            # Save model and scaler
-            joblib.dump(self.model, self.model_path)
-            joblib.dump(self.scaler, self.scaler_path)
-            
-            logger.info("Model and scaler saved successfully")
+            self.version = model_registry.publish(
+                self.registry_name,
+                {'model': self.model, 'scaler': self.scaler},
+                {'features': self.feature_names},
+            )
+            logger.info(f"Model and scaler published as {self.version}")
             
         except Exception as e:
             logger.error(f"Failed to save model: {e}")
     
     def _load_model(self):
-        """Load trained model and scaler"""
+        """Load the published model and scaler, switching when a new version is published"""
         try:
-            if self.model_path.exists() and self.scaler_path.exists():
-                self.model = joblib.load(self.model_path)
-                self.scaler = joblib.load(self.scaler_path)
+            version = model_registry.version(self.registry_name)
+            if self.is_trained and version in (None, self.version):
+                return
+            bundle = model_registry.get(self.registry_name)
+            if bundle:
+                self.model = bundle['model']
+                self.scaler = bundle['scaler']
+                self.version = version
                 self.is_trained = True
-                logger.info("Model and scaler loaded successfully")
+                logger.info(f"Model and scaler loaded ({version or 'legacy files'})")
             else:
                 logger.warning("No trained model found")
                 
@@ -160,8 +160,8 @@ class PaymentDelayPredictor:
         self.scaler = StandardScaler()
         self.is_trained = False
         self.feature_names = ['amount', 'days_until_due', 'previous_delays', 'parent_income_bracket']
-        self.model_path = Path('models/payment_delay_model.pkl')
-        self.scaler_path = Path('models/payment_delay_scaler.pkl')
+        self.registry_name = 'payment_delay'
+        self.version = None
     
     def train(self, training_data: pd.DataFrame) -> Dict[str, float]:
         """Train the payment delay prediction model"""
@@ -208,8 +208,7 @@ class PaymentDelayPredictor:
     
     def predict_delay(self, features: List[float]) -> Dict[str, Any]:
         """Predict payment delay"""
-        if not self.is_trained:
-            self._load_model()
+        self._load_model()
         
         try:
             # Ensure features are in correct format
@@ -239,23 +238,30 @@ class PaymentDelayPredictor:
             }
     
     def _save_model(self):
-        """Save trained model and scaler"""
+        """Publish trained model and scaler to the model registry"""
         try:
-            self.model_path.parent.mkdir(exist_ok=True)
-            joblib.dump(self.model, self.model_path)
-            joblib.dump(self.scaler, self.scaler_path)
-            logger.info("Payment delay model saved successfully")
+            self.version = model_registry.publish(
+                self.registry_name,
+                {'model': self.model, 'scaler': self.scaler},
+                {'features': self.feature_names},
+            )
+            logger.info(f"Payment delay model published as {self.version}")
         except Exception as e:
             logger.error(f"Failed to save payment delay model: {e}")
     
     def _load_model(self):
-        """Load trained model and scaler"""
+        """Load the published model and scaler, switching when a new version is published"""
         try:
-            if self.model_path.exists() and self.scaler_path.exists():
-                self.model = joblib.load(self.model_path)
-                self.scaler = joblib.load(self.scaler_path)
+            version = model_registry.version(self.registry_name)
+            if self.is_trained and version in (None, self.version):
+                return
+            bundle = model_registry.get(self.registry_name)
+            if bundle:
+                self.model = bundle['model']
+                self.scaler = bundle['scaler']
+                self.version = version
                 self.is_trained = True
-                logger.info("Payment delay model loaded successfully")
+                logger.info(f"Payment delay model loaded ({version or 'legacy files'})")
             else:
                 logger.warning("No trained payment delay model found")
         except Exception as e:
@@ -268,13 +274,14 @@ class AttendancePatternAnalyzer:
         from sklearn.cluster import KMeans
         self.model = KMeans(n_clusters=3, random_state=42)  # Low, Medium, High attendance
         self.is_trained = False
-        self.model_path = Path('models/attendance_pattern_model.pkl')
+        self.registry_name = 'attendance_pattern'
+        self.version = None
     
     def analyze_patterns(self, attendance_data: np.ndarray) -> Dict[str, Any]:
         """Analyze attendance patterns using clustering"""
         try:
-            if not self.is_trained:
-                self._train_or_load()
+            if not self._load():
+                raise ValueError("Attendance pattern model has not been trained")
             
             # Predict cluster
             cluster = self.model.predict(attendance_data.reshape(1, -1))[0]
@@ -311,28 +318,30 @@ class AttendancePatternAnalyzer:
                 'cluster': 1
             }
     
-    def _train_or_load(self):
-        """Train model with synthetic data or load existing model"""
-        try:
-            if self.model_path.exists():
-                self.model = joblib.load(self.model_path)
-                self.is_trained = True
-                logger.info("Attendance pattern model loaded")
-            else:
-                # Generate synthetic training data
-                np.random.seed(42)
-                synthetic_data = np.random.beta(2, 2, (1000, 30))  # 1000 students, 30 days
-                
-                self.model.fit(synthetic_data)
-                self.is_trained = True
-                
-                # Save model
-                self.model_path.parent.mkdir(exist_ok=True)
-                joblib.dump(self.model, self.model_path)
-                logger.info("Attendance pattern model trained and saved")
-                
-        except Exception as e:
-            logger.error(f"Failed to train/load attendance model: {e}")
+    def train(self):
+        """Fit the clusters on synthetic attendance data and publish the model"""
+        # Generate synthetic training data
+        np.random.seed(42)
+        synthetic_data = np.random.beta(2, 2, (1000, 30))  # 1000 students, 30 days
+        
+        self.model.fit(synthetic_data)
+        self.version = model_registry.publish(self.registry_name, self.model, {'samples': 1000, 'days': 30})
+        self.is_trained = True
+        logger.info(f"Attendance pattern model trained and published as {self.version}")
+    
+    def _load(self):
+        """Load the published model; never trains in the request path"""
+        version = model_registry.version(self.registry_name)
+        if self.is_trained and version in (None, self.version):
+            return True
+        model = model_registry.get(self.registry_name)
+        if model is None:
+            return False
+        self.model = model
+        self.version = version
+        self.is_trained = True
+        logger.info(f"Attendance pattern model loaded ({version or 'legacy files'})")
+        return True
 
 # Model instances
 student_performance_predictor = StudentPerformancePredictor()
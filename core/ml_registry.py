@@ -0,0 +1,227 @@
+# core/ml_registry.py - Versioned, memory-mapped ML model registry
+"""
+Trained models are published as versioned artifacts under ML_REGISTRY_DIR:
+
+    manifest.json                     {name: current version + metadata}
+    <name>/<version>/model.joblib     uncompressed joblib dump
+
+Artifacts are written uncompressed so joblib can load their NumPy arrays with
+mmap_mode='r': every worker maps the same file read-only and the OS keeps a
+single physical copy in the page cache. Workers re-read the manifest at most
+every ML_REGISTRY_CHECK_INTERVAL seconds and switch to a newly published
+version on their next access. Nothing here trains a model; publishing is done
+by ``train_ml_models`` and ``ml_registry --import-legacy``.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+import logging
+
+from .ml_lazy_loader import lazy_import
+
+joblib = lazy_import('joblib')
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+ARTIFACT_FILE = 'model.joblib'
+
+# Registry name -> pickle files the models/ directory used before the registry.
+# Two files are published together as {'model': ..., 'scaler': ...}.
+LEGACY_MODELS = {
+    'performance': ('performance_model.pkl',),
+    'fee_collection': ('fee_collection_model.pkl',),
+    'attendance': ('attendance_model.pkl',),
+    'student_performance': ('student_performance_model.pkl', 'student_performance_scaler.pkl'),
+    'payment_delay': ('payment_delay_model.pkl', 'payment_delay_scaler.pkl'),
+    'attendance_pattern': ('attendance_pattern_model.pkl',),
+}
+
+
+class ModelRegistry:
+    """Publish and load versioned model artifacts shared between processes"""
+
+    def __init__(self, root=None):
+        self._root = root
+        self._lock = threading.Lock()
+        self._manifest = {}
+        self._manifest_mtime = None
+        self._checked_at = None
+        self._loaded = {}  # name -> (version, model)
+
+    @property
+    def root(self):
+        return self._root or getattr(settings, 'ML_REGISTRY_DIR',
+                                     os.path.join(settings.BASE_DIR, 'models', 'registry'))
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable model manifest {self.manifest_path}: {e}")
+            return {}
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(manifest, fh, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def manifest(self, force=False):
+        """Current manifest, re-read when the file changed (checked every interval)"""
+        now = time.monotonic()
+        interval = getattr(settings, 'ML_REGISTRY_CHECK_INTERVAL', 30)
+        if force or self._checked_at is None or now - self._checked_at >= interval:
+            with self._lock:
+                self._checked_at = now
+                try:
+                    mtime = os.stat(self.manifest_path).st_mtime_ns
+                except OSError:
+                    mtime = None
+                if force or mtime != self._manifest_mtime:
+                    self._manifest = self._read_manifest() if mtime else {}
+                    self._manifest_mtime = mtime
+        return self._manifest
+
+    def version(self, name):
+        entry = self.manifest().get(name)
+        return entry['version'] if entry else None
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def get(self, name, default=None):
+        """Model published under ``name`` (memory-mapped), or ``default``"""
+        entry = self.manifest().get(name)
+        if not entry:
+            return self._get_legacy(name, default)
+        version = entry['version']
+        loaded = self._loaded.get(name)
+        if loaded and loaded[0] == version:
+            return loaded[1]
+
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded and loaded[0] == version:
+                return loaded[1]
+            path = os.path.join(self.root, name, version, ARTIFACT_FILE)
+            try:
+                start = time.perf_counter()
+                model = joblib.load(path, mmap_mode='r')
+            except Exception as e:
+                logger.error(f"Failed to load model {name} {version}: {e}")
+                return loaded[1] if loaded else default
+            self._loaded[name] = (version, model)
+            logger.info(f"Loaded model {name} {version} in {(time.perf_counter() - start) * 1000:.0f}ms")
+            return model
+
+    def _get_legacy(self, name, default):
+        """Fall back to the loose models/*.pkl files until they are imported"""
+        loaded = self._loaded.get(name)
+        if loaded and loaded[0] == 'legacy':
+            return loaded[1]
+        files = LEGACY_MODELS.get(name)
+        if not files:
+            return default
+        paths = [os.path.join(settings.BASE_DIR, 'models', filename) for filename in files]
+        if not all(os.path.exists(path) for path in paths):
+            return default
+        with self._lock:
+            try:
+                objects = [joblib.load(path, mmap_mode='r') for path in paths]
+            except Exception as e:
+                logger.error(f"Failed to load legacy model {name}: {e}")
+                return default
+            model = objects[0] if len(objects) == 1 else {'model': objects[0], 'scaler': objects[1]}
+            self._loaded[name] = ('legacy', model)
+        logger.info(f"Loaded legacy model files for {name}; run `manage.py ml_registry --import-legacy`")
+        return model
+
+    def clear(self):
+        """Forget loaded models and the cached manifest"""
+        with self._lock:
+            self._loaded.clear()
+            self._manifest = {}
+            self._manifest_mtime = None
+            self._checked_at = None
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    def publish(self, name, model, metadata=None):
+        """Write ``model`` as the next version of ``name`` and make it current"""
+        manifest = self._read_manifest()
+        previous = manifest.get(name, {})
+        number = int(previous.get('version', 'v0')[1:]) + 1
+        version = f'v{number:04d}'
+
+        version_dir = os.path.join(self.root, name, version)
+        os.makedirs(version_dir, exist_ok=True)
+        path = os.path.join(version_dir, ARTIFACT_FILE)
+        joblib.dump(model, path)  # Uncompressed so it can be memory-mapped
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+                sha256.update(chunk)
+
+        manifest = self._read_manifest()
+        manifest[name] = {
+            'version': version,
+            'published_at': timezone.now().isoformat(),
+            'size': os.path.getsize(path),
+            'sha256': sha256.hexdigest(),
+            'metadata': metadata or {},
+        }
+        self._write_manifest(manifest)
+        self._prune(name, version)
+        self.manifest(force=True)
+        logger.info(f"Published model {name} {version}")
+        return version
+
+    def _prune(self, name, current):
+        keep = getattr(settings, 'ML_REGISTRY_KEEP_VERSIONS', 3)
+        model_dir = os.path.join(self.root, name)
+        versions = sorted(v for v in os.listdir(model_dir) if v.startswith('v'))
+        for version in versions[:-keep] if keep > 0 else []:
+            if version != current:
+                shutil.rmtree(os.path.join(model_dir, version), ignore_errors=True)
+
+    def import_legacy(self, models_dir=None, overwrite=False):
+        """Publish the loose models/*.pkl files; returns {name: version}"""
+        models_dir = models_dir or os.path.join(settings.BASE_DIR, 'models')
+        manifest = self._read_manifest()
+        published = {}
+        for name, files in LEGACY_MODELS.items():
+            if name in manifest and not overwrite:
+                continue
+            paths = [os.path.join(models_dir, filename) for filename in files]
+            if not all(os.path.exists(path) for path in paths):
+                continue
+            objects = [joblib.load(path) for path in paths]
+            model = objects[0] if len(objects) == 1 else {'model': objects[0], 'scaler': objects[1]}
+            published[name] = self.publish(name, model, {'source': ', '.join(files)})
+        return published
+
+
+model_registry = ModelRegistry()
@@ -9,125 +9,132 @@ from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
-# Try to import ML dependencies with graceful fallback
-try:
-    import numpy as np
-    import pandas as pd
-    from sklearn.ensemble import RandomForestClassifier
-    from sklearn.preprocessing import StandardScaler
-    import joblib
-    ML_DEPENDENCIES_AVAILABLE = True
-except ImportError:
-    ML_DEPENDENCIES_AVAILABLE = False
+# Heavy ML dependencies are imported on first use, not when this module loads
+from .ml_lazy_loader import module_available
+
+ML_DEPENDENCIES_AVAILABLE = all(module_available(name) for name in ('numpy', 'pandas', 'sklearn', 'joblib'))
+if not ML_DEPENDENCIES_AVAILABLE:
     logger.warning("ML dependencies not available. Install scikit-learn, pandas, numpy for ML features.")
 
-# Import ML models
-try:
-    from .ml_models import (
-        student_performance_predictor,
-        payment_delay_predictor,
-        attendance_pattern_analyzer
-    )
-    ML_MODELS_AVAILABLE = True
-except ImportError:
-    ML_MODELS_AVAILABLE = False
-    logger.warning("ML models not available")
+# Predictors live in core.ml_models (imports sklearn); only check they can be loaded
+ML_MODELS_AVAILABLE = ML_DEPENDENCIES_AVAILABLE and module_available('core.ml_models')
 
 class MLService:
     """Local ML service with zero API costs"""
     
-    def __init__(self):
-        self.models_path = 'models/'
-        self.models = {}
-        self.load_models()
+    model_names = ('performance', 'fee_collection', 'attendance')
     
-    def load_models(self):
-        """Load all trained models"""
-        try:
-            model_files = {
-                'performance': 'performance_model.pkl',
-                'fee_collection': 'fee_collection_model.pkl',
-                'attendance': 'attendance_model.pkl'
-            }
-            
-            for name, filename in model_files.items():
-                filepath = os.path.join(self.models_path, filename)
-                if os.path.exists(filepath):
-                    self.models[name] = joblib.load(filepath)
-                    logger.info(f"Loaded {name} model")
-                else:
-                    logger.warning(f"Model {filename} not found")
-                    
-        except Exception as e:
-            logger.error(f"Error loading models: {e}")
+    @property
+    def models(self):
+        """Trained models from the shared registry; picks up newly published versions"""
+        if not ML_DEPENDENCIES_AVAILABLE:
+            return {}
+        from .ml_registry import model_registry
+        
+        models = {}
+        for name in self.model_names:
+            model = model_registry.get(name)
+            if model is not None:
+                models[name] = model
+        return models
     
     def predict_student_risk(self, student):
         """Predict student dropout/performance risk - returns None if no data"""
+        return self.predict_risk_batch([student])[student.id]
+    
+    def predict_risk_batch(self, students):
+        """
+        Predict risk for a queryset or list of students at once: features come
+        from a few grouped queries and the model scores every row in one call.
+        Returns {student_id: prediction} in the predict_student_risk format.
+        """
+        from .ml_features import StudentFeatureBuilder, np
+        
         try:
-            # Extract features
-            features = self.extract_student_features(student)
-            
-            # Check if we have actual data
-            if features is None:
-                return {
+            builder = StudentFeatureBuilder(students)
+            features = builder.risk_features()
+        except Exception as e:
+            logger.error(f"Risk feature extraction error: {e}")
+            return {}
+        
+        results = {}
+        scored = []
+        for student_id, row in features.items():
+            if row is None:
+                results[student_id] = {
                     'status': 'no_data',
                     'message': 'Insufficient data for prediction',
                     'risk_level': 'unknown',
                     'confidence': 0.0,
                     'recommendations': ['Collect more student data for accurate predictions']
                 }
-            
-            # If no ML model available, return data-based assessment
-            if 'performance' not in self.models:
-                attendance_rate, payment_score, fine_count, age = features
-                
-                # Simple rule-based assessment using actual data
-                risk_score = 0
-                if attendance_rate is not None and attendance_rate < 0.75:
-                    risk_score += 0.4
-                if payment_score is not None and payment_score < 0.5:
-                    risk_score += 0.3
-                if fine_count is not None and fine_count > 2:
-                    risk_score += 0.3
-                
-                if risk_score > 0.6:
-                    risk_level = 'high'
-                elif risk_score > 0.3:
-                    risk_level = 'medium'
-                else:
-                    risk_level = 'low'
-                
-                return {
-                    'status': 'rule_based',
-                    'risk_level': risk_level,
-                    'confidence': min(risk_score + 0.2, 1.0),
-                    'recommendations': self.get_risk_recommendations_by_level(risk_level),
-                    'data_available': True
+            else:
+                scored.append((student_id, row))
+        
+        if not scored:
+            return results
+        
+        # If no ML model available, return data-based assessment
+        model = self.models.get('performance')
+        if model is None:
+            for student_id, row in scored:
+                results[student_id] = self._rule_based_risk(row)
+            return results
+        
+        # Use ML model: one predict_proba call for every student
+        try:
+            X = np.asarray([row for _, row in scored], dtype=float)
+            probabilities = model.predict_proba(X)
+            predictions = model.classes_[probabilities.argmax(axis=1)]
+            confidences = probabilities.max(axis=1)
+        except Exception as e:
+            logger.error(f"Risk prediction error: {e}")
+            for student_id, _ in scored:
+                results[student_id] = {
+                    'status': 'error',
+                    'message': f'Prediction failed: {str(e)}',
+                    'risk_level': 'unknown',
+                    'confidence': 0.0
                 }
-            
-            # Use ML model if available
-            model = self.models['performance']
-            prediction = model.predict([features])[0]
-            confidence = max(model.predict_proba([features])[0])
-            
-            risk_levels = {0: 'high', 1: 'medium', 2: 'low'}
-            
-            return {
+            return results
+        
+        risk_levels = {0: 'high', 1: 'medium', 2: 'low'}
+        for (student_id, _), prediction, confidence in zip(scored, predictions, confidences):
+            results[student_id] = {
                 'status': 'ml_prediction',
-                'risk_level': risk_levels.get(prediction, 'medium'),
+                'risk_level': risk_levels.get(int(prediction), 'medium'),
                 'confidence': float(confidence),
-                'recommendations': self.get_risk_recommendations(prediction),
+                'recommendations': self.get_risk_recommendations(int(prediction)),
                 'data_available': True
             }
-            
-        except Exception as e:
-            logger.error(f"Risk prediction error: {e}")
-            return {
-                'status': 'error',
-                'message': f'Prediction failed: {str(e)}',
-                'risk_level': 'unknown',
-                'confidence': 0.0
-            }
+        return results
+    
+    def _rule_based_risk(self, features):
+        """Simple assessment from the features when no trained model exists"""
+        attendance_rate, payment_score, fine_count, age = features
+        
+        risk_score = 0
+        if attendance_rate < 0.75:
+            risk_score += 0.4
+        if payment_score < 0.5:
+            risk_score += 0.3
+        if fine_count > 2:
+            risk_score += 0.3
+        
+        if risk_score > 0.6:
+            risk_level = 'high'
+        elif risk_score > 0.3:
+            risk_level = 'medium'
+        else:
+            risk_level = 'low'
+        
+        return {
+            'status': 'rule_based',
+            'risk_level': risk_level,
+            'confidence': min(risk_score + 0.2, 1.0),
+            'recommendations': self.get_risk_recommendations_by_level(risk_level),
+            'data_available': True
+        }
     
     def get_optimal_fee_collection_days(self):
         """Get optimal days for fee collection"""
@@ -148,14 +155,14 @@ class MLService:
             if 'attendance' not in self.models:
                 return {'low': [], 'medium': [], 'high': []}
             
-            # Extract attendance rates
+            # Extract attendance rates (one grouped query for all students)
+            from .ml_features import StudentFeatureBuilder, DEFAULT_ATTENDANCE_RATE
+            builder = StudentFeatureBuilder(students)
+            student_list = builder.students
             attendance_data = []
-            student_list = []
-            
-            for student in students:
-                rate = self.get_student_attendance_rate(student)
-                attendance_data.append([rate])
-                student_list.append(student)
+            for student in student_list:
+                rate = builder.attendance_rate(student.id)
+                attendance_data.append([rate if rate is not None else DEFAULT_ATTENDANCE_RATE])
             
             # Predict clusters
             model = self.models['attendance']
@@ -178,93 +185,26 @@ class MLService:
     def extract_student_features(self, student):
         """Extract features for ML prediction - returns None if no data"""
         try:
-            # Attendance rate
-            attendance_rate = self.get_student_attendance_rate(student)
-            
-            # Payment score
-            payment_score = self.get_student_payment_score(student)
-            
-            # Fine count
-            fine_count = self.get_student_fine_count(student)
-            
-            # Age
-            age = getattr(student, 'age', None)
-            if hasattr(student, 'date_of_birth') and student.date_of_birth:
-                from datetime import date
-                today = date.today()
-                age = today.year - student.date_of_birth.year
-                if today < student.date_of_birth.replace(year=today.year):
-                    age -= 1
-            
-            # Check if we have any actual data
-            has_data = any([
-                attendance_rate is not None,
-                payment_score is not None,
-                fine_count is not None and fine_count > 0,
-                age is not None
-            ])
-            
-            if not has_data:
-                return None  # No data available for prediction
-            
-            # Fill missing values with neutral defaults only when we have some data
-            return [
-                attendance_rate if attendance_rate is not None else 0.85,
-                payment_score if payment_score is not None else 0.75,
-                fine_count if fine_count is not None else 0,
-                age if age is not None else 15
-            ]
-            
+            from .ml_features import StudentFeatureBuilder
+            return StudentFeatureBuilder([student]).risk_features()[student.id]
         except Exception as e:
             logger.error(f"Feature extraction error: {e}")
             return None
     
     def get_student_attendance_rate(self, student):
         """Get student attendance rate - returns None if no data"""
-        try:
-            from attendance.models import AttendanceRecord
-            total_days = 30
-            total_records = AttendanceRecord.objects.filter(
-                student=student,
-                date__gte=datetime.now().date() - timedelta(days=total_days)
-            ).count()
-            
-            if total_records == 0:
-                return None  # No attendance data available
-                
-            present_days = AttendanceRecord.objects.filter(
-                student=student,
-                date__gte=datetime.now().date() - timedelta(days=total_days),
-                is_present=True
-            ).count()
-            return min(present_days / total_records, 1.0)
-        except:
-            return None
+        from .ml_features import StudentFeatureBuilder
+        return StudentFeatureBuilder([student]).attendance_rate(student.id)
     
     def get_student_payment_score(self, student):
         """Get student payment reliability score - returns None if no data"""
-        try:
-            from student_fees.models import FeeDeposit
-            recent_payments = FeeDeposit.objects.filter(
-                student=student,
-                deposit_date__gte=datetime.now() - timedelta(days=90)
-            ).count()
-            
-            # If no payment history, return None
-            if recent_payments == 0:
-                return None
-                
-            return min(recent_payments / 3, 1.0)
-        except:
-            return None
+        from .ml_features import StudentFeatureBuilder
+        return StudentFeatureBuilder([student]).payment_score(student.id)
     
     def get_student_fine_count(self, student):
         """Get student fine count - returns actual count or None"""
-        try:
-            from fines.models import FineStudent
-            return FineStudent.objects.filter(student=student).count()
-        except:
-            return None
+        from .ml_features import StudentFeatureBuilder
+        return StudentFeatureBuilder([student]).fine_count(student.id)
     
     def get_risk_recommendations(self, risk_level):
         """Get recommendations based on risk level"""
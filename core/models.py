@@ -71,4 +71,34 @@ class AuditLog(models.Model):
         indexes = [
             models.Index(fields=['user', 'action']),
             models.Index(fields=['created_at']),
-        ]
\ No newline at end of file
+        ]
+
+
+class MLAlertSnapshot(models.Model):
+    """ML alert feed materialized by the alert job; dashboards only read the latest row"""
+    
+    generated_at = models.DateTimeField(auto_now_add=True)
+    inputs_version = models.CharField(max_length=64)
+    alerts = models.JSONField(default=list)
+    summary = models.JSONField(default=dict)
+    duration_ms = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-generated_at']
+        indexes = [
+            models.Index(fields=['-generated_at']),
+        ]
+    
+    def __str__(self):
+        return f"ML alerts {self.generated_at:%Y-%m-%d %H:%M} ({len(self.alerts)} alerts)"
+
+
+class DataVersion(models.Model):
+    """Version stamp of one data domain (see core/response_cache.py), shared by every server process"""
+    
+    key = models.CharField(max_length=50, primary_key=True)
+    stamp = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.key}: {self.stamp}"
@@ -0,0 +1,28 @@
+# core/perf_views.py - Performance report for the profiling middleware
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from .profiling import SORT_KEYS, build_report, registry
+
+
+@login_required
+@user_passes_test(lambda user: user.is_superuser)
+def perf_report(request):
+    """Worst views by latency/query count, merged across all workers"""
+    registry.flush()
+    sort = request.GET.get('sort', 'p95_ms')
+    try:
+        top = int(request.GET.get('top', 50))
+    except ValueError:
+        top = 50
+    rows = build_report(sort=sort, top=top)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'sort': sort, 'views': rows})
+
+    return render(request, 'core/perf_report.html', {
+        'rows': rows,
+        'sort': sort,
+        'sort_keys': SORT_KEYS,
+    })
@@ -1,6 +1,5 @@
 # core/performance.py - Performance optimization utilities
 from django.core.cache import cache
-from django.db import connection
 from functools import wraps
 import time
 import logging
@@ -31,19 +30,22 @@ class PerformanceOptimizer:
     
     @staticmethod
     def monitor_queries(func):
-        """Decorator to monitor database queries"""
+        """Decorator to monitor database queries (works without DEBUG)"""
         @wraps(func)
         def wrapper(*args, **kwargs):
-            initial_queries = len(connection.queries)
+            from .profiling import capture_queries
             start_time = time.time()
             
-            result = func(*args, **kwargs)
+            with capture_queries() as profile:
+                result = func(*args, **kwargs)
             
             end_time = time.time()
-            query_count = len(connection.queries) - initial_queries
+            query_count = profile.query_count
             
             if query_count > 10:  # Alert if too many queries
                 logger.warning(f"{func.__name__} executed {query_count} queries in {end_time - start_time:.3f}s")
+            for shape, count in profile.repeated_queries():
+                logger.warning(f"{func.__name__} repeated a query {count} times (possible N+1): {shape[:200]}")
             
             return result
         return wrapper
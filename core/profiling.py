@@ -0,0 +1,372 @@
+# core/profiling.py - Per-view query and latency profiling
+"""
+Low-overhead request profiling.
+
+QueryProfilingMiddleware wraps every sampled request with a database
+execute_wrapper and a cache probe, then records query count, DB time,
+cache hits/misses and total latency per view name into a rolling window.
+Repeated identical SQL shapes inside a single request are flagged as N+1
+patterns.
+
+Each worker keeps its own window in memory and periodically flushes it to
+PERF_STATS_DIR so the /perf/ report and the ``perf_report`` management
+command can merge the numbers of all workers. Snapshots of workers that have
+exited, or older than PERF_SNAPSHOT_MAX_AGE, are deleted when stats are
+merged.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+import logging
+
+try:
+    import psutil
+except ImportError:  # Only the age limit applies
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram bucket upper bounds in milliseconds (last bucket is open)
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+# Sample tuple layout (kept as lists so snapshots are plain JSON)
+S_TIMESTAMP, S_LATENCY, S_QUERIES, S_DB_MS, S_CACHE_HITS, S_CACHE_MISSES, S_N_PLUS_ONE = range(7)
+
+_active_profile = ContextVar('perf_active_profile', default=None)
+_CACHE_MISS = object()
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize_sql(sql):
+    """Reduce a SQL statement to its shape so repeated lookups compare equal"""
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _LITERAL_RE.sub('?', sql)
+
+
+class RequestProfile:
+    """Counters collected for a single request (or any block of code)"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.sql_counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """django.db execute_wrapper hook"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            self.sql_counts[sql] += 1
+
+    def repeated_queries(self, threshold=None):
+        """Return [(sql_shape, count)] for shapes executed at least ``threshold`` times"""
+        threshold = threshold or _setting('PERF_N_PLUS_ONE_THRESHOLD', 5)
+        shapes = Counter()
+        for sql, count in self.sql_counts.items():
+            shapes[normalize_sql(sql)] += count
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+
+def _instrument_cache(backend):
+    """Count hits/misses of ``backend.get`` for the active profile (idempotent)"""
+    if getattr(backend, '_perf_instrumented', False):
+        return
+    original_get = backend.get
+
+    def get(key, default=None, version=None):
+        value = original_get(key, _CACHE_MISS, version=version)
+        profile = _active_profile.get()
+        if profile is not None:
+            if value is _CACHE_MISS:
+                profile.cache_misses += 1
+            else:
+                profile.cache_hits += 1
+        return default if value is _CACHE_MISS else value
+
+    backend.get = get
+    backend._perf_instrumented = True
+
+
+@contextmanager
+def capture_queries():
+    """Profile the enclosed block; yields a RequestProfile"""
+    profile = RequestProfile()
+    _instrument_cache(caches['default'])
+    token = _active_profile.set(profile)
+    try:
+        with connection.execute_wrapper(profile):
+            yield profile
+    finally:
+        _active_profile.reset(token)
+
+
+class ProfileRegistry:
+    """Rolling per-view samples for this worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._repeated = {}
+        self._last_flush = time.time()
+
+    def record(self, view_name, profile, latency_ms):
+        repeated = profile.repeated_queries()
+        sample = [
+            round(time.time(), 3),
+            round(latency_ms, 2),
+            profile.query_count,
+            round(profile.db_time * 1000, 2),
+            profile.cache_hits,
+            profile.cache_misses,
+            1 if repeated else 0,
+        ]
+        window = _setting('PERF_WINDOW_SIZE', 1000)
+        with self._lock:
+            samples = self._samples.get(view_name)
+            if samples is None:
+                samples = self._samples[view_name] = deque(maxlen=window)
+            samples.append(sample)
+            if repeated:
+                shapes = self._repeated.setdefault(view_name, {})
+                for shape, count in repeated:
+                    shapes[shape] = max(shapes.get(shape, 0), count)
+                if len(shapes) > 20:
+                    for shape in sorted(shapes, key=shapes.get)[:len(shapes) - 20]:
+                        del shapes[shape]
+        return repeated
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'generated_at': time.time(),
+                'views': {
+                    name: {
+                        'samples': list(samples),
+                        'repeated_queries': dict(self._repeated.get(name, {})),
+                    }
+                    for name, samples in self._samples.items()
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._repeated.clear()
+
+    def maybe_flush(self):
+        interval = _setting('PERF_FLUSH_INTERVAL', 30)
+        if time.time() - self._last_flush >= interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.time()
+        stats_dir = stats_directory()
+        try:
+            os.makedirs(stats_dir, exist_ok=True)
+            path = os.path.join(stats_dir, f'perf_{os.getpid()}.json')
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(self.snapshot(), fh)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not flush performance stats: {e}")
+
+
+registry = ProfileRegistry()
+
+
+def stats_directory():
+    return _setting('PERF_STATS_DIR', os.path.join(settings.BASE_DIR, 'logs', 'perf'))
+
+
+def _pid_alive(pid):
+    if psutil is None or not isinstance(pid, int):
+        return True
+    return pid == os.getpid() or psutil.pid_exists(pid)
+
+
+def _expired(data, now):
+    """A snapshot of a worker that has exited, or one past PERF_SNAPSHOT_MAX_AGE"""
+    max_age = _setting('PERF_SNAPSHOT_MAX_AGE', 24 * 3600)
+    if max_age and now - data.get('generated_at', 0) > max_age:
+        return True
+    return not _pid_alive(data.get('pid'))
+
+
+def load_merged_stats(include_live=True):
+    """Merge the flushed snapshots of every live worker (and this process live)"""
+    snapshots = {}
+    stats_dir = stats_directory()
+    now = time.time()
+    if os.path.isdir(stats_dir):
+        for filename in os.listdir(stats_dir):
+            if not (filename.startswith('perf_') and filename.endswith('.json')):
+                continue
+            path = os.path.join(stats_dir, filename)
+            try:
+                with open(path, encoding='utf-8') as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            if _expired(data, now):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            snapshots[data.get('pid')] = data
+    if include_live:
+        live = registry.snapshot()
+        snapshots[live['pid']] = live
+
+    merged = {}
+    for data in snapshots.values():
+        for name, view in data.get('views', {}).items():
+            entry = merged.setdefault(name, {'samples': [], 'repeated_queries': {}})
+            entry['samples'].extend(view.get('samples', []))
+            for shape, count in view.get('repeated_queries', {}).items():
+                entry['repeated_queries'][shape] = max(entry['repeated_queries'].get(shape, 0), count)
+    return merged
+
+
+def reset_stats():
+    """Drop this process's window and every flushed worker snapshot"""
+    registry.reset()
+    stats_dir = stats_directory()
+    if os.path.isdir(stats_dir):
+        for filename in os.listdir(stats_dir):
+            if filename.startswith('perf_') and filename.endswith('.json'):
+                try:
+                    os.remove(os.path.join(stats_dir, filename))
+                except OSError:
+                    pass
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _histogram(latencies):
+    counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for value in latencies:
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+    return dict(zip(labels, counts))
+
+
+SORT_KEYS = ('p95_ms', 'p50_ms', 'max_ms', 'avg_queries', 'max_queries', 'avg_db_ms', 'requests', 'n_plus_one_requests')
+
+
+def build_report(stats=None, sort='p95_ms', top=None):
+    """Summarise merged samples into one row per view, worst first"""
+    if stats is None:
+        stats = load_merged_stats()
+    rows = []
+    for name, view in stats.items():
+        samples = view['samples']
+        if not samples:
+            continue
+        count = len(samples)
+        latencies = sorted(s[S_LATENCY] for s in samples)
+        queries = [s[S_QUERIES] for s in samples]
+        hits = sum(s[S_CACHE_HITS] for s in samples)
+        misses = sum(s[S_CACHE_MISSES] for s in samples)
+        rows.append({
+            'view': name,
+            'requests': count,
+            'p50_ms': _percentile(latencies, 50),
+            'p95_ms': _percentile(latencies, 95),
+            'p99_ms': _percentile(latencies, 99),
+            'max_ms': latencies[-1],
+            'avg_queries': round(sum(queries) / count, 1),
+            'max_queries': max(queries),
+            'avg_db_ms': round(sum(s[S_DB_MS] for s in samples) / count, 2),
+            'cache_hits': hits,
+            'cache_misses': misses,
+            'cache_hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+            'n_plus_one_requests': sum(s[S_N_PLUS_ONE] for s in samples),
+            'repeated_queries': sorted(view['repeated_queries'].items(), key=lambda item: -item[1])[:5],
+            'histogram': _histogram(latencies),
+        })
+    if sort not in SORT_KEYS:
+        sort = 'p95_ms'
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:top] if top else rows
+
+
+class QueryProfilingMiddleware:
+    """
+    Record query count, DB time, cache hits/misses and latency per view.
+    Configure with PERF_PROFILING_ENABLED, PERF_SAMPLE_RATE, PERF_WINDOW_SIZE,
+    PERF_N_PLUS_ONE_THRESHOLD, PERF_SLOW_REQUEST_MS and PERF_FLUSH_INTERVAL.
+    The X-Query-Count and X-Response-Time headers are only sent in DEBUG or
+    to staff users.
+    """
+
+    skip_prefixes = ('/static/', '/media/', '/perf/', '/favicon.ico')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = _setting('PERF_PROFILING_ENABLED', True)
+        self.sample_rate = _setting('PERF_SAMPLE_RATE', 1.0)
+        self.slow_request_ms = _setting('PERF_SLOW_REQUEST_MS', 1000)
+
+    def __call__(self, request):
+        if (not self.enabled
+                or request.path.startswith(self.skip_prefixes)
+                or (self.sample_rate < 1.0 and random.random() >= self.sample_rate)):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with capture_queries() as profile:
+            response = self.get_response(request)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name or match._func_path) if match else 'unresolved'
+        repeated = registry.record(view_name, profile, latency_ms)
+
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or getattr(user, 'is_staff', False):
+            response['X-Query-Count'] = str(profile.query_count)
+            response['X-Response-Time'] = f'{latency_ms / 1000:.3f}s'
+
+        if latency_ms > self.slow_request_ms or repeated:
+            logger.warning(
+                f"Slow or chatty request: {view_name} {latency_ms:.0f}ms, "
+                f"{profile.query_count} queries ({profile.db_time * 1000:.0f}ms DB)"
+                + (f", repeated SQL x{repeated[0][1]}" if repeated else "")
+            )
+
+        registry.maybe_flush()
+        return response
@@ -0,0 +1,177 @@
+# core/response_cache.py
+"""
+Data version stamps and body compression for cached responses
+
+Cached pages and template fragments are keyed by the version stamps of the
+data they show instead of being deleted one key at a time (LocMemCache and
+Redis alike can't delete by pattern). A stamp is a random token per data
+domain, stored in the database (core.DataVersion) so that every server
+process sees a write at once, whatever the cache backend:
+
+    data_versions.get('students', 'fees')   # {'students': '3f2a…', 'fees': '9c01…'}
+    data_versions.stamp('students', 'fees') # '3f2a….9c01…', for cache keys
+    data_versions.touch('fees')             # after a write: every key built from it is stale
+
+Saves and deletes of the models in MODEL_DOMAINS touch their domains through
+signals. Bulk writes send no signals, so the bulk paths touch explicitly
+(payment allocations, due recalculation, attendance marking, imports).
+A bump is part of the surrounding transaction: other processes see the new
+stamp together with the data, and a rollback restores the old one.
+
+The stamps are read with one small query the first time a request needs
+them and reused for the rest of that request. The cached bodies themselves
+may stay in a per-process cache: their keys carry the stamps.
+
+Bodies are stored brotli-compressed when the ``brotli`` package is
+installed and gzip-compressed otherwise (see core/cache_middleware.py).
+"""
+
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.text import compress_string
+import gzip
+import logging
+import threading
+import uuid
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DOMAINS = ('students', 'fees', 'attendance', 'teachers')
+
+# model label -> domains whose cached pages show it
+MODEL_DOMAINS = {
+    'students.Student': ('students',),
+    'subjects.ClassSection': ('students',),
+    'transport.TransportAssignment': ('students', 'fees'),
+    'student_fees.FeeDeposit': ('fees',),
+    'fees.FeesGroup': ('fees',),
+    'fees.FeesType': ('fees',),
+    'fines.Fine': ('fees',),
+    'fines.FineStudent': ('fees',),
+    'attendance.Attendance': ('attendance',),
+    'teachers.Teacher': ('teachers',),
+    'users.UserModulePermission': DOMAINS,  # Pages show what the user may do
+}
+
+STORE_ENCODING = 'br' if brotli else 'gzip'
+BROTLI_QUALITY = 5  # Close to gzip's speed, noticeably smaller output
+
+
+class DataVersions:
+    """Per-key version stamps in core.DataVersion; page domains plus internal keys such as 'fee_schedule'"""
+
+    INITIAL = '0'  # Stamp of a key that was never bumped
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self._local = threading.local()
+
+    def begin_request(self, **kwargs):
+        self._local.in_request = True
+        self._local.stamps = None
+
+    def end_request(self, **kwargs):
+        self._local.in_request = False
+        self._local.stamps = None
+
+    def _load(self):
+        """All stamps; read once per request and reused until it finishes"""
+        stamps = getattr(self._local, 'stamps', None)
+        if stamps is None:
+            from .models import DataVersion
+            stamps = dict(DataVersion.objects.using(self.using).values_list('key', 'stamp'))
+            if getattr(self._local, 'in_request', False):
+                self._local.stamps = stamps
+        return stamps
+
+    def get(self, *keys):
+        """Current stamps of ``keys`` (all page domains by default)"""
+        stamps = self._load()
+        return {key: stamps.get(key, self.INITIAL) for key in keys or DOMAINS}
+
+    def stamp(self, *keys):
+        """The stamps of ``keys`` joined into one cache key part"""
+        versions = self.get(*keys)
+        return '.'.join(versions[key] for key in keys or DOMAINS)
+
+    def bump(self, key):
+        from .models import DataVersion
+        stamp = uuid.uuid4().hex[:12]
+        versions = DataVersion.objects.using(self.using)
+        if not versions.filter(key=key).update(stamp=stamp):
+            try:
+                with transaction.atomic(using=self.using):
+                    versions.create(key=key, stamp=stamp)
+            except IntegrityError:  # Created by another process meanwhile
+                versions.filter(key=key).update(stamp=stamp)
+        stamps = getattr(self._local, 'stamps', None)
+        if stamps is not None:
+            stamps[key] = stamp
+        return stamp
+
+    def touch(self, *keys):
+        """Mark ``keys`` (all page domains by default) changed"""
+        for key in keys or DOMAINS:
+            self.bump(key)
+
+
+data_versions = DataVersions()
+
+
+def touch_model_domains(sender, raw=False, **kwargs):
+    if not raw:
+        data_versions.touch(*MODEL_DOMAINS[sender._meta.label])
+
+
+request_started.connect(data_versions.begin_request, dispatch_uid='data_versions_begin')
+request_finished.connect(data_versions.end_request, dispatch_uid='data_versions_end')
+
+for label in MODEL_DOMAINS:
+    post_save.connect(touch_model_domains, sender=label, dispatch_uid=f'data_versions_save_{label}')
+    post_delete.connect(touch_model_domains, sender=label, dispatch_uid=f'data_versions_delete_{label}')
+
+
+# ----------------------------------------------------------------------
+# Compression
+# ----------------------------------------------------------------------
+
+def accepted_encodings(request):
+    """Content codings the client accepts (q=0 entries excluded)"""
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def negotiate(request):
+    """Best coding for this client: 'br', 'gzip' or None for identity"""
+    accepted = accepted_encodings(request)
+    if brotli and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # Random bytes in the gzip header, as GZipMiddleware does against BREACH
+    return compress_string(body, max_random_bytes=100)
+
+
+def decompress(body, encoding):
+    if encoding == 'br':
+        return brotli.decompress(body)
+    return gzip.decompress(body)
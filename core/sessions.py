@@ -0,0 +1,103 @@
+# core/sessions.py
+"""
+Low-write session engines
+
+Sessions slide: SESSION_SAVE_EVERY_REQUEST renews the expiry on every
+request, so with the plain db engine every page view and AJAX poll is a
+SELECT and an UPDATE on django_session - on SQLite each of those UPDATEs
+waits for the database write lock.
+
+Both engines keep the db engine's table and semantics but:
+
+- write the session data only when it actually changed
+- persist an expiry renewal only once the sliding window has moved by
+  SESSION_REFRESH_THRESHOLD seconds, with an UPDATE of expire_date alone
+
+SESSION_ENGINE = 'core.sessions' also serves reads from the cache (like
+cached_db), falling back to the table. A cached session is only correct when
+every server process sees the same cache, so the core.E001 system check
+rejects this engine with a per-process cache (LocMemCache).
+SESSION_ENGINE = 'core.sessions_db' reads from the table on every request and
+works with any cache; settings.py picks it unless CACHE_BACKEND is shared.
+
+Between renewals the stored expiry lags the real one by less than the
+threshold, so an idle session can end up to that much early but never
+outlives SESSION_COOKIE_AGE (BACKUP_SESSION_TIMEOUT). The cache entry
+expires together with the stored row, so both agree on when a session ends.
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+KEY_PREFIX = 'core.sessions'
+
+
+class LowWriteSessionMixin:
+    """Skip session writes that would change neither the data nor (by much) the expiry"""
+
+    def __init__(self, session_key=None):
+        self._stored_expiry = None
+        super().__init__(session_key)
+
+    @property
+    def refresh_threshold(self):
+        threshold = getattr(settings, 'SESSION_REFRESH_THRESHOLD', 300)
+        # Never let the stored expiry lag by more than half a session
+        return timedelta(seconds=min(threshold, self.get_expiry_age() / 2))
+
+    def _remember(self, data, expire_date):
+        """Note ``expire_date``, the expiry now stored in the table"""
+        self._stored_expiry = expire_date
+
+    def _load_from_db(self):
+        s = self._get_session_from_db()
+        if not s:
+            return {}
+        data = self.decode(s.session_data)
+        self._remember(data, s.expire_date)
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+
+        expire_date = self.get_expiry_date()
+        if not must_create and not self.modified and self._stored_expiry is not None:
+            if expire_date - self._stored_expiry < self.refresh_threshold:
+                return  # Stored expiry is recent enough; nothing to write
+
+            # Only the sliding window moved: renew the expiry, not the data
+            if self.model.objects.filter(session_key=self.session_key).update(expire_date=expire_date):
+                self._remember(self._get_session(), expire_date)
+                return
+
+        DBStore.save(self, must_create=must_create)
+        self._remember(self._session, expire_date)
+
+
+class SessionStore(LowWriteSessionMixin, cached_db.SessionStore):
+    """cached_db store that skips redundant writes; needs a cache shared by all processes"""
+
+    cache_key_prefix = KEY_PREFIX
+
+    def _remember(self, data, expire_date):
+        """Also cache ``data`` until ``expire_date``"""
+        super()._remember(data, expire_date)
+        timeout = int((expire_date - timezone.now()).total_seconds())
+        if timeout > 0:
+            self._cache.set(self.cache_key, {'data': data, 'expires': expire_date}, timeout)
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # Some backends raise on invalid cache keys; treat as a miss
+            entry = None
+
+        if entry is not None and entry['expires'] > timezone.now():
+            self._stored_expiry = entry['expires']
+            return entry['data']
+        return self._load_from_db()
@@ -0,0 +1,16 @@
+# core/sessions_db.py
+"""
+SESSION_ENGINE = 'core.sessions_db': the low-write session store of
+core/sessions.py without the cache, for servers whose cache is per process
+"""
+
+from django.contrib.sessions.backends import db
+
+from .sessions import LowWriteSessionMixin
+
+
+class SessionStore(LowWriteSessionMixin, db.SessionStore):
+    """db store that skips redundant writes"""
+
+    def load(self):
+        return self._load_from_db()
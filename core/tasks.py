@@ -0,0 +1,13 @@
+# core/tasks.py - Background core jobs
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def run_import(job_id, kind, path, user_id=None, dry_run=False):
+    """Run a bulk import queued by core.imports.start_import"""
+    from .imports import run_import_job
+    
+    run_import_job(job_id, kind, path, user_id, dry_run)
+    return f"Import {job_id} ({kind}) finished"
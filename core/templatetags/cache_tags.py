@@ -0,0 +1,21 @@
+# core/templatetags/cache_tags.py
+"""
+{% load cache cache_tags %}
+{% data_version 'students' 'fees' as version %}
+{% cache 300 student_rows version user.pk request.get_full_path %}...{% endcache %}
+
+Version stamp of the data a fragment shows (see core/response_cache.py).
+Passed to Django's {% cache %} as a vary_on value, it keys the fragment by
+that data, so a write makes the cached copy unreachable at once.
+"""
+
+from django import template
+
+from core.response_cache import data_versions
+
+register = template.Library()
+
+
+@register.simple_tag
+def data_version(*domains):
+    return data_versions.stamp(*domains)
@@ -0,0 +1,32 @@
+# core/templatetags/image_tags.py
+"""
+{% load image_tags %}
+{% photo student 'thumb' class="w-12 h-12 rounded-full" alt=student.first_name %}
+
+Renders a <picture> with the WebP variant and the JPEG variant as fallback
+(see core/images.py), or a plain <img> of the original photo when no variants
+have been generated yet. Works with any object that has get_image_url() and
+get_image_webp_url(), i.e. Student and Teacher.
+"""
+
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def photo(obj, variant='thumb', **attrs):
+    if obj is None:
+        return ''
+    src = obj.get_image_url(variant)
+    if not src:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    img = format_html('<img src="{}"{}>', src, flatatt(attrs))
+    webp = obj.get_image_webp_url(variant)
+    if not webp:
+        return img
+    return format_html('<picture><source srcset="{}" type="image/webp">{}</picture>', webp, img)
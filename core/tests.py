@@ -0,0 +1,616 @@
+# core/tests.py - Query budget guard suite for the hot views
+"""
+Seeds a realistic school (BenchmarkSchoolBuilder) and asserts that every hot
+view stays inside its query budget and latency baseline. Budgets are
+``base + per_row * rows`` where rows is the number of students the view has
+to walk (the whole school for reports, one class for attendance marking), so
+the suite holds at any seeded scale.
+
+Scale and tolerance come from the environment:
+    BENCHMARK_STUDENTS           students to seed (default 2000, 60 sections)
+    BENCHMARK_ATTENDANCE_DAYS    school days of attendance (default 220)
+    BENCHMARK_LATENCY_TOLERANCE  multiplier on latency baselines (default 3, 0 disables)
+
+Run only this suite with ``python manage.py test core --tag=benchmark`` or
+skip it with ``--exclude-tag=benchmark``.
+"""
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings, tag
+from django.urls import reverse
+from django.utils import timezone
+
+from core import profiling
+from core.benchmark_school import BenchmarkSchoolBuilder
+from core.profiling import capture_queries
+from core.response_cache import data_versions
+
+QueryBudget = namedtuple('QueryBudget', 'queries queries_per_row latency_ms latency_per_row_ms')
+
+# Measured on the seeded school, with headroom; tighten when a view gets cheaper
+QUERY_BUDGETS = {
+    'student_list': QueryBudget(65, 0, 150, 0),
+    'fees_report': QueryBudget(65, 0, 300, 7),  # Constant: 57 at 200 and at 2000 students
+    'dashboard_view': QueryBudget(45, 0.01, 400, 0.5),  # Balances are read 500 students per chunk
+    'mark_attendance': QueryBudget(25, 0, 60, 2),  # Constant: 21 for a class of 4 and of 34
+    'get_student_fees': QueryBudget(45, 0, 100, 0),
+    'receipt_view': QueryBudget(55, 0, 100, 0),
+    'fine_history': QueryBudget(20, 0, 60, 0),
+}
+
+BENCHMARK_STUDENTS = int(os.getenv('BENCHMARK_STUDENTS', 2000))
+BENCHMARK_ATTENDANCE_DAYS = int(os.getenv('BENCHMARK_ATTENDANCE_DAYS', 220))
+LATENCY_TOLERANCE = float(os.getenv('BENCHMARK_LATENCY_TOLERANCE', 3))
+
+
+class TempStatsDirMixin:
+    """Flush worker snapshots to a throwaway PERF_STATS_DIR, not logs/perf"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.stats_dir = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(PERF_STATS_DIR=cls.stats_dir))
+        super().setUpClass()
+
+
+@tag('benchmark')
+class HotViewQueryBudgetTests(TempStatsDirMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from students.models import Student
+        from student_fees.models import FeeDeposit
+
+        cls.summary = BenchmarkSchoolBuilder(
+            students=BENCHMARK_STUDENTS,
+            attendance_days=BENCHMARK_ATTENDANCE_DAYS,
+        ).build()
+        cls.user = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+
+        deposit = FeeDeposit.objects.select_related('student__class_section').order_by('id').first()
+        cls.student = deposit.student
+        cls.receipt_no = deposit.receipt_no
+        cls.class_section = cls.student.class_section
+        cls.class_student_ids = list(
+            Student.objects.filter(class_section=cls.class_section).values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertWithinBudget(self, name, request, rows=0):
+        """Run ``request`` cold and compare queries/latency to QUERY_BUDGETS[name]"""
+        budget = QUERY_BUDGETS[name]
+        start = time.perf_counter()
+        with capture_queries() as profile:
+            response = request()
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        self.assertEqual(response.status_code, 200, f'{name} returned {response.status_code}')
+
+        query_budget = budget.queries + budget.queries_per_row * rows
+        repeated = profile.repeated_queries()
+        self.assertLessEqual(
+            profile.query_count, query_budget,
+            f'{name} ran {profile.query_count} queries (budget {query_budget} for {rows} rows)'
+            + (f'; most repeated x{repeated[0][1]}: {repeated[0][0][:200]}' if repeated else '')
+        )
+        if LATENCY_TOLERANCE:
+            latency_budget = (budget.latency_ms + budget.latency_per_row_ms * rows) * LATENCY_TOLERANCE
+            self.assertLessEqual(
+                latency_ms, latency_budget,
+                f'{name} took {latency_ms:.0f}ms (baseline x{LATENCY_TOLERANCE:g} = {latency_budget:.0f}ms)'
+            )
+        return response
+
+    def test_student_list(self):
+        self.assertWithinBudget('student_list', lambda: self.client.get(reverse('students:student_list')))
+
+    def test_fees_report(self):
+        self.assertWithinBudget('fees_report', lambda: self.client.get(reverse('reports:fees_report')),
+                                rows=self.summary['students'])
+
+    def test_dashboard_view(self):
+        self.assertWithinBudget('dashboard_view', lambda: self.client.get(reverse('dashboard')),
+                                rows=self.summary['students'])
+
+    def test_mark_attendance(self):
+        payload = {
+            'class_section_id': self.class_section.id,
+            'date': timezone.localdate().isoformat(),
+            'attendance': self.class_student_ids[::2],
+        }
+        self.assertWithinBudget('mark_attendance', lambda: self.client.post(
+            reverse('attendance:mark_attendance'), json.dumps(payload), content_type='application/json'
+        ), rows=len(self.class_student_ids))
+
+    def test_get_student_fees(self):
+        response = self.assertWithinBudget('get_student_fees', lambda: self.client.get(
+            reverse('student_fees:get_student_fees'), {'admission_number': self.student.admission_number}
+        ))
+        self.assertEqual(response.json()['status'], 'success')
+
+    def test_receipt_view(self):
+        self.assertWithinBudget('receipt_view', lambda: self.client.get(
+            reverse('student_fees:receipt_view', args=[self.receipt_no])
+        ))
+
+    def test_fine_history(self):
+        self.assertWithinBudget('fine_history', lambda: self.client.get(reverse('fines:fine_history')))
+
+
+class ProfilingTests(TempStatsDirMixin, TestCase):
+
+    def setUp(self):
+        profiling.reset_stats()
+
+    def write_snapshot(self, pid, generated_at):
+        path = os.path.join(self.stats_dir, f'perf_{pid}.json')
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump({'pid': pid, 'generated_at': generated_at, 'views': {
+                'some:view': {'samples': [[generated_at, 12.0, 3, 1.0, 0, 0, 0]], 'repeated_queries': {}},
+            }}, fh)
+        return path
+
+    def test_flush_writes_to_stats_dir(self):
+        profiling.registry.record('some:view', profiling.RequestProfile(), 5)
+        profiling.registry.flush()
+        self.assertTrue(os.path.exists(os.path.join(self.stats_dir, f'perf_{os.getpid()}.json')))
+
+    def test_expired_and_dead_worker_snapshots_are_pruned(self):
+        live = self.write_snapshot(os.getpid(), time.time())
+        old = self.write_snapshot(os.getppid(), time.time() - 2 * 24 * 3600)
+        stats = profiling.load_merged_stats(include_live=False)
+
+        self.assertEqual(len(stats['some:view']['samples']), 1)
+        self.assertTrue(os.path.exists(live))
+        self.assertFalse(os.path.exists(old))
+
+        if profiling.psutil is not None:
+            dead_pid = max(profiling.psutil.pids()) + 100000
+            dead = self.write_snapshot(dead_pid, time.time())
+            profiling.load_merged_stats(include_live=False)
+            self.assertFalse(os.path.exists(dead))
+
+    @override_settings(DEBUG=False)
+    def test_query_count_header_only_for_staff(self):
+        User = get_user_model()
+        clerk = User.objects.create_user('clerk', 'clerk@example.com', 'clerk')
+        admin = User.objects.create_user('admin', 'admin@example.com', 'admin', is_staff=True)
+
+        self.client.force_login(clerk)
+        response = self.client.get(reverse('students:student_list'))
+        self.assertNotIn('X-Query-Count', response)
+
+        self.client.force_login(admin)
+        response = self.client.get(reverse('students:student_list'))
+        self.assertIn('X-Query-Count', response)
+
+
+class SessionWriteTests(TestCase):
+    """Session table writes per request: one UPDATE each with the db engine, none with the low-write ones"""
+
+    REQUESTS = 5
+
+    def session_writes(self):
+        user = get_user_model().objects.create_superuser('sessions', 'sessions@example.com', 'sessions')
+        self.client.force_login(user)
+        writes = []
+        for _ in range(self.REQUESTS):
+            with capture_queries() as profile:
+                self.client.get(reverse('students:student_list'))
+            writes.append(sum(
+                count for sql, count in profile.sql_counts.items()
+                if 'django_session' in sql and sql.lstrip().upper().startswith(('INSERT', 'UPDATE'))
+            ))
+        return writes
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_db_engine_writes_on_every_request(self):
+        self.assertEqual(self.session_writes(), [1] * self.REQUESTS)
+
+    @override_settings(SESSION_ENGINE='core.sessions_db')
+    def test_low_write_engine_skips_expiry_renewals(self):
+        self.assertEqual(self.session_writes(), [0] * self.REQUESTS)
+
+    def test_cached_engine_skips_expiry_renewals(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            SESSION_ENGINE='core.sessions',
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}},
+        ):
+            self.assertEqual(self.session_writes(), [0] * self.REQUESTS)
+
+    @override_settings(SESSION_REFRESH_THRESHOLD=0)
+    def test_zero_threshold_renews_on_every_request(self):
+        with override_settings(SESSION_ENGINE='core.sessions_db'):
+            writes = self.session_writes()
+        self.assertTrue(all(writes))
+
+    def test_cached_engine_needs_a_shared_cache(self):
+        from core.checks import check_session_cache
+
+        with override_settings(SESSION_ENGINE='core.sessions', CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }):
+            self.assertEqual([error.id for error in check_session_cache()], ['core.E001'])
+        with override_settings(SESSION_ENGINE='core.sessions', CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'},
+        }):
+            self.assertEqual(check_session_cache(), [])
+        with override_settings(SESSION_ENGINE='core.sessions_db'):
+            self.assertEqual(check_session_cache(), [])
+
+
+class VersionedPageCacheTests(TestCase):
+    """SmartCacheMiddleware entries go stale on writes from any process, and ETags answer with 304"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=5, classes=1, sections_per_class=1, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+        cls.user = get_user_model().objects.create_superuser('pages', 'pages@example.com', 'pages')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('students:student_list')
+        # The first response issues the CSRF cookie and is not stored
+        for _ in range(3):
+            if self.client.get(self.url).get('X-Cache-Status') == 'HIT':
+                break
+
+    def test_cached_page_is_served(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache-Status'], 'HIT')
+
+    def test_write_in_this_process_invalidates(self):
+        from students.models import Student
+
+        student = Student.objects.order_by('id').first()
+        student.first_name = 'Renamed'
+        student.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache-Status'], 'MISS')
+        self.assertContains(response, 'Renamed')
+
+    def test_write_in_another_process_invalidates(self):
+        from core.models import DataVersion
+        from students.models import Student
+
+        # Another worker: its UPDATE sends no signal here, only its stamp reaches the database
+        Student.objects.filter(pk=Student.objects.order_by('id').first().pk).update(first_name='Elsewhere')
+        DataVersion.objects.update_or_create(key='students', defaults={'stamp': 'other-worker'})
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache-Status'], 'MISS')
+        self.assertContains(response, 'Elsewhere')
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        data_versions.touch('students')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_stamps_are_read_once_per_request(self):
+        cache.clear()
+        with capture_queries() as profile:
+            self.client.get(self.url)
+        reads = sum(count for sql, count in profile.sql_counts.items()
+                    if 'core_dataversion' in sql and sql.lstrip().upper().startswith('SELECT'))
+        self.assertEqual(reads, 1)
+
+
+class QueryPlanTests(TestCase):
+    """Every hot fee, fine and attendance query is served from an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=20, classes=2, sections_per_class=1, attendance_days=5,
+                               routes=1, stoppages_per_route=1).build()
+
+    def test_hot_queries_use_indexes(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('explain_hot_queries', '--fail-on-scan', stdout=out)
+        self.assertIn('queries use an index', out.getvalue())
+
+
+class LazyImportTests(TestCase):
+    """Heavy ML/reporting libraries stay out of a worker until a page needs them"""
+
+    def test_urlconf_loads_no_heavy_module(self):
+        from core.management.commands.startup_benchmark import Command
+
+        result = Command()._measure('__urlconf__')  # Fresh interpreter, as a new worker
+        self.assertNotIn('error', result)
+        self.assertEqual(result['heavy'], [])
+
+    def test_lazy_module_imports_on_first_use(self):
+        import sys
+        from core.ml_lazy_loader import LazyModule, lazy_import
+
+        self.assertIs(lazy_import('json'), sys.modules['json'])
+        module = LazyModule('core.ml_features')
+        self.assertFalse(module.is_loaded)
+        self.assertEqual(module.__name__, 'core.ml_features')
+        self.assertTrue(module.is_loaded)
+
+
+class RiskBatchTests(TestCase):
+    """Risk features come from grouped queries and are scored with one model call"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=30, classes=2, sections_per_class=1, attendance_days=10,
+                               routes=1, stoppages_per_route=1).build()
+
+    class CountingModel:
+        """Stands in for the trained classifier and records each predict_proba batch"""
+
+        def __init__(self):
+            import numpy
+            self.classes_ = numpy.array([0, 1, 2])
+            self.calls = []
+
+        def predict_proba(self, X):
+            import numpy
+            self.calls.append(len(X))
+            return numpy.tile([0.1, 0.2, 0.7], (len(X), 1))
+
+    def test_feature_queries_do_not_grow_with_students(self):
+        from core.ml_features import StudentFeatureBuilder
+        from students.models import Student
+
+        counts = []
+        for size in (5, 30):
+            with capture_queries() as profile:
+                StudentFeatureBuilder(Student.objects.order_by('id')[:size]).risk_features()
+            counts.append(profile.query_count)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_one_model_call_for_the_batch(self):
+        from unittest import mock
+        from core.ml_service import MLService
+        from students.models import Student
+
+        model = self.CountingModel()
+        students = list(Student.objects.order_by('id'))
+        with mock.patch.object(MLService, 'models', new_callable=mock.PropertyMock,
+                               return_value={'performance': model}):
+            service = MLService()
+            results = service.predict_risk_batch(students)
+            single = service.predict_student_risk(students[0])
+
+        self.assertEqual(set(results), {student.id for student in students})
+        self.assertEqual(model.calls[0], sum(1 for r in results.values() if r['status'] == 'ml_prediction'))
+        self.assertEqual(len(model.calls), 2)  # The batch, then the single student
+        self.assertEqual(single, results[students[0].id])
+        self.assertEqual(results[students[0].id]['risk_level'], 'low')
+
+
+@override_settings(ML_REGISTRY_CHECK_INTERVAL=0, ML_REGISTRY_KEEP_VERSIONS=2)
+class ModelRegistryTests(TestCase):
+    """Published models are memory-mapped, versioned and picked up by other processes"""
+
+    def setUp(self):
+        from core.ml_registry import ModelRegistry
+
+        self.root = self.enterContext(tempfile.TemporaryDirectory())
+        self.publisher = ModelRegistry(self.root)
+        self.worker = ModelRegistry(self.root)  # Another process reading the same directory
+
+    def model(self, value):
+        import numpy
+        return {'weights': numpy.full(1000, value, dtype=float)}
+
+    def test_published_model_is_memory_mapped(self):
+        import numpy
+
+        self.assertEqual(self.publisher.publish('performance', self.model(1.0)), 'v0001')
+        model = self.worker.get('performance')
+        self.assertIsInstance(model['weights'], numpy.memmap)
+        self.assertEqual(float(model['weights'].sum()), 1000.0)
+
+    def test_workers_switch_to_a_new_version(self):
+        self.publisher.publish('performance', self.model(1.0))
+        self.assertEqual(float(self.worker.get('performance')['weights'][0]), 1.0)
+
+        self.publisher.publish('performance', self.model(2.0))
+        self.assertEqual(self.worker.version('performance'), 'v0002')
+        self.assertEqual(float(self.worker.get('performance')['weights'][0]), 2.0)
+
+    def test_old_versions_are_pruned(self):
+        for value in range(4):
+            self.publisher.publish('performance', self.model(value))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, 'performance'))), ['v0003', 'v0004'])
+        self.assertIsNone(self.worker.get('missing'))
+
+
+class MLAlertFeedTests(TestCase):
+    """The alert feed is computed by the job; requests only read the stored snapshot"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=10, classes=1, sections_per_class=1, attendance_days=5,
+                               routes=1, stoppages_per_route=1).build()
+
+    def setUp(self):
+        from core.ml_alert_service import MLAlertService
+
+        cache.clear()
+        self.service = MLAlertService()
+
+    def test_requests_never_compute_alerts(self):
+        from unittest import mock
+        from core.ml_alert_service import MLAlertService
+
+        with mock.patch.object(MLAlertService, 'compute_alerts', side_effect=AssertionError('computed in a request')):
+            self.assertEqual(self.service.get_all_ml_alerts(), [])
+
+        snapshot, created = self.service.materialize()
+        self.assertTrue(created)
+        cache.clear()
+        with mock.patch.object(MLAlertService, 'compute_alerts', side_effect=AssertionError('computed in a request')):
+            feed = self.service.get_feed()
+        self.assertEqual(feed['alerts'], snapshot.alerts)
+        self.assertEqual(feed['inputs_version'], snapshot.inputs_version)
+
+    def test_unchanged_inputs_are_not_recomputed(self):
+        from students.models import Student
+
+        first, created = self.service.materialize()
+        self.assertTrue(created)
+        self.assertEqual(self.service.materialize(), (first, False))
+
+        Student.objects.order_by('id').first().save()
+        second, created = self.service.materialize()
+        self.assertTrue(created)
+        self.assertNotEqual(second.inputs_version, first.inputs_version)
+
+
+class BulkImportTests(TestCase):
+    """The chunked import engine, run with the class section adapter"""
+
+    CSV = (
+        'Class,Section,Room\n'
+        'Class 1,A,R-101\n'
+        'Class 1,B,R-102\n'
+        'Class 2,A,R-101\n'   # Room taken by row 2
+        'Class 1,A,R-103\n'   # Same class as row 2
+    )
+
+    def upload(self, content=None, name='classes.csv'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile(name, (content or self.CSV).encode())
+
+    def run_import(self, dry_run=False, chunk_size=None, **kwargs):
+        from core.imports import BulkImporter, get_adapter
+        return BulkImporter(get_adapter('class_sections'), chunk_size=chunk_size).run(
+            self.upload(**kwargs), dry_run=dry_run
+        )
+
+    def test_dry_run_validates_without_saving(self):
+        from subjects.models import ClassSection
+
+        report = self.run_import(dry_run=True)
+        self.assertEqual((report.rows, report.created, report.error_count), (4, 2, 2))
+        self.assertEqual([error.split(':')[0] for error in report.errors], ['Row 4', 'Row 5'])
+        self.assertIn('would be created', report.summary)
+        self.assertFalse(ClassSection.objects.exists())
+
+    def test_chunks_are_saved_and_checked_against_each_other(self):
+        from subjects.models import ClassSection
+
+        before = data_versions.stamp('students')
+        report = self.run_import(chunk_size=1)
+        # Row 4's room was saved by an earlier chunk; row 5's class too, so it is skipped as existing
+        self.assertEqual((report.created, report.skipped, report.error_count), (2, 1, 1))
+        self.assertTrue(report.errors[0].startswith('Row 4'))
+        self.assertEqual(sorted(ClassSection.objects.values_list('room_number', flat=True)), ['R-101', 'R-102'])
+        self.assertNotEqual(data_versions.stamp('students'), before)
+
+        again = self.run_import()
+        self.assertEqual((again.created, again.skipped, again.error_count), (0, 3, 1))
+        self.assertEqual(ClassSection.objects.count(), 2)
+
+    def test_unreadable_files_are_rejected(self):
+        from core.imports import ImportFileError
+
+        with self.assertRaisesMessage(ImportFileError, 'room_number'):
+            self.run_import(content='Class,Section\nClass 1,A\n')
+        with self.assertRaises(ImportFileError):
+            self.run_import(name='classes.txt')
+        with self.assertRaisesMessage(ImportFileError, 'empty'):
+            self.run_import(content='\n\n')
+
+    def test_command_dry_run(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from subjects.models import ClassSection
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write(self.CSV)
+        self.addCleanup(os.unlink, fh.name)
+        out = StringIO()
+        call_command('bulk_import', 'class_sections', fh.name, '--dry-run', stdout=out)
+        self.assertIn('2 would be created', out.getvalue())
+        self.assertIn('nothing was saved', out.getvalue())
+        self.assertFalse(ClassSection.objects.exists())
+
+
+class QueueLoggingTests(TestCase):
+    """Records are written by the writer thread; busy loggers are rate-limited"""
+
+    def make_logger(self, queue_size=100):
+        import io
+        import logging
+        import queue
+        import threading
+        from core.logging_config import HandlerQueueListener, QueueProxyHandler
+
+        class WriterThreadHandler(logging.StreamHandler):
+            def emit(self, record):
+                self.stream.write(f'[{threading.current_thread().name}] ')
+                super().emit(record)
+
+        stream = io.StringIO()
+        target = WriterThreadHandler(stream)
+        target.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        proxy = QueueProxyHandler(queue.Queue(maxsize=queue_size), target)
+        logger = logging.getLogger(f'core.tests.queue.{self._testMethodName}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(proxy)
+        self.addCleanup(logger.removeHandler, proxy)
+        return logger, HandlerQueueListener(proxy.queue, [proxy]), proxy, stream
+
+    def test_records_are_written_by_the_writer_thread(self):
+        logger, listener, _, stream = self.make_logger()
+        listener.start()
+        fees = {'paid': 100}
+        logger.info('Deposit %s', fees)
+        fees['paid'] = 0  # Changed after the call; the record keeps what was logged
+        listener.stop()
+        self.assertEqual(stream.getvalue(), "[log-writer] INFO Deposit {'paid': 100}\n")
+
+    def test_full_queue_drops_info_and_reports_it(self):
+        logger, listener, proxy, stream = self.make_logger(queue_size=1)
+        for number in range(3):
+            logger.info('Record %s', number)
+        self.assertEqual(proxy.dropped, 2)
+
+        listener.start()
+        listener.stop()
+        self.assertIn('2 records were dropped', stream.getvalue())
+        self.assertIn('Record 0', stream.getvalue())
+
+    def test_rate_limit_filter(self):
+        import logging
+        from core.logging_config import RateLimitFilter
+
+        limiter = RateLimitFilter(per_second=2)
+
+        def record(level=logging.INFO, created=1000.0):
+            entry = logging.makeLogRecord({'name': 'busy', 'levelno': level, 'msg': 'tick'})
+            entry.created = created
+            return entry
+
+        self.assertEqual([limiter.filter(record()) for _ in range(5)], [True, True, False, False, False])
+        self.assertTrue(limiter.filter(record(logging.WARNING)))
+        later = record(created=1001.0)
+        self.assertTrue(limiter.filter(later))
+        self.assertEqual(later.getMessage(), '[3 records suppressed] tick')
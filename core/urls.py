@@ -9,4 +9,8 @@ urlpatterns = [
     path('api/export/initiate/', api_views.export_initiate, name='export_initiate'),
     path('api/export/status/<str:request_id>/', api_views.export_status, name='export_status'),
     path('api/export/download/<str:request_id>/', api_views.export_download, name='export_download'),
+
+    # Bulk import API
+    path('api/import/initiate/', api_views.import_initiate, name='import_initiate'),
+    path('api/import/status/<str:job_id>/', api_views.import_status, name='import_status'),
 ]
\ No newline at end of file
@@ -9,8 +9,10 @@ from decimal import Decimal
 from students.models import Student
 from teachers.models import Teacher
 from student_fees.models import FeeDeposit
-from attendance.models import Attendance
 from subjects.models import ClassSection, Subject
+import logging
+
+logger = logging.getLogger(__name__)
 
 class UnifiedDashboardService:
     """
@@ -21,6 +23,12 @@ class UnifiedDashboardService:
         self.current_date = timezone.now().date()
         self.current_month_start = self.current_date.replace(day=1)
         self.thirty_days_ago = self.current_date - timedelta(days=30)
+        self._results = {}  # Sections computed once per instance (alerts reuse them)
+    
+    def _once(self, name, compute):
+        if name not in self._results:
+            self._results[name] = compute()
+        return self._results[name]
     
     def get_complete_dashboard_data(self):
         """
@@ -79,6 +87,9 @@ class UnifiedDashboardService:
         """
         Get comprehensive fee collection data from actual database
         """
+        return self._once('fee_data', self._get_fee_collection_data)
+    
+    def _get_fee_collection_data(self):
         try:
             # Monthly revenue (current month)
             monthly_revenue = FeeDeposit.objects.filter(
@@ -95,31 +106,26 @@ class UnifiedDashboardService:
             overdue_fees_count = 0
             total_pending_amount = Decimal('0')
             
-            # Check each student's balance using the fee calculation service
+            # Every student's balance from a few grouped queries per chunk
             try:
-                from student_fees.services import FeeCalculationService
+                from core.fee_management.calculators import AtomicFeeCalculator
                 
-                for student in Student.objects.all():
-                    try:
-                        balance_info = FeeCalculationService.calculate_student_balance(student)
-                        total_balance = Decimal(str(balance_info['total_balance']))
+                balances = AtomicFeeCalculator.calculate_balance_details(
+                    Student.objects.select_related('class_section')
+                )
+                for balance_info in balances.values():
+                    total_balance = Decimal(str(balance_info['total_balance']))
+                    
+                    if total_balance > 0:
+                        pending_fees_count += 1
+                        total_pending_amount += total_balance
                         
-                        if total_balance > 0:
-                            pending_fees_count += 1
-                            total_pending_amount += total_balance
-                            
-                            # Check if overdue (has carry forward or overdue fines)
-                            cf_balance = Decimal(str(balance_info['carry_forward']['balance']))
-                            fine_balance = Decimal(str(balance_info['fines']['unpaid']))
-                            
-                            if cf_balance > 0 or fine_balance > 0:
-                                overdue_fees_count += 1
-                    except Exception:
-                        # If calculation fails, check basic due amount
-                        if student.due_amount and student.due_amount > 0:
-                            pending_fees_count += 1
+                        # Check if overdue (has carry forward or overdue fines)
+                        cf_balance = Decimal(str(balance_info['carry_forward']['balance']))
+                        fine_balance = Decimal(str(balance_info['fines']['unpaid']))
+                        
+                        if cf_balance > 0 or fine_balance > 0:
                             overdue_fees_count += 1
-                            total_pending_amount += student.due_amount
                         
             except ImportError:
                 # Fallback to basic calculation if service not available
@@ -164,6 +170,9 @@ class UnifiedDashboardService:
         """
         Get comprehensive attendance data from actual database
         """
+        return self._once('attendance_data', self._get_attendance_data)
+    
+    def _get_attendance_data(self):
         # Today's attendance rate
         today_attendance = self._calculate_daily_attendance(self.current_date)
         
@@ -184,6 +193,9 @@ class UnifiedDashboardService:
         """
         Get comprehensive fines data from actual database
         """
+        return self._once('fines_data', self._get_fines_data)
+    
+    def _get_fines_data(self):
         try:
             from fines.models import Fine, FineStudent
             
@@ -219,15 +231,14 @@ class UnifiedDashboardService:
             
             # Total fine liability (fine amount × students applied to)
             total_amount = Decimal('0')
-            for fine in Fine.objects.all():
-                student_count = fine.fine_students.count()
-                total_amount += fine.amount * student_count
-            
-            # Monthly fines liability (current month)
             monthly_fines = Decimal('0')
-            for fine in Fine.objects.filter(applied_date__date__gte=self.current_month_start):
-                student_count = fine.fine_students.count()
-                monthly_fines += fine.amount * student_count
+            for amount, applied_date, student_count in Fine.objects.annotate(
+                student_count=Count('fine_students')
+            ).values_list('amount', 'applied_date', 'student_count'):
+                total_amount += amount * student_count
+                # Monthly fines liability (current month)
+                if applied_date and timezone.localdate(applied_date) >= self.current_month_start:
+                    monthly_fines += amount * student_count
             
             # Total collected fines (paid fines amount)
             collected_fines = FineStudent.objects.filter(
@@ -349,53 +360,34 @@ class UnifiedDashboardService:
         """
         Calculate attendance rate for a specific date
         """
-        day_attendance = Attendance.objects.filter(date=date)
-        total_records = day_attendance.count()
-        
-        if total_records == 0:
-            return 0
-        
-        present_count = day_attendance.filter(status='Present').count()
-        return round((present_count / total_records) * 100, 1)
+        from attendance.services import AttendanceService
+        return AttendanceService.get_rate(date)
     
     def _calculate_monthly_attendance(self):
         """
         Calculate average attendance for current month
         """
-        month_attendance = Attendance.objects.filter(
-            date__gte=self.current_month_start
-        )
-        
-        if not month_attendance.exists():
-            return 0
-        
-        total_records = month_attendance.count()
-        present_count = month_attendance.filter(status='Present').count()
-        
-        return round((present_count / total_records) * 100, 1)
+        from attendance.services import AttendanceService
+        return AttendanceService.get_rate(self.current_month_start, self.current_date)
     
     def _get_low_attendance_students(self):
         """
-        Get students with attendance below 75% - optimized query
+        Get students with attendance below 75% - one grouped query
         """
         low_attendance = []
         
-        # Only check students who have attendance records
-        students_with_attendance = Student.objects.filter(
-            attendances__date__gte=self.current_month_start
-        ).distinct()
+        # Only students who have attendance records this month
+        month = Q(attendances__date__gte=self.current_month_start)
+        students_with_attendance = Student.objects.filter(month).annotate(
+            total_days=Count('attendances', filter=month),
+            present_days=Count('attendances', filter=month & Q(attendances__status='Present')),
+        ).select_related('class_section')
         
         for student in students_with_attendance:
-            student_attendance = Attendance.objects.filter(
-                student=student,
-                date__gte=self.current_month_start
-            )
-            
-            total = student_attendance.count()
+            total, present = student.total_days, student.present_days
             if total == 0:
                 continue
                 
-            present = student_attendance.filter(status='Present').count()
             rate = (present / total) * 100
             
             if rate < 75:
@@ -601,33 +593,26 @@ class UnifiedDashboardService:
             pass
         return alerts
     
+    def _get_ml_summary(self):
+        """Counts materialized with the ML alert feed (not computed per request)"""
+        try:
+            from core.ml_alert_service import ml_alert_service
+            return ml_alert_service.get_summary()
+        except Exception as e:
+            logger.error(f"ML alert summary failed: {e}")
+            return {}
+    
     def _get_ml_high_risk_students(self):
         """Get count of ML-identified high-risk students"""
-        try:
-            from core.ml_integrations import ml_service
-            # Simulate ML risk detection
-            return Student.objects.filter(due_amount__gt=5000).count()
-        except Exception:
-            return 0
+        return self._get_ml_summary().get('high_risk_students', 0)
     
     def _get_ml_payment_risks(self):
         """Get count of students with high payment delay risk"""
-        try:
-            # Simulate ML payment risk prediction
-            return Student.objects.filter(
-                due_amount__gt=0,
-                fee_deposits__isnull=True
-            ).count()
-        except Exception:
-            return 0
+        return self._get_ml_summary().get('payment_risks', 0)
     
     def _get_ml_attendance_anomalies(self):
         """Get count of students with attendance anomalies"""
-        try:
-            # Simulate ML attendance pattern detection
-            return len(self._get_low_attendance_students())
-        except Exception:
-            return 0
+        return self._get_ml_summary().get('attendance_anomalies', 0)
     
     def _get_enhanced_ml_alerts(self):
         """Get comprehensive ML alerts from dedicated service"""
@@ -0,0 +1,260 @@
+# fees/carry_forward.py
+"""
+Bulk carry-forward (previous session balance) updates
+
+Carry-forward lives in Student.due_amount. Every way of setting it goes through
+CarryForwardService.apply(): only rows whose amount actually changed are
+written, with one bulk UPDATE per batch and no model save() (so no class-change
+signals), and the affected balances are recalculated once at commit.
+
+Amounts come from three places:
+
+- the carry-forward editor (due_amount_<id> form fields)
+- a CSV/XLSX file of admission number and amount, read row by row and fully
+  validated before anything is written
+- the payment ledger: what each student still owes from the session being
+  closed (current session balance plus unpaid carry-forward), computed for
+  every student in a few grouped queries. Unpaid fines are not included; they
+  stay attached to the student as FineStudent rows.
+
+Ledger amounts are a preview only. Nothing closes the session: the closed
+session's fees and carry-forward payments stay allocated, so writing current
+balance + carry-forward into due_amount would count the current session twice
+(and again on every run). The editor and ``set_carry_forward --from-ledger``
+show the amounts but never save them.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+import csv
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_AMOUNT = Decimal('99999999.99')  # Student.due_amount: max_digits=10, decimal_places=2
+
+ADMISSION_HEADERS = ('admission_number', 'admission no', 'admission_no', 'admission no.')
+AMOUNT_HEADERS = ('due_amount', 'carry_forward', 'carry forward', 'due amount', 'amount')
+
+
+class CarryForwardError(ValueError):
+    """Raised when an uploaded carry-forward file cannot be read"""
+
+
+@dataclass
+class CarryForwardImport:
+    """Outcome of reading a carry-forward file"""
+
+    changes: dict = field(default_factory=dict)
+    rows: int = 0
+    errors: list = field(default_factory=list)
+    error_count: int = 0
+
+    MAX_ERRORS = 50
+
+    def add_error(self, row_num, message):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"Row {row_num}: {message}")
+
+
+class CarryForwardService:
+    """Set many students' carry-forward amounts at once"""
+
+    BATCH_SIZE = 500
+    LOOKUP_BATCH_SIZE = 1000
+
+    @staticmethod
+    def parse_amount(value):
+        """Decimal amount from form/file input; blank means 0. Raises ValueError."""
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return Decimal('0.00')
+        try:
+            amount = Decimal(str(value).strip().replace(',', ''))
+        except InvalidOperation:
+            raise ValueError(f"'{value}' is not a valid amount")
+        if not amount.is_finite() or amount < 0:
+            raise ValueError(f"'{value}' is not a valid amount")
+        if amount > MAX_AMOUNT:
+            raise ValueError(f"{value} is larger than the maximum of {MAX_AMOUNT}")
+        return amount.quantize(Decimal('0.01'))
+
+    @classmethod
+    def apply(cls, changes):
+        """
+        Write ``changes`` ({student_id: amount}) to Student.due_amount.
+        Rows already holding the amount, and unknown ids, are skipped.
+        Returns the number of students updated.
+        """
+        from students.models import Student
+        from core.fee_management.recalculation import due_recalc_queue
+
+        changes = {int(student_id): Decimal(amount) for student_id, amount in changes.items()}
+        if not changes:
+            return 0
+
+        ids = sorted(changes)
+        updated_ids = []
+        with transaction.atomic():
+            for start in range(0, len(ids), cls.LOOKUP_BATCH_SIZE):
+                chunk = ids[start:start + cls.LOOKUP_BATCH_SIZE]
+                current = Student.objects.all_statuses().select_related(None).filter(
+                    id__in=chunk
+                ).values_list('id', 'due_amount')
+                changed = [
+                    Student(id=student_id, due_amount=changes[student_id])
+                    for student_id, due_amount in current
+                    if due_amount != changes[student_id]
+                ]
+                Student.objects.all_statuses().bulk_update(changed, ['due_amount'], batch_size=cls.BATCH_SIZE)
+                updated_ids.extend(student.id for student in changed)
+
+            due_recalc_queue.mark_dirty(updated_ids)
+
+        logger.info(f"Carry forward updated for {len(updated_ids)} of {len(changes)} students")
+        return len(updated_ids)
+
+    @classmethod
+    def changes_from_post(cls, data):
+        """{student_id: amount} from the editor's due_amount_<id> fields; invalid entries are skipped"""
+        changes = {}
+        for key, value in data.items():
+            if not key.startswith('due_amount_'):
+                continue
+            try:
+                changes[int(key[len('due_amount_'):])] = cls.parse_amount(value)
+            except ValueError:
+                continue
+        return changes
+
+    # ------------------------------------------------------------------
+    # File import
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _iter_rows(uploaded_file):
+        """Yield rows of a CSV or XLSX upload without loading the whole file"""
+        name = (getattr(uploaded_file, 'name', '') or '').lower()
+        if name.endswith('.xlsx'):
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise CarryForwardError("Excel import is not available; please upload a CSV file.")
+            try:
+                workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+            except Exception:
+                raise CarryForwardError("We couldn't open this Excel file. Please check it and try again.")
+            try:
+                for row in workbook.active.iter_rows(values_only=True):
+                    yield row
+            finally:
+                workbook.close()
+        elif name.endswith('.csv'):
+            uploaded_file.seek(0)
+            reader = csv.reader(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline=''))
+            try:
+                for row in reader:
+                    yield row
+            except UnicodeDecodeError:
+                raise CarryForwardError("We couldn't read this file. Please save it as UTF-8 CSV and try again.")
+        else:
+            raise CarryForwardError("Please upload a .csv or .xlsx file.")
+
+    @staticmethod
+    def _find_columns(header):
+        """(admission column, amount column) from a header row, or None if it isn't one"""
+        labels = [str(cell or '').strip().lower() for cell in header]
+        admission = next((i for i, label in enumerate(labels) if label in ADMISSION_HEADERS), None)
+        amount = next((i for i, label in enumerate(labels) if label in AMOUNT_HEADERS), None)
+        if admission is None or amount is None:
+            return None
+        return admission, amount
+
+    @classmethod
+    def _resolve_batch(cls, batch, result):
+        """Map a batch of (row_num, admission_number, amount) to student ids"""
+        from students.models import Student
+
+        ids = dict(Student.objects.all_statuses().select_related(None).filter(
+            admission_number__in={admission for _, admission, _ in batch}
+        ).values_list('admission_number', 'id'))
+        for row_num, admission, amount in batch:
+            student_id = ids.get(admission)
+            if student_id is None:
+                result.add_error(row_num, f"no student with admission number '{admission}'")
+            else:
+                result.changes[student_id] = amount
+
+    @classmethod
+    def read_file(cls, uploaded_file):
+        """
+        Validate a CSV/XLSX of admission number and carry-forward amount.
+        The first row must name both columns (e.g. admission_number, due_amount).
+        Nothing is written; pass ``result.changes`` to apply() if there are no errors.
+        """
+        result = CarryForwardImport()
+        rows = cls._iter_rows(uploaded_file)
+        columns = None
+        seen = set()
+        batch = []
+        for row_num, row in enumerate(rows, 1):
+            if not row or not any(cell not in (None, '') for cell in row):
+                continue
+            if columns is None:
+                columns = cls._find_columns(row)
+                if columns is None:
+                    raise CarryForwardError(
+                        "The first row must have 'admission_number' and 'due_amount' column headings."
+                    )
+                continue
+
+            result.rows += 1
+            admission_col, amount_col = columns
+            admission = str(row[admission_col] if admission_col < len(row) and row[admission_col] is not None else '').strip()
+            if not admission:
+                result.add_error(row_num, "admission number is missing")
+                continue
+            if admission in seen:
+                result.add_error(row_num, f"admission number '{admission}' appears more than once")
+                continue
+            seen.add(admission)
+            try:
+                amount = cls.parse_amount(row[amount_col] if amount_col < len(row) else None)
+            except ValueError as e:
+                result.add_error(row_num, str(e))
+                continue
+
+            batch.append((row_num, admission, amount))
+            if len(batch) >= cls.LOOKUP_BATCH_SIZE:
+                cls._resolve_batch(batch, result)
+                batch = []
+
+        if columns is None:
+            raise CarryForwardError("The file is empty.")
+        if batch:
+            cls._resolve_batch(batch, result)
+        return result
+
+    # ------------------------------------------------------------------
+    # Ledger
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def from_ledger(students=None):
+        """
+        {student_id: amount still owed} from the payment ledger: current session
+        balance plus unpaid carry-forward, for ``students`` (default: active students).
+        For preview only; see the module docstring.
+        """
+        from students.models import Student
+        from core.fee_management.calculators import AtomicFeeCalculator
+
+        if students is None:
+            students = Student.objects.all()
+        balances = AtomicFeeCalculator.calculate_balances(students)
+        return {
+            student_id: balance['current'] + balance['carry_forward']
+            for student_id, balance in balances.items()
+        }
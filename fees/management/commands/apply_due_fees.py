@@ -3,6 +3,7 @@ from django.utils import timezone
 from datetime import date
 from fees.models import FeesType
 from students.models import Student
+from core.fee_management.recalculation import due_recalc_queue
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,14 +19,10 @@ class Command(BaseCommand):
             is_active=True
         )
         
-        updated_count = 0
-        
-        # Update all student due amounts to reflect current fees
-        students = Student.objects.all()
-        
-        for student in students:
-            student.update_due_amount()
-            updated_count += 1
+        # Update all student due amounts to reflect current fees, in one batched pass
+        student_ids = list(Student.objects.values_list('id', flat=True))
+        due_recalc_queue.mark_dirty(student_ids)
+        updated_count = len(student_ids)
         
         self.stdout.write(
             self.style.SUCCESS(f'Updated due amounts for {updated_count} students')
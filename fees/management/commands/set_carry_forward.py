@@ -0,0 +1,53 @@
+# fees/management/commands/set_carry_forward.py
+from django.core.management.base import BaseCommand, CommandError
+from students.models import Student
+from fees.carry_forward import CarryForwardService, CarryForwardError
+
+
+class Command(BaseCommand):
+    help = 'Set carry forward (previous session due) for many students from a CSV/XLSX file or the payment ledger'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--file', help='CSV or XLSX with admission_number and due_amount columns')
+        source.add_argument('--from-ledger', action='store_true',
+                            help='Preview what each student still owes (current balance + unpaid carry forward); '
+                                 'cannot be combined with --apply')
+        parser.add_argument('--class-id', type=int, help='Only students of this class section (ledger mode)')
+        parser.add_argument('--apply', action='store_true', help='Save the amounts (default is a dry run)')
+
+    def handle(self, *args, **options):
+        if options['from_ledger'] and options['apply']:
+            raise CommandError(
+                'Ledger amounts are a preview only: without a session close the current session stays '
+                'allocated, so saving them would count it twice. Nothing was saved.'
+            )
+        if options['file']:
+            try:
+                with open(options['file'], 'rb') as uploaded:
+                    result = CarryForwardService.read_file(uploaded)
+            except (OSError, CarryForwardError) as e:
+                raise CommandError(str(e))
+            for error in result.errors:
+                self.stdout.write(self.style.WARNING(f'⚠️ {error}'))
+            if result.error_count:
+                raise CommandError(f'{result.error_count} of {result.rows} rows have errors; nothing was saved')
+            changes = result.changes
+        else:
+            students = Student.objects.all()
+            if options['class_id']:
+                students = students.filter(class_section_id=options['class_id'])
+            changes = CarryForwardService.from_ledger(students)
+
+        total = sum(changes.values())
+        self.stdout.write(f'📋 {len(changes)} students, ₹{total} carry forward in total')
+
+        if options['from_ledger']:
+            self.stdout.write(self.style.WARNING('Preview only - ledger amounts are never saved'))
+            return
+        if not options['apply']:
+            self.stdout.write(self.style.WARNING('Dry run - use --apply to save'))
+            return
+
+        updated = CarryForwardService.apply(changes)
+        self.stdout.write(self.style.SUCCESS(f'✅ Carry forward updated for {updated} students'))
@@ -1,6 +1,5 @@
 # fees/services.py
 from django.db.models import Sum, Q
-from django.core.cache import cache
 from .models import FeesGroup, FeesType
 from students.models import Student
 from decimal import Decimal
@@ -11,36 +10,20 @@ logger = logging.getLogger(__name__)
 class FeeService:
     @staticmethod
     def get_applicable_fees(student):
-        """Get applicable fees for a student"""
-        cache_key = f"applicable_fees_{student.id}"
-        fees = cache.get(cache_key)
-        
-        if not fees:
-            # Get fees based on class
-            class_fees = FeesType.objects.filter(
-                Q(class_name=student.class_section.class_name) |
-                Q(class_name__isnull=True)
-            ).select_related('fee_group')
-            
-            # Get transport fees if applicable
-            transport_fees = []
-            try:
-                from transport.models import TransportAssignment
-                transport = TransportAssignment.objects.filter(student=student).first()
-                if transport:
-                    transport_fees = FeesType.objects.filter(
-                        related_stoppage=transport.stoppage
-                    ).select_related('fee_group')
-            except ImportError:
-                pass
-            
-            fees = {
-                'class_fees': list(class_fees),
-                'transport_fees': list(transport_fees)
-            }
-            cache.set(cache_key, fees, 1800)  # 30 minutes
-        
-        return fees
+        """Get applicable fees for a student from the compiled fee schedule"""
+        from core.fee_management.fee_schedule import fee_schedule
+        from transport.models import TransportAssignment
+        
+        schedule = fee_schedule.get()
+        class_name = student.class_section.display_name if student.class_section else None
+        stoppage_id = TransportAssignment.objects.filter(
+            student=student
+        ).values_list('stoppage_id', flat=True).first()
+        
+        return {
+            'class_fees': list(schedule.class_fees(class_name)),
+            'transport_fees': list(schedule.transport_fees(stoppage_id))
+        }
     
     @staticmethod
     def calculate_total_fees(student):
@@ -76,7 +59,4 @@ class FeeService:
                 logger.error(f"Error creating fee type: {e}")
                 continue
         
-        # Clear cache
-        cache.delete_pattern('applicable_fees_*')
-        
         return created_fees
\ No newline at end of file
@@ -1,3 +1,112 @@
+# fees/tests.py
+import io
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from core.benchmark_school import BenchmarkSchoolBuilder
+from core.fee_management.calculators import AtomicFeeCalculator
+from fees.carry_forward import CarryForwardService
+from students.models import Student
+
+
+def balances():
+    return {
+        student_id: balance['total']
+        for student_id, balance in AtomicFeeCalculator.calculate_balances(
+            Student.objects.select_related('class_section')
+        ).items()
+    }
+
+
+class CarryForwardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=8, classes=1, sections_per_class=2, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+        cls.user = get_user_model().objects.create_superuser('accounts', 'accounts@example.com', 'accounts')
+
+    def test_ledger_apply_is_refused_and_balances_do_not_move(self):
+        before = balances()
+        with self.assertRaises(CommandError):
+            call_command('set_carry_forward', '--from-ledger', '--apply', stdout=io.StringIO())
+        call_command('set_carry_forward', '--from-ledger', stdout=io.StringIO())
+        self.assertEqual(balances(), before)
+
+    def test_ledger_page_is_a_preview(self):
+        before = balances()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('fees:fees_carry_forward'), {'mode': 'ledger'})
+
+        self.assertContains(response, 'Still Owed (Preview)')
+        self.assertNotContains(response, 'name="due_amount_')
+        self.assertEqual(balances(), before)
+
+    def test_apply_writes_only_changed_rows(self):
+        first, second = Student.objects.order_by('id')[:2]
+        changes = {first.id: Decimal('750.00'), second.id: second.due_amount}
+        self.assertEqual(CarryForwardService.apply(changes), 1)
+        first.refresh_from_db()
+        self.assertEqual(first.due_amount, Decimal('750.00'))
+
+    def test_file_with_errors_saves_nothing(self):
+        first, second = Student.objects.order_by('id')[:2]
+        upload = SimpleUploadedFile('carry.csv', (
+            f'admission_number,due_amount\n{first.admission_number},900\n{second.admission_number},abc\nNOPE,5\n'
+        ).encode(), content_type='text/csv')
+        result = CarryForwardService.read_file(upload)
+
+        self.assertEqual(result.rows, 3)
+        self.assertEqual(result.error_count, 2)
+        self.assertEqual(result.changes, {first.id: Decimal('900.00')})
+
+
+class FeeScheduleTests(TestCase):
+    """The compiled schedule follows the 'fee_schedule' stamp kept in the database"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from fees.models import FeesType
+
+        BenchmarkSchoolBuilder(students=4, classes=1, sections_per_class=1, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+        cls.fee = FeesType.objects.exclude(class_name='').order_by('id').first()
+
+    def class_total(self):
+        from core.fee_management.fee_schedule import fee_schedule
+        return fee_schedule.get().class_total(self.fee.class_name)
+
+    def test_saved_fee_is_recompiled(self):
+        before = self.class_total()
+        self.fee.amount += 100
+        self.fee.save()
+        self.assertEqual(self.class_total(), before + 100)
+
+    def test_stamp_bumped_by_another_process_is_seen(self):
+        from core.models import DataVersion
+        from fees.models import FeesType
+
+        before = self.class_total()
+        # Another worker's write: no signal here, only its stamp in the database
+        FeesType.objects.filter(pk=self.fee.pk).update(amount=self.fee.amount + 100)
+        self.assertEqual(self.class_total(), before)
+        DataVersion.objects.update_or_create(key='fee_schedule', defaults={'stamp': 'other-worker'})
+        self.assertEqual(self.class_total(), before + 100)
+
+    def test_rollback_keeps_the_old_schedule(self):
+        from django.db import transaction
+        from core.fee_management.fee_schedule import fee_schedule
 
-# Create your tests here.
+        before, version = self.class_total(), fee_schedule.version()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.fee.amount += 100
+            self.fee.save()
+            self.assertEqual(self.class_total(), before + 100)
+            raise RuntimeError
+        self.assertEqual(fee_schedule.version(), version)
+        self.assertEqual(self.class_total(), before)
@@ -533,19 +533,31 @@ def fees_carry_forward(request):
         from subjects.models import ClassSection
         from django.core.paginator import Paginator
         
+        from .carry_forward import CarryForwardService, CarryForwardError
+        
         if request.method == 'POST':
-            # Handle saving due amounts
-            for key, value in request.POST.items():
-                if key.startswith('due_amount_'):
-                    student_id = key.replace('due_amount_', '')
-                    try:
-                        student = Student.objects.get(id=student_id)
-                        student.due_amount = float(value) if value else 0.00
-                        student.save()
-                    except (Student.DoesNotExist, ValueError):
-                        continue
+            if request.FILES.get('carry_forward_file'):
+                # Import from CSV/XLSX - validated in full before anything is saved
+                try:
+                    result = CarryForwardService.read_file(request.FILES['carry_forward_file'])
+                except CarryForwardError as e:
+                    messages.error(request, str(e))
+                    return redirect('fees:fees_carry_forward')
+                
+                if result.error_count:
+                    messages.error(
+                        request,
+                        f"Nothing was saved: {result.error_count} of {result.rows} rows need fixing. "
+                        + "; ".join(result.errors[:10])
+                    )
+                else:
+                    updated = CarryForwardService.apply(result.changes)
+                    messages.success(request, f"Great! Imported {result.rows} rows, {updated} due amounts changed.")
+                return redirect('fees:fees_carry_forward')
             
-            messages.success(request, "Great! Due amounts have been updated successfully.")
+            # Handle saving due amounts - only changed rows are written
+            updated = CarryForwardService.apply(CarryForwardService.changes_from_post(request.POST))
+            messages.success(request, f"Great! Due amounts have been updated successfully ({updated} changed).")
             return redirect('fees:fees_carry_forward')
         
         # Get pagination parameters
@@ -565,11 +577,19 @@ def fees_carry_forward(request):
         paginator = Paginator(students_qs, page_size)
         students = paginator.get_page(page)
         
+        # Ledger mode: show what each student still owes next to the saved amount (preview only)
+        from_ledger = request.GET.get('mode') == 'ledger'
+        if from_ledger:
+            ledger = CarryForwardService.from_ledger(students.object_list)
+            for student in students:
+                student.ledger_due = ledger.get(student.id)
+        
         context = {
             'students': students,
             'classes': classes,
             'selected_class': class_filter,
-            'page_size': page_size
+            'page_size': page_size,
+            'from_ledger': from_ledger,
         }
         
         return render(request, 'fees/fees_carry_forward.html', context)
@@ -160,30 +160,9 @@ class FineForm(forms.ModelForm):
             instance.created_by = user
 
         if commit:
+            # Fine.save links Class/All fines to their eligible students in bulk
             instance.save()
             
-            # Use centralized service for proper fine application
-            if target_scope == 'Class' and instance.class_section:
-                from core.fee_management.services import fee_service
-                
-                fine_data = {
-                    'class_section_id': instance.class_section.id,
-                    'fine_type_id': instance.fine_type.id,
-                    'fees_type_id': instance.fees_type.id if instance.fees_type else None,
-                    'amount': instance.amount,
-                    'reason': instance.reason,
-                    'due_date': instance.due_date,
-                    'created_by': user
-                }
-                
-                # Apply fine using centralized service (this will create FineStudent records)
-                result = fee_service.apply_class_fine(fine_data)
-                
-                if not result['success']:
-                    logger.error(f"Failed to apply class fine: {result.get('error')}")
-                else:
-                    logger.info(f"Successfully applied fine to {result['students_affected']} students in {result['class_name']}")
-            
             logger.info(f"Form save method - successfully saved fine ID: {instance.id}")
         else:
             logger.info("Form save method - commit=False, not saving to DB yet")
@@ -0,0 +1,93 @@
+# fines/imports.py
+"""Bulk fine assignment import adapter (see core/imports.py)"""
+
+from django.core.exceptions import ValidationError
+from core.imports import ImportAdapter, parse_decimal
+from .models import Fine, FineStudent, FineType
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FineAssignmentImportAdapter(ImportAdapter):
+    """
+    One row per student fine: admission_number, fine_type (name), amount,
+    reason, due_date. Rows sharing fine type, amount, reason and due date
+    become one Individual fine assigned to all of their students.
+    """
+
+    kind = 'fine_assignments'
+    label = 'Fines'
+    module = 'fines'
+    touches = ('fees',)
+    columns = ('admission_number', 'fine_type', 'amount', 'reason', 'due_date')
+    aliases = {'admission_no': 'admission_number', 'fine_amount': 'amount', 'type': 'fine_type'}
+    BATCH_SIZE = 500
+
+    def __init__(self, user=None, **options):
+        super().__init__(user=user, **options)
+        self.fines = {}       # (fine_type_id, amount, reason, due_date) -> Fine
+        self.assigned = set()  # (fine key, student_id)
+        self._fine_types = None
+
+    def fine_types(self):
+        if self._fine_types is None:
+            self._fine_types = {
+                name.strip().lower(): type_id
+                for type_id, name in FineType.objects.filter(is_active=True).values_list('id', 'name')
+            }
+        return self._fine_types
+
+    def prepare(self, records):
+        from students.models import Student
+
+        admissions = {record.get('admission_number', '').strip() for _, record in records}
+        return {'students': dict(
+            Student.objects.all_statuses().select_related(None).filter(
+                admission_number__in=admissions
+            ).values_list('admission_number', 'id')
+        )}
+
+    def _fine(self, record):
+        """The (possibly unsaved) fine this row belongs to"""
+        fine_type_id = self.fine_types().get(record.get('fine_type', '').strip().lower())
+        if fine_type_id is None:
+            raise ValidationError(f"fine type '{record.get('fine_type', '')}' does not exist or is inactive")
+        amount = parse_decimal(record.get('amount'))
+        if not amount:
+            raise ValidationError("amount must be greater than 0")
+
+        fine = Fine(
+            fine_type_id=fine_type_id, amount=amount, reason=record.get('reason', ''),
+            due_date=record.get('due_date'), target_scope='Individual', created_by=self.user,
+        )
+        try:
+            fine.clean_fields(exclude=['fine_type', 'class_section', 'fees_type', 'created_by'])
+        except ValidationError as e:
+            raise ValidationError('; '.join(f"{name}: {' '.join(errors)}" for name, errors in e.message_dict.items()))
+        key = (fine.fine_type_id, fine.amount, fine.reason, fine.due_date)
+        return key, self.fines.setdefault(key, fine)
+
+    def build(self, row_num, record, context):
+        admission = record.get('admission_number', '').strip()
+        student_id = context['students'].get(admission)
+        if student_id is None:
+            raise ValidationError(f"no student with admission number '{admission}'")
+
+        key, fine = self._fine(record)
+        if (key, student_id) in self.assigned:
+            raise ValidationError(f"'{admission}' already has this fine earlier in the file")
+        self.assigned.add((key, student_id))
+        return FineStudent(fine=fine, student_id=student_id)
+
+    def write(self, instances):
+        from core.fee_management.recalculation import due_recalc_queue
+
+        # Fine.save() would also apply the fine; here the students are linked below
+        new_fines = list({id(fs.fine): fs.fine for fs in instances if fs.fine.pk is None}.values())
+        Fine.objects.bulk_create(new_fines, batch_size=self.BATCH_SIZE)
+        FineStudent.objects.bulk_create(instances, batch_size=self.BATCH_SIZE, ignore_conflicts=True)
+        due_recalc_queue.mark_dirty({fs.student_id for fs in instances})
+        if new_fines:
+            logger.info(f"Imported {len(new_fines)} fines for {len(instances)} students")
+        return len(instances), 0
@@ -78,18 +78,25 @@ class Fine(BaseModel):
 
     def save(self, *args, **kwargs):
         user = kwargs.pop('user', None)
+        apply_to_students = kwargs.pop('apply_to_students', True)
         with transaction.atomic():
             if self.dynamic_amount_percent and self.fees_type:
                 self.amount = self.fees_type.amount * (self.dynamic_amount_percent / 100)
             if user:
                 self.created_by = self.created_by or user
+            is_new = self._state.adding
             super().save(*args, **kwargs)
             logger.info(f"Saved fine ID {self.id} with scope {self.target_scope}")
             
-            # Update due amounts for affected students
-            if hasattr(self, 'fine_students'):
-                for fs in self.fine_students.all():
-                    fs.student.update_due_amount()
+            from core.fee_management.fine_application import FineApplicationService
+            if is_new and apply_to_students and self.target_scope in FineApplicationService.BULK_SCOPES:
+                # Link the class / school to the new fine in bulk
+                FineApplicationService.apply(self)
+            else:
+                # Update due amounts for affected students
+                FineApplicationService.refresh_students(
+                    self.fine_students.values_list('student_id', flat=True)
+                )
 
 # FineWaiver removed - use student_fees discount system instead
 
@@ -105,6 +112,7 @@ class FineStudent(BaseModel):
         indexes = [
             models.Index(fields=['fine', 'student']),
             models.Index(fields=['is_paid']),
+            models.Index(fields=['student', 'is_paid']),
         ]
         unique_together = ('fine', 'student')
 
@@ -114,7 +122,8 @@ class FineStudent(BaseModel):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         # Update student due amount when fine status changes
-        self.student.update_due_amount()
+        from core.fee_management.recalculation import due_recalc_queue
+        due_recalc_queue.mark_dirty([self.student_id])
 
 class FineAuditLog(BaseModel):
     fine = models.ForeignKey(Fine, on_delete=models.CASCADE, related_name='audit_logs')
@@ -0,0 +1,15 @@
+# fines/tasks.py - Periodic fine jobs (scheduled in school_management/celery.py)
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def process_due_fines():
+    """Apply Class/All fines past their due date to eligible students that don't have them yet"""
+    from core.fee_management.fine_application import FineApplicationService
+    
+    applied = FineApplicationService.apply_due()
+    message = f"Applied {len(applied)} due fines to {sum(applied.values())} students"
+    logger.info(message)
+    return message
@@ -1,3 +1,79 @@
+# fines/tests.py
+from decimal import Decimal
+
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+
+from core.benchmark_school import BenchmarkSchoolBuilder
+from core.fee_management.fine_application import FineApplicationService
+from core.fee_management.models import PaymentAllocation
+from core.fee_management.services import FeeManagementService
+from core.profiling import capture_queries
+from fines.models import Fine, FineStudent, FineType
+from students.models import Student
+from subjects.models import ClassSection
+
+
+class ClassFineTests(TestCase):
+    """Class fines are linked to the right students in a fixed number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=24, classes=2, sections_per_class=1, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+        cls.fine_type = FineType.objects.create(name='Late Submission', category='Late Fee')
+        cls.section = ClassSection.objects.order_by('id').first()
+        cls.class_ids = set(Student.objects.filter(class_section=cls.section).values_list('id', flat=True))
+
+    def apply(self, **extra):
+        return FeeManagementService().apply_class_fine({
+            'class_section_id': self.section.id,
+            'fine_type_id': self.fine_type.id,
+            'amount': '50',
+            'reason': 'Late payment',
+            **extra,
+        })
+
+    def fined_ids(self, fine_id):
+        return set(FineStudent.objects.filter(fine_id=fine_id).values_list('student_id', flat=True))
+
+    def test_only_the_class_is_fined(self):
+        result = self.apply()
+        self.assertTrue(result['success'])
+        self.assertEqual(self.fined_ids(result['fine_id']), self.class_ids)
+        self.assertEqual(result['students_affected'], len(self.class_ids))
+
+    def test_students_who_paid_the_fee_type_are_skipped(self):
+        from fees.models import FeesType
+
+        fee = FeesType.objects.filter(class_name=self.section.display_name).order_by('id').first()
+        paid = {
+            row['student_id'] for row in PaymentAllocation.objects.filter(
+                allocation_type=PaymentAllocation.FEE, fees_type=fee,
+            ).values('student_id').annotate(total=Sum('allocated_amount')) if row['total'] >= fee.amount
+        }
+        self.assertTrue(paid)  # The seeded deposits pay the first month for most students
+
+        result = self.apply(fees_type_id=fee.id)
+        self.assertEqual(self.fined_ids(result['fine_id']), self.class_ids - paid)
+
+    def test_queries_do_not_grow_with_the_class(self):
+        counts = []
+        for scope, section in (('Class', self.section), ('All', None)):
+            fine = Fine(fine_type=self.fine_type, amount=Decimal('20'), reason='Damage', target_scope=scope,
+                        class_section=section, due_date=timezone.localdate())
+            fine.save(apply_to_students=False)
+            with capture_queries() as profile:
+                fined = FineApplicationService.apply(fine)
+            counts.append(profile.query_count)
+        self.assertEqual(len(fined), Student.objects.count())
+        self.assertEqual(counts[0], counts[1])
 
-# Create your tests here.
+    def test_reapplying_links_nobody_twice(self):
+        fine = Fine.objects.create(fine_type=self.fine_type, amount=Decimal('20'), reason='Library',
+                                   target_scope='Class', class_section=self.section,
+                                   due_date=timezone.localdate())
+        self.assertEqual(FineApplicationService.apply(fine), [])
+        self.assertEqual(FineApplicationService.apply_due(), {})
+        self.assertEqual(FineStudent.objects.filter(fine=fine).count(), len(self.class_ids))
@@ -169,7 +169,25 @@ def delete_fine(request, fine_id):
 
 @module_required('fines', 'edit')
 def upload_fines(request):
-    return render(request, 'fines/upload_fines.html')
+    context = {}
+    if request.method == 'POST':
+        from core.imports import ImportFileError, start_import
+
+        uploaded_file = request.FILES.get('file')
+        if not uploaded_file:
+            messages.error(request, "Please choose a CSV or Excel file to upload.")
+        else:
+            try:
+                dry_run = request.POST.get('dry_run') == 'on'
+                context['job_id'] = start_import('fine_assignments', uploaded_file, user=request.user, dry_run=dry_run)
+                context['dry_run'] = dry_run
+                logger.info(f"User {request.user.id} started fine import {context['job_id']}")
+            except ImportFileError as e:
+                messages.error(request, str(e))
+            except Exception as e:
+                logger.error(f"Error starting fine import by user {request.user.id}: {str(e)}")
+                messages.error(request, "We couldn't start the upload right now. Please try again.")
+    return render(request, 'fines/upload_fines.html', context)
 
 @module_required('fines', 'view')
 def base_fine(request):
@@ -530,8 +548,8 @@ def download_sample_csv(request):
         response['Content-Security-Policy'] = "default-src 'none'"
         
         # Add sample CSV content
-        response.write('Student Name,Admission Number,Fine Amount,Reason\n')
-        response.write('John Doe,ADM001,100,Late submission\n')
+        response.write('admission_number,fine_type,amount,reason,due_date\n')
+        response.write('ADM001,Late Fee,100,Late submission,2025-04-30\n')
         
         return response
     except Exception as e:
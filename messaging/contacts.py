@@ -0,0 +1,159 @@
+# messaging/contacts.py
+"""
+Contact directory for messaging
+
+Students and teachers are read as one list of lightweight contact dicts
+(id, name, phone, role, class_info, type) straight from the database: a
+UNION ALL of the two tables, ordered and sliced in SQL, so a page of the
+directory costs one small query however many contacts there are. Counts come
+from COUNT(*) queries rather than len() on loaded rows.
+
+    directory = ContactDirectory(search='ram', role='Student')
+    page = directory.page(2, per_page=20)   # Django Page of contact dicts
+    directory.counts()                       # {'students': 12, 'teachers': 0}
+    directory.phones()                       # distinct non-empty numbers
+"""
+
+from django.core.paginator import Paginator
+from django.db.models import Case, CharField, F, IntegerField, Q, Value, When
+from django.db.models.functions import Concat
+from students.models import Student
+from teachers.models import Teacher
+
+ROLES = ('Student', 'Teacher')
+# Annotation names: 'id' and 'name' would clash with model fields
+COLUMNS = ('contact_id', 'contact_name', 'phone', 'role', 'class_info', 'type', 'rank')
+
+
+def _contact(row):
+    return {
+        'id': row['contact_id'], 'name': row['contact_name'], 'phone': row['phone'],
+        'role': row['role'], 'class_info': row['class_info'], 'type': row['type'],
+    }
+
+
+class ContactList:
+    """Lazy, sliceable contact sequence for Paginator; each slice is one LIMIT/OFFSET query"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def count(self):
+        counts = self.directory.counts()
+        return sum(counts[key] for role, key in (('Student', 'students'), ('Teacher', 'teachers'))
+                   if role in self.directory.roles)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        return [_contact(row) for row in self.directory.queryset()[index]]
+
+
+class ContactDirectory:
+    """Students and teachers as one searchable, filterable contact list"""
+
+    def __init__(self, search='', role='', class_name='', class_section_id=None,
+                 student_ids=None, active_only=False, with_phone=False):
+        self.search = search
+        self.roles = [role] if role in ROLES else list(ROLES)
+        self.class_name = class_name
+        self.class_section_id = class_section_id
+        self.student_ids = student_ids
+        self.active_only = active_only
+        self.with_phone = with_phone
+        self._counts = None
+
+    def students(self):
+        queryset = Student.objects.active() if self.active_only else Student.objects.all_statuses()
+        queryset = queryset.select_related(None)
+        if self.search:
+            queryset = queryset.filter(
+                Q(first_name__icontains=self.search) |
+                Q(last_name__icontains=self.search) |
+                Q(mobile_number__icontains=self.search) |
+                Q(admission_number__icontains=self.search)
+            )
+        if self.class_name:
+            queryset = queryset.filter(class_section__class_name__icontains=self.class_name)
+        if self.class_section_id:
+            queryset = queryset.filter(class_section_id=self.class_section_id)
+        if self.student_ids is not None:
+            queryset = queryset.filter(id__in=self.student_ids)
+        if self.with_phone:
+            queryset = queryset.exclude(mobile_number__isnull=True).exclude(mobile_number='')
+        return queryset
+
+    def teachers(self):
+        if self.class_section_id or self.student_ids is not None:
+            return Teacher.objects.none()  # Student-only selections
+        queryset = Teacher.objects.all()
+        if self.search:
+            queryset = queryset.filter(Q(name__icontains=self.search) | Q(mobile__icontains=self.search))
+        if self.with_phone:
+            queryset = queryset.exclude(mobile__isnull=True).exclude(mobile='')
+        return queryset
+
+    def _student_contacts(self):
+        return self.students().annotate(
+            contact_id=F('id'),
+            contact_name=Concat(
+                'first_name', Value(' '), 'last_name', Value(' ('), 'admission_number', Value(')'),
+                output_field=CharField(),
+            ),
+            phone=F('mobile_number'),
+            role=Value('Student', output_field=CharField()),
+            class_info=Case(
+                When(class_section__isnull=True, then=Value('N/A')),
+                default=Concat('class_section__class_name', Value(' - '), 'class_section__section_name'),
+                output_field=CharField(),
+            ),
+            type=Value('student', output_field=CharField()),
+            rank=Value(0, output_field=IntegerField()),
+        ).order_by().values(*COLUMNS)
+
+    def _teacher_contacts(self):
+        # Same annotations in the same order as _student_contacts, so the UNION columns line up
+        return self.teachers().annotate(
+            contact_id=F('id'),
+            contact_name=F('name'),
+            phone=F('mobile'),
+            role=Value('Teacher', output_field=CharField()),
+            class_info=Value('Staff', output_field=CharField()),
+            type=Value('teacher', output_field=CharField()),
+            rank=Value(1, output_field=IntegerField()),
+        ).order_by().values(*COLUMNS)
+
+    def queryset(self):
+        """Matching contacts as value rows, students first, each by name"""
+        parts = []
+        if 'Student' in self.roles:
+            parts.append(self._student_contacts())
+        if 'Teacher' in self.roles:
+            parts.append(self._teacher_contacts())
+        queryset = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+        return queryset.order_by('rank', 'contact_name', 'contact_id')
+
+    def counts(self):
+        """Matching students and teachers, whatever the role filter (it only narrows the list)"""
+        if self._counts is None:
+            self._counts = {'students': self.students().count(), 'teachers': self.teachers().count()}
+        return self._counts
+
+    def page(self, number, per_page=20):
+        return Paginator(ContactList(self), per_page).get_page(number)
+
+    def phones(self):
+        """Distinct phone numbers of the matching contacts"""
+        numbers = set()
+        if 'Student' in self.roles:
+            numbers.update(self.students().values_list('mobile_number', flat=True))
+        if 'Teacher' in self.roles:
+            numbers.update(self.teachers().values_list('mobile', flat=True))
+        return [number for number in numbers if number]
+
+    def contacts(self):
+        """Every matching contact dict, e.g. recipients for MessagingService.send_bulk_sms"""
+        return [_contact(row) for row in self.queryset()]
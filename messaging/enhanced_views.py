@@ -10,6 +10,7 @@ from subjects.models import ClassSection as StudentClass
 from .models import MessageLog, MessageRecipient, MessagingConfig
 from .enhanced_forms import CustomMessageForm, MessageTemplateForm, BulkMessageForm
 from .service.notification_service import notification_service
+from .contacts import ContactDirectory
 import json
 
 class SendMessageView(LoginRequiredMixin, View):
@@ -63,36 +64,32 @@ class SendMessageView(LoginRequiredMixin, View):
     
     def _get_recipients(self, cleaned_data):
         """Get recipient phone numbers based on form data"""
-        recipients = []
         recipient_type = cleaned_data['recipient_type']
-        send_to_parents = cleaned_data['send_to_parents']
         
         if recipient_type == 'individual':
             student = cleaned_data['individual_student']
-            if student and student.mobile_number:
-                recipients.append(student.mobile_number)
+            if not student:
+                return []
+            directory = ContactDirectory(role='Student', student_ids=[student.pk], with_phone=True)
         
         elif recipient_type == 'class':
             student_class = cleaned_data['student_class']
-            if student_class:
-                students = Student.objects.filter(class_section=student_class)
-                if send_to_parents:
-                    students = students.exclude(mobile_number__isnull=True).exclude(mobile_number='')
-                recipients.extend([s.mobile_number for s in students if s.mobile_number])
+            if not student_class:
+                return []
+            directory = ContactDirectory(role='Student', class_section_id=student_class.pk, active_only=True, with_phone=True)
         
         elif recipient_type == 'multiple':
-            students = cleaned_data['selected_students']
-            if send_to_parents:
-                students = students.exclude(mobile_number__isnull=True).exclude(mobile_number='')
-            recipients.extend([s.mobile_number for s in students if s.mobile_number])
+            directory = ContactDirectory(
+                role='Student', student_ids=cleaned_data['selected_students'].values('pk'), with_phone=True
+            )
         
         elif recipient_type == 'all':
-            students = Student.objects.all()
-            if send_to_parents:
-                students = students.exclude(mobile_number__isnull=True).exclude(mobile_number='')
-            recipients.extend([s.mobile_number for s in students if s.mobile_number])
+            directory = ContactDirectory(role='Student', active_only=True, with_phone=True)
+        
+        else:
+            return []
         
-        return list(set(recipients))  # Remove duplicates
+        return directory.phones()  # Distinct numbers
 
 class MessageHistoryView(LoginRequiredMixin, ListView):
     """View for message history"""
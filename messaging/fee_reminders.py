@@ -4,12 +4,10 @@ Fee Reminder Management System
 
 import logging
 from datetime import date, timedelta
-from django.db.models import Sum, Q
 from django.utils import timezone
+from core.fee_management.calculators import AtomicFeeCalculator
 from students.models import Student
 from student_fees.models import FeeDeposit
-from fees.models import FeesType
-from fines.models import FineStudent
 from .fee_messaging import FeeMessagingService
 
 logger = logging.getLogger(__name__)
@@ -23,51 +21,30 @@ class FeeReminderService:
         overdue_date = date.today() - timedelta(days=days_overdue)
         overdue_students = []
         
-        for student in Student.objects.all():
-            # Calculate outstanding amount
-            outstanding = self.calculate_outstanding_amount(student)
+        # Balances of all students in a few grouped queries
+        students = list(Student.objects.all())
+        balances = AtomicFeeCalculator.calculate_balances(students)
+        
+        # Students with any payment in last X days
+        recent_payers = set(FeeDeposit.objects.filter(
+            deposit_date__date__gte=overdue_date
+        ).values_list('student_id', flat=True))
+        
+        for student in students:
+            outstanding = balances[student.id]['total']
             
-            if outstanding > 0:
-                # Check if student has any payments in last X days
-                recent_payments = FeeDeposit.objects.filter(
-                    student=student,
-                    deposit_date__date__gte=overdue_date
-                ).exists()
-                
-                if not recent_payments:
-                    overdue_students.append({
-                        'student': student,
-                        'outstanding_amount': outstanding,
-                        'days_overdue': days_overdue
-                    })
+            if outstanding > 0 and student.id not in recent_payers:
+                overdue_students.append({
+                    'student': student,
+                    'outstanding_amount': outstanding,
+                    'days_overdue': days_overdue
+                })
         
         return overdue_students
     
     def calculate_outstanding_amount(self, student):
         """Calculate total outstanding amount for student"""
-        # Get applicable fees
-        applicable_fees = FeesType.objects.filter(
-            Q(class_name__isnull=True) | Q(class_name__iexact=student.student_class.name)
-        ).exclude(fee_type="Carry Forward")
-        
-        total_fees = sum(fee.amount for fee in applicable_fees)
-        
-        # Get total payments
-        total_paid = FeeDeposit.objects.filter(
-            student=student
-        ).aggregate(Sum('paid_amount'))['paid_amount__sum'] or 0
-        
-        # Get unpaid fines
-        unpaid_fines = FineStudent.objects.filter(
-            student=student,
-            is_paid=False
-        ).aggregate(Sum('fine__amount'))['fine__amount__sum'] or 0
-        
-        # Add carry forward amount
-        cf_amount = student.due_amount or 0
-        
-        outstanding = total_fees + unpaid_fines + cf_amount - total_paid
-        return max(outstanding, 0)
+        return AtomicFeeCalculator.calculate_student_balance(student)['total_balance']
     
     def send_fee_reminders(self, days_overdue=7):
         """Send fee reminder SMS to overdue students"""
@@ -107,11 +84,13 @@ class FeeReminderService:
         else:
             students = Student.objects.all()
         
+        students = list(students)
+        balances = AtomicFeeCalculator.calculate_balances(students)
         sent_count = 0
         failed_count = 0
         
         for student in students:
-            outstanding = self.calculate_outstanding_amount(student)
+            outstanding = balances[student.id]['total']
             
             if outstanding > 0:
                 if custom_message:
@@ -137,5 +116,5 @@ class FeeReminderService:
         return {
             'sent': sent_count,
             'failed': failed_count,
-            'total_students': students.count()
+            'total_students': len(students)
         }
\ No newline at end of file
@@ -0,0 +1,54 @@
+# messaging/tests.py
+from datetime import date
+
+from django.test import TestCase
+
+from core.benchmark_school import BenchmarkSchoolBuilder
+from core.profiling import capture_queries
+from messaging.contacts import ContactDirectory
+from students.models import Student
+from teachers.models import Teacher
+
+
+class ContactDirectoryTests(TestCase):
+    """Students and teachers are paged as one list in SQL"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=25, classes=1, sections_per_class=1, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+        for number in range(3):
+            Teacher.objects.create(name=f'Teacher {number}', mobile=f'98765000{number:02d}',
+                                   email=f'teacher{number}@example.com', qualification='B.Ed',
+                                   joining_date=date(2020, 6, 1))
+
+    def test_pages_cover_the_whole_list_in_order(self):
+        directory = ContactDirectory()
+        everyone = directory.contacts()
+        self.assertEqual(len(everyone), 28)
+        self.assertEqual([contact['type'] for contact in everyone[-3:]], ['teacher'] * 3)
+
+        paged = []
+        for number in range(1, 4):
+            paged.extend(ContactDirectory().page(number, per_page=10).object_list)
+        self.assertEqual(paged, everyone)
+        self.assertEqual(ContactDirectory().page(3, per_page=10).paginator.num_pages, 3)
+
+    def test_a_page_costs_the_same_queries_at_any_size(self):
+        counts = []
+        for per_page in (5, 25):
+            with capture_queries() as profile:
+                list(ContactDirectory().page(1, per_page=per_page).object_list)
+            counts.append(profile.query_count)
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[0], 3)  # Two counts and one page slice
+
+    def test_filters_and_counts(self):
+        student = Student.objects.order_by('id').first()
+        directory = ContactDirectory(search=student.admission_number)
+        self.assertEqual([contact['id'] for contact in directory.contacts()], [student.id])
+
+        teachers = ContactDirectory(role='Teacher')
+        self.assertEqual(teachers.counts(), {'students': 25, 'teachers': 3})
+        self.assertEqual(teachers.page(1).paginator.count, 3)
+        self.assertEqual(len(teachers.phones()), 3)
@@ -2,8 +2,6 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.contrib import messages
-from django.db.models import Q
-from django.core.paginator import Paginator
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_POST
 from django.core.exceptions import ValidationError
@@ -13,6 +11,7 @@ from teachers.models import Teacher
 from subjects.models import ClassSection
 from .models import MessageLog, MessageRecipient, MessagingConfig, MSG91Config
 from .services import MessagingService, MSG91Service
+from .contacts import ContactDirectory
 from users.decorators import module_required
 import logging
 
@@ -59,58 +58,10 @@ def messaging_dashboard(request):
     
     # Validation already done above
     
-    # Get all students with their contact info
-    students_query = Student.objects.all_statuses().select_related('class_section')
-    if search:
-        students_query = students_query.filter(
-            Q(first_name__icontains=search) |
-            Q(last_name__icontains=search) |
-            Q(mobile_number__icontains=search) |
-            Q(admission_number__icontains=search)
-        )
-    if class_filter:
-        students_query = students_query.filter(class_section__class_name__icontains=class_filter)
-    
-    student_contacts = []
-    for student in students_query:
-        student_contacts.append({
-            'id': student.id,
-            'name': student.get_full_display_name(),
-            'phone': student.mobile_number,
-            'role': 'Student',
-            'class_info': f"{student.class_section.class_name} - {student.class_section.section_name}" if student.class_section else 'N/A',
-            'type': 'student'
-        })
-    
-    # Get all teachers with their contact info
-    teachers_query = Teacher.objects.all()
-    if search:
-        teachers_query = teachers_query.filter(
-            Q(name__icontains=search) |
-            Q(mobile__icontains=search)
-        )
-    
-    teacher_contacts = []
-    for teacher in teachers_query:
-        teacher_contacts.append({
-            'id': teacher.id,
-            'name': teacher.name,
-            'phone': teacher.mobile,
-            'role': 'Teacher',
-            'class_info': 'Staff',
-            'type': 'teacher'
-        })
-    
-    # Combine and filter contacts
-    all_contacts = []
-    if not role_filter or role_filter == 'Student':
-        all_contacts.extend(student_contacts)
-    if not role_filter or role_filter == 'Teacher':
-        all_contacts.extend(teacher_contacts)
-    
-    # Paginate contacts
-    paginator = Paginator(all_contacts, per_page)
-    contacts_page = paginator.get_page(page)
+    # One page of students and teachers, searched, ordered and sliced in the database
+    directory = ContactDirectory(search=search, role=role_filter, class_name=class_filter)
+    contacts_page = directory.page(page, per_page)
+    counts = directory.counts()
     
     # Get all classes for filtering
     classes = ClassSection.objects.all()
@@ -131,9 +82,9 @@ def messaging_dashboard(request):
         'all_contacts': contacts_page.object_list,
         'classes': classes,
         'recent_messages': recent_messages,
-        'total_students': len(student_contacts),
-        'total_teachers': len(teacher_contacts),
-        'total_contacts': len(all_contacts),
+        'total_students': counts['students'],
+        'total_teachers': counts['teachers'],
+        'total_contacts': contacts_page.paginator.count,
         'config': config,
         'current_page': int(page),
         'per_page': per_page,
@@ -350,70 +301,43 @@ def send_bulk_message(request):
                 'success': False,
                 'message': 'Invalid class selection'
             })
-        
-        recipients = []
-        
-        # Build recipient list based on type
-        if recipient_type == 'ALL_STUDENTS':
-            students = Student.objects.all_statuses()            
-            for student in students:
-                recipients.append({
-                    'student': student,
-                    'teacher': None,
-                    'phone': student.mobile_number,
-                    'name': student.get_full_display_name(),
-                    'role': 'Student'
-                })
-        
-        elif recipient_type == 'ALL_TEACHERS':
-            teachers = Teacher.objects.all()
-            for teacher in teachers:
-                recipients.append({
-                    'student': None,
-                    'teacher': teacher,
-                    'phone': teacher.mobile,
-                    'name': teacher.name,
-                    'role': 'Teacher'
-                })
-        
-        elif recipient_type == 'CLASS_STUDENTS' and class_id:
-            students = Student.objects.all_statuses().filter(class_section__id=class_id)
-            for student in students:
-                recipients.append({
-                    'student': student,
-                    'teacher': None,
-                    'phone': student.mobile_number,
-                    'name': student.get_full_display_name(),
-                    'role': 'Student'
-                })
-        
-        if not recipients:
-            return JsonResponse({'success': False, 'message': 'No contacts found to send messages to. Please check your selection.'})
-        
-        # Create message log
-        message_log = MessageLog.objects.create(
-            sender=request.user,
-            message_type=message_type,
-            recipient_type=recipient_type,
-            message_content=message_content,
-            total_recipients=len(recipients),
-            source_module='messaging',
-            class_section_filter_id=class_id if class_id else None
-        )
-        
-        messaging_service = MessagingService()
-        
-        if message_type == 'SMS':
-            # Send bulk SMS
-            results = messaging_service.send_bulk_sms(recipients, message_content, message_log)
-            
-            return JsonResponse({
-                'success': True,
-                'message': f'Great! Your message has been sent to {message_log.successful_sends} out of {len(recipients)} contacts.',
-                'successful': message_log.successful_sends,
-                'failed': message_log.failed_sends
-            })
     
+    # Build recipient list based on type
+    if recipient_type == 'ALL_STUDENTS':
+        directory = ContactDirectory(role='Student', with_phone=True)
+    elif recipient_type == 'ALL_TEACHERS':
+        directory = ContactDirectory(role='Teacher', with_phone=True)
+    else:
+        directory = ContactDirectory(role='Student', class_section_id=class_id_int, with_phone=True)
+    recipients = directory.contacts()
+    
+    if not recipients:
+        return JsonResponse({'success': False, 'message': 'No contacts found to send messages to. Please check your selection.'})
+    
+    # Create message log
+    message_log = MessageLog.objects.create(
+        sender=request.user,
+        message_type=message_type,
+        recipient_type=recipient_type,
+        message_content=message_content,
+        total_recipients=len(recipients),
+        source_module='messaging',
+        class_section_filter_id=class_id if class_id else None
+    )
+    
+    messaging_service = MessagingService()
+    
+    if message_type == 'SMS':
+        # Send bulk SMS
+        results = messaging_service.send_bulk_sms(recipients, message_content, message_log)
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Great! Your message has been sent to {message_log.successful_sends} out of {len(recipients)} contacts.',
+            'successful': message_log.successful_sends,
+            'failed': message_log.failed_sends
+        })
+
     return JsonResponse({'success': False, 'message': 'Please use the bulk messaging form to send messages to multiple contacts.'})
 
 @module_required('messaging', 'view')
@@ -2,11 +2,10 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db import transaction
 from .models import PromotionRule, StudentPromotion
 from .serializers import PromotionRuleSerializer, StudentPromotionSerializer
+from .services import BulkPromotionEngine
 from students.models import Student
-from subjects.models import ClassSection
 from users.decorators import module_required
 from django.utils.decorators import method_decorator
 
@@ -35,38 +34,19 @@ class StudentPromotionViewSet(viewsets.ModelViewSet):
                 return Response({'error': 'Missing required fields'}, 
                               status=status.HTTP_400_BAD_REQUEST)
             
-            from_class = ClassSection.objects.get(id=from_class_id)
-            to_class = ClassSection.objects.get(id=to_class_id)
-            
-            promoted_count = 0
-            
-            with transaction.atomic():
-                for student_id in student_ids:
-                    try:
-                        student = Student.objects.get(id=student_id)
-                        
-                        # Create promotion record
-                        StudentPromotion.objects.create(
-                            student=student,
-                            from_class_section=from_class,
-                            to_class_section=to_class,
-                            academic_year=academic_year,
-                            promotion_date=request.data.get('promotion_date'),
-                            remarks=request.data.get('remarks', '')
-                        )
-                        
-                        # Update student's class
-                        student.class_section = to_class
-                        student.save()
-                        
-                        promoted_count += 1
-                        
-                    except Student.DoesNotExist:
-                        continue
+            result = BulkPromotionEngine.promote(
+                {student_id: to_class_id for student_id in student_ids},
+                academic_year,
+                remarks=request.data.get('remarks', ''),
+                from_class_id=from_class_id,
+                promotion_date=request.data.get('promotion_date'),
+            )
             
             return Response({
-                'message': f'Successfully promoted {promoted_count} students',
-                'promoted_count': promoted_count
+                'message': f"Successfully promoted {result['promoted']} students",
+                'promoted_count': result['promoted'],
+                'summary': result['classes'],
+                'skipped': result['skipped']
             })
             
         except Exception as e:
@@ -1,6 +1,7 @@
 # promotion/services.py
 from django.db import transaction
 from django.core.cache import cache
+from django.utils import timezone
 from .models import PromotionRule, StudentPromotion
 from students.models import Student
 from subjects.models import ClassSection
@@ -26,47 +27,156 @@ class PromotionService:
     
     @staticmethod
     def bulk_promote_students(student_ids, from_class_id, to_class_id, academic_year, promotion_date=None):
-        """Bulk promote students"""
-        from django.utils import timezone
-        
-        if not promotion_date:
-            promotion_date = timezone.now().date()
-        
-        from_class = ClassSection.objects.get(id=from_class_id)
-        to_class = ClassSection.objects.get(id=to_class_id)
-        
-        promoted_count = 0
-        
-        with transaction.atomic():
-            for student_id in student_ids:
-                try:
-                    student = Student.objects.select_for_update().get(id=student_id)
-                    
-                    # Create promotion record
-                    StudentPromotion.objects.create(
-                        student=student,
-                        from_class_section=from_class,
-                        to_class_section=to_class,
-                        academic_year=academic_year,
-                        promotion_date=promotion_date
-                    )
-                    
-                    # Update student's class
-                    student.class_section = to_class
-                    student.save()
-                    
-                    promoted_count += 1
-                    
-                except Student.DoesNotExist:
-                    logger.warning(f"Student {student_id} not found for promotion")
-                    continue
-        
-        # Clear relevant caches
-        cache.delete_pattern('student_stats*')
-        
-        return promoted_count
+        """Bulk promote the students of ``from_class_id`` among ``student_ids``"""
+        result = BulkPromotionEngine.promote(
+            {student_id: to_class_id for student_id in student_ids}, academic_year,
+            from_class_id=from_class_id, promotion_date=promotion_date,
+        )
+        for skipped in result['skipped']:
+            logger.warning(f"Student {skipped['student_id']} not promoted: {skipped['reason']}")
+        return result['promoted']
     
     @staticmethod
     def get_promotion_history(student):
         """Get promotion history for a student"""
-        return StudentPromotion.objects.filter(student=student).order_by('-promotion_date')
\ No newline at end of file
+        return StudentPromotion.objects.filter(student=student).order_by('-promotion_date')
+
+
+class BulkPromotionEngine:
+    """
+    Set-based promotion: StudentPromotion rows are bulk-inserted, students
+    move with one UPDATE per target class, and class fines are reconciled
+    with a few set operations per class. Student.save and its class-change
+    signals are not used, so the cost does not grow with per-row queries.
+    """
+
+    BATCH_SIZE = 500
+    MAX_STUDENTS = 5000
+
+    @classmethod
+    def promote(cls, moves, academic_year, remarks='', from_class_id=None, promotion_date=None):
+        """
+        Move students to new classes. ``moves`` maps student id to target
+        class id (or is an iterable of such pairs). With ``from_class_id``
+        only students currently in that class move; ``promotion_date``
+        (default today) is recorded on their StudentPromotion rows. Returns a
+        dict with the promoted count, a per-target-class summary and the
+        skipped students.
+        """
+        from fines.models import Fine, FineStudent
+        from core.fee_management.fine_application import FineApplicationService
+        from core.fee_management.recalculation import due_recalc_queue
+        from core.response_cache import data_versions
+
+        moves = {int(student_id): int(class_id) for student_id, class_id in dict(moves).items()}
+        if len(moves) > cls.MAX_STUDENTS:
+            raise ValueError(f"Cannot promote more than {cls.MAX_STUDENTS} students at once")
+
+        classes = ClassSection.objects.in_bulk(set(moves.values()))
+        skipped = []
+        by_target = {}  # to_class_id -> [(student_id, from_class_id)]
+
+        with transaction.atomic():
+            current = {}
+            ids = list(moves)
+            for start in range(0, len(ids), cls.BATCH_SIZE):
+                chunk = ids[start:start + cls.BATCH_SIZE]
+                current.update(Student.objects.all_statuses().select_related(None).filter(
+                    id__in=chunk
+                ).select_for_update().values_list('id', 'class_section_id'))
+
+            for student_id, to_class_id in moves.items():
+                if student_id not in current:
+                    skipped.append({'student_id': student_id, 'reason': 'Student not found'})
+                elif to_class_id not in classes:
+                    skipped.append({'student_id': student_id, 'reason': 'Class not found'})
+                elif from_class_id is not None and current[student_id] != int(from_class_id):
+                    skipped.append({'student_id': student_id, 'reason': 'Not in the source class'})
+                elif current[student_id] == to_class_id:
+                    skipped.append({'student_id': student_id, 'reason': 'Already in this class'})
+                else:
+                    by_target.setdefault(to_class_id, []).append((student_id, current[student_id]))
+
+            # Promotion history (students without a class have nothing to record);
+            # promoting again in the same year corrects the target class
+            StudentPromotion.objects.bulk_create([
+                StudentPromotion(
+                    student_id=student_id,
+                    from_class_section_id=from_class_id,
+                    to_class_section_id=to_class_id,
+                    academic_year=academic_year,
+                    remarks=remarks,
+                )
+                for to_class_id, students in by_target.items()
+                for student_id, from_class_id in students
+                if from_class_id
+            ], batch_size=cls.BATCH_SIZE, update_conflicts=True,
+                unique_fields=['student', 'academic_year'],
+                update_fields=['to_class_section', 'remarks', 'updated_at'])
+            if promotion_date:
+                # promotion_date is auto_now_add, so bulk_create always writes today
+                StudentPromotion.objects.filter(
+                    student_id__in=[student_id for students in by_target.values() for student_id, _ in students],
+                    academic_year=academic_year,
+                ).update(promotion_date=promotion_date)
+
+            summary = []
+            for to_class_id, students in by_target.items():
+                student_ids = [student_id for student_id, _ in students]
+                fines_removed = fines_added = 0
+                for start in range(0, len(student_ids), cls.BATCH_SIZE):
+                    chunk = student_ids[start:start + cls.BATCH_SIZE]
+                    Student.objects.all_statuses().filter(id__in=chunk).update(
+                        class_section_id=to_class_id, updated_at=timezone.now()
+                    )
+                    # Unpaid fines of the class they left no longer apply
+                    fines_removed += FineStudent.objects.filter(
+                        student_id__in=chunk,
+                        is_paid=False,
+                        fine__target_scope='Class',
+                    ).exclude(fine__class_section_id=to_class_id).delete()[0]
+
+                # Fines of the new class apply to its new students
+                for fine in Fine.objects.filter(
+                    target_scope='Class', class_section_id=to_class_id
+                ).select_related('fees_type'):
+                    eligible = FineApplicationService.eligible_students(fine).filter(id__in=student_ids)
+                    fines_added += len(FineApplicationService.apply(fine, eligible))
+
+                from_counts = {}
+                for _, from_class_id in students:
+                    from_counts[from_class_id] = from_counts.get(from_class_id, 0) + 1
+                summary.append({
+                    'to_class': classes[to_class_id].display_name,
+                    'promoted': len(students),
+                    'from_classes': from_counts,
+                    'fines_removed': fines_removed,
+                    'fines_added': fines_added,
+                })
+
+            promoted_ids = [student_id for students in by_target.values() for student_id, _ in students]
+            due_recalc_queue.mark_dirty(promoted_ids)
+            if promoted_ids:
+                data_versions.touch('students')  # Class lists and rosters; the UPDATE sends no post_save
+            transaction.on_commit(cls._clear_caches)
+
+        # Name the source classes once for the whole summary
+        sources = ClassSection.objects.in_bulk(
+            {from_id for entry in summary for from_id in entry['from_classes'] if from_id}
+        )
+        for entry in summary:
+            entry['from_classes'] = {
+                sources[from_id].display_name if from_id in sources else 'No Class': count
+                for from_id, count in entry['from_classes'].items()
+            }
+
+        promoted = len(promoted_ids)
+        logger.info(f"Promoted {promoted} students into {len(summary)} classes for {academic_year}; {len(skipped)} skipped")
+        return {'promoted': promoted, 'classes': summary, 'skipped': skipped}
+
+    @staticmethod
+    def _clear_caches():
+        from dashboard.real_time_service import DashboardUpdateService
+        DashboardUpdateService.update_student_stats()
+        if hasattr(cache, 'delete_pattern'):
+            cache.delete_pattern('student_stats*')
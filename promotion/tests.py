@@ -1,3 +1,50 @@
+# promotion/tests.py
+from datetime import date
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.benchmark_school import BenchmarkSchoolBuilder
+from core.response_cache import data_versions
+from promotion.models import StudentPromotion
+from promotion.services import BulkPromotionEngine, PromotionService
+from students.models import Student
+from subjects.models import ClassSection
+
+
+class BulkPromotionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=8, classes=2, sections_per_class=1, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+        cls.first, cls.second = ClassSection.objects.order_by('id')[:2]
+        cls.target = ClassSection.objects.create(class_name='Class 3', section_name='A')
+
+    def test_only_students_of_the_source_class_move(self):
+        ids = list(Student.objects.values_list('id', flat=True))
+        promoted = PromotionService.bulk_promote_students(ids, self.first.id, self.target.id, '2099-00')
+
+        self.assertEqual(promoted, 4)
+        self.assertEqual(Student.objects.filter(class_section=self.target).count(), 4)
+        self.assertEqual(Student.objects.filter(class_section=self.second).count(), 4)
+
+    def test_promotion_date_is_recorded(self):
+        ids = list(Student.objects.filter(class_section=self.first).values_list('id', flat=True))
+        PromotionService.bulk_promote_students(ids, self.first.id, self.target.id, '2099-00',
+                                               promotion_date=date(2099, 4, 1))
+        self.assertEqual(
+            set(StudentPromotion.objects.filter(academic_year='2099-00').values_list('promotion_date', flat=True)),
+            {date(2099, 4, 1)},
+        )
+
+    def test_promotion_touches_students_domain(self):
+        before = data_versions.stamp('students')
+        BulkPromotionEngine.promote({Student.objects.filter(class_section=self.first).first().id: self.target.id},
+                                    '2099-00')
+        self.assertNotEqual(data_versions.stamp('students'), before)
+
+    def test_skipped_reason_for_other_class(self):
+        student = Student.objects.filter(class_section=self.second).first()
+        result = BulkPromotionEngine.promote({student.id: self.target.id}, '2099-00', from_class_id=self.first.id)
+        self.assertEqual(result['promoted'], 0)
+        self.assertEqual(result['skipped'], [{'student_id': student.id, 'reason': 'Not in the source class'}])
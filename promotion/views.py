@@ -17,6 +17,7 @@ except ImportError:
     Attendance = None
 from django.contrib import messages
 from users.decorators import module_required
+from .services import BulkPromotionEngine
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,20 +36,21 @@ def _validate_promotion_data(promotions):
     
     return True, "Valid"
 
-@login_required
-@module_required('promotion', 'view')
-def student_promotion(request):
-    """Main promotion page"""
+def _get_sessions(request):
+    """Current and next academic session from the school profile"""
     try:
         school_profile = SchoolProfile.objects.first()
         current_year = school_profile.start_date.year if school_profile else timezone.now().year
-        current_session = f"{current_year}-{current_year + 1}"
-        next_session = f"{current_year + 1}-{current_year + 2}"
     except Exception as e:
         logger.error(f"Error getting school profile for user {request.user.id}: {str(e)}")
         current_year = timezone.now().year
-        current_session = f"{current_year}-{current_year + 1}"
-        next_session = f"{current_year + 1}-{current_year + 2}"
+    return f"{current_year}-{current_year + 1}", f"{current_year + 1}-{current_year + 2}"
+
+@login_required
+@module_required('promotion', 'view')
+def student_promotion(request):
+    """Main promotion page"""
+    current_session, next_session = _get_sessions(request)
 
     try:
         classes = ClassSection.objects.all().order_by('class_name', 'section_name')
@@ -177,11 +179,11 @@ def promote_students(request):
             return JsonResponse({'status': 'error', 'message': 'Please select at least one student to promote to the next class.'})
         
         # Validate promotions data
-        if len(promotions) > 100:  # Limit bulk operations
+        if len(promotions) > BulkPromotionEngine.MAX_STUDENTS:  # Limit bulk operations
             return JsonResponse({'status': 'error', 'message': 'Too many students selected. Please promote in smaller batches.'})
         
-        promoted_count = 0
         errors = []
+        moves = {}
         
         # Log promotion attempt
         logger.info(f"User {request.user.id} attempting to promote {len(promotions)} students")
@@ -204,35 +206,37 @@ def promote_students(request):
                 errors.append(f"Invalid student or class information")
                 continue
             
-            try:
-                student = Student.objects.get(id=student_id_int)
-                new_class = ClassSection.objects.get(id=new_class_id_int)
-                
-                # Update student class
-                old_class = student.class_section
-                student.class_section = new_class
-                student.save()
-                
-                promoted_count += 1
-                
-            except Student.DoesNotExist:
-                errors.append(f"We couldn\'t find the student with ID {student_id}")
-            except ClassSection.DoesNotExist:
+            moves[student_id_int] = new_class_id_int
+        
+        # Promote everyone in one set-based pass
+        _, next_session = _get_sessions(request)
+        try:
+            result = BulkPromotionEngine.promote(moves, next_session)
+        except Exception as e:
+            logger.error(f"Error promoting students by user {request.user.id}: {str(e)}")
+            return JsonResponse({'status': 'error', 'message': 'Something went wrong while promoting students. Please try again.'})
+        
+        promoted_count = result['promoted']
+        for skipped in result['skipped']:
+            if skipped['reason'] == 'Student not found':
+                errors.append(f"We couldn\'t find the student with ID {skipped['student_id']}")
+            elif skipped['reason'] == 'Class not found':
                 errors.append(f"The selected class is no longer available")
-            except Exception as e:
-                logger.error(f"Error promoting student {student_id} by user {request.user.id}: {str(e)}")
-                errors.append(f"We couldn\'t promote student {student_id} due to an error")
+            elif skipped['reason'] != 'Already in this class':
+                errors.append(f"Student {skipped['student_id']} was not promoted: {skipped['reason']}")
         
         if errors:
             return JsonResponse({
                 'status': 'partial',
                 'message': f"Great! {promoted_count} students have been promoted successfully. However, {len(errors)} students couldn\'t be promoted.",
-                'errors': errors
+                'errors': errors,
+                'summary': result['classes']
             })
         
         return JsonResponse({
             'status': 'success',
-            'message': f"Excellent! All {promoted_count} students have been promoted successfully to their new classes."
+            'message': f"Excellent! All {promoted_count} students have been promoted successfully to their new classes.",
+            'summary': result['classes']
         })
         
     except Exception as e:
@@ -1,89 +1,62 @@
 # reports/ml_analytics.py - ML-powered analytics for enterprise reporting
 from typing import Dict, List, Tuple, Optional
-import numpy as np
-import pandas as pd
 from decimal import Decimal
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.db.models import Q, Sum, Avg, Count
-from sklearn.ensemble import RandomForestRegressor, IsolationForest
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-import joblib
-import os
+import logging
+
+from core.ml_features import StudentFeatureBuilder
+from core.ml_lazy_loader import lazy_import
+from core.ml_registry import model_registry
+
+# numpy/pandas/scikit-learn load on first use, not when reports.views imports this module
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+sklearn_ensemble = lazy_import('sklearn.ensemble')
+sklearn_linear_model = lazy_import('sklearn.linear_model')
 
 from students.models import Student
 from student_fees.models import FeeDeposit
-from attendance.models import AttendanceRecord
 from fines.models import FineStudent
 
+logger = logging.getLogger(__name__)
+
+RISK_MODEL_NAME = 'fee_collection_risk'
+
 
 class MLAnalyticsService:
     """Enterprise ML analytics for school management"""
     
-    def __init__(self):
-        self.models_path = 'reports/ml_models/'
-        os.makedirs(self.models_path, exist_ok=True)
-    
     def predict_fee_collection_risk(self, student_ids: List[int]) -> Dict[int, Dict]:
         """Predict fee collection risk for students using ML"""
         
-        # Prepare features for ML model
-        features_data = []
-        student_data = {}
-        
-        for student_id in student_ids:
-            try:
-                student = Student.objects.get(id=student_id)
-                
-                # Calculate historical payment patterns
-                payments = FeeDeposit.objects.filter(student=student)
-                
-                # Feature engineering
-                total_payments = payments.count()
-                avg_payment_delay = self._calculate_avg_payment_delay(payments)
-                payment_consistency = self._calculate_payment_consistency(payments)
-                outstanding_amount = self._get_outstanding_amount(student)
-                attendance_rate = self._get_attendance_rate(student)
-                
-                features = [
-                    total_payments,
-                    avg_payment_delay,
-                    payment_consistency,
-                    float(outstanding_amount),
-                    attendance_rate,
-                    student.class_section.id if student.class_section else 0
-                ]
-                
-                features_data.append(features)
-                student_data[student_id] = {
-                    'name': student.get_full_display_name(),
-                    'class': str(student.class_section) if student.class_section else 'Unknown'
-                }
-                
-            except Student.DoesNotExist:
-                continue
-        
-        if not features_data:
+        # Features for every student from a few grouped queries
+        builder = StudentFeatureBuilder(Student.objects.filter(id__in=student_ids))
+        if not builder.students:
             return {}
         
-        # Load or train ML model
-        model = self._get_or_train_risk_model()
+        # Published model only; training runs in `manage.py train_ml_models --model risk`
+        model = model_registry.get(RISK_MODEL_NAME)
+        if model is None:
+            logger.warning(f"No {RISK_MODEL_NAME} model published; run `manage.py train_ml_models --model risk`")
+            return {}
         
-        # Make predictions
-        X = np.array(features_data)
+        # One prediction call for all students
+        X = builder.fee_risk_matrix()
         risk_scores = model.predict_proba(X)[:, 1] if hasattr(model, 'predict_proba') else model.predict(X)
         
         # Prepare results
         results = {}
-        for i, student_id in enumerate(student_ids[:len(risk_scores)]):
-            risk_level = 'High' if risk_scores[i] > 0.7 else 'Medium' if risk_scores[i] > 0.4 else 'Low'
+        for student, risk_score in zip(builder.students, risk_scores):
+            risk_level = 'High' if risk_score > 0.7 else 'Medium' if risk_score > 0.4 else 'Low'
             
-            results[student_id] = {
-                **student_data.get(student_id, {}),
-                'risk_score': float(risk_scores[i]),
+            results[student.id] = {
+                'name': student.get_full_display_name(),
+                'class': str(student.class_section) if student.class_section else 'Unknown',
+                'risk_score': float(risk_score),
                 'risk_level': risk_level,
-                'recommendations': self._get_risk_recommendations(risk_scores[i])
+                'recommendations': self._get_risk_recommendations(risk_score)
             }
         
         return results
@@ -117,7 +90,7 @@ class MLAnalyticsService:
         X = np.array(range(len(monthly_collections))).reshape(-1, 1)
         y = np.array(monthly_collections)
         
-        model = LinearRegression()
+        model = sklearn_linear_model.LinearRegression()
         model.fit(X, y)
         
         # Forecast future months
@@ -152,7 +125,7 @@ class MLAnalyticsService:
         features = df[['paid_amount', 'day_of_week', 'payment_mode_encoded']].fillna(0)
         
         # Isolation Forest for anomaly detection
-        iso_forest = IsolationForest(contamination=0.1, random_state=42)
+        iso_forest = sklearn_ensemble.IsolationForest(contamination=0.1, random_state=42)
         anomaly_labels = iso_forest.fit_predict(features)
         
         # Identify anomalies
@@ -199,68 +172,18 @@ class MLAnalyticsService:
         
         return insights
     
-    def _calculate_avg_payment_delay(self, payments) -> float:
-        """Calculate average payment delay in days"""
-        delays = []
-        for payment in payments:
-            # Assuming due date is 10th of each month
-            due_date = payment.deposit_date.replace(day=10)
-            if payment.deposit_date > due_date:
-                delay = (payment.deposit_date - due_date).days
-                delays.append(delay)
-        
-        return np.mean(delays) if delays else 0
+    def _get_risk_recommendations(self, risk_score) -> List[str]:
+        """Follow-up actions for a fee collection risk score"""
+        if risk_score > 0.7:
+            return ['Call parents about pending dues', 'Offer an instalment plan']
+        if risk_score > 0.4:
+            return ['Send a payment reminder before the due date']
+        return ['No action needed']
     
-    def _calculate_payment_consistency(self, payments) -> float:
-        """Calculate payment consistency score (0-1)"""
-        if payments.count() < 2:
-            return 0.5
-        
-        payment_amounts = [float(p.paid_amount) for p in payments]
-        cv = np.std(payment_amounts) / np.mean(payment_amounts) if np.mean(payment_amounts) > 0 else 1
-        
-        # Convert coefficient of variation to consistency score
-        return max(0, 1 - cv)
-    
-    def _get_outstanding_amount(self, student) -> Decimal:
-        """Get total outstanding amount for student"""
-        total_fees = student.due_amount or Decimal('0')
-        
-        # Add unpaid fines
-        unpaid_fines = FineStudent.objects.filter(
-            student=student, is_paid=False
-        ).aggregate(total=Sum('fine__amount'))['total'] or Decimal('0')
-        
-        return total_fees + unpaid_fines
-    
-    def _get_attendance_rate(self, student) -> float:
-        """Get student attendance rate for last 30 days"""
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        attendance_records = AttendanceRecord.objects.filter(
-            student=student,
-            date__gte=start_date,
-            date__lte=end_date
-        )
-        
-        if not attendance_records.exists():
-            return 0.75  # Default assumption
-        
-        present_count = attendance_records.filter(status='Present').count()
-        total_count = attendance_records.count()
-        
-        return present_count / total_count if total_count > 0 else 0.75
-    
-    def _get_or_train_risk_model(self):
-        """Get existing model or train new one"""
-        model_path = os.path.join(self.models_path, 'risk_model.joblib')
-        
-        if os.path.exists(model_path):
-            return joblib.load(model_path)
-        
+    def train_risk_model(self):
+        """Train the fee collection risk model and publish it; returns the version"""
         # Train new model with synthetic data (in production, use real historical data)
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model = sklearn_ensemble.RandomForestRegressor(n_estimators=100, random_state=42)
         
         # Generate synthetic training data
         X_train = np.random.rand(1000, 6)
@@ -268,9 +191,7 @@ class MLAnalyticsService:
         
         model.fit(X_train, y_train)
         
-        # Save model
-        joblib.dump(model, model_path)
-        return model
+        return model_registry.publish(RISK_MODEL_NAME, model, {'samples': 1000, 'synthetic': True})
     
     def _classify_anomaly_type(self, payment_data, features) -> str:
         """Classify the type of payment anomaly"""
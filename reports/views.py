@@ -29,6 +29,8 @@ from users.decorators import module_required
 from subjects.models import ClassSection
 from fees.models import FeesType
 from transport.models import TransportAssignment
+from core.fee_management.allocations import PaymentAllocationService
+from core.fee_management.models import PaymentAllocation
 from messaging.cross_module_logger import CrossModuleMessageLogger
 
 # Centralized fee service integration
@@ -346,9 +348,9 @@ def fees_report(request):
     from decimal import Decimal
     from django.db.models import Sum, Q
     from subjects.models import ClassSection
-    from fees.models import FeesType
     from fines.models import FineStudent
     from transport.models import TransportAssignment
+    from core.fee_management.fee_schedule import fee_schedule
     from django.core.paginator import Paginator
     
     """Modern comprehensive fees report with ML insights"""
@@ -405,28 +407,31 @@ def fees_report(request):
         'outstanding': 0
     }
     
+    # Paid/discount per student and allocation type in one grouped query
+    allocation_totals = PaymentAllocationService.totals_for_students(students)
+    
+    # Fee structure from the compiled schedule; stoppages and fines in one query each
+    schedule = fee_schedule.get()
+    stoppages = dict(TransportAssignment.objects.filter(
+        student__in=students
+    ).order_by('-id').values_list('student_id', 'stoppage_id'))
+    fine_totals = {}
+    for row in FineStudent.objects.filter(student__in=students).values(
+        'student_id', 'is_paid'
+    ).annotate(total=Sum('fine__amount')):
+        fine_totals[(row['student_id'], row['is_paid'])] = (row['total'] or Decimal('0')).quantize(Decimal('0.01'))
+    
     for student in students:
-        # Get applicable current session fees - Fix class name matching
+        # Get applicable current session fees - class fees match either class name or display name
         class_name = student.class_section.class_name if student.class_section else ''
         class_display = student.class_section.display_name if student.class_section else ''
         
-        applicable_fees = FeesType.objects.filter(
-            Q(class_name__isnull=True) | 
-            Q(class_name__iexact=class_name) |
-            Q(class_name__iexact=class_display)
-        ).exclude(fee_group__group_type="Transport")
+        current_fees = schedule.class_total(class_display)
+        if class_name and class_name.lower() != class_display.lower():
+            current_fees += schedule.class_total(class_name) - schedule.general_total
         
         # Add transport fees if assigned
-        transport_assignment = TransportAssignment.objects.filter(student=student).first()
-        if transport_assignment and transport_assignment.stoppage:
-            transport_fees = FeesType.objects.filter(
-                fee_group__group_type="Transport",
-                related_stoppage=transport_assignment.stoppage
-            )
-            applicable_fees = list(applicable_fees) + list(transport_fees)
-        
-        # Calculate current session fees
-        current_fees = sum(fee.amount for fee in applicable_fees)
+        current_fees += schedule.transport_total(stoppages.get(student.id))
         
         # Carry Forward amounts
         cf_due_original = student.due_amount or Decimal('0')
@@ -434,44 +439,25 @@ def fees_report(request):
         # Total fees = Current session fees + Carry forward due
         total_fees = current_fees + cf_due_original
         
-        # Get ALL payments (fees + CF, excluding fines)
-        fee_payments = FeeDeposit.objects.filter(
-            student=student
-        ).exclude(note__icontains="Fine Payment")
+        # Payments from the precomputed allocation totals (fees + CF, excluding fines)
+        student_totals = allocation_totals[student.id]
+        cf_totals = student_totals[PaymentAllocation.CARRY_FORWARD]
+        current_totals = student_totals[PaymentAllocation.FEE]
         
-        total_fee_paid = fee_payments.aggregate(Sum('paid_amount'))['paid_amount__sum'] or Decimal('0')
-        total_fee_discount = fee_payments.aggregate(Sum('discount'))['discount__sum'] or Decimal('0')
+        cf_paid = cf_totals['paid']
+        cf_discount = cf_totals['discount']
+        current_paid = current_totals['paid']
+        current_discount = current_totals['discount']
         
-        # Separate CF payments for display
-        cf_payments = fee_payments.filter(
-            Q(note__icontains="Carry Forward") | Q(payment_source="carry_forward")
-        )
-        cf_paid = cf_payments.aggregate(Sum('paid_amount'))['paid_amount__sum'] or Decimal('0')
-        cf_discount = cf_payments.aggregate(Sum('discount'))['discount__sum'] or Decimal('0')
-        
-        # Current session payments only - FIXED: Separate current from CF
-        current_session_payments = fee_payments.exclude(
-            Q(note__icontains="Carry Forward") | Q(payment_source="carry_forward")
-        )
-        current_paid = current_session_payments.aggregate(Sum('paid_amount'))['paid_amount__sum'] or Decimal('0')
-        current_discount = current_session_payments.aggregate(Sum('discount'))['discount__sum'] or Decimal('0')
+        total_fee_paid = current_paid + cf_paid
+        total_fee_discount = current_discount + cf_discount
         
         # Remaining CF due
         cf_due = max(cf_due_original - cf_paid - cf_discount, Decimal('0'))
         
         # Fine amounts
-        unpaid_fines = FineStudent.objects.filter(
-            student=student, 
-            is_paid=False
-        ).select_related('fine')
-        
-        paid_fines = FineStudent.objects.filter(
-            student=student, 
-            is_paid=True
-        ).select_related('fine')
-        
-        fine_unpaid = sum(fs.fine.amount for fs in unpaid_fines)
-        fine_paid = sum(fs.fine.amount for fs in paid_fines)
+        fine_unpaid = fine_totals.get((student.id, False), Decimal('0'))
+        fine_paid = fine_totals.get((student.id, True), Decimal('0'))
         
         # Calculate final due: Total fees - Total paid - Total discount + Unpaid fines
         # Match student_fee_preview calculation logic
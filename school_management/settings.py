@@ -88,6 +88,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.cache_middleware.CompressionMiddleware',  # brotli/gzip for pages and JSON
+    'core.profiling.QueryProfilingMiddleware',  # Per-view query/latency profiling (see /perf/)
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -98,6 +100,7 @@ MIDDLEWARE = [
     'demo.security_monitor.SecurityMonitoringMiddleware',  # SECURITY: Anti-piracy monitoring
     'users.middleware.ModuleAccessMiddleware',  # Module access control
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.cache_middleware.SmartCacheMiddleware',  # Versioned page cache, ETag/304 (after access checks)
     # Removed heavy middleware for performance
     # 'core.middleware.pdf_export.PDFExportMiddleware',  # Disabled for performance
     # 'django.middleware.locale.LocaleMiddleware',  # Disabled if not using i18n
@@ -203,7 +206,7 @@ LOGIN_EXEMPT_URLS = [r'^media/']
 # ======================
 # SESSION CONFIGURATION
 # ======================
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# SESSION_ENGINE is chosen below, once CACHES is known
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
@@ -251,6 +254,12 @@ WHITENOISE_SKIP_COMPRESS_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'zip
 # LOGGING CONFIGURATION
 # ======================
 # Enhanced Logging Configuration for Backup System
+# Handlers write from a background thread (see core/logging_config.py)
+LOGGING_CONFIG = 'core.logging_config.configure'
+LOG_QUEUE_ENABLED = os.getenv('LOG_QUEUE_ENABLED', 'True').lower() == 'true'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Records waiting to be written before INFO/DEBUG are dropped
+LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', 50))  # INFO/DEBUG records per logger per second
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -259,6 +268,9 @@ LOGGING = {
             '()': 'django.utils.log.CallbackFilter',
             'callback': lambda record: not ('Broken pipe' in record.getMessage() or 'Connection reset by peer' in record.getMessage()),
         },
+        'rate_limit': {
+            '()': 'core.logging_config.RateLimitFilter',
+        },
     },
     'formatters': {
         'verbose': {
@@ -282,6 +294,7 @@ LOGGING = {
             'maxBytes': 15*1024*1024,  # 15MB
             'backupCount': 10,
             'formatter': 'verbose',
+            'filters': ['rate_limit'],
         },
         'backup_file': {
             'level': 'INFO',
@@ -303,6 +316,7 @@ LOGGING = {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
+            'filters': ['rate_limit'],
         },
     },
     'loggers': {
@@ -443,6 +457,8 @@ BACKUP_DIRECTORY = os.getenv('BACKUP_DIRECTORY', os.path.join(BASE_DIR, 'backups
 BACKUP_TEMP_DIRECTORY = os.getenv('BACKUP_TEMP_DIRECTORY', os.path.join(BASE_DIR, 'backups', 'temp'))
 BACKUP_CLEANUP_ENABLED = os.getenv('BACKUP_CLEANUP_ENABLED', 'True').lower() == 'true'
 BACKUP_MAX_BACKUPS_PER_TYPE = int(os.getenv('BACKUP_MAX_BACKUPS_PER_TYPE', 50))
+BACKUP_SNAPSHOT_STEP_PAGES = int(os.getenv('BACKUP_SNAPSHOT_STEP_PAGES', 4096))  # Pages per copy step outside WAL mode
+BACKUP_SNAPSHOT_COMPRESSLEVEL = int(os.getenv('BACKUP_SNAPSHOT_COMPRESSLEVEL', 1))  # gzip level; 1 is fastest
 
 # Security Settings for Backup Operations
 SECURE_BACKUP_OPERATIONS = True
@@ -453,15 +469,20 @@ BACKUP_LOCKOUT_DURATION = 900  # 15 minutes
 
 
 # Enhanced Cache Configuration - Performance Optimized
+# The default per-process memory cache is fine for a single server process.
+# With several processes set CACHE_BACKEND to a shared one, e.g.
+# django.core.cache.backends.filebased.FileBasedCache with CACHE_LOCATION=/var/tmp/school-cache
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', 'school-cache')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'school-cache',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
         'TIMEOUT': 1800,  # 30 minutes (reduced from 1 hour)
         'OPTIONS': {
             'MAX_ENTRIES': 5000,  # Reduced for memory efficiency
             'CULL_FREQUENCY': 4,  # More aggressive culling
-        }
+        } if CACHE_BACKEND.rsplit('.', 2)[-2] in ('locmem', 'filebased', 'db') else {}  # Redis/Memcached clients reject these
     },
     'ml_cache': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -478,6 +499,60 @@ CACHES = {
 SESSION_COOKIE_AGE = BACKUP_SESSION_TIMEOUT
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+SESSION_REFRESH_THRESHOLD = int(os.getenv('SESSION_REFRESH_THRESHOLD', 300))  # Seconds the sliding expiry may move before it is written
+# Low-write sessions (core/sessions.py): cache-first only when the cache is shared by all processes (check core.E001)
+SESSION_ENGINE = 'core.sessions_db' if CACHE_BACKEND.endswith('LocMemCache') else 'core.sessions'
+
+# ======================
+# REQUEST PROFILING
+# ======================
+PERF_PROFILING_ENABLED = os.getenv('PERF_PROFILING_ENABLED', 'True').lower() == 'true'
+PERF_SAMPLE_RATE = float(os.getenv('PERF_SAMPLE_RATE', 1.0))
+PERF_WINDOW_SIZE = int(os.getenv('PERF_WINDOW_SIZE', 1000))  # Samples kept per view
+PERF_N_PLUS_ONE_THRESHOLD = int(os.getenv('PERF_N_PLUS_ONE_THRESHOLD', 5))  # Same SQL shape per request
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', 1000))
+PERF_FLUSH_INTERVAL = int(os.getenv('PERF_FLUSH_INTERVAL', 30))  # Seconds between worker snapshots
+PERF_STATS_DIR = os.path.join(BASE_DIR, 'logs', 'perf')
+PERF_SNAPSHOT_MAX_AGE = int(os.getenv('PERF_SNAPSHOT_MAX_AGE', 24 * 3600))  # Seconds; 0 keeps snapshots of live workers
+
+# ======================
+# ML MODEL REGISTRY
+# ======================
+ML_REGISTRY_DIR = os.getenv('ML_REGISTRY_DIR', os.path.join(BASE_DIR, 'models', 'registry'))
+ML_REGISTRY_CHECK_INTERVAL = int(os.getenv('ML_REGISTRY_CHECK_INTERVAL', 30))  # Seconds between manifest checks
+ML_REGISTRY_KEEP_VERSIONS = int(os.getenv('ML_REGISTRY_KEEP_VERSIONS', 3))
+
+# ======================
+# ML ALERT FEED
+# ======================
+ML_ALERTS_SCHEDULER_ENABLED = os.getenv('ML_ALERTS_SCHEDULER_ENABLED', 'False').lower() == 'true'
+ML_ALERTS_REFRESH_INTERVAL = int(os.getenv('ML_ALERTS_REFRESH_INTERVAL', 900))  # Seconds between materializations
+ML_ALERTS_KEEP_SNAPSHOTS = int(os.getenv('ML_ALERTS_KEEP_SNAPSHOTS', 48))
+
+# ======================
+# DUE AMOUNT RECALCULATION
+# ======================
+DUE_RECALC_ASYNC = os.getenv('DUE_RECALC_ASYNC', 'False').lower() == 'true'  # Recompute in the Celery worker
+DUE_RECALC_WARM_BALANCES = os.getenv('DUE_RECALC_WARM_BALANCES', 'True').lower() == 'true'
+
+# ======================
+# RECEIPT NUMBERS
+# ======================
+RECEIPT_SEQUENCE_PREFIX = os.getenv('RECEIPT_SEQUENCE_PREFIX', 'REC-{year}')  # {year} and {school} are filled in
+RECEIPT_SCHOOL_CODE = os.getenv('RECEIPT_SCHOOL_CODE', '')
+
+# ======================
+# BULK IMPORT
+# ======================
+BULK_IMPORT_BACKEND = os.getenv('BULK_IMPORT_BACKEND', 'thread')  # thread, celery or inline
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', 500))  # Rows validated and saved per transaction
+
+# ======================
+# RESPONSE CACHE
+# ======================
+SMART_CACHE_ENABLED = os.getenv('SMART_CACHE_ENABLED', 'True').lower() == 'true'  # Versioned per-user page cache
+SMART_CACHE_TIMEOUT = int(os.getenv('SMART_CACHE_TIMEOUT', 300))  # Upper bound for data not covered by version stamps
+SMART_CACHE_MAX_SIZE = int(os.getenv('SMART_CACHE_MAX_SIZE', 1024 * 1024))  # Larger pages are not stored
 
 # Backup monitoring middleware disabled temporarily
 # if 'backup.monitoring.BackupMonitoringMiddleware' not in MIDDLEWARE:
@@ -18,6 +18,7 @@ from dashboard.views import dashboard_view, dashboard_stats_api
 from dashboard.ml_views import ml_insights, student_risk_api, fee_optimization_api
 from students.transport_api import student_transport_api
 from attendance.dashboard_api import attendance_report_api
+from core.perf_views import perf_report
 
 # Chrome DevTools handler
 def chrome_devtools_handler(request):
@@ -98,6 +99,9 @@ urlpatterns = [
     # Modern Export System (2025)
     path('core/', include('core.urls')),
     
+    # Per-view performance report (superuser only)
+    path('perf/', perf_report, name='perf_report'),
+    
 
     
     # Auth redirects
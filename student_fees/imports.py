@@ -0,0 +1,392 @@
+# student_fees/imports.py
+"""Bulk opening deposit and statement payment import adapters (see core/imports.py)"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+from django import forms
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from core.imports import ImportAdapter, parse_decimal
+from .forms import FeePaymentForm
+from .models import FeeDeposit
+import re
+
+OPENING_NOTE = 'Opening balance payment'
+
+
+def set_deposit_dates(deposits, attr):
+    """deposit_date is auto_now_add: move bulk-created deposits to the date in ``attr`` (09:00)"""
+    by_date = defaultdict(list)
+    for deposit in deposits:
+        if getattr(deposit, attr, None):
+            by_date[getattr(deposit, attr)].append(deposit)
+    for day, dated in by_date.items():
+        stamp = timezone.make_aware(datetime.combine(day, time(9, 0)))
+        FeeDeposit.objects.filter(id__in=[d.id for d in dated]).update(deposit_date=stamp)
+        for deposit in dated:
+            deposit.deposit_date = stamp
+
+
+class OpeningDepositImportAdapter(ImportAdapter):
+    """
+    Payments received before the school started using the system: one row per
+    deposit with admission_number and amount, plus optional discount,
+    receipt_no, deposit_date, payment_mode, transaction_no and note. Rows
+    without a receipt number get the next ones from the receipt counter;
+    receipt numbers that already exist are skipped.
+    """
+
+    kind = 'opening_deposits'
+    label = 'Opening deposits'
+    module = 'fees'
+    touches = ('fees',)
+    columns = ('admission_number', 'amount')
+    aliases = {
+        'admission_no': 'admission_number', 'receipt': 'receipt_no', 'receipt_number': 'receipt_no',
+        'date': 'deposit_date', 'payment_date': 'deposit_date', 'mode': 'payment_mode',
+    }
+    BATCH_SIZE = 500
+    PENDING_RECEIPT = 'PENDING'  # Replaced from the receipt counter when the chunk is written
+
+    def __init__(self, user=None, **options):
+        super().__init__(user=user, **options)
+        self.seen_receipts = set()
+
+    def prepare(self, records):
+        from students.models import Student
+
+        admissions = {record.get('admission_number', '').strip() for _, record in records}
+        receipts = {record.get('receipt_no', '').strip() for _, record in records} - {''}
+        return {
+            'students': dict(Student.objects.all_statuses().select_related(None).filter(
+                admission_number__in=admissions
+            ).values_list('admission_number', 'id')),
+            'receipts': set(FeeDeposit.objects.filter(receipt_no__in=receipts).values_list('receipt_no', flat=True)),
+        }
+
+    def build(self, row_num, record, context):
+        admission = record.get('admission_number', '').strip()
+        student_id = context['students'].get(admission)
+        if student_id is None:
+            raise ValidationError(f"no student with admission number '{admission}'")
+
+        receipt_no = record.get('receipt_no', '').strip()
+        if receipt_no in context['receipts']:
+            return None
+        if receipt_no and receipt_no in self.seen_receipts:
+            raise ValidationError(f"receipt '{receipt_no}' appears more than once")
+
+        data = {
+            'amount': record.get('amount'),
+            'discount': record.get('discount') or '0',
+            'payment_mode': record.get('payment_mode') or 'Cash',
+            'transaction_no': record.get('transaction_no', ''),
+            'payment_source': 'opening_balance',
+            'note': record.get('note') or OPENING_NOTE,
+        }
+        # FeeDeposit.clean() compares the amounts, so start from zero; form.save() sets paid_amount
+        deposit = FeeDeposit(
+            student_id=student_id, receipt_no=receipt_no or self.PENDING_RECEIPT,
+            amount=Decimal('0'), paid_amount=Decimal('0'),
+        )
+        form = FeePaymentForm(data=data, instance=deposit)
+        if not form.is_valid():
+            raise ValidationError(self.form_errors(form))
+        deposit = form.save(commit=False)
+        if record.get('deposit_date'):
+            try:
+                deposit.opening_date = forms.DateField().clean(record['deposit_date'])
+            except ValidationError:
+                raise ValidationError(f"deposit_date: '{record['deposit_date']}' is not a valid date")
+
+        if receipt_no:
+            self.seen_receipts.add(receipt_no)
+        return deposit
+
+    def write(self, instances):
+        from core.fee_management.allocations import PaymentAllocationService
+        from core.fee_management.receipts import ReceiptNumberService
+        from core.fee_management.recalculation import due_recalc_queue
+
+        pending = [deposit for deposit in instances if deposit.receipt_no == self.PENDING_RECEIPT]
+        if pending:
+            for deposit, receipt_no in zip(pending, ReceiptNumberService.allocate_block(len(pending))):
+                deposit.receipt_no = receipt_no
+
+        FeeDeposit.objects.bulk_create(instances, batch_size=self.BATCH_SIZE)
+
+        set_deposit_dates(instances, 'opening_date')
+
+        PaymentAllocationService.allocate_deposits(instances)
+        due_recalc_queue.mark_dirty({deposit.student_id for deposit in instances})
+        return len(instances), 0
+
+
+@dataclass
+class StatementPayment:
+    """One statement credit and the deposits it was split into"""
+
+    student_id: int
+    transaction_no: str
+    deposits: list
+    fines_paid: list
+    paid_on: date = None
+    line: dict = field(default_factory=dict)
+
+
+class StatementPaymentImportAdapter(ImportAdapter):
+    """
+    Bank/UPI settlement files: one credit per row with amount and
+    transaction_no (UTR/reference), plus optional admission_number,
+    narration, payment_date and payment_mode. Rows are matched to students by
+    the admission_number column, else by an admission number written in the
+    narration or reference. Each credit is split over the student's dues as
+    the payment counter lists them (previous session balance, fees, fines);
+    anything left over is posted as an advance. Transaction numbers already
+    posted, or repeated in the file, are skipped. The whole file is posted in
+    one transaction and report.lines is the reconciliation.
+    """
+
+    kind = 'statement_payments'
+    label = 'Statement payments'
+    module = 'payments'
+    touches = ('fees',)
+    columns = ('amount', 'transaction_no')
+    aliases = {
+        'admission_no': 'admission_number',
+        'utr': 'transaction_no', 'utr_no': 'transaction_no', 'rrn': 'transaction_no', 'txn_id': 'transaction_no',
+        'transaction_id': 'transaction_no', 'reference': 'transaction_no', 'reference_no': 'transaction_no',
+        'ref_no': 'transaction_no', 'credit': 'amount', 'credit_amount': 'amount', 'amount_received': 'amount',
+        'description': 'narration', 'remarks': 'narration', 'particulars': 'narration',
+        'date': 'payment_date', 'value_date': 'payment_date', 'txn_date': 'payment_date',
+        'transaction_date': 'payment_date', 'mode': 'payment_mode',
+    }
+    single_transaction = True
+    BATCH_SIZE = 500
+    PENDING_RECEIPT = 'PENDING'  # Replaced from the receipt counter when the chunk is written
+    SOURCE = 'bank_statement'
+    DEFAULT_MODE = 'Online'
+    ADVANCE_NOTE = 'Advance Payment'
+    MODE_ALIASES = {'neft': 'Bank Transfer', 'rtgs': 'Bank Transfer', 'imps': 'Bank Transfer', 'net banking': 'Online'}
+    DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%b-%Y', '%d %b %Y', '%d-%b-%y')
+    ADMISSION_TOKEN = re.compile(r'[A-Za-z0-9]*[0-9][A-Za-z0-9]*')
+    SPLITS = ('carry_forward', 'fees', 'fines', 'advance')
+
+    def __init__(self, user=None, **options):
+        super().__init__(user=user, **options)
+        self.seen_transactions = set()
+        self.dues = {}   # student_id -> payable items, reduced as credits are matched
+        self.lines = []
+
+    def _tokens(self, record):
+        """Candidate admission numbers in the narration, then in the reference"""
+        text = f"{record.get('narration', '')} {record.get('transaction_no', '')}"
+        return [token.upper() for token in self.ADMISSION_TOKEN.findall(text) if len(token) >= 3]
+
+    def prepare(self, records):
+        from core.fee_management.calculators import AtomicFeeCalculator
+        from students.models import Student
+
+        keys = set()
+        for _, record in records:
+            admission = record.get('admission_number', '').strip()
+            keys.update([admission, admission.upper()] if admission else self._tokens(record))
+        # One indexed lookup for every candidate in the chunk
+        students = {
+            student.admission_number.upper(): student
+            for student in Student.objects.all_statuses().filter(admission_number__in=keys - {''})
+        }
+        transactions = {record.get('transaction_no', '').strip() for _, record in records} - {''}
+        posted = set(FeeDeposit.objects.filter(transaction_no__in=transactions).values_list('transaction_no', flat=True))
+
+        new = [student for student in students.values() if student.id not in self.dues]
+        self.dues.update(AtomicFeeCalculator.payable_fees_for_students(new))
+        return {'students': students, 'posted': posted}
+
+    def _match(self, record, students):
+        admission = record.get('admission_number', '').strip()
+        if admission:
+            return students.get(admission.upper()), 'admission_number'
+        matches = {students[token].id: students[token] for token in self._tokens(record) if token in students}
+        if len(matches) > 1:
+            raise ValidationError(
+                f"reference matches several students ({', '.join(s.admission_number for s in matches.values())})"
+            )
+        return next(iter(matches.values()), None), 'reference'
+
+    def _date(self, value):
+        if not value:
+            return None
+        for text in (value, value.split(' ')[0]):
+            for fmt in self.DATE_FORMATS:
+                try:
+                    paid_on = datetime.strptime(text, fmt).date()
+                except ValueError:
+                    continue
+                if paid_on > timezone.localdate():
+                    raise ValidationError(f"payment_date: {paid_on} is in the future")
+                return paid_on
+        raise ValidationError(f"payment_date: '{value}' is not a valid date")
+
+    def _mode(self, value):
+        from core.fee_management.constants import PAYMENT_MODES
+
+        if not value:
+            return self.DEFAULT_MODE
+        modes = {mode.lower(): mode for mode, _ in PAYMENT_MODES}
+        mode = modes.get(value.lower()) or self.MODE_ALIASES.get(value.lower())
+        if mode is None:
+            raise ValidationError(f"payment_mode: '{value}' is not one of {', '.join(modes.values())}")
+        return mode
+
+    def build(self, row_num, record, context):
+        line = {
+            'row': row_num, 'transaction_no': record.get('transaction_no', '').strip(),
+            'amount': record.get('amount', ''), 'admission_number': '', 'student': '', 'matched_by': '',
+            'status': 'error', 'receipt_no': '', **{split: '' for split in self.SPLITS}, 'message': '',
+        }
+        self.lines.append(line)
+        try:
+            return self._build(record, context, line)
+        except ValidationError as e:
+            line['message'] = '; '.join(e.messages)
+            raise
+
+    def _build(self, record, context, line):
+        amount = parse_decimal(record.get('amount'))
+        if not amount:
+            raise ValidationError("amount must be greater than 0")
+        line['amount'] = str(amount)
+        transaction_no = line['transaction_no']
+        if not transaction_no:
+            raise ValidationError("transaction_no is missing")
+        if transaction_no in context['posted'] or transaction_no in self.seen_transactions:
+            line['status'] = 'duplicate'
+            line['message'] = 'already posted' if transaction_no in context['posted'] else 'repeats an earlier row'
+            return None
+
+        line['status'] = 'unmatched'
+        student, matched_by = self._match(record, context['students'])
+        if student is None:
+            raise ValidationError("no student matches the admission number or reference")
+        line.update(admission_number=student.admission_number, student=student.get_full_name(),
+                    matched_by=matched_by, status='error')
+        paid_on = self._date(record.get('payment_date', ''))
+        mode = self._mode(record.get('payment_mode', '').strip())
+
+        self.seen_transactions.add(transaction_no)
+        payment, splits = self._allocate(student.id, amount, transaction_no, mode)
+        payment.paid_on, payment.line = paid_on, line
+        line.update({split: str(amount) for split, amount in splits.items()}, status='matched')
+        return payment
+
+    def _allocate(self, student_id, amount, transaction_no, mode):
+        """Split ``amount`` over the student's remaining dues, in memory"""
+        from core.fee_management.models import PaymentAllocation
+
+        splits = dict.fromkeys(self.SPLITS, Decimal('0.00'))
+        deposits, fines_paid = [], []
+        remaining = amount
+
+        def deposit(original, paid, note, allocation):
+            instance = FeeDeposit(
+                student_id=student_id, amount=original, discount=Decimal('0'), paid_amount=paid,
+                receipt_no=self.PENDING_RECEIPT, payment_mode=mode, transaction_no=transaction_no,
+                payment_source=self.SOURCE, note=note,
+            )
+            instance.allocation = allocation
+            deposits.append(instance)
+
+        for item in self.dues.get(student_id, []):
+            if remaining <= 0:
+                break
+            if item['payable'] <= 0:
+                continue
+            # Fines are settled whole: FineStudent only tracks is_paid, so a part-payment would be lost
+            if item['type'] == 'fine' and remaining < item['payable']:
+                continue
+            paid = min(item['payable'], remaining)
+            item['payable'] -= paid
+            remaining -= paid
+            if item['type'] == 'carry_forward':
+                splits['carry_forward'] += paid
+                deposit(item['amount'], paid, 'Carry Forward Payment', (PaymentAllocation.CARRY_FORWARD, None, None))
+            elif item['type'] == 'fine':
+                splits['fines'] += paid
+                fine = item['fine']
+                deposit(item['amount'], paid, f"Fine Payment: {fine.fine_type.name}", (PaymentAllocation.FINE, None, fine))
+                fines_paid.append(fine.id)
+            else:
+                splits['fees'] += paid
+                deposit(item['amount'], paid, f"Fee Payment: {item['display_name']}",
+                        (PaymentAllocation.FEE, item['fees_type'], None))
+        if remaining > 0:
+            splits['advance'] = remaining
+            deposit(remaining, remaining, self.ADVANCE_NOTE, (PaymentAllocation.FEE, None, None))
+
+        return StatementPayment(student_id, transaction_no, deposits, fines_paid), splits
+
+    def write(self, payments):
+        from core.fee_management.allocations import PaymentAllocationService
+        from core.fee_management.calculators import AtomicFeeCalculator
+        from core.fee_management.receipts import ReceiptNumberService
+        from core.fee_management.recalculation import due_recalc_queue
+        from fines.models import FineStudent
+
+        # Checked again inside the transaction, in case another upload posted them meanwhile
+        posted = set(FeeDeposit.objects.filter(
+            transaction_no__in=[payment.transaction_no for payment in payments]
+        ).values_list('transaction_no', flat=True))
+        for payment in payments:
+            if payment.transaction_no in posted:
+                payment.line.update(status='duplicate', message='already posted')
+        payments = [payment for payment in payments if payment.transaction_no not in posted]
+        if not payments:
+            return 0, 0
+
+        for payment, receipt_no in zip(payments, ReceiptNumberService.allocate_block(len(payments))):
+            payment.line.update(status='posted', receipt_no=receipt_no)
+            for deposit in payment.deposits:
+                deposit.receipt_no = receipt_no
+        deposits = [deposit for payment in payments for deposit in payment.deposits]
+        FeeDeposit.objects.bulk_create(deposits, batch_size=self.BATCH_SIZE)
+        for payment in payments:
+            for deposit in payment.deposits:
+                deposit.paid_on = payment.paid_on
+        set_deposit_dates(deposits, 'paid_on')
+        PaymentAllocationService.record([(deposit, *deposit.allocation) for deposit in deposits])
+
+        paid_fines = defaultdict(list)
+        for payment in payments:
+            for fine_id in payment.fines_paid:
+                paid_fines[(fine_id, payment.paid_on or timezone.localdate())].append(payment.student_id)
+        for (fine_id, paid_on), student_ids in paid_fines.items():
+            FineStudent.objects.filter(fine_id=fine_id, student_id__in=student_ids).update(is_paid=True, payment_date=paid_on)
+
+        student_ids = {payment.student_id for payment in payments}
+        AtomicFeeCalculator.clear_students_cache(student_ids)
+        due_recalc_queue.mark_dirty(student_ids)
+        return len(payments), 0
+
+    def summarize(self, report):
+        """Per-row reconciliation and totals by outcome and by what was paid"""
+        totals = {}
+        splits = dict.fromkeys(self.SPLITS, Decimal('0.00'))
+        for line in self.lines:
+            entry = totals.setdefault(line['status'], {'count': 0, 'amount': Decimal('0.00')})
+            entry['count'] += 1
+            try:
+                entry['amount'] += Decimal(line['amount'])
+            except (InvalidOperation, ValueError):
+                pass
+            if line['status'] in ('matched', 'posted'):
+                for split in self.SPLITS:
+                    splits[split] += Decimal(line[split] or '0')
+        report.lines = self.lines
+        report.totals = {
+            'by_status': {status: {'count': entry['count'], 'amount': str(entry['amount'])}
+                          for status, entry in totals.items()},
+            'allocated': {split: str(amount) for split, amount in splits.items()},
+        }
@@ -27,13 +27,13 @@ class IntegratedFeeService:
     @staticmethod
     def get_student_payable_fees(student, discount_enabled=False) -> List[Dict]:
         """Get payable fees using best available service"""
-        logger.info(f"🔍 [INTEGRATION] get_student_payable_fees called for {student.admission_number}")
+        logger.debug("🔍 [INTEGRATION] get_student_payable_fees called for %s", student.admission_number)
         try:
             # FIXED: Always use local service for consistent Carry Forward calculation
             # The centralized service has issues with CF calculation, so use local fallback
-            logger.info(f"🔄 [INTEGRATION] Using local service for reliable CF calculation for {student.admission_number}")
+            logger.debug("🔄 [INTEGRATION] Using local service for reliable CF calculation for %s", student.admission_number)
             fallback_fees = FeeCalculationService.get_payable_fees(student)
-            logger.info(f"✅ [INTEGRATION] Local service returned {len(fallback_fees)} fees")
+            logger.debug("✅ [INTEGRATION] Local service returned %s fees", len(fallback_fees))
             
             # Ensure frontend compatibility
             for fee in fallback_fees:
@@ -50,7 +50,7 @@ class IntegratedFeeService:
                     else:
                         fee['type'] = 'fee'
             
-            logger.info(f"✅ [INTEGRATION] Processed {len(fallback_fees)} fees with frontend compatibility")
+            logger.debug("✅ [INTEGRATION] Processed %s fees with frontend compatibility", len(fallback_fees))
             return fallback_fees
                 
         except Exception as e:
@@ -1,5 +1,5 @@
 # student_fees/models.py - CLEANED (Business logic moved to service)
-from django.db import models
+from django.db import models, transaction
 from students.models import Student
 
 class FeeDeposit(models.Model):
@@ -19,6 +19,13 @@ class FeeDeposit(models.Model):
 
     class Meta:
         ordering = ['-deposit_date']
+        indexes = [
+            models.Index(fields=['student', 'deposit_date']),
+            models.Index(fields=['deposit_date']),
+            models.Index(fields=['receipt_no']),
+            models.Index(fields=['payment_mode', 'deposit_date']),
+            models.Index(fields=['transaction_no']),
+        ]
         verbose_name = 'Fee Deposit'
         verbose_name_plural = 'Fee Deposits'
 
@@ -53,5 +60,28 @@ class FeeDeposit(models.Model):
         # Final validation for receipt number
         if not self.receipt_no or len(self.receipt_no.strip()) < 5:
             raise ValueError("Cannot save deposit with empty receipt number")
-            
-        super().save(*args, **kwargs)
+        
+        # The post_save allocation (core/fee_management/signals.py) commits or rolls back with the row
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class ReceiptSnapshot(models.Model):
+    """
+    What a receipt showed when it was issued; reprints render from this, not
+    from live balances. Editing a deposit marks the snapshot stale and the
+    next print captures a new revision; earlier revisions are kept.
+    """
+    receipt_no = models.CharField(max_length=50)
+    revision = models.PositiveIntegerField(default=1)
+    stale = models.BooleanField(default=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='receipt_snapshots')
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('receipt_no', 'revision')
+        ordering = ['receipt_no', '-revision']
+
+    def __str__(self):
+        return f"Receipt snapshot {self.receipt_no} r{self.revision}"
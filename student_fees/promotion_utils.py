@@ -16,7 +16,6 @@ def cleanup_irrelevant_fines_after_promotion(student):
         unpaid_fine_students = FineStudent.objects.filter(
             student=student,
             is_paid=False,
-            fine__is_active=True,
             fine__target_scope='Class'  # Only class-specific fines
         ).select_related('fine', 'fine__class_section')
         
@@ -49,8 +48,7 @@ def apply_new_class_fines_after_promotion(student):
         # Get all active class-specific fines for the student's new class
         class_fines = Fine.objects.filter(
             target_scope='Class',
-            class_section=student.class_section,
-            is_active=True
+            class_section=student.class_section
         )
         
         added_count = 0
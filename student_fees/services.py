@@ -4,7 +4,9 @@
 from core.fee_management.calculators import AtomicFeeCalculator
 from decimal import Decimal
 from typing import Dict, List
+from django.core.cache import cache
 from django.db.models import Sum
+from django.utils import timezone
 import logging
 
 logger = logging.getLogger(__name__)
@@ -100,7 +102,7 @@ class PaymentProcessingService:
     @staticmethod
     def process_payment(student, payment_data: Dict) -> Dict:
         """Process payment using AtomicFeeCalculator"""
-        return AtomicFeeCalculator.process_payment(student, payment_data)
+        return AtomicFeeCalculator.process_payment(student, AtomicFeeCalculator.reserve_receipt(payment_data))
 
 
 class FeeReportingService:
@@ -110,11 +112,13 @@ class FeeReportingService:
     def get_student_payment_history(student) -> Dict:
         """Get comprehensive payment history for student"""
         from .models import FeeDeposit
+        from core.fee_management.allocations import PaymentAllocationService
+        from core.fee_management.models import PaymentAllocation
         
         deposits = FeeDeposit.objects.filter(student=student).order_by('-deposit_date')
-        regular_deposits = deposits.exclude(note__icontains="Carry Forward").exclude(note__icontains="Fine Payment")
-        cf_deposits = deposits.filter(note__icontains="Carry Forward")
-        fine_deposits = deposits.filter(note__icontains="Fine Payment")
+        regular_deposits = PaymentAllocationService.regular_deposits(deposits)
+        cf_deposits = PaymentAllocationService.deposits_of_type(deposits, PaymentAllocation.CARRY_FORWARD)
+        fine_deposits = PaymentAllocationService.deposits_of_type(deposits, PaymentAllocation.FINE)
         
         total_paid = deposits.aggregate(Sum('paid_amount'))['paid_amount__sum'] or Decimal('0')
         total_discount = deposits.aggregate(Sum('discount'))['discount__sum'] or Decimal('0')
@@ -150,4 +154,175 @@ class FeeReportingService:
             'total_amount': total_amount,
             'total_discount': total_discount,
             'total_paid': total_paid
-        }
\ No newline at end of file
+        }
+
+
+class ReceiptSnapshotService:
+    """
+    Capture a receipt's line items, previous payments and balances when it
+    is issued, and render reprints from that snapshot. Amounts are stored as
+    strings in a compact JSON document; the rendered page is cached per day.
+    Editing a deposit keeps the snapshot but marks it stale; the next print
+    captures a new revision from the edited rows.
+    """
+    
+    VERSION = 1
+    CACHE_TIMEOUT = 3600
+    LINE_FIELDS = ('type', 'note', 'amount', 'discount', 'paid_amount', 'previous_paid', 'due')
+    
+    @classmethod
+    def capture(cls, receipt_no: str, backfilled: bool = False):
+        """
+        Store the snapshot of ``receipt_no`` as it stands now (call right
+        after the payment). A stale snapshot is kept and a new revision added.
+        """
+        from core.fee_management.allocations import PaymentAllocationService
+        from .models import ReceiptSnapshot
+        
+        receipt_data = FeeReportingService.get_receipt_data(receipt_no)
+        student = receipt_data['student']
+        deposits = list(receipt_data['deposits'])
+        payable_by_id = {fee['id']: fee for fee in AtomicFeeCalculator.get_payable_fees(student, False)}
+        balance_info = AtomicFeeCalculator.calculate_student_balance(student)
+        
+        lines = []
+        for deposit in PaymentAllocationService.annotate_deposits(student, deposits):
+            matching_fee = payable_by_id.get(deposit.payable_key)
+            if matching_fee:
+                previous_paid, due = deposit.paid_before, matching_fee.get('due', 0)
+            else:
+                previous_paid = Decimal('0')
+                due = max(deposit.amount - deposit.paid_amount - deposit.discount, Decimal('0'))
+            lines.append([
+                deposit.allocation_type, deposit.note or '', str(deposit.amount), str(deposit.discount),
+                str(deposit.paid_amount), str(previous_paid), str(due),
+            ])
+        
+        latest = ReceiptSnapshot.objects.filter(receipt_no=receipt_no).order_by('-revision').first()
+        revision = latest.revision + 1 if latest and latest.stale else (latest.revision if latest else 1)
+        
+        first = deposits[0]
+        data = {
+            'v': cls.VERSION,
+            'revision': revision,
+            'backfilled': backfilled,
+            'captured_at': timezone.now().isoformat(),
+            'deposit_date': first.deposit_date.isoformat(),
+            'payment_mode': first.payment_mode,
+            'transaction_no': first.transaction_no or '',
+            'student': {
+                'display_name': student.get_full_display_name(),
+                'admission_number': student.admission_number,
+                'father_name': student.father_name,
+                'mobile_number': student.mobile_number,
+                'class_name': student.class_section.class_name if student.class_section else '',
+            },
+            'lines': lines,
+            'current_session_due': str(balance_info.get('current_session', {}).get('balance', 0)),
+            'previous_session_due': str(balance_info.get('carry_forward', {}).get('balance', 0)),
+        }
+        snapshot, _ = ReceiptSnapshot.objects.update_or_create(
+            receipt_no=receipt_no, revision=revision, defaults={'student': student, 'data': data, 'stale': False}
+        )
+        cls.invalidate(receipt_no)
+        return snapshot
+    
+    @classmethod
+    def capture_on_commit(cls, receipt_no: str):
+        """
+        Capture ``receipt_no`` once the payment's transaction commits. A
+        failed capture cannot roll the payment back; the first print
+        backfills the snapshot instead.
+        """
+        from django.db import transaction
+        
+        def capture():
+            try:
+                cls.capture(receipt_no)
+            except Exception as snapshot_error:
+                logger.warning(f"Receipt snapshot deferred to first print: {snapshot_error}")
+        
+        transaction.on_commit(capture)
+    
+    @classmethod
+    def get(cls, receipt_no: str) -> Dict:
+        """
+        Snapshot data of the latest revision of ``receipt_no``. Receipts
+        issued before snapshots existed are captured now (backfilled), and
+        receipts edited since their last snapshot get a new revision.
+        """
+        from .models import ReceiptSnapshot
+        
+        latest = ReceiptSnapshot.objects.filter(receipt_no=receipt_no).order_by('-revision').values_list(
+            'data', 'stale'
+        ).first()
+        if latest is None:
+            return cls.capture(receipt_no, backfilled=True).data
+        data, stale = latest
+        if stale:
+            return cls.capture(receipt_no).data
+        return data
+    
+    @staticmethod
+    def history(receipt_no: str):
+        """Every revision of ``receipt_no``, newest first"""
+        from .models import ReceiptSnapshot
+        return ReceiptSnapshot.objects.filter(receipt_no=receipt_no).order_by('-revision')
+    
+    @classmethod
+    def context(cls, receipt_no: str) -> Dict:
+        """Template context of the receipt page built from the snapshot only"""
+        from django.utils.dateparse import parse_datetime
+        from core.fee_management.models import PaymentAllocation
+        
+        data = cls.get(receipt_no)
+        lines = [
+            dict(zip(cls.LINE_FIELDS, line[:2] + [Decimal(value) for value in line[2:]]))
+            for line in data['lines']
+        ]
+        for line in lines:
+            line['previous_total_paid'] = line['previous_paid']
+            line['due_amount'] = line['due']
+        total_paid = sum((line['paid_amount'] for line in lines), Decimal('0'))
+        
+        return {
+            'student': data['student'],
+            'class_name': data['student']['class_name'],
+            'receipt_no': receipt_no,
+            'deposit_date': parse_datetime(data['deposit_date']),
+            'payment_mode': data['payment_mode'],
+            'transaction_no': data['transaction_no'],
+            'payments': lines,
+            'regular_payments': [line for line in lines if line['type'] == PaymentAllocation.FEE],
+            'cf_payments': [line for line in lines if line['type'] == PaymentAllocation.CARRY_FORWARD],
+            'fine_payments': [line for line in lines if line['type'] == PaymentAllocation.FINE],
+            'total_amount': sum((line['amount'] for line in lines), Decimal('0')),
+            'total_discount': sum((line['discount'] for line in lines), Decimal('0')),
+            'total_paid': total_paid,
+            'total_previous_paid': sum((line['previous_paid'] for line in lines), Decimal('0')),
+            'total_due': sum((line['due'] for line in lines), Decimal('0')),
+            'current_session_due': Decimal(data['current_session_due']),
+            'previous_session_due': Decimal(data['previous_session_due']),
+            'show_discount': any(line['discount'] for line in lines),
+            'copy_labels': ['Original', 'Duplicate'],
+            'backfilled': data.get('backfilled', False),
+            'revision': data.get('revision', 1),
+            'captured_at': parse_datetime(data['captured_at']) if data.get('captured_at') else None,
+        }
+    
+    @staticmethod
+    def cache_key(receipt_no: str) -> str:
+        # The page prints today's date, so a rendering is only reused on the same day
+        return f"receipt_html_{receipt_no}_{timezone.localdate().isoformat()}"
+    
+    @classmethod
+    def invalidate(cls, receipt_no: str):
+        cache.delete(cls.cache_key(receipt_no))
+    
+    @classmethod
+    def mark_stale(cls, receipt_no: str):
+        """A deposit of ``receipt_no`` was edited or deleted: re-capture on the next print, keep the old revisions"""
+        from .models import ReceiptSnapshot
+        
+        ReceiptSnapshot.objects.filter(receipt_no=receipt_no, stale=False).update(stale=True)
+        cls.invalidate(receipt_no)
@@ -1,7 +1,7 @@
 """
 Signals for handling student fee and fine updates
 """
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from students.models import Student
 import logging
@@ -36,4 +36,16 @@ def handle_class_change(sender, instance, created, **kwargs):
                 result = handle_student_promotion(instance, old_class)
                 logger.info(f"Promotion handled for {instance.admission_number}: {result}")
             except Exception as e:
-                logger.error(f"Error handling promotion for {instance.admission_number}: {str(e)}")
\ No newline at end of file
+                logger.error(f"Error handling promotion for {instance.admission_number}: {str(e)}")
+
+@receiver(post_save, sender='student_fees.FeeDeposit')
+@receiver(post_delete, sender='student_fees.FeeDeposit')
+def revise_receipt_snapshot(sender, instance, **kwargs):
+    """Editing or deleting a deposit re-captures its receipt as a new revision on next print"""
+    if kwargs.get('created') or not instance.receipt_no:
+        return
+    try:
+        from .services import ReceiptSnapshotService
+        ReceiptSnapshotService.mark_stale(instance.receipt_no)
+    except Exception as e:
+        logger.warning(f"Could not mark receipt snapshot {instance.receipt_no} stale: {e}")
@@ -1,3 +1,215 @@
+# student_fees/tests.py
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.benchmark_school import BenchmarkSchoolBuilder
+from core.fee_management.allocations import PaymentAllocationService
+from core.fee_management.checks import check_unallocated_deposits
+from core.fee_management.models import PaymentAllocation
+from student_fees.models import FeeDeposit
+from students.models import Student
+
+
+def build_school(students=6):
+    """A small seeded school: one class of ``students``, a route and a few fines"""
+    return BenchmarkSchoolBuilder(
+        students=students, classes=1, sections_per_class=1, attendance_days=5,
+        routes=1, stoppages_per_route=1,
+    ).build()
+
+
+class PaymentAllocationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        build_school()
+        cls.student = Student.objects.order_by('id').first()
+
+    def deposit(self, **kwargs):
+        values = dict(student=self.student, amount=Decimal('600'), paid_amount=Decimal('600'),
+                      receipt_no='TEST-00001', note='Fee Payment: Tuition Fee - April')
+        values.update(kwargs)
+        return values
+
+    def test_saved_deposit_is_allocated(self):
+        deposit = FeeDeposit.objects.create(**self.deposit())
+        self.assertEqual(PaymentAllocation.objects.filter(fee_deposit=deposit).count(), 1)
+
+    def test_allocation_failure_rolls_the_deposit_back(self):
+        before = FeeDeposit.objects.count()
+        with mock.patch.object(PaymentAllocationService, 'allocate_deposits', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                FeeDeposit.objects.create(**self.deposit())
+        self.assertEqual(FeeDeposit.objects.count(), before)
+
+    def test_check_flags_unallocated_deposits(self):
+        self.assertEqual(check_unallocated_deposits(databases=['default']), [])
+        FeeDeposit.objects.bulk_create([FeeDeposit(**self.deposit())])  # No post_save, no allocation
+
+        warnings = check_unallocated_deposits(databases=['default'])
+        self.assertEqual([warning.id for warning in warnings], ['fee_management.W001'])
+        self.assertEqual(check_unallocated_deposits(databases=None), [])
+
+
+class ReceiptSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        build_school()
+        cls.deposit = FeeDeposit.objects.filter(note__startswith='Fee Payment').order_by('id').first()
+        cls.user = get_user_model().objects.create_superuser('cashier', 'cashier@example.com', 'cashier')
+
+    def test_edit_keeps_the_original_and_adds_a_revision(self):
+        from student_fees.services import ReceiptSnapshotService
+
+        original = ReceiptSnapshotService.capture(self.deposit.receipt_no)
+        self.assertEqual(original.revision, 1)
+
+        self.deposit.discount = Decimal('10')
+        self.deposit.paid_amount = self.deposit.amount - Decimal('10')
+        self.deposit.save()
+
+        original.refresh_from_db()
+        self.assertTrue(original.stale)
+        data = ReceiptSnapshotService.get(self.deposit.receipt_no)
+        self.assertEqual(data['revision'], 2)
+        self.assertEqual(
+            [snapshot.revision for snapshot in ReceiptSnapshotService.history(self.deposit.receipt_no)], [2, 1]
+        )
+        self.assertEqual(original.data['lines'][0][3], '0.00')  # The original discount is preserved
+        self.assertEqual(data['lines'][0][3], '10.00')
+
+    def test_capture_waits_for_the_commit_and_never_fails_the_payment(self):
+        from student_fees.models import ReceiptSnapshot
+        from student_fees.services import ReceiptSnapshotService
+
+        receipts = ReceiptSnapshot.objects.filter(receipt_no=self.deposit.receipt_no)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ReceiptSnapshotService.capture_on_commit(self.deposit.receipt_no)
+            self.assertFalse(receipts.exists())
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(receipts.exists())
+
+        with mock.patch.object(ReceiptSnapshotService, 'capture', side_effect=RuntimeError('boom')):
+            with self.captureOnCommitCallbacks(execute=True):
+                ReceiptSnapshotService.capture_on_commit(self.deposit.receipt_no)
+
+    def test_backfilled_and_revised_receipts_say_so(self):
+        from django.urls import reverse
+        self.client.force_login(self.user)
+        url = reverse('student_fees:receipt_view', args=[self.deposit.receipt_no])
+
+        response = self.client.get(url)
+        self.assertContains(response, 'Reconstructed from payment records')
+        self.assertNotContains(response, 'Revised receipt')
+
+        self.deposit.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Revised receipt (revision 2)')
+
+
+class StatementPostingTests(TestCase):
+    """Bank/UPI statement credits: matching, splitting over dues, dedupe and all-or-nothing posting"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from core.fee_management.calculators import AtomicFeeCalculator
+
+        build_school(students=4)
+        cls.students = list(Student.objects.order_by('id'))
+        cls.dues = AtomicFeeCalculator.payable_fees_for_students(cls.students)
+
+    def payable(self, student):
+        return sum((item['payable'] for item in self.dues[student.id]), Decimal('0.00'))
+
+    def statement(self):
+        first, second, third = self.students[:3]
+        overpaid = self.payable(third) + 100
+        return (
+            'Value Date,Narration,UTR,Credit,Admission No\n'
+            f'01/04/2025,UPI fee,UTR001,500,{first.admission_number}\n'
+            f'01/04/2025,NEFT school fee {second.admission_number},UTR002,300,\n'
+            f'02/04/2025,UPI fee,UTR001,500,{first.admission_number}\n'   # Same UTR again
+            '02/04/2025,Unknown payer,UTR003,250,\n'
+            f'02/04/2025,Full year,UTR004,{overpaid},{third.admission_number}\n'
+        )
+
+    def post(self, dry_run=False):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from core.imports import BulkImporter, get_adapter
+
+        upload = SimpleUploadedFile('statement.csv', self.statement().encode())
+        return BulkImporter(get_adapter('statement_payments')).run(upload, dry_run=dry_run)
+
+    def statuses(self, report):
+        return [line['status'] for line in report.lines]
+
+    def test_dry_run_reconciles_without_posting(self):
+        before = FeeDeposit.objects.count()
+        report = self.post(dry_run=True)
+        self.assertEqual(self.statuses(report), ['matched', 'matched', 'duplicate', 'unmatched', 'matched'])
+        self.assertEqual(report.lines[1]['matched_by'], 'reference')
+        self.assertEqual(FeeDeposit.objects.count(), before)
+
+    def test_credits_are_split_over_dues_and_posted_once(self):
+        report = self.post()
+        self.assertEqual(self.statuses(report), ['posted', 'posted', 'duplicate', 'unmatched', 'posted'])
+        self.assertEqual(report.created, 3)
+
+        for line in report.lines:
+            if line['status'] != 'posted':
+                continue
+            deposits = FeeDeposit.objects.filter(transaction_no=line['transaction_no'])
+            self.assertEqual({deposit.receipt_no for deposit in deposits}, {line['receipt_no']})
+            self.assertEqual(sum(deposit.paid_amount for deposit in deposits), Decimal(line['amount']))
+            splits = sum(Decimal(line[split] or '0') for split in ('carry_forward', 'fees', 'fines', 'advance'))
+            self.assertEqual(splits, Decimal(line['amount']))
+            self.assertEqual(
+                PaymentAllocation.objects.filter(fee_deposit__in=deposits).count(), deposits.count()
+            )
+        self.assertEqual(Decimal(report.lines[4]['advance']), Decimal('100.00'))
+
+        again = self.post()
+        self.assertEqual(self.statuses(again), ['duplicate', 'duplicate', 'duplicate', 'unmatched', 'duplicate'])
+        self.assertEqual(FeeDeposit.objects.filter(transaction_no='UTR001').values('receipt_no').distinct().count(), 1)
+
+    def test_a_credit_ending_partway_through_a_fine_leaves_it_unpaid(self):
+        from datetime import date
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from core.fee_management.calculators import AtomicFeeCalculator
+        from core.imports import BulkImporter, get_adapter
+        from fines.models import Fine, FineStudent, FineType
+
+        student = self.students[3]
+        FineStudent.objects.filter(student=student).update(is_paid=True)
+        fine = Fine.objects.create(
+            fine_type=FineType.objects.create(name='Library Damage', category='Other'),
+            amount=Decimal('80.00'), reason='Damaged book', due_date=date.today(),
+        )
+        fine_student = FineStudent.objects.create(fine=fine, student=student)
+        items = AtomicFeeCalculator.payable_fees_for_students([student])[student.id]
+        fees = sum((item['payable'] for item in items if item['type'] != 'fine'), Decimal('0.00'))
+        credit = fees + Decimal('30.00')
+
+        upload = SimpleUploadedFile('statement.csv', (
+            'Value Date,Narration,UTR,Credit,Admission No\n'
+            f'03/04/2025,UPI fee,UTR005,{credit},{student.admission_number}\n'
+        ).encode())
+        report = BulkImporter(get_adapter('statement_payments')).run(upload)
+
+        self.assertEqual(self.statuses(report), ['posted'])
+        self.assertEqual(Decimal(report.lines[0]['fines'] or '0'), Decimal('0'))
+        self.assertEqual(Decimal(report.lines[0]['advance']), Decimal('30.00'))
+        self.assertFalse(FeeDeposit.objects.filter(transaction_no='UTR005', note__startswith='Fine Payment').exists())
+        fine_student.refresh_from_db()
+        self.assertFalse(fine_student.is_paid)
+
+    def test_a_failed_write_posts_nothing(self):
+        before = FeeDeposit.objects.count()
+        with mock.patch.object(PaymentAllocationService, 'record', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.post()
+        self.assertEqual(FeeDeposit.objects.count(), before)
@@ -97,27 +97,6 @@ def get_student_fee_breakdown(student):
         'unpaid_fines': unpaid_fines
     }
 def generate_receipt_no():
-    """Generate unique receipt number: REC-4DigitRandomUniqueCombinations"""
-    from student_fees.models import FeeDeposit
-    import random
-    import time
-    
-    max_attempts = 50
-    
-    for attempt in range(max_attempts):
-        # Generate 4-digit random number
-        random_digits = random.randint(1000, 9999)
-        receipt_no = f"REC-{random_digits}"
-        
-        # Check uniqueness
-        if not FeeDeposit.objects.filter(receipt_no=receipt_no).exists():
-            return receipt_no
-            
-        # Small delay to avoid collision
-        time.sleep(random.uniform(0.001, 0.01))
-    
-    # Fallback: Use timestamp-based 4 digits if all random attempts fail
-    timestamp_digits = str(int(time.time()))[-4:]  # Last 4 digits of timestamp
-    fallback_receipt = f"REC-{timestamp_digits}"
-    
-    return fallback_receipt
\ No newline at end of file
+    """Issue the next receipt number from the receipt sequence"""
+    from core.fee_management.receipts import ReceiptNumberService
+    return ReceiptNumberService.next_number()
@@ -2,7 +2,8 @@
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, Http404
+from django.http import HttpResponse, JsonResponse, Http404
+from django.core.cache import cache
 from django.db.models import Sum, Q
 from django.contrib import messages
 from django.utils import timezone
@@ -17,6 +18,8 @@ from users.decorators import module_required
 import logging
 
 from core.fee_management.calculators import AtomicFeeCalculator
+from core.fee_management.allocations import PaymentAllocationService
+from core.fee_management.models import PaymentAllocation
 
 from transport.models import TransportAssignment
 from fines.models import Fine, FineStudent
@@ -31,7 +34,7 @@ from messaging.cross_module_logger import CrossModuleMessageLogger
 from .models import FeeDeposit
 from .forms import FeePaymentForm
 from .utils import generate_receipt_no
-from .services import FeeCalculationService, PaymentProcessingService, FeeReportingService
+from .services import FeeCalculationService, PaymentProcessingService, FeeReportingService, ReceiptSnapshotService
 # Security utilities moved to centralized service
 from django.utils.html import escape
 from django.core.exceptions import ValidationError
@@ -308,11 +311,11 @@ def get_student_fees(request):
     discount_enabled_param = request.GET.get("discount_enabled", "false").lower()
     discount_enabled = discount_enabled_param in ["true", "1", "yes", "on"]
     
-    logger.info(f"🔍 [FEES DEBUG] get_student_fees called - admission_number: {admission_number}, discount_enabled: {discount_enabled}")
+    logger.debug("🔍 [FEES DEBUG] get_student_fees called - admission_number: %s, discount_enabled: %s", admission_number, discount_enabled)
     
     try:
         if not admission_number or len(admission_number) > 20:
-            logger.warning(f"❌ [FEES DEBUG] Invalid admission number: {admission_number}")
+            logger.warning("❌ [FEES DEBUG] Invalid admission number: %s", admission_number)
             error_msg = MessageFormatter.format_error('student_not_found')
             return JsonResponse({
                 "status": "error",
@@ -321,27 +324,22 @@ def get_student_fees(request):
                 "fees_count": 0
             })
         
-        logger.info(f"🔍 [FEES DEBUG] Searching for student with admission_number: {admission_number}")
+        logger.debug("🔍 [FEES DEBUG] Searching for student with admission_number: %s", admission_number)
         student = Student.objects.all_statuses().select_related('class_section').get(admission_number=admission_number)
-        logger.info(f"✅ [FEES DEBUG] Student found: {student.first_name} {student.last_name} (ID: {student.id})")
-        
-        # Use AtomicFeeCalculator
-        logger.info(f"🔍 [FEES DEBUG] Using AtomicFeeCalculator for student {student.id}")
+        logger.debug("✅ [FEES DEBUG] Student found: %s %s (ID: %s)", student.first_name, student.last_name, student.id)
         
         payable_fees = AtomicFeeCalculator.get_payable_fees(student, discount_enabled)
         balance_info = AtomicFeeCalculator.calculate_student_balance(student)
         
-        logger.info(f"✅ [FEES DEBUG] Integrated service returned {len(payable_fees)} payable fees")
-        # Debug: Log each fee for verification
-        for i, fee in enumerate(payable_fees):
-            logger.info(f"🔍 [FEES DEBUG] Payable fee {i+1}: {fee}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        logger.debug("✅ [FEES DEBUG] AtomicFeeCalculator returned %s payable fees", len(payable_fees))
         
         # Pass fees directly from AtomicFeeCalculator (already sanitized)
-        logger.info(f"🔍 [FEES DEBUG] Processing {len(payable_fees)} fees for template")
         safe_fees = []
         
         for i, fee in enumerate(payable_fees):
-            logger.debug(f"🔍 [FEES DEBUG] Fee {i+1}: {fee} (type: {type(fee)})")
+            if debug:
+                logger.debug("🔍 [FEES DEBUG] Fee %s: %s", i + 1, fee)
             
             if isinstance(fee, dict):
                 safe_fees.append({
@@ -357,7 +355,7 @@ def get_student_fees(request):
                     'due_date': fee.get('due_date', '')
                 })
             else:
-                logger.warning(f"🔍 [FEES DEBUG] Unexpected fee format: {fee}")
+                logger.warning("🔍 [FEES DEBUG] Unexpected fee format: %s", fee)
                 safe_fees.append({
                     'id': f'fee_{i}',
                     'amount': 0,
@@ -370,7 +368,6 @@ def get_student_fees(request):
                     'is_overdue': False,
                     'due_date': ''
                 })
-        logger.info(f"✅ [FEES DEBUG] Processed {len(safe_fees)} safe fees for template")
         
         template_context = {
             'fees': safe_fees,
@@ -379,21 +376,16 @@ def get_student_fees(request):
             'discount_enabled': bool(discount_enabled)
         }
         
-        logger.info(f"🔍 [FEES DEBUG] Rendering template with context: fees={len(safe_fees)}, student={student.admission_number}, discount_enabled={discount_enabled}")
-        logger.info(f"🔍 [FEES DEBUG] Template context discount_enabled type: {type(discount_enabled)}, value: {discount_enabled}, bool: {bool(discount_enabled)}")
         html = render_to_string('student_fees/components/fee_form.html', template_context)
-        logger.info(f"✅ [FEES DEBUG] Template rendered successfully, HTML length: {len(html)}")
-        
-        # Debug: Check if fee_form content is actually in the HTML
-        if 'fee-form-container' in html:
-            logger.info(f"✅ [FEES DEBUG] fee-form-container found in rendered HTML")
-        else:
-            logger.warning(f"⚠️ [FEES DEBUG] fee-form-container NOT found in rendered HTML")
         
-        # Debug: Check if discount column is in rendered HTML
-        discount_column_count = html.count('Discount')
-        discount_input_count = html.count('discount-input')
-        logger.info(f"🔍 [FEES DEBUG] Rendered HTML contains: discount_column_count={discount_column_count}, discount_input_count={discount_input_count}")
+        # Debug: Check what the rendered form contains
+        if debug:
+            logger.debug(
+                "🔍 [FEES DEBUG] Rendered %s fees for %s (discount_enabled=%s): %s chars, "
+                "fee-form-container=%s, discount_column_count=%s, discount_input_count=%s",
+                len(safe_fees), student.admission_number, discount_enabled, len(html),
+                'fee-form-container' in html, html.count('Discount'), html.count('discount-input'),
+            )
         
         return JsonResponse({
             "status": "success",
@@ -449,10 +441,12 @@ def submit_deposit(request):
                 "show_message": True
             }, status=400)
         
+        # Receipt number is taken before the transaction so the sequence row isn't held
+        receipt_no = generate_receipt_no()
+        
         # Use centralized payment processing
         with transaction.atomic():
             student = Student.objects.select_for_update().get(pk=student_id)
-            receipt_no = generate_receipt_no()
             
             # Skip auto-sync to avoid receipt validation errors
             # if FEE_SERVICE_AVAILABLE:
@@ -472,12 +466,12 @@ def submit_deposit(request):
                 discount = Decimal(request.POST.get(discount_key, '0').replace('₹', '').replace(',', '')) or Decimal('0')
                 payable_amount = Decimal(request.POST.get(payable_key, '0').replace('₹', '').replace(',', '')) or Decimal('0')
                 
-                logger.info(f"🔍 [BACKEND] Fee {fee_id}: original={original_amount}, discount={discount}, payable={payable_amount}")
+                logger.debug("🔍 [BACKEND] Fee %s: original=%s, discount=%s, payable=%s", fee_id, original_amount, discount, payable_amount)
                 
                 # ALWAYS use payable amount (user's edited value)
                 amount = payable_amount if payable_amount > 0 else (original_amount - discount)
                 
-                logger.info(f"✅ [BACKEND] Fee {fee_id}: final amount={amount}")
+                logger.debug("✅ [BACKEND] Fee %s: final amount=%s", fee_id, amount)
                 
                 if payable_amount > 0:
                     payment_items.append({
@@ -505,6 +499,7 @@ def submit_deposit(request):
             # Process payments
             total_paid = Decimal('0')
             deposits = []
+            allocation_targets = []
             
             for item in payment_items:
                 fee_id = item['fee_id']
@@ -525,11 +520,14 @@ def submit_deposit(request):
                     'deposit_date': django_timezone.now()
                 }
                 
+                fee = fine = None
                 if fee_id == 'carry_forward':
+                    allocation_type = PaymentAllocation.CARRY_FORWARD
                     deposit_data.update({
                         'note': 'Carry Forward Payment'
                     })
                 elif fee_id.startswith('fine_'):
+                    allocation_type = PaymentAllocation.FINE
                     fine_id = validate_numeric_id(fee_id.replace('fine_', ''), "Fine ID")
                     fine = Fine.objects.get(id=fine_id)
                     deposit_data.update({
@@ -541,10 +539,13 @@ def submit_deposit(request):
                         payment_date=django_timezone.now().date()
                     )
                 else:
+                    allocation_type = PaymentAllocation.FEE
                     fee = FeesType.objects.get(id=fee_id)
                     deposit_data['note'] = f'Fee Payment: {fee.fee_group.group_type} - {fee.amount_type}'
                 
-                deposits.append(FeeDeposit(**deposit_data))
+                deposit = FeeDeposit(**deposit_data)
+                deposits.append(deposit)
+                allocation_targets.append((deposit, allocation_type, fee, fine))
                 total_paid += paid_amount
             
             # Final validation before saving
@@ -556,8 +557,9 @@ def submit_deposit(request):
                         "show_message": True
                     }, status=500)
             
-            # Bulk create deposits
+            # Bulk create deposits and record what each one paid
             FeeDeposit.objects.bulk_create(deposits)
+            PaymentAllocationService.record(allocation_targets)
             
             # Clear cache and trigger post-payment sync
             try:
@@ -577,7 +579,10 @@ def submit_deposit(request):
             except Exception as cache_error:
                 logger.warning(f"Failed to invalidate cache: {cache_error}")
                 pass
-            
+
+            # Freeze what the receipt shows once the payment commits; reprints render from this snapshot
+            ReceiptSnapshotService.capture_on_commit(receipt_no)
+
             request.session['last_receipt_no'] = receipt_no
             
             # Send SMS notification and log to messaging history
@@ -671,9 +676,8 @@ def student_fee_preview(request, student_id):
         total_due = max(total_fees_due - total_received - total_discount + fine_amount, Decimal('0'))
         
         # Debug logging
-        logger.info(f"🔍 [DUE CALC] Student {student.id}: applied_fees={applied_fees}, cf_amount={cf_amount}, fine_amount={fine_amount}, total_due={total_due}")
-        logger.info(f"🔍 [DUE CALC] total_received={total_received}, payment_history.total_paid={payment_history.get('total_paid', 0)}")
-        logger.info(f"🔍 [DUE CALC] fine_paid_amount={balance_info.get('fines', {}).get('paid', 0)}, balance_info.total_balance={balance_info.get('total_balance', 0)}")
+        logger.debug("🔍 [DUE CALC] Student %s: applied_fees=%s, cf_amount=%s, fine_amount=%s, total_due=%s, total_received=%s",
+                     student.id, applied_fees, cf_amount, fine_amount, total_due, total_received)
         
         # Calculate separate payment totals
         all_payments = payment_history.get('all_payments', [])
@@ -701,9 +705,8 @@ def student_fee_preview(request, student_id):
         }
         
         # Final debug log
-        logger.info(f"🔍 [DUE CALC] Final context balance (due amount): {total_due}")
-        logger.info(f"🔍 [DUE CALC] Debug totals - Fee: {fee_payments_only}, Fine: {fine_payments_only}, CF: {cf_payments_only}")
-        logger.info(f"🔍 [DUE CALC] Payment history total_paid: {payment_history.get('total_paid', 0)}")
+        logger.debug("🔍 [DUE CALC] Totals - Fee: %s, Fine: %s, CF: %s, payment history total_paid: %s",
+                     fee_payments_only, fine_payments_only, cf_payments_only, payment_history.get('total_paid', 0))
         
         # Verify payment calculation
         actual_total = fee_payments_only + fine_payments_only + cf_payments_only
@@ -720,98 +723,27 @@ def student_fee_preview(request, student_id):
 
 @module_required('payments', 'view')
 def receipt_view(request, receipt_no):
-    """Receipt view - uses AtomicFeeCalculator for consistent calculations"""
+    """Receipt view - rendered from the snapshot taken when the payment was made"""
+    cache_key = ReceiptSnapshotService.cache_key(receipt_no)
+    html = cache.get(cache_key)
+    if html is not None:
+        return HttpResponse(html)
+    
     try:
-        receipt_data = FeeReportingService.get_receipt_data(receipt_no)
-        school = SchoolProfile.objects.first()
-        student = receipt_data['student']
-        
-        payments = receipt_data['deposits']
-        
-        # Use AtomicFeeCalculator for consistent calculations
-        payable_fees = AtomicFeeCalculator.get_payable_fees(student, False)
-        balance_info = AtomicFeeCalculator.calculate_student_balance(student)
-        
-        # Map payments to calculator data for accurate calculations
-        enhanced_payments = []
-        for payment in payments:
-            # Find matching fee from calculator
-            matching_fee = None
-            for fee in payable_fees:
-                if ("Carry Forward" in payment.note and fee.get('id') == 'carry_forward') or \
-                   ("Fine Payment" in payment.note and fee.get('id', '').startswith('fine_')) or \
-                   (fee.get('display_name', '') in payment.note):
-                    matching_fee = fee
-                    break
-            
-            if matching_fee:
-                # Calculate previous payments based on actual payment history
-                if "Carry Forward" in payment.note:
-                    # For CF: Get all CF payments before this one
-                    cf_payments_before = FeeDeposit.objects.filter(
-                        student=student,
-                        note__icontains="Carry Forward",
-                        deposit_date__lt=payment.deposit_date
-                    ).aggregate(total=Sum('paid_amount'))['total'] or Decimal('0')
-                    payment.previous_total_paid = cf_payments_before
-                else:
-                    # For regular fees: Get all payments for this fee type before this one
-                    fee_type = payment.note.replace('Fee Payment: ', '') if 'Fee Payment:' in payment.note else ''
-                    regular_payments_before = FeeDeposit.objects.filter(
-                        student=student,
-                        note__icontains=fee_type,
-                        deposit_date__lt=payment.deposit_date
-                    ).exclude(
-                        Q(note__icontains="Fine Payment") | Q(note__icontains="Carry Forward")
-                    ).aggregate(total=Sum('paid_amount'))['total'] or Decimal('0')
-                    payment.previous_total_paid = regular_payments_before
-                payment.due_amount = matching_fee.get('due', 0)
-            else:
-                # Fallback for unmatched payments
-                payment.previous_total_paid = Decimal('0')
-                payment.due_amount = max(payment.amount - payment.paid_amount - payment.discount, Decimal('0'))
-            
-            enhanced_payments.append(payment)
-        
-        fine_payments = [p for p in enhanced_payments if "Fine Payment" in (p.note or '')]
-        cf_payments = [p for p in enhanced_payments if "Carry Forward Payment" in (p.note or '')]
-        regular_payments = [p for p in enhanced_payments if not ("Fine Payment" in (p.note or '') or "Carry Forward Payment" in (p.note or ''))]
-        
-        # Calculate totals from enhanced payments
-        total_previous_paid = sum(getattr(p, 'previous_total_paid', 0) for p in enhanced_payments)
-        total_due = sum(getattr(p, 'due_amount', 0) for p in enhanced_payments)
-        
-        # Calculate session-wise due amounts for receipt template - FIXED: Use 'balance' key
-        current_session_due = balance_info.get('current_session', {}).get('balance', 0)
-        previous_session_due = balance_info.get('carry_forward', {}).get('balance', 0)
-        
-        return render(request, 'student_fees/receipt.html', {
-            'school': school,
-            'student': student,
-            'class_name': student.class_section.class_name if student.class_section else '',
-            'receipt_no': receipt_data['receipt_no'],
-            'deposit_date': receipt_data['deposit_date'],
-            'payments': enhanced_payments,
-            'regular_payments': regular_payments,
-            'cf_payments': cf_payments,
-            'fine_payments': fine_payments,
-            'total_amount': receipt_data['total_amount'],
-            'total_discount': receipt_data['total_discount'],
-            'total_paid': receipt_data['total_paid'],
-            'total_previous_paid': total_previous_paid,
-            'total_due': total_due,
-            'current_session_due': current_session_due,
-            'previous_session_due': previous_session_due,
-            'show_discount': any(p.discount for p in enhanced_payments),
-            'copy_labels': ['Original', 'Duplicate'],
-            'amount_in_words': f"Rupees {number_to_words(receipt_data['total_paid']).title()} Only"
-        })
+        context = ReceiptSnapshotService.context(receipt_no)
+        context['school'] = SchoolProfile.objects.first()
+        context['amount_in_words'] = f"Rupees {number_to_words(context['total_paid']).title()} Only"
+        # Rendered without the request: the cached page is shared by every cashier
+        html = render_to_string('student_fees/receipt.html', context)
         
     except ValueError as e:
         raise Http404(str(e))
     except Exception as e:
         logger.exception(f"Error loading receipt {sanitize_log_input(receipt_no)}")
         raise Http404("Error loading receipt") from e
+    
+    cache.set(cache_key, html, ReceiptSnapshotService.CACHE_TIMEOUT)
+    return HttpResponse(html)
 
 @module_required('payments', 'view')
 def payment_confirmation(request, student_id):
@@ -833,50 +765,23 @@ def payment_confirmation(request, student_id):
     balance_info = AtomicFeeCalculator.calculate_student_balance(student)
     payable_fees = AtomicFeeCalculator.get_payable_fees(student, False)
     
-    # Map deposits to calculator data for accurate previous_paid and due_amount
-    enhanced_deposits = []
-    for deposit in deposits:
-        # Find matching fee from calculator
-        matching_fee = None
-        for fee in payable_fees:
-            if ("Carry Forward" in deposit.note and fee.get('id') == 'carry_forward') or \
-               ("Fine Payment" in deposit.note and fee.get('id', '').startswith('fine_')) or \
-               (fee.get('display_name', '') in deposit.note):
-                matching_fee = fee
-                break
-        
+    # Map deposits to calculator data via their allocations
+    payable_by_id = {fee['id']: fee for fee in payable_fees}
+    enhanced_deposits = PaymentAllocationService.annotate_deposits(student, deposits)
+    for deposit in enhanced_deposits:
+        matching_fee = payable_by_id.get(deposit.payable_key)
         if matching_fee:
-            # Calculate previous payments based on actual payment history
-            if "Carry Forward" in deposit.note:
-                # For CF: Get all CF payments before this one
-                cf_payments_before = FeeDeposit.objects.filter(
-                    student=student,
-                    note__icontains="Carry Forward",
-                    deposit_date__lt=deposit.deposit_date
-                ).aggregate(total=Sum('paid_amount'))['total'] or Decimal('0')
-                deposit.previous_paid = cf_payments_before
-            else:
-                # For regular fees: Get all payments for this fee type before this one
-                fee_type = deposit.note.replace('Fee Payment: ', '') if 'Fee Payment:' in deposit.note else ''
-                regular_payments_before = FeeDeposit.objects.filter(
-                    student=student,
-                    note__icontains=fee_type,
-                    deposit_date__lt=deposit.deposit_date
-                ).exclude(
-                    Q(note__icontains="Fine Payment") | Q(note__icontains="Carry Forward")
-                ).aggregate(total=Sum('paid_amount'))['total'] or Decimal('0')
-                deposit.previous_paid = regular_payments_before
+            # Previous payments towards the same fee, fine or carry forward
+            deposit.previous_paid = deposit.paid_before
             deposit.due_amount = matching_fee.get('due', 0)
         else:
-            # Fallback for unmatched deposits
+            # Fallback for fully paid or unmatched deposits
             deposit.previous_paid = Decimal('0')
             deposit.due_amount = max(deposit.amount - deposit.paid_amount - deposit.discount, Decimal('0'))
-        
-        enhanced_deposits.append(deposit)
     
-    fine_deposits = [d for d in enhanced_deposits if "Fine Payment" in (d.note or '')]
-    cf_deposits = [d for d in enhanced_deposits if "Carry Forward Payment" in (d.note or '')]
-    regular_deposits = [d for d in enhanced_deposits if not ("Fine Payment" in (d.note or '') or "Carry Forward Payment" in (d.note or ''))]
+    fine_deposits = [d for d in enhanced_deposits if d.allocation_type == PaymentAllocation.FINE]
+    cf_deposits = [d for d in enhanced_deposits if d.allocation_type == PaymentAllocation.CARRY_FORWARD]
+    regular_deposits = [d for d in enhanced_deposits if d.allocation_type == PaymentAllocation.FEE]
     
     # Calculate totals from enhanced deposits
     total_previous_paid = sum(getattr(d, 'previous_paid', 0) for d in enhanced_deposits)
@@ -217,7 +217,7 @@ def student_quick_info_api(request, student_id):
         
         student = Student.objects.select_related('class_section').only(
             'id', 'admission_number', 'first_name', 'last_name',
-            'mobile_number', 'email', 'student_image', 'due_amount',
+            'mobile_number', 'email', 'student_image', 'image_variants', 'due_amount',
             'class_section__class_name', 'class_section__section_name'
         ).get(id=student_id)
         
@@ -233,7 +233,7 @@ def student_quick_info_api(request, student_id):
                 'section': student.class_section.section_name if student.class_section else 'N/A',
                 'mobile': student.mobile_number,
                 'email': student.email,
-                'photo': student.student_image.url if student.student_image and student.student_image.url else None,
+                'photo': student.get_image_url('thumb') if student.student_image else None,
                 'due_amount': str(student.due_amount or 0),
                 'total_outstanding': str(financial.get('total_outstanding', 0)),
                 'attendance_percentage': student.attendance_percentage
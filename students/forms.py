@@ -113,7 +113,8 @@ class StudentForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         # Optimize class_section queryset
-        self.fields['class_section'].queryset = ClassSection.objects.select_related().all()
+        if 'class_section' in self.fields:
+            self.fields['class_section'].queryset = ClassSection.objects.select_related().all()
         
         # Set required fields
         required_fields = [
@@ -134,11 +135,18 @@ class StudentForm(forms.ModelForm):
                 self.fields[field_name].required = True
         
         # Hide status field for new students (will use model default 'ACTIVE')
-        if not self.instance.pk:
+        if not self.instance.pk and 'status' in self.fields:
             self.fields['status'].widget = forms.HiddenInput()
             self.fields['status'].initial = 'ACTIVE'
             self.fields['status'].required = False
 
+    def _value_taken(self, field_name, value):
+        """Whether another student already uses ``value`` for ``field_name``"""
+        existing = Student.objects.filter(**{field_name: value})
+        if self.instance.pk:
+            existing = existing.exclude(pk=self.instance.pk)
+        return existing.exists()
+
     def clean_admission_number(self):
         """Validate and sanitize admission number"""
         admission_number = self.cleaned_data.get('admission_number')
@@ -153,11 +161,7 @@ class StudentForm(forms.ModelForm):
             raise ValidationError("Admission number must be 3-20 alphanumeric characters.")
         
         # Check uniqueness (exclude current instance for updates)
-        existing = Student.objects.filter(admission_number=admission_number)
-        if self.instance.pk:
-            existing = existing.exclude(pk=self.instance.pk)
-        
-        if existing.exists():
+        if self._value_taken('admission_number', admission_number):
             raise ValidationError("This admission number is already taken. Please choose a different one.")
         
         return admission_number
@@ -242,11 +246,7 @@ class StudentForm(forms.ModelForm):
         email = sanitize_input(email.strip().lower())
         
         # Check uniqueness (exclude current instance for updates)
-        existing = Student.objects.filter(email=email)
-        if self.instance.pk:
-            existing = existing.exclude(pk=self.instance.pk)
-        
-        if existing.exists():
+        if self._value_taken('email', email):
             raise ValidationError("This email is already registered. Please use a different email.")
         
         return email
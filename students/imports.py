@@ -0,0 +1,135 @@
+# students/imports.py
+"""Bulk student import adapter (see core/imports.py)"""
+
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from core.imports import ImportAdapter, parse_decimal
+from .forms import StudentForm
+from .models import Student
+import logging
+
+logger = logging.getLogger(__name__)
+
+FILE_FIELDS = ('student_image', 'aadhar_card', 'transfer_certificate')
+
+
+class StudentImportForm(StudentForm):
+    """StudentForm without uploads/class/status, checking uniqueness against a preloaded chunk"""
+
+    class Meta(StudentForm.Meta):
+        fields = [name for name in StudentForm.Meta.fields
+                  if name not in FILE_FIELDS + ('class_section', 'status')]
+
+    def __init__(self, *args, taken=None, **kwargs):
+        self.taken = taken or {}
+        super().__init__(*args, **kwargs)
+
+    def _value_taken(self, field_name, value):
+        return value in self.taken.get(field_name, ())
+
+    def validate_unique(self):
+        # Checked per chunk by StudentImportAdapter instead of a query per row
+        pass
+
+
+class StudentImportAdapter(ImportAdapter):
+    """
+    One row per new student: the admission form's fields plus the class as
+    ``class`` (e.g. ``5A``) or ``class_name`` and ``section_name``, and an
+    optional ``due_amount`` carried forward. Admission numbers that already
+    exist are skipped.
+    """
+
+    kind = 'students'
+    label = 'Students'
+    module = 'students'
+    touches = ('students',)
+    columns = (
+        'admission_number', 'first_name', 'last_name', 'father_name', 'mother_name',
+        'date_of_birth', 'date_of_admission', 'gender', 'religion', 'caste_category',
+        'address', 'mobile_number', 'email', 'blood_group',
+    )
+    aliases = {
+        'admission_no': 'admission_number', 'mobile': 'mobile_number', 'dob': 'date_of_birth',
+        'admission_date': 'date_of_admission', 'category': 'caste_category',
+        'section': 'section_name', 'carry_forward': 'due_amount',
+    }
+    BATCH_SIZE = 500
+
+    def __init__(self, user=None, **options):
+        super().__init__(user=user, **options)
+        self.seen = {'admission_number': set(), 'email': set()}
+        self._classes = None
+
+    def classes(self):
+        """{'class5a': id} by display name (spaces and dashes dropped), plus (class_name, section_name) pairs"""
+        if self._classes is None:
+            from subjects.models import ClassSection
+
+            self._classes = {}
+            for class_id, class_name, section_name in ClassSection.objects.values_list('id', 'class_name', 'section_name'):
+                self._classes[self._class_key(f"{class_name}{section_name}")] = class_id
+                self._classes[(class_name.strip().lower(), section_name.strip().lower())] = class_id
+        return self._classes
+
+    @staticmethod
+    def _class_key(name):
+        return name.replace(' ', '').replace('-', '').lower()
+
+    def prepare(self, records):
+        admissions = {record.get('admission_number', '').strip().upper() for _, record in records}
+        emails = {record.get('email', '').strip().lower() for _, record in records}
+        students = Student.objects.all_statuses().select_related(None)
+        existing = set(students.filter(admission_number__in=admissions).values_list('admission_number', flat=True))
+        taken_emails = set(students.filter(email__in=emails).values_list('email', flat=True))
+        return {
+            'existing': existing,
+            'taken': {
+                'admission_number': self.seen['admission_number'],
+                'email': taken_emails | self.seen['email'],
+            },
+        }
+
+    def _class_id(self, record):
+        classes = self.classes()
+        if record.get('class'):
+            key = self._class_key(record['class'])
+            if key not in classes:
+                raise ValidationError(f"class '{record['class']}' does not exist")
+            return classes[key]
+        if record.get('class_name'):
+            key = (record['class_name'].strip().lower(), record.get('section_name', '').strip().lower())
+            if key not in classes:
+                raise ValidationError(f"class '{record['class_name']} {record.get('section_name', '')}' does not exist")
+            return classes[key]
+        return None
+
+    def build(self, row_num, record, context):
+        admission = record.get('admission_number', '').strip().upper()
+        if admission in context['existing'] and admission not in self.seen['admission_number']:
+            return None
+
+        class_id = self._class_id(record)
+        form = StudentImportForm(data=record, taken=context['taken'])
+        if not form.is_valid():
+            raise ValidationError(self.form_errors(form))
+
+        student = form.save(commit=False)
+        student.class_section_id = class_id
+        student.status = 'ACTIVE'
+        student.due_amount = parse_decimal(record.get('due_amount'), default=Decimal('0.00'))
+        self.seen['admission_number'].add(student.admission_number)
+        self.seen['email'].add(student.email)
+        return student
+
+    def write(self, instances):
+        # ignore_conflicts: a student added meanwhile by hand is left as is, so count what was inserted
+        saved = Student.objects.filter(admission_number__in=[student.admission_number for student in instances])
+        before = saved.count()
+        Student.objects.bulk_create(instances, batch_size=self.BATCH_SIZE, ignore_conflicts=True)
+        return saved.count() - before, 0
+
+    def finish(self, report):
+        if report.created:
+            from dashboard.real_time_service import DashboardUpdateService
+            DashboardUpdateService.update_student_stats()
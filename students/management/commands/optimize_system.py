@@ -108,14 +108,8 @@ class Command(BaseCommand):
             "CREATE INDEX IF NOT EXISTS idx_students_due_amount ON students_student(due_amount);",
             "CREATE INDEX IF NOT EXISTS idx_students_created_at ON students_student(created_at);",
             
-            # Fee-related indexes
-            "CREATE INDEX IF NOT EXISTS idx_fee_deposits_student ON student_fees_feedeposit(student_id);",
-            "CREATE INDEX IF NOT EXISTS idx_fee_deposits_date ON student_fees_feedeposit(deposit_date);",
-            "CREATE INDEX IF NOT EXISTS idx_fee_deposits_amount ON student_fees_feedeposit(paid_amount);",
-            
-            # Attendance indexes
-            "CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance_attendance(student_id, date);",
-            "CREATE INDEX IF NOT EXISTS idx_attendance_status ON attendance_attendance(status);",
+            # Fee deposit, fine and attendance indexes are declared in the models'
+            # Meta.indexes; check them with `python manage.py explain_hot_queries`
             
             # User activity indexes
             "CREATE INDEX IF NOT EXISTS idx_users_last_login ON users_customuser(last_login);",
@@ -56,7 +56,7 @@ class StudentManager(models.Manager):
         return self.all_statuses().select_related(
             'class_section'
         ).only(
-            'admission_number', 'first_name', 'last_name', 'student_image',
+            'admission_number', 'first_name', 'last_name', 'student_image', 'image_variants',
             'mobile_number', 'email', 'due_amount', 'created_at', 'status',
             'class_section__class_name', 'class_section__section_name'
         ).get(admission_number=admission_number)
@@ -64,7 +64,7 @@ class StudentManager(models.Manager):
     def get_list_optimized(self, status_filter=None):
         """Optimized queryset for student list view with status filtering"""
         queryset = self.all_statuses().select_related('class_section').only(
-            'id', 'admission_number', 'first_name', 'last_name',
+            'id', 'admission_number', 'first_name', 'last_name', 'student_image', 'image_variants',
             'mobile_number', 'email', 'due_amount', 'created_at', 'status',
             'class_section__class_name', 'class_section__section_name'
         )
@@ -194,6 +194,7 @@ class Student(BaseModel):
     email = models.EmailField(verbose_name="Email")
     blood_group = models.CharField(max_length=5, choices=BLOOD_GROUP_CHOICES, verbose_name="Blood Group")
     student_image = models.ImageField(upload_to='students/images/', null=True, blank=True, validators=[validate_file_size, validate_file_extension])
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Thumbnails, see core/images.py
     aadhar_card = models.FileField(upload_to='students/documents/', verbose_name="Aadhar Card", validators=[validate_file_size, validate_file_extension])
     transfer_certificate = models.FileField(upload_to='students/documents/', verbose_name="Transfer Certificate", validators=[validate_file_size, validate_file_extension])
     due_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -219,13 +220,10 @@ class Student(BaseModel):
         ordering = ['first_name', 'last_name']
     
     def update_due_amount(self):
-        """Update due amount with auto-sync of new fees/fines"""
+        """Queue this student's balance for recalculation when the transaction commits"""
         try:
-            from core.fee_calculation_engine import fee_engine
-            # Auto-sync new fees and fines before calculating
-            fee_engine.auto_sync_student_fees(self)
-            # Clear cache to get fresh data
-            self.invalidate_cache()
+            from core.fee_management.recalculation import due_recalc_queue
+            due_recalc_queue.mark_dirty([self])
         except ImportError:
             pass
 
@@ -343,18 +341,11 @@ class Student(BaseModel):
         
         if percentage is None:
             try:
-                from attendance.models import Attendance
-                from django.db.models import Count, Q
-                
-                # Single query with aggregation
-                stats = Attendance.objects.filter(student=self).aggregate(
-                    total=Count('id'),
-                    present=Count('id', filter=Q(status='Present'))
-                )
+                from attendance.models import StudentAttendanceTotals
                 
-                total = stats['total'] or 0
-                present = stats['present'] or 0
-                percentage = round((present / total * 100), 2) if total > 0 else 0
+                # Running totals kept by the attendance writer (one indexed lookup)
+                totals = StudentAttendanceTotals.objects.filter(student=self).first()
+                percentage = totals.percentage if totals else 0
                 
                 # Cache for 1 hour
                 cache.set(cache_key, percentage, 3600)
@@ -395,7 +386,7 @@ class Student(BaseModel):
             'name': self.name,
             'class': self.class_section.class_name if self.class_section else 'N/A',
             'section': self.class_section.section_name if self.class_section else 'N/A',
-            'photo': self.get_image_url(),
+            'photo': self.get_image_url('profile'),
             'mobile': self.mobile_number,
             'email': self.email
         }
@@ -468,8 +459,17 @@ class Student(BaseModel):
         
         return sorted(events, key=lambda x: x['date'], reverse=True)
     
-    def get_image_url(self):
-        """Get student image URL with fallback to default avatar"""
+    def get_image_url(self, variant=None):
+        """Get student image URL with fallback to default avatar
+
+        ``variant`` ('thumb' or 'profile') returns the resized JPEG when it has
+        been generated for the current photo, without touching the storage.
+        """
+        if variant:
+            from core.images import ImageVariantService
+            url = ImageVariantService.url(self.student_image, self.image_variants, variant)
+            if url:
+                return url
         if self.student_image and hasattr(self.student_image, 'url') and self.student_image.url:
             try:
                 # Check if file exists
@@ -491,7 +491,7 @@ class Student(BaseModel):
         # Check all file fields
         for field_name in ['student_image', 'aadhar_card', 'transfer_certificate']:
             field_value = getattr(self, field_name)
-            if field_value:
+            if field_value and field_value._committed:  # New uploads are written by save()
                 try:
                     if not field_value.storage.exists(field_value.name):
                         logger.warning(f"Missing {field_name} file for {self.admission_number}: {field_value.name}")
@@ -505,10 +505,20 @@ class Student(BaseModel):
         if fields_to_clear:
             self.save(update_fields=fields_to_clear)
     
+    def get_image_webp_url(self, variant):
+        """WebP version of a photo variant, or None if it has not been generated"""
+        from core.images import ImageVariantService
+        return ImageVariantService.url(self.student_image, self.image_variants, variant, 'webp')
+
     @property
     def image_url(self):
         """Property for template access"""
         return self.get_image_url()
+
+    @property
+    def thumbnail_url(self):
+        """Small square photo for lists and avatars"""
+        return self.get_image_url('thumb')
     
     def get_last_payment(self):
         """Get last payment details"""
@@ -558,19 +568,31 @@ class Student(BaseModel):
         }
         return status_info.get(self.status, status_info['ACTIVE'])
     
-    def invalidate_cache(self):
-        """Clear all cached data for this student"""
-        cache_keys = [
-            f"student_dashboard_{self.admission_number}",
-            f"student_fees_{self.admission_number}",
-            f"student_activities_{self.admission_number}",
-            f"financial_summary_{self.id}",
-            f"attendance_pct_{self.id}",
-            f"recent_activities_{self.id}",
-            f"students_list_{self.id}",  # Clear list cache for any user
+    @staticmethod
+    def _cache_keys(student_id, admission_number):
+        return [
+            f"student_dashboard_{admission_number}",
+            f"student_fees_{admission_number}",
+            f"student_activities_{admission_number}",
+            f"financial_summary_{student_id}",
+            f"attendance_pct_{student_id}",
+            f"recent_activities_{student_id}",
+            f"students_list_{student_id}",  # Clear list cache for any user
             f"student_status_counts",  # Clear status counts cache
         ]
-        cache.delete_many(cache_keys)
+    
+    @classmethod
+    def invalidate_cache_many(cls, students):
+        """Clear cached data of many students with one cache call"""
+        cache_keys = set()
+        for student in students:
+            cache_keys.update(cls._cache_keys(student.id, student.admission_number))
+        if cache_keys:
+            cache.delete_many(list(cache_keys))
+    
+    def invalidate_cache(self):
+        """Clear all cached data for this student"""
+        cache.delete_many(self._cache_keys(self.id, self.admission_number))
         
         # Clear property caches
         if hasattr(self, '_financial_summary'):
@@ -9,6 +9,7 @@ import logging
 from .models import Student
 from core.security_utils import sanitize_input, log_security_event
 from core.cache_utils import sanitize_cache_key, safe_cache_set, safe_cache_get
+from core.response_cache import data_versions
 
 logger = logging.getLogger(__name__)
 
@@ -258,8 +259,8 @@ class StudentService:
             # Limit results and optimize fields
             results = list(queryset.only(
                 'id', 'admission_number', 'first_name', 'last_name',
-                'mobile_number', 'email', 'class_section__class_name',
-                'class_section__section_name'
+                'mobile_number', 'email', 'due_amount', 'student_image', 'image_variants',
+                'class_section__class_name', 'class_section__section_name'
             )[:20])
             
             # Cache for 5 minutes
@@ -320,6 +321,7 @@ class StudentService:
                 updated_count = Student.objects.filter(
                     id__in=student_ids
                 ).update(due_amount=amount)
+                data_versions.touch('fees')
                 
                 # Log bulk update
                 log_security_event(
@@ -406,7 +408,7 @@ class StudentDashboardService:
                     'name': f"{student.first_name} {student.last_name}",
                     'class': student.class_section.class_name if student.class_section else 'N/A',
                     'section': student.class_section.section_name if student.class_section else 'N/A',
-                    'photo': student.get_image_url(),
+                    'photo': student.get_image_url('profile'),
                     'mobile': student.mobile_number,
                     'email': student.email
                 },
@@ -225,7 +225,7 @@ def student_search_api(request):
                 'class': student.class_section.class_name if student.class_section else 'N/A',
                 'section': student.class_section.section_name if student.class_section else 'N/A',
                 'due_amount': float(student.due_amount or 0),
-                'photo': student.student_image.url if student.student_image and student.student_image.url else None
+                'photo': student.get_image_url('thumb') if student.student_image else None
             })
         
         return JsonResponse({
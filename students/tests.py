@@ -1,3 +1,92 @@
-from django.test import TestCase
+# students/tests.py
+import io
+import os
+import tempfile
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.benchmark_school import BenchmarkSchoolBuilder
+from students.models import Student
+
+
+def photo_upload(name='photo.jpg', size=(1200, 800), color=(200, 80, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class PhotoVariantTests(TestCase):
+    """Uploaded photos get WebP/JPEG thumb and profile variants, replaced and removed with the photo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=2, classes=1, sections_per_class=1, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        self.student = Student.objects.order_by('id').first()
+
+    def upload(self, **kwargs):
+        self.student.student_image = photo_upload(**kwargs)
+        self.student.save()
+        return self.student.image_variants
+
+    def path(self, name):
+        return os.path.join(self.media_root, name)
+
+    def test_variants_are_generated_on_upload(self):
+        variants = self.upload()
+        self.assertEqual(variants['source'], self.student.student_image.name)
+        for name, expected in (('thumb', (192, 192)), ('profile', (480, 320))):
+            for ext in ('webp', 'jpg'):
+                with Image.open(self.path(variants[name][ext])) as image:
+                    self.assertEqual(image.size, expected)
+        self.assertEqual(Student.objects.get(pk=self.student.pk).image_variants, variants)
+        self.assertTrue(self.student.get_image_url('thumb').endswith('.thumb.jpg'))
+
+    def test_replaced_photo_removes_old_variants(self):
+        old = self.upload()
+        new = self.upload(name='new.jpg', color=(10, 120, 200))
+        self.assertNotEqual(old['thumb']['jpg'], new['thumb']['jpg'])
+        self.assertFalse(os.path.exists(self.path(old['thumb']['jpg'])))
+        self.assertTrue(os.path.exists(self.path(new['thumb']['jpg'])))
+
+    def test_deleted_student_removes_variants(self):
+        variants = self.upload()
+        self.student.delete()
+        self.assertFalse(os.path.exists(self.path(variants['thumb']['webp'])))
+
+    def test_photo_tag_renders_webp_with_jpeg_fallback(self):
+        self.upload()
+        html = Template("{% load image_tags %}{% photo student 'thumb' alt='Photo' %}").render(
+            Context({'student': self.student})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('.thumb.webp', html)
+        self.assertIn('.thumb.jpg', html)
+        self.assertIn('loading="lazy"', html)
+
+
+class StudentImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BenchmarkSchoolBuilder(students=2, classes=1, sections_per_class=1, attendance_days=2,
+                               routes=1, stoppages_per_route=1).build()
+
+    def test_students_added_meanwhile_are_not_counted_as_created(self):
+        from students.imports import StudentImportAdapter
+
+        existing = Student.objects.order_by('id').first()
+        taken = Student(**{field.attname: getattr(existing, field.attname) for field in Student._meta.concrete_fields})
+        taken.pk = None
+        new = Student(**{field.attname: getattr(existing, field.attname) for field in Student._meta.concrete_fields})
+        new.pk, new.admission_number, new.email = None, 'IMP0001', 'imported@example.com'
+
+        self.assertEqual(StudentImportAdapter().write([taken, new]), (1, 0))
+        self.assertTrue(Student.objects.filter(admission_number='IMP0001').exists())
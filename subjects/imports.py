@@ -0,0 +1,101 @@
+# subjects/imports.py
+"""Bulk class section and subject import adapters (see core/imports.py)"""
+
+from django.core.exceptions import ValidationError
+from core.imports import ImportAdapter
+from .forms import ClassSectionForm, SubjectForm
+from .models import ClassSection, Subject
+
+
+class ClassSectionImportForm(ClassSectionForm):
+    def validate_unique(self):
+        # Checked per chunk by ClassSectionImportAdapter
+        pass
+
+
+class SubjectImportForm(SubjectForm):
+    def validate_unique(self):
+        # Checked per chunk by SubjectImportAdapter
+        pass
+
+
+class ClassSectionImportAdapter(ImportAdapter):
+    """class_name, section_name, room_number; classes that already exist are skipped"""
+
+    kind = 'class_sections'
+    label = 'Class sections'
+    module = 'classes'
+    touches = ('students',)
+    columns = ('class_name', 'section_name', 'room_number')
+    aliases = {'class': 'class_name', 'section': 'section_name', 'room': 'room_number', 'room_no': 'room_number'}
+
+    def __init__(self, user=None, **options):
+        super().__init__(user=user, **options)
+        self.seen_classes = set()
+        self.seen_rooms = set()
+
+    def prepare(self, records):
+        existing = set()
+        rooms = set(ClassSection.objects.filter(
+            room_number__in={record.get('room_number', '').strip() for _, record in records}
+        ).values_list('room_number', flat=True))
+        for class_name, section_name in ClassSection.objects.filter(
+            class_name__in={record.get('class_name', '').strip() for _, record in records}
+        ).values_list('class_name', 'section_name'):
+            existing.add((class_name, section_name))
+        return {'existing': existing, 'rooms': rooms}
+
+    def build(self, row_num, record, context):
+        form = ClassSectionImportForm(data=record)
+        if not form.is_valid():
+            raise ValidationError(self.form_errors(form))
+        class_section = form.save(commit=False)
+        key = (class_section.class_name, class_section.section_name)
+        if key in context['existing']:
+            return None
+        if key in self.seen_classes:
+            raise ValidationError(f"{class_section.class_name} {class_section.section_name} appears more than once")
+        if class_section.room_number in context['rooms'] or class_section.room_number in self.seen_rooms:
+            raise ValidationError(f"room number '{class_section.room_number}' is already used")
+        self.seen_classes.add(key)
+        self.seen_rooms.add(class_section.room_number)
+        return class_section
+
+    def write(self, instances):
+        from core.fee_management.fee_schedule import fee_schedule
+
+        ClassSection.objects.bulk_create(instances, ignore_conflicts=True)
+        fee_schedule.invalidate()  # bulk_create sends no post_save
+        return len(instances), 0
+
+
+class SubjectImportAdapter(ImportAdapter):
+    """One subject name per row; subjects that already exist are skipped"""
+
+    kind = 'subjects'
+    label = 'Subjects'
+    module = 'subjects'
+    columns = ('name',)
+    aliases = {'subject': 'name', 'subject_name': 'name'}
+
+    def __init__(self, user=None, **options):
+        super().__init__(user=user, **options)
+        self.seen = set()
+
+    def prepare(self, records):
+        names = {record.get('name', '').strip() for _, record in records}
+        return {'existing': set(Subject.objects.filter(name__in=names).values_list('name', flat=True))}
+
+    def build(self, row_num, record, context):
+        form = SubjectImportForm(data=record)
+        if not form.is_valid():
+            raise ValidationError(self.form_errors(form))
+        subject = form.save(commit=False)
+        if subject.name in context['existing'] or subject.name in self.seen:
+            return None
+        self.seen.add(subject.name)
+        return subject
+
+    def write(self, instances):
+        Subject.objects.bulk_create(instances, ignore_conflicts=True)
+        return len(instances), 0
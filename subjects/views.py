@@ -7,7 +7,6 @@ from .models import ClassSection, Subject, SubjectAssignment
 from .forms import ClassSectionForm, SubjectForm, SubjectAssignmentForm
 from users.decorators import module_required
 import csv
-import io
 import codecs
 
 @module_required('subjects', 'view')
@@ -128,76 +127,77 @@ def delete_subject_assignment(request, pk):
         messages.success(request, 'The subject assignment has been removed successfully.')
     return redirect('subjects_management')
 
+def _sectioned_records(rows):
+    """
+    Split the exported subjects CSV ("Subject Management Data" and
+    "Class-Section Data" blocks) into {'subjects': [...], 'class_sections': [...]}
+    of (row_num, record) pairs for the bulk import adapters.
+    """
+    sections = {'subjects': [], 'class_sections': []}
+    current_section = None
+    header_pending = False
+    for row_num, row in enumerate(rows, 1):
+        if not row or not any(row):  # Skip empty rows
+            continue
+
+        # Check for section headers
+        first = row[0].strip().lower()
+        if 'data' in first or (len(row) == 1 and ('subject management' in first or 'class-section' in first)):
+            current_section = first
+            header_pending = True
+            continue
+
+        # Skip the column headings that follow a section header
+        if header_pending:
+            header_pending = False
+            if any(header in first for header in ['subject', 'class', 'name']):
+                continue
+
+        cells = [cell.strip() for cell in row]
+        if 'subject management' in str(current_section):
+            sections['subjects'].append((row_num, {'name': cells[0]}))
+        elif 'class-section' in str(current_section):
+            cells += [''] * (3 - len(cells))
+            sections['class_sections'].append((row_num, {
+                'class_name': cells[0], 'section_name': cells[1], 'room_number': cells[2],
+            }))
+    return sections
+
+
 @module_required('subjects', 'edit')
 def import_csv(request):
-    """Import subjects from CSV file with proper UTF-8 encoding support."""
+    """Import subjects and class sections from CSV file with proper UTF-8 encoding support."""
     if request.method == 'POST' and request.FILES.get('csv_file'):
+        from core.imports import BulkImporter, get_adapter
+
         csv_file = request.FILES['csv_file']
         
         try:
-            # Detect encoding and read file
-            file_data = csv_file.read()
-            
             # Try UTF-8 first, then UTF-8 with BOM, then other encodings
             encodings = ['utf-8-sig', 'utf-8', 'latin1', 'cp1252']
-            decoded_data = None
+            sections = None
             
             for encoding in encodings:
                 try:
-                    decoded_data = file_data.decode(encoding)
+                    csv_file.seek(0)
+                    rows = csv.reader(codecs.iterdecode(csv_file, encoding))
+                    sections = _sectioned_records(rows)
                     break
                 except UnicodeDecodeError:
                     continue
             
-            if not decoded_data:
+            if sections is None:
                 return JsonResponse({'success': False, 'message': 'We couldn\'t read your file. Please make sure it\'s saved in UTF-8 format and try again.'})
             
-            # Parse CSV
-            csv_reader = csv.reader(io.StringIO(decoded_data))
-            
             imported_count = 0
             errors = []
-            current_section = None
             
-            for row_num, row in enumerate(csv_reader, 1):
-                if not row or not any(row):  # Skip empty rows
-                    continue
-                
-                # Check for section headers
-                if len(row) == 1 or 'data' in row[0].lower():
-                    current_section = row[0].lower()
-                    continue
-                
-                # Skip header rows
-                if any(header in row[0].lower() for header in ['subject', 'class', 'name']):
-                    continue
-                
-                try:
-                    if 'subject management' in str(current_section):
-                        # Import subjects
-                        if len(row) >= 1 and row[0].strip():
-                            subject_name = row[0].strip()
-                            subject, created = Subject.objects.get_or_create(name=subject_name)
-                            if created:
-                                imported_count += 1
-                    
-                    elif 'class-section' in str(current_section):
-                        # Import class sections
-                        if len(row) >= 2 and row[0].strip() and row[1].strip():
-                            class_name = row[0].strip()
-                            section_name = row[1].strip()
-                            room_number = row[2].strip() if len(row) > 2 else ''
-                            
-                            cs, created = ClassSection.objects.get_or_create(
-                                class_name=class_name,
-                                section_name=section_name,
-                                defaults={'room_number': room_number}
-                            )
-                            if created:
-                                imported_count += 1
-                
-                except Exception as e:
-                    errors.append(f'Row {row_num}: {str(e)}')
+            # Rows are validated and saved in chunks by the bulk import adapters
+            for kind in ('class_sections', 'subjects'):
+                if sections[kind]:
+                    report = BulkImporter(get_adapter(kind, user=request.user)).run_records(sections[kind])
+                    imported_count += report.created
+                    errors.extend(report.errors)
             
             if errors:
                 return JsonResponse({
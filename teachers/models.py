@@ -8,6 +8,7 @@ class Teacher(models.Model):
     qualification = models.CharField(max_length=100)
     joining_date = models.DateField()
     photo = models.ImageField(upload_to='teacher_photos/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Thumbnails, see core/images.py
     resume = models.FileField(upload_to='teacher_resumes/', blank=True, null=True)
     joining_letter = models.FileField(upload_to='teacher_letters/', blank=True, null=True)
 
@@ -16,3 +17,19 @@ class Teacher(models.Model):
 
     def __str__(self):
         return self.name
+
+    def get_image_url(self, variant=None):
+        """Photo URL, preferring the resized variant ('thumb' or 'profile') when generated"""
+        if not self.photo:
+            return None
+        if variant:
+            from core.images import ImageVariantService
+            url = ImageVariantService.url(self.photo, self.image_variants, variant)
+            if url:
+                return url
+        return self.photo.url
+
+    def get_image_webp_url(self, variant):
+        """WebP version of a photo variant, or None if it has not been generated"""
+        from core.images import ImageVariantService
+        return ImageVariantService.url(self.photo, self.image_variants, variant, 'webp')